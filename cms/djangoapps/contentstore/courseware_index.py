@@ -1,6 +1,8 @@
 """ Code to allow module store to interface with courseware index """
 from __future__ import absolute_import
 
+import hashlib
+import json
 import logging
 import re
 from abc import ABCMeta, abstractmethod
@@ -28,6 +30,10 @@ from xmodule.modulestore import ModuleStoreEnum
 # how far back from the trigger point to look back in order to index
 REINDEX_AGE = timedelta(0, 60)  # 60 seconds
 
+# INDEX_CHUNK_SIZE is the largest number of documents that are sent to, read
+# from or removed from the search index at once
+INDEX_CHUNK_SIZE = 500
+
 log = logging.getLogger('edx.modulestore')
 
 
@@ -102,18 +108,44 @@ class SearchIndexerBase(object):
         return usage_id
 
     @classmethod
-    def remove_deleted_items(cls, searcher, structure_key, exclude_items):
+    def get_indexed_hashes(cls, searcher, structure_key):
         """
-        remove any item that is present in the search index that is not present in updated list of indexed items
-        as we find items we can shorten the set of items to keep
+        Returns the content hash of each item of the structure that is present in the search index,
+        by id - None for the items indexed before their content was hashed
         """
-        response = searcher.search(
-            doc_type=cls.DOCUMENT_TYPE,
-            field_dictionary=cls._get_location_info(structure_key),
-            exclude_dictionary={"id": list(exclude_items)}
-        )
-        result_ids = [result["data"]["id"] for result in response["results"]]
-        searcher.remove(cls.DOCUMENT_TYPE, result_ids)
+        indexed_hashes = {}
+        read_count = 0
+        while True:
+            # Pages are sorted on the (not analyzed) id, so that they neither overlap nor skip items
+            response = searcher.search(
+                doc_type=cls.DOCUMENT_TYPE,
+                field_dictionary=cls._get_location_info(structure_key),
+                size=INDEX_CHUNK_SIZE,
+                from_=read_count,
+                sort="id:asc",
+            )
+            for result in response["results"]:
+                indexed_hashes[result["data"]["id"]] = result["data"].get("content_hash")
+            read_count += len(response["results"])
+            if not response["results"] or read_count >= response["total"]:
+                return indexed_hashes
+
+    @classmethod
+    def remove_deleted_items(cls, searcher, indexed_hashes, exclude_items):
+        """
+        remove any item that is present in the search index (as listed by `indexed_hashes`) that is not present
+        in updated list of indexed items
+        """
+        result_ids = [item_id for item_id in indexed_hashes if item_id not in exclude_items]
+        for start in range(0, len(result_ids), INDEX_CHUNK_SIZE):
+            searcher.remove(cls.DOCUMENT_TYPE, result_ids[start:start + INDEX_CHUNK_SIZE])
+
+    @staticmethod
+    def content_hash(item_index):
+        """
+        Returns a hash of the index dictionary of an item, which tells whether it changed since it was indexed
+        """
+        return hashlib.sha1(json.dumps(item_index, sort_keys=True, default=unicode)).hexdigest()
 
     @classmethod
     def index(cls, modulestore, structure_key, triggered_at=None, reindex_age=REINDEX_AGE):
@@ -150,15 +182,34 @@ class SearchIndexerBase(object):
 
         # indexed_items is a list of all the items that we wish to remain in the
         # index, whether or not we are planning to actually update their index.
-        # This is used in order to build a query to remove those items not in this
-        # list - those are ready to be destroyed
+        # Those of indexed_hashes that are not in this list are ready to be destroyed
         indexed_items = set()
 
-        # items_index is a list of all the items index dictionaries.
-        # it is used to collect all indexes and index them using bulk API,
-        # instead of per item index API call.
+        # indexed_hashes holds the content hash of each item that is present in the
+        # index, so that only the items whose index dictionary changed are sent again
+        indexed_hashes = {}
+
+        # items_index is a list of the index dictionaries of the items that changed.
+        # They are sent in chunks of INDEX_CHUNK_SIZE using bulk API, instead of
+        # per item index API call, or all of the items of the structure at once.
         items_index = []
 
+        def add_item_index(item_index):
+            """
+            Add this index dictionary to the items_index, sending them if it's full
+            """
+            items_index.append(item_index)
+            if len(items_index) >= INDEX_CHUNK_SIZE:
+                send_items_index()
+
+        def send_items_index():
+            """
+            Send the index dictionaries of the items_index to the index, and empty it
+            """
+            if items_index:
+                searcher.index(cls.DOCUMENT_TYPE, items_index)
+                del items_index[:]
+
         def get_item_location(item):
             """
             Gets the version agnostic item location
@@ -240,13 +291,18 @@ class SearchIndexerBase(object):
                     item_index['start_date'] = item.start
                 item_index['content_groups'] = item_content_groups if item_content_groups else None
                 item_index.update(cls.supplemental_fields(item))
-                items_index.append(item_index)
-                indexed_count["count"] += 1
-                return item_content_groups
+                item_index['content_hash'] = cls.content_hash(item_index)
             except Exception as err:  # pylint: disable=broad-except
                 # broad exception so that index operation does not fail on one item of many
                 log.warning('Could not index item: %s - %r', item.location, err)
                 error_list.append(_('Could not index item: {}').format(item.location))
+                return
+
+            # only send the items whose content changed since they were indexed
+            if indexed_hashes.get(item_id) != item_index['content_hash']:
+                add_item_index(item_index)
+            indexed_count["count"] += 1
+            return item_content_groups
 
         try:
             with modulestore.branch_setting(ModuleStoreEnum.RevisionOption.published_only):
@@ -257,10 +313,11 @@ class SearchIndexerBase(object):
                 cls.supplemental_index_information(modulestore, structure)
 
                 # Now index the content
+                indexed_hashes.update(cls.get_indexed_hashes(searcher, structure_key))
                 for item in structure.get_children():
                     prepare_item_index(item, groups_usage_info=groups_usage_info)
-                searcher.index(cls.DOCUMENT_TYPE, items_index)
-                cls.remove_deleted_items(searcher, structure_key, indexed_items)
+                send_items_index()
+                cls.remove_deleted_items(searcher, indexed_hashes, indexed_items)
         except Exception as err:  # pylint: disable=broad-except
             # broad exception so that index operation does not prevent the rest of the application from working
             log.exception(
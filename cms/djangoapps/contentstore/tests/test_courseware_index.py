@@ -14,6 +14,7 @@ from lazy.lazy import lazy
 from mock import patch
 from pytz import UTC
 from search.search_engine_base import SearchEngine
+from search.tests.mock_search_engine import MockSearchEngine
 
 from contentstore.courseware_index import (
     CourseAboutSearchIndexer,
@@ -544,6 +545,39 @@ class TestCoursewareSearchIndexer(MixedWithOptionsTestCase):
         with self.assertRaises(SearchIndexingError):
             self.reindex_course(store)
 
+    def _test_only_changed_items_sent(self, store):
+        """ Test that items are sent to the index in chunks, and only when their content changed """
+        self.publish_item(store, self.vertical.location)
+        index = MockSearchEngine.index
+        search = MockSearchEngine.search
+        with patch('contentstore.courseware_index.INDEX_CHUNK_SIZE', 3), \
+                patch.object(MockSearchEngine, 'index', autospec=True, side_effect=index) as mock_index, \
+                patch.object(MockSearchEngine, 'search', autospec=True, side_effect=search) as mock_search:
+            self.assertEqual(self.reindex_course(store), 4)
+            self.assertEqual([len(call[0][2]) for call in mock_index.call_args_list], [3, 1])
+            # The indexed items are read in pages with a stable order.
+            self.assertTrue(mock_search.called)
+            self.assertTrue(all(call[1]["sort"] == "id:asc" for call in mock_search.call_args_list))
+
+            # Nothing is sent again when nothing changed.
+            mock_index.reset_mock()
+            self.assertEqual(self.reindex_course(store), 4)
+            self.assertFalse(mock_index.called)
+
+            # Only the changed item is sent again.
+            self.html_unit.display_name = "Updated Html Content"
+            self.update_item(store, self.html_unit)
+            self.publish_item(store, self.vertical.location)
+            self.assertEqual(self.reindex_course(store), 4)
+            self.assertEqual(
+                [[source["id"] for source in call[0][2]] for call in mock_index.call_args_list],
+                [[unicode(self.html_unit.location)]]
+            )
+
+        response = self.search()
+        self.assertEqual(response["total"], 4)
+        self.assertTrue(all(result["data"]["content_hash"] for result in response["results"]))
+
     @ddt.data(*WORKS_WITH_STORES)
     def test_indexing_course(self, store_type):
         self._perform_test_using_store(store_type, self._test_indexing_course)
@@ -572,6 +606,10 @@ class TestCoursewareSearchIndexer(MixedWithOptionsTestCase):
     def test_time_based_index(self, store_type):
         self._perform_test_using_store(store_type, self._test_time_based_index)
 
+    @ddt.data(*WORKS_WITH_STORES)
+    def test_only_changed_items_sent(self, store_type):
+        self._perform_test_using_store(store_type, self._test_only_changed_items_sent)
+
     @ddt.data(*WORKS_WITH_STORES)
     def test_exception(self, store_type):
         self._perform_test_using_store(store_type, self._test_exception)
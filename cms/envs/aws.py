@@ -156,6 +156,7 @@ LOG_DIR = ENV_TOKENS['LOG_DIR']
 DATA_DIR = path(ENV_TOKENS.get('DATA_DIR', DATA_DIR))
 
 CACHES = ENV_TOKENS['CACHES']
+COURSE_STRUCTURE_LOCAL_CACHE = ENV_TOKENS.get('COURSE_STRUCTURE_LOCAL_CACHE', COURSE_STRUCTURE_LOCAL_CACHE)
 # Cache used for location mapping -- called many times with the same key/value
 # in a given request.
 if 'loc_cache' not in CACHES:
@@ -212,6 +213,7 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
         CODE_JAIL[name] = value
 
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
+CODE_JAIL_WORKER_POOL = ENV_TOKENS.get('CODE_JAIL_WORKER_POOL', CODE_JAIL_WORKER_POOL)
 
 ASSET_IGNORE_REGEX = ENV_TOKENS.get('ASSET_IGNORE_REGEX', ASSET_IGNORE_REGEX)
 
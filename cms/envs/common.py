@@ -606,6 +606,14 @@ MODULESTORE = {
 # require student context.
 MODULESTORE_FIELD_OVERRIDE_PROVIDERS = ()
 
+# In-process, least-recently-used tier in front of the 'course_structure_cache'
+# for split modulestore course structures, which keeps them pickled but not
+# compressed. Setting either limit to 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE = {
+    'MAX_STRUCTURES': 0,
+    'MAX_BLOCKS': 0,
+}
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -621,6 +629,16 @@ CODE_JAIL = {
     },
 }
 
+# Pool of warm sandboxed Pythons that run the code of problems without waiting
+# for a new one to start and import numpy, see capa.safe_exec.worker_pool.
+# SIZE is the number of idle workers per process (0 disables the pool), and
+# idle workers are discarded after MAX_AGE seconds.  Each worker runs the code
+# of a single execution, so that executions can't tamper with each other.
+CODE_JAIL_WORKER_POOL = {
+    'SIZE': 0,
+    'MAX_AGE': 300,
+}
+
 ############################ DJANGO_BUILTINS ################################
 # Change DEBUG in your environment settings files, not here
 DEBUG = False
@@ -1013,7 +1031,7 @@ INSTALLED_APPS = [
     # For CMS
     'contentstore.apps.ContentstoreConfig',
 
-    'openedx.core.djangoapps.contentserver',
+    'openedx.core.djangoapps.contentserver.apps.ContentServerConfig',
     'course_creators',
     'openedx.core.djangoapps.external_auth',
     'student.apps.StudentConfig',  # misleading name due to sharing with lms
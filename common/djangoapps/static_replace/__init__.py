@@ -8,12 +8,19 @@ from django.conf import settings
 from xmodule.contentstore.content import StaticContent
 
 from opaque_keys.edx.locator import AssetLocator
+from openedx.core.djangoapps.contentserver.caching import (
+    ProcessLRUCache, get_course_asset_index, get_course_assets_version
+)
 from six import text_type
 
 log = logging.getLogger(__name__)
 XBLOCK_STATIC_RESOURCE_PREFIX = '/static/xblock'
 
 
+# The urls that static urls of courses were resolved to, see STATIC_URL_CACHE_SIZE.
+RESOLVED_URL_CACHE = ProcessLRUCache()
+
+
 def _url_replace_regex(prefix):
     """
     Match static urls in quotes that don't end in '?raw'.
@@ -66,12 +73,8 @@ def replace_jump_to_id_urls(text, course_id, jump_to_id_base_url):
     output: <text> after the link rewriting rules are applied
     """
 
-    def replace_jump_to_id_url(match):
-        quote = match.group('quote')
-        rest = match.group('rest')
-        return "".join([quote, jump_to_id_base_url + rest, quote])
-
-    return re.sub(_url_replace_regex('/jump_to_id/'), replace_jump_to_id_url, text)
+    return replace_urls(text, course_id=course_id, jump_to_id_base_url=jump_to_id_base_url,
+                        static=False, course=False)
 
 
 def replace_course_urls(text, course_key):
@@ -84,14 +87,7 @@ def replace_course_urls(text, course_key):
     returns: text with the links replaced
     """
 
-    course_id = text_type(course_key)
-
-    def replace_course_url(match):
-        quote = match.group('quote')
-        rest = match.group('rest')
-        return "".join([quote, '/courses/' + course_id + '/', rest, quote])
-
-    return re.sub(_url_replace_regex('/course/'), replace_course_url, text)
+    return replace_urls(text, course_id=course_key, static=False)
 
 
 def process_static_urls(text, replacement_function, data_dir=None):
@@ -163,27 +159,133 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
       * the original unmodified static URI
       * the updated static URI (will match the original if unchanged)
     """
+    return replace_urls(
+        text,
+        data_directory=data_directory,
+        course_id=course_id,
+        static_asset_path=static_asset_path,
+        static_paths_out=static_paths_out,
+        course=False,
+    )
+
+
+def replace_urls(text, data_directory=None, course_id=None, static_asset_path='', jump_to_id_base_url=None,
+                 static_paths_out=None, static=True, course=True):
+    """
+    Do the substitutions of replace_static_urls, replace_course_urls and
+    replace_jump_to_id_urls in a single scan of `text`.
+
+    text: The source text to do the substitutions in
+    data_directory, static_asset_path, static_paths_out: See replace_static_urls
+    course_id: The course in which the substitutions happen. /course/ urls are left
+        unchanged if it is None.
+    jump_to_id_base_url: See replace_jump_to_id_urls. /jump_to_id/ urls are left
+        unchanged if it is None.
+    static, course: Whether to replace the /static/ and the /course/ urls.
+
+    Each distinct static url is resolved once per call.  When STATIC_URL_CACHE_SIZE
+    is set, the urls that the static urls of a course were resolved to in the
+    contentstore are also kept across calls, until the assets of the course change.
+    """
+    course = course and course_id is not None
+    jump_to_id = jump_to_id_base_url is not None
+    data_dir = static_asset_path or data_directory
+    if not (static or course or jump_to_id):
+        return text
+
+    resolver = _StaticUrlResolver(data_directory, course_id, static_asset_path) if static else None
+    course_base_url = u'/courses/{}/'.format(text_type(course_id)) if course else None
+
+    def replace_url(match):
+        """
+        Replace a single matched url, depending on which of the prefixes it matched.
+        """
+        original = match.group(0)
+        quote = match.group('quote')
+        prefix = match.group('prefix')
+        rest = match.group('rest')
+
+        if match.group('course') is not None:
+            return "".join([quote, course_base_url, rest, quote])
+        if match.group('jump_to_id') is not None:
+            return "".join([quote, jump_to_id_base_url + rest, quote])
+
+        # Don't rewrite XBlock resource links.  Probably wasn't a good idea that /static
+        # works for actual static assets and for magical course asset URLs....
+        full_url = prefix + rest
+        starts_with_static_url = full_url.startswith(unicode(settings.STATIC_URL))
+        starts_with_prefix = full_url.startswith(XBLOCK_STATIC_RESOURCE_PREFIX)
+        contains_prefix = XBLOCK_STATIC_RESOURCE_PREFIX in full_url
+        if starts_with_prefix or (starts_with_static_url and contains_prefix):
+            return original
 
-    if static_paths_out is None:
-        static_paths_out = []
+        url = resolver.resolve(prefix, rest)
+        if static_paths_out is not None:
+            static_paths_out.append((full_url, url if url is not None else full_url))
+        if url is None:
+            return original
+        return "".join([quote, url, quote])
+
+    return re.sub(_replace_urls_regex(data_dir, static, course, jump_to_id), replace_url, text)
 
-    def replace_static_url(original, prefix, quote, rest):
+
+def _replace_urls_regex(data_dir, static, course, jump_to_id):
+    """
+    Match the urls in quotes that replace_urls rewrites, in named groups
+    telling which of the prefixes they start with.
+    """
+    prefixes = []
+    if static:
+        prefixes.append(u'(?P<static>(?:{static_url}|/static/)(?!{data_dir}))'.format(
+            static_url=settings.STATIC_URL,
+            data_dir=data_dir,
+        ))
+    if course:
+        prefixes.append(u'(?P<course>/course/)')
+    if jump_to_id:
+        prefixes.append(u'(?P<jump_to_id>/jump_to_id/)')
+    for group in ('static', 'course', 'jump_to_id'):
+        if not any(u'<{}>'.format(group) in prefix for prefix in prefixes):
+            # Missing groups match nothing, so that they are still defined.
+            prefixes.append(u'(?P<{}>(?!))'.format(group))
+    return _url_replace_regex(u'|'.join(prefixes))
+
+
+class _StaticUrlResolver(object):
+    """
+    Resolves the static urls of a piece of content, for replace_urls.
+    """
+    def __init__(self, data_directory, course_id, static_asset_path):
+        self.data_directory = data_directory
+        self.course_id = course_id
+        self.static_asset_path = static_asset_path
+        self._urls = {}
+        self._asset_settings = None
+
+    def resolve(self, prefix, rest):
+        """
+        Return the url that the static url `prefix` + `rest` is replaced with,
+        or None if it is left unchanged.
+        """
+        key = (prefix, rest)
+        if key not in self._urls:
+            self._urls[key] = self._resolve(prefix, rest)
+        return self._urls[key]
+
+    def _resolve(self, prefix, rest):
         """
-        Replace a single matched url.
+        Resolve a single static url.
         """
-        original_uri = "".join([prefix, rest])
         # Don't mess with things that end in '?raw'
         if rest.endswith('?raw'):
-            static_paths_out.append((original_uri, original_uri))
-            return original
+            return None
 
         # In debug mode, if we can find the url as is,
         if settings.DEBUG and finders.find(rest, True):
-            static_paths_out.append((original_uri, original_uri))
-            return original
+            return None
 
         # if we're running with a MongoBacked store course_namespace is not None, then use studio style urls
-        elif (not static_asset_path) and course_id:
+        elif (not self.static_asset_path) and self.course_id:
             # first look in the static file pipeline and see if we are trying to reference
             # a piece of static content which is in the edx-platform repo (e.g. JS associated with an xmodule)
 
@@ -199,18 +301,11 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
             else:
                 # if not, then assume it's courseware specific content and then look in the
                 # Mongo-backed database
-                # Import is placed here to avoid model import at project startup.
-                from static_replace.models import AssetBaseUrlConfig, AssetExcludedExtensionsConfig
-                base_url = AssetBaseUrlConfig.get_base_url()
-                excluded_exts = AssetExcludedExtensionsConfig.get_excluded_extensions()
-                url = StaticContent.get_canonicalized_asset_path(course_id, rest, base_url, excluded_exts)
-
-                if AssetLocator.CANONICAL_NAMESPACE in url:
-                    url = url.replace('block@', 'block/', 1)
+                url = self._resolve_course_asset(rest)
 
         # Otherwise, look the file up in staticfiles_storage, and append the data directory if needed
         else:
-            course_path = "/".join((static_asset_path or data_directory, rest))
+            course_path = "/".join((self.static_asset_path or self.data_directory, rest))
 
             try:
                 if staticfiles_storage.exists(rest):
@@ -223,7 +318,44 @@ def replace_static_urls(text, data_directory=None, course_id=None, static_asset_
                     rest, str(err)))
                 url = "".join([prefix, course_path])
 
-        static_paths_out.append((original_uri, url))
-        return "".join([quote, url, quote])
+        return url
 
-    return process_static_urls(text, replace_static_url, data_dir=static_asset_path or data_directory)
+    def _resolve_course_asset(self, rest):
+        """
+        Return the url of the course asset at `rest` in the contentstore,
+        from the cache of resolved urls if it is enabled, looking the asset
+        up in the asset index of the course if it is enabled.
+        """
+        if self._asset_settings is None:
+            # Import is placed here to avoid model import at project startup.
+            from static_replace.models import AssetBaseUrlConfig, AssetExcludedExtensionsConfig
+            self._asset_settings = (
+                AssetBaseUrlConfig.get_base_url(),
+                AssetExcludedExtensionsConfig.get_excluded_extensions(),
+                get_course_asset_index(self.course_id),
+            )
+        base_url, excluded_exts, asset_index = self._asset_settings
+
+        cache_size = getattr(settings, 'STATIC_URL_CACHE_SIZE', 0)
+        cache_key = None
+        if cache_size > 0:
+            cache_key = (
+                text_type(self.course_id),
+                get_course_assets_version(self.course_id),
+                base_url,
+                tuple(excluded_exts),
+                rest,
+            )
+            url = RESOLVED_URL_CACHE.get(cache_key)
+            if url is not None:
+                return url
+
+        url = StaticContent.get_canonicalized_asset_path(
+            self.course_id, rest, base_url, excluded_exts, asset_index=asset_index
+        )
+        if AssetLocator.CANONICAL_NAMESPACE in url:
+            url = url.replace('block@', 'block/', 1)
+
+        if cache_key is not None:
+            RESOLVED_URL_CACHE.set(cache_key, url, cache_size)
+        return url
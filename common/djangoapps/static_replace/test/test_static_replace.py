@@ -14,15 +14,19 @@ from mock import Mock, patch
 from opaque_keys.edx.keys import CourseKey
 from PIL import Image
 
+from openedx.core.djangoapps.contentserver.caching import del_cached_content
 from static_replace import (
+    RESOLVED_URL_CACHE,
     _url_replace_regex,
     make_static_urls_absolute,
     process_static_urls,
     replace_course_urls,
-    replace_static_urls
+    replace_jump_to_id_urls,
+    replace_static_urls,
+    replace_urls
 )
 from xmodule.assetstore.assetmgr import AssetManager
-from xmodule.contentstore.content import StaticContent
+from xmodule.contentstore.content import CourseAssetIndex, StaticContent
 from xmodule.contentstore.django import contentstore
 from xmodule.exceptions import NotFoundError
 from xmodule.modulestore import ModuleStoreEnum
@@ -129,7 +133,9 @@ def test_mongo_filestore(mock_get_excluded_extensions, mock_get_base_url, mock_m
     assert '"' + mock_static_content.get_canonicalized_asset_path.return_value + '"' == \
         replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, course_id=COURSE_KEY)
 
-    mock_static_content.get_canonicalized_asset_path.assert_called_once_with(COURSE_KEY, 'file.png', u'', ['foobar'])
+    mock_static_content.get_canonicalized_asset_path.assert_called_once_with(
+        COURSE_KEY, 'file.png', u'', ['foobar'], asset_index=None
+    )
 
 
 @patch('static_replace.settings', autospec=True)
@@ -250,6 +256,63 @@ def test_static_url_with_xblock_resource_on_cdn(mock_modulestore, mock_storage):
     assert replace_static_urls(pre_text, DATA_DIRECTORY, COURSE_KEY) == post_text
 
 
+@patch('static_replace.staticfiles_storage', autospec=True)
+def test_replace_urls(mock_storage):
+    """
+    Make sure that replace_urls does the substitutions of replace_static_urls,
+    replace_course_urls and replace_jump_to_id_urls, resolving each static url once.
+    """
+    mock_storage.exists.return_value = True
+    mock_storage.url.return_value = '/static/file.abcd.png'
+    jump_to_id_base_url = '/courses/org/course/run/jump_to_id/'
+
+    text = '<img src="/static/file.png"/><a href="/course/info">a</a><a href=\'/jump_to_id/id\'>b</a>' \
+        '<img src="/static/file.png"/>'
+    expected = replace_jump_to_id_urls(
+        replace_course_urls(replace_static_urls(text, DATA_DIRECTORY), COURSE_KEY),
+        COURSE_KEY,
+        jump_to_id_base_url,
+    )
+    mock_storage.reset_mock()
+
+    static_paths = []
+    result = replace_urls(
+        text,
+        DATA_DIRECTORY,
+        COURSE_KEY,
+        static_asset_path=DATA_DIRECTORY,
+        jump_to_id_base_url=jump_to_id_base_url,
+        static_paths_out=static_paths,
+    )
+    assert result == expected
+    assert result == '<img src="/static/file.abcd.png"/><a href="/courses/org/course/run/info">a</a>' \
+        '<a href=\'/courses/org/course/run/jump_to_id/id\'>b</a><img src="/static/file.abcd.png"/>'
+    assert static_paths == [('/static/file.png', '/static/file.abcd.png')] * 2
+    mock_storage.exists.assert_called_once_with('file.png')
+
+
+@pytest.mark.django_db
+@override_settings(STATIC_URL_CACHE_SIZE=10)
+@patch('static_replace.StaticContent.get_canonicalized_asset_path', return_value='/c4x/org/course/asset/file.png')
+@patch('static_replace.staticfiles_storage', autospec=True)
+def test_resolved_url_cache(mock_storage, mock_get_canonicalized_asset_path):
+    """
+    Make sure that the urls of course assets are kept until the assets of the course change.
+    """
+    mock_storage.exists.return_value = False
+    RESOLVED_URL_CACHE.clear()
+    expected = '"/c4x/org/course/asset/file.png"'
+
+    assert replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, COURSE_KEY) == expected
+    assert replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, COURSE_KEY) == expected
+    assert mock_get_canonicalized_asset_path.call_count == 1
+
+    del_cached_content(COURSE_KEY.make_asset_key('asset', 'other.png'))
+    assert replace_static_urls(STATIC_SOURCE, DATA_DIRECTORY, COURSE_KEY) == expected
+    assert mock_get_canonicalized_asset_path.call_count == 2
+    RESOLVED_URL_CACHE.clear()
+
+
 @ddt.ddt
 class CanonicalContentTest(SharedModuleStoreTestCase):
     """
@@ -787,3 +850,24 @@ class CanonicalContentTest(SharedModuleStoreTestCase):
             print(expected)
             print(asset_path)
             self.assertIsNotNone(re.match(expected, asset_path))
+
+    @ddt.data('split', 'old')
+    def test_canonical_asset_path_with_asset_index(self, prefix):
+        course_key = self.courses[prefix].id
+        asset_index = CourseAssetIndex.from_contentstore(contentstore(), course_key)
+        paths = [
+            u'/static/{}_ünlöck.png', u'/static/{}_lock.png', u'/static/special/{}_lock.png', u'/static/missing.png',
+            u'/static/{}_excluded.html', u'/static/{}_ünlöck.png?foo=/static/{}_lock.png',
+        ]
+        if prefix == 'old':
+            paths.append(u'/c4x/a/b/thumbnail/{}_ünlöck-png-16x16.jpg')
+        else:
+            paths.append(u'/asset-v1:a+b+{}+type@thumbnail+block@{}_ünlöck-png-16x16.jpg')
+        for path in paths:
+            path = path.format(prefix, prefix)
+            expected = StaticContent.get_canonicalized_asset_path(course_key, path, u'dev', [u'html'])
+            with check_mongo_calls(0):
+                asset_path = StaticContent.get_canonicalized_asset_path(
+                    course_key, path, u'dev', [u'html'], asset_index=asset_index
+                )
+            self.assertEqual(asset_path, expected)
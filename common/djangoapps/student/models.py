@@ -184,6 +184,40 @@ def anonymous_id_for_user(user, course_id, save=True):
     return digest
 
 
+def bulk_anonymous_ids_for_users(users, course_id):
+    """
+    Caches, on each of the given users, their anonymous id for the course,
+    saving the missing AnonymousUserId objects in bulk, so that calls to
+    anonymous_id_for_user for these users and course don't query the
+    database.
+    """
+    digests = {user.id: anonymous_id_for_user(user, course_id, save=False) for user in users}
+    existing_ids = set(
+        AnonymousUserId.objects.filter(user_id__in=digests.keys(), course_id=course_id).values_list(
+            'user_id', 'anonymous_user_id',
+        )
+    )
+    missing_ids = [
+        AnonymousUserId(user_id=user_id, course_id=course_id, anonymous_user_id=digest)
+        for user_id, digest in digests.iteritems()
+        if (user_id, digest) not in existing_ids
+    ]
+    try:
+        AnonymousUserId.objects.bulk_create(missing_ids)
+    except IntegrityError:
+        # Another thread has already created some of these entries, so
+        # create the others one at a time.
+        for anonymous_user_id in missing_ids:
+            try:
+                AnonymousUserId.objects.get_or_create(
+                    user_id=anonymous_user_id.user_id,
+                    course_id=course_id,
+                    anonymous_user_id=anonymous_user_id.anonymous_user_id,
+                )
+            except IntegrityError:
+                pass
+
+
 def user_by_anonymous_id(uid):
     """
     Return user by anonymous_user_id using AnonymousUserId lookup table.
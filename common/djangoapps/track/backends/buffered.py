@@ -0,0 +1,211 @@
+"""
+Event tracker backend that sends the events of another backend in batches,
+from a background thread.
+
+`track.tracker.send` runs every backend in the request that emits the event.
+Wrapping a backend in a `BufferedBackend` puts the events in a bounded queue
+instead, which a background thread drains into the wrapped backend: whenever
+`batch_size` events are queued, or `flush_interval` seconds after the first
+event of a batch was queued.  When the queue is full, events are dropped
+according to `drop_policy` and counted, rather than making requests wait.
+The queued events are sent when the process exits.
+
+For instance::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.buffered.BufferedBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {...},
+              },
+              'max_queue_size': 10000,
+              'batch_size': 100,
+              'flush_interval': 1.0,
+          }
+      }
+  }
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import threading
+import time
+from Queue import Empty, Full, Queue
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+log = logging.getLogger(__name__)
+
+# What to do with an event when the queue is full: drop it, or drop the oldest queued event to make room for it.
+DROP_NEWEST = 'newest'
+DROP_OLDEST = 'oldest'
+
+# Seconds that the process waits for the queued events to be sent when it exits.
+SHUTDOWN_TIMEOUT = 5
+
+# Put in the queue to stop the background thread once it has sent the events queued before it.
+_STOP = object()
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend that sends events to another backend in batches, from a background thread.
+    """
+
+    def __init__(self, backend, max_queue_size=10000, batch_size=100, flush_interval=1.0, drop_policy=DROP_NEWEST,
+                 **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: the configuration of the wrapped backend, with
+            an `ENGINE` and `OPTIONS` like the ones of `TRACKING_BACKENDS`
+          - `max_queue_size`: the number of events that can wait to be sent
+          - `batch_size`: the largest number of events sent at once
+          - `flush_interval`: the longest time in seconds that an event waits
+            for a batch to fill up
+          - `drop_policy`: which event is dropped when the queue is full,
+            the new one ("newest") or the oldest queued one ("oldest")
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        # The tracker module instantiates this backend as it's imported.
+        from track import tracker
+
+        self.backend = tracker._instantiate_backend_from_name(  # pylint: disable=protected-access
+            backend['ENGINE'], backend.get('OPTIONS', {}),
+        )
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError('Invalid drop policy {!r}'.format(drop_policy))
+
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.dropped_count = 0
+        self.sent_count = 0
+        self._metric_tags = ['backend:{}'.format(type(self.backend).__name__)]
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        atexit.register(self.shutdown, SHUTDOWN_TIMEOUT)
+
+    def send(self, event):
+        """Queue the event, to be sent by the background thread."""
+        queue = self._get_queue()
+        try:
+            queue.put_nowait(event)
+            return
+        except Full:
+            pass
+
+        dropped = 1
+        if self.drop_policy == DROP_OLDEST:
+            try:
+                queue.get_nowait()
+            except Empty:
+                # The background thread made room in the meantime.
+                dropped = 0
+            try:
+                queue.put_nowait(event)
+            except Full:
+                dropped += 1
+
+        if dropped:
+            self.dropped_count += dropped
+            dog_stats_api.increment('track.buffered.dropped', dropped, tags=self._metric_tags)
+
+    def send_many(self, events):
+        """Queue the events, to be sent by the background thread."""
+        for event in events:
+            self.send(event)
+
+    def shutdown(self, timeout=None):
+        """
+        Send the queued events and stop the background thread, waiting at most
+        `timeout` seconds for it.  Events sent afterwards start a new thread.
+        """
+        with self._lock:
+            thread, queue = self._thread, self._queue
+            if thread is None or self._pid != os.getpid():
+                return
+            self._thread = self._queue = None
+
+        try:
+            queue.put(_STOP, timeout=timeout)
+        except Full:
+            log.warning('Event tracker queue is still full at shutdown, %d events will be lost', queue.qsize())
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            log.warning('Timed out sending the queued events of the event tracker')
+
+    def _get_queue(self):
+        """
+        Return the queue of this process, starting its background thread if needed.
+        """
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # Forked processes don't inherit the thread, nor the events queued for it.
+                self._pid = os.getpid()
+                self._queue = Queue(self.max_queue_size)
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._queue,), name='track-buffered-backend',
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            return self._queue
+
+    def _run(self, queue):
+        """
+        Send the events of the queue in batches, until it gets the stop marker.
+        """
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch(queue)
+            if batch:
+                self._send_batch(batch)
+
+    def _next_batch(self, queue):
+        """
+        Return the next batch of events of the queue, as soon as it has
+        `batch_size` events or its first event was queued `flush_interval`
+        seconds ago, and whether the queue was stopped.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.time()
+            try:
+                event = queue.get(timeout=timeout) if timeout > 0 else queue.get_nowait()
+            except Empty:
+                break
+            if event is _STOP:
+                # Send everything that was queued before stopping.
+                return batch, True
+            batch.append(event)
+            if deadline is None:
+                deadline = time.time() + self.flush_interval
+        return batch, False
+
+    def _send_batch(self, batch):
+        """Send a batch of events to the wrapped backend, which must not stop the thread."""
+        try:
+            with dog_stats_api.timer('track.buffered.send_many', tags=self._metric_tags):
+                self.backend.send_many(batch)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Error sending a batch of %d events to the %s event tracker backend',
+                          len(batch), type(self.backend).__name__)
+            dog_stats_api.increment('track.buffered.failed', len(batch), tags=self._metric_tags)
+            return
+        self.sent_count += len(batch)
+        dog_stats_api.histogram('track.buffered.batch_size', len(batch), tags=self._metric_tags)
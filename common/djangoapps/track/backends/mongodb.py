@@ -96,3 +96,13 @@ class MongoBackend(BaseBackend):
             # during the next event.
             msg = 'Error inserting to MongoDB event tracker backend'
             log.exception(msg)
+
+    def send_many(self, events):
+        """Insert the events in to the Mongo collection, at once"""
+        try:
+            # insert_many adds an _id to the documents it's given.
+            self.collection.insert_many([dict(event) for event in events], ordered=False)
+        except (PyMongoError, BSONError):
+            # Like in send, the events will be lost.
+            msg = 'Error inserting to MongoDB event tracker backend'
+            log.exception(msg)
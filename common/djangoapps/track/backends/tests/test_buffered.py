@@ -0,0 +1,131 @@
+"""Tests for the buffered event tracker backend."""
+from __future__ import absolute_import
+
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from track.backends import BaseBackend
+from track.backends.buffered import _STOP, BufferedBackend
+
+
+class RecordingBackend(BaseBackend):
+    """Backend that records the batches it's sent, and can be made to wait before sending them."""
+
+    def __init__(self, **options):
+        super(RecordingBackend, self).__init__(**options)
+        self.batches = []
+        self.sending = threading.Event()
+        self.can_send = threading.Event()
+        self.can_send.set()
+
+    def send(self, event):
+        self.send_many([event])
+
+    def send_many(self, events):
+        self.sending.set()
+        self.can_send.wait()
+        if 'error' in events:
+            raise ValueError()
+        self.batches.append(list(events))
+
+
+class TestBufferedBackend(TestCase):
+    """Tests for BufferedBackend."""
+
+    def make_backend(self, **options):
+        """Return a BufferedBackend wrapping a RecordingBackend."""
+        backend = BufferedBackend(
+            backend={'ENGINE': 'track.backends.tests.test_buffered.RecordingBackend'},
+            **options
+        )
+        self.addCleanup(backend.shutdown)
+        return backend
+
+    def test_flush_on_size(self):
+        backend = self.make_backend(batch_size=2, flush_interval=60)
+        for event in range(5):
+            backend.send(event)
+        self.wait_for(lambda: backend.sent_count == 4)
+        self.assertEqual(backend.backend.batches, [[0, 1], [2, 3]])
+
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[0, 1], [2, 3], [4]])
+
+    def test_flush_on_interval(self):
+        backend = self.make_backend(batch_size=100, flush_interval=0.05)
+        backend.send_many([0, 1])
+        self.wait_for(lambda: backend.sent_count == 2)
+        self.assertEqual(backend.backend.batches, [[0, 1]])
+
+    def test_shutdown(self):
+        backend = self.make_backend(batch_size=100, flush_interval=60)
+        backend.send_many(range(3))
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[0, 1, 2]])
+
+        # Sending events after a shutdown starts a new thread.
+        backend.send(3)
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[0, 1, 2], [3]])
+
+    @patch('track.backends.buffered.dog_stats_api')
+    def test_drop_newest(self, mock_dog_stats_api):
+        backend = self.fill_queue(self.make_backend(max_queue_size=2, batch_size=1))
+        backend.send(3)
+        self.assertEqual(backend.dropped_count, 1)
+        mock_dog_stats_api.increment.assert_called_once_with(
+            'track.buffered.dropped', 1, tags=['backend:RecordingBackend'],
+        )
+
+        backend.backend.can_send.set()
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[0], [1], [2]])
+
+    def test_drop_oldest(self):
+        backend = self.fill_queue(self.make_backend(max_queue_size=2, batch_size=1, drop_policy='oldest'))
+        backend.send(3)
+        self.assertEqual(backend.dropped_count, 1)
+
+        backend.backend.can_send.set()
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[0], [2], [3]])
+
+    def test_invalid_drop_policy(self):
+        with self.assertRaises(ValueError):
+            self.make_backend(drop_policy='random')
+
+    def test_failed_batch(self):
+        backend = self.make_backend(batch_size=1, flush_interval=60)
+        backend.send_many(['error', 'event'])
+        backend.shutdown()
+        self.assertEqual(backend.backend.batches, [['event']])
+        self.assertEqual(backend.sent_count, 1)
+
+    def test_forked_process(self):
+        backend = self.make_backend(batch_size=100, flush_interval=60)
+        backend.send(0)
+        parent_queue = backend._queue  # pylint: disable=protected-access
+        self.addCleanup(parent_queue.put, _STOP)
+        with patch('track.backends.buffered.os.getpid', return_value=-1):
+            # The queue and thread of the parent process are ignored.
+            backend.send(1)
+            backend.shutdown()
+        self.assertEqual(backend.backend.batches, [[1]])
+
+    def fill_queue(self, backend):
+        """Make the background thread wait to send event 0, with events 1 and 2 queued."""
+        backend.backend.can_send.clear()
+        backend.send(0)
+        backend.backend.sending.wait()
+        backend.send_many([1, 2])
+        return backend
+
+    def wait_for(self, condition, timeout=5):
+        """Wait until the condition is true."""
+        deadline = time.time() + timeout
+        while not condition():
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
@@ -4,10 +4,17 @@ Tests for sandboxing.py in util app
 
 from django.test import TestCase
 from django.test.utils import override_settings
+from mock import patch
 from opaque_keys.edx.keys import CourseKey
 from opaque_keys.edx.locator import CourseLocator, LibraryLocator
 
-from xmodule.util.sandboxing import can_execute_unsafe_code
+from capa.safe_exec import WORKER_POOL, TwoTierCache
+from xmodule.util.sandboxing import (
+    SAFE_EXEC_LOCAL_CACHE,
+    can_execute_unsafe_code,
+    configure_sandbox_worker_pool,
+    get_safe_exec_cache
+)
 
 
 class SandboxingTest(TestCase):
@@ -38,3 +45,47 @@ class SandboxingTest(TestCase):
         self.assertFalse(can_execute_unsafe_code(CourseLocator('edX', 'full', '2012_Fall')))
         self.assertFalse(can_execute_unsafe_code(CourseLocator('edX', 'full', '2013_Spring')))
         self.assertFalse(can_execute_unsafe_code(LibraryLocator('edX', 'test_bank')))
+
+
+class SafeExecCacheTest(TestCase):
+    """
+    Test the cache of safe_exec results
+    """
+    def test_local_cache_disabled_by_default(self):
+        self.assertIsNone(get_safe_exec_cache(None))
+        cache = {}
+        self.assertIs(get_safe_exec_cache(cache), cache)
+
+    @override_settings(SAFE_EXEC_LOCAL_CACHE={'MAX_ENTRIES': 10, 'MAX_BYTES': 1000})
+    def test_local_cache(self):
+        cache = {}
+        safe_exec_cache = get_safe_exec_cache(cache)
+        self.addCleanup(SAFE_EXEC_LOCAL_CACHE.configure, 0, 0)
+        self.assertIsInstance(safe_exec_cache, TwoTierCache)
+        self.assertIs(safe_exec_cache.local_cache, SAFE_EXEC_LOCAL_CACHE)
+        self.assertIs(safe_exec_cache.cache, cache)
+        self.assertEqual((SAFE_EXEC_LOCAL_CACHE.max_entries, SAFE_EXEC_LOCAL_CACHE.max_bytes), (10, 1000))
+
+
+class SandboxWorkerPoolTest(TestCase):
+    """
+    Test the configuration of the pool of sandbox workers
+    """
+    def test_disabled_by_default(self):
+        configure_sandbox_worker_pool()
+        self.assertEqual(WORKER_POOL.size, 0)
+        self.assertFalse(WORKER_POOL.enabled)
+
+    @override_settings(CODE_JAIL_WORKER_POOL={'SIZE': 2, 'MAX_AGE': 60})
+    def test_configure(self):
+        configure_sandbox_worker_pool()
+        self.addCleanup(WORKER_POOL.configure, 0, 300)
+        self.assertEqual((WORKER_POOL.size, WORKER_POOL.max_age), (2, 60))
+
+    @override_settings(CODE_JAIL_WORKER_POOL={'SIZE': 2, 'MAX_EXECUTIONS': 3, 'MAX_AGE': 60})
+    def test_reused_workers_refused(self):
+        with patch('xmodule.util.sandboxing.log') as mock_log:
+            configure_sandbox_worker_pool()
+        self.addCleanup(WORKER_POOL.configure, 0, 300)
+        self.assertTrue(mock_log.warning.called)
+        self.assertEqual((WORKER_POOL.size, WORKER_POOL.max_age), (2, 60))
@@ -7,6 +7,8 @@ Uses pyparsing to parse. Main function as of now is evaluator().
 import math
 import numbers
 import operator
+import threading
+from collections import OrderedDict
 
 import numpy
 from pyparsing import (
@@ -27,6 +29,12 @@ from pyparsing import (
     stringEnd
 )
 
+try:
+    import dogstats_wrapper as dog_stats_api
+except ImportError:
+    # calc can be used without the rest of the platform, and then doesn't emit metrics.
+    dog_stats_api = None
+
 import functions
 
 # Functions available by default
@@ -95,6 +103,13 @@ class UnmatchedParenthesis(Exception):
     pass
 
 
+class VectorizationError(Exception):
+    """
+    Indicate that an expression can't be evaluated over all samples at once.
+    """
+    pass
+
+
 def lower_dict(input_dict):
     """
     Convert all keys in a dictionary to lowercase; keep their original values.
@@ -231,47 +246,318 @@ def add_defaults(variables, functions, case_sensitive):
     return (all_variables, all_functions)
 
 
-def evaluator(variables, functions, math_expr, case_sensitive=False):
+# The following actions are the vectorized counterparts of the ones above, used
+# by `CompiledExpression.evaluate_many`. Their operands are numbers or numpy
+# arrays holding one value per sample; operators are left as strings.
+
+def _operands(parse_result):
+    """
+    Return the non-operator elements of `parse_result`.
+    """
+    return [k for k in parse_result if not isinstance(k, basestring)]
+
+
+def eval_atom_vectorized(parse_result):
+    """
+    Like `eval_atom`, but allow numpy arrays as values.
+    """
+    return _operands(parse_result)[0]
+
+
+def eval_power_vectorized(parse_result):
+    """
+    Like `eval_power`, but allow numpy arrays as values.
+    """
+    return reduce(lambda a, b: b ** a, reversed(_operands(parse_result)))
+
+
+def eval_parallel_vectorized(parse_result):
+    """
+    Like `eval_parallel`, but allow numpy arrays as values.
+
+    A zero among the inputs makes the scalar version return NaN for that
+    sample; raise `VectorizationError` so that the caller can fall back to it.
+    """
+    if len(parse_result) == 1:
+        return parse_result[0]
+    operands = _operands(parse_result)
+    if any(numpy.any(numpy.asarray(operand) == 0) for operand in operands):
+        raise VectorizationError("Zero input to the parallel resistors operator")
+    return 1. / sum(1. / operand for operand in operands)
+
+
+def eval_sum_vectorized(parse_result):
+    """
+    Like `eval_sum`, but allow numpy arrays as values.
+    """
+    total = 0.0
+    current_op = operator.add
+    for token in parse_result:
+        if not isinstance(token, basestring):
+            total = current_op(total, token)
+        elif token == '+':
+            current_op = operator.add
+        elif token == '-':
+            current_op = operator.sub
+    return total
+
+
+def eval_product_vectorized(parse_result):
+    """
+    Like `eval_product`, but allow numpy arrays as values.
+    """
+    prod = 1.0
+    current_op = operator.mul
+    for token in parse_result:
+        if not isinstance(token, basestring):
+            prod = current_op(prod, token)
+        elif token == '*':
+            current_op = operator.mul
+        elif token == '/':
+            current_op = operator.truediv
+    return prod
+
+
+class CompiledExpression(object):
+    """
+    A math expression that has been parsed once, and can be evaluated many times.
+
+    Evaluation is bound late to the variables and functions, so that the same
+    compiled expression may be evaluated with different values.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse `math_expr`.
+
+        Raise `UnmatchedParenthesis` or `pyparsing.ParseException` if it is
+        not a valid expression. An empty expression evaluates to NaN.
+        """
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+        self.math_interpreter = None
+
+        if math_expr.strip() != "":
+            check_parens(math_expr)
+            self.math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+            self.math_interpreter.parse_algebra()
+
+    def casify(self, name):
+        """
+        Normalize a variable or function name, according to the case sensitivity.
+        """
+        return name if self.case_sensitive else name.lower()
+
+    def _evaluate_actions(self, all_variables, all_functions, vectorized=False):
+        """
+        Return the `reduce_tree` actions for evaluating with the given values.
+        """
+        return {
+            'number': eval_number,
+            'variable': lambda x: all_variables[self.casify(x[0])],
+            'function': lambda x: all_functions[self.casify(x[0])](x[1]),
+            'atom': eval_atom_vectorized if vectorized else eval_atom,
+            'power': eval_power_vectorized if vectorized else eval_power,
+            'parallel': eval_parallel_vectorized if vectorized else eval_parallel,
+            'product': eval_product_vectorized if vectorized else eval_product,
+            'sum': eval_sum_vectorized if vectorized else eval_sum
+        }
+
+    def _get_values(self, variables, functions):
+        """
+        Combine the given values with the defaults, and check the expression against them.
+        """
+        all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
+        self.math_interpreter.check_variables(all_variables, all_functions)
+        return all_variables, all_functions
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression; that is, return a float.
+
+        -Variables are passed as a dictionary from string to value. They must be
+         python numbers.
+        -Unary functions are passed as a dictionary from string to function.
+        """
+        if self.math_interpreter is None:
+            return float('nan')
+
+        all_variables, all_functions = self._get_values(variables, functions)
+        return self.math_interpreter.reduce_tree(self._evaluate_actions(all_variables, all_functions))
+
+    def evaluate_many(self, variables_list, functions):
+        """
+        Evaluate the expression for each dictionary of variables in `variables_list`.
+
+        Return the list of results, which are the same as calling `evaluate`
+        on each of the dictionaries in turn (including the errors raised).
+        Every dictionary must define the same variables, as is the case for
+        the samples of a FormulaResponse.
+
+        The expression is evaluated once, over numpy arrays of all the sampled
+        values. If that isn't possible (for example when a function doesn't
+        accept arrays, or a sample would divide by zero or overflow), fall
+        back to evaluating the samples one at a time.
+        """
+        if not variables_list:
+            return []
+        if self.math_interpreter is None:
+            return [float('nan')] * len(variables_list)
+
+        sampled_names = set(variables_list[0])
+        if any(set(variables) != sampled_names for variables in variables_list):
+            return [self.evaluate(variables, functions) for variables in variables_list]
+
+        # Check the variables (and raise UndefinedVariable) only once.
+        all_variables, all_functions = self._get_values(variables_list[0], functions)
+
+        try:
+            results = self._evaluate_vectorized(variables_list, all_variables, all_functions)
+        except Exception:  # pylint: disable=broad-except
+            results = None
+
+        if results is None:
+            results = [self.evaluate(variables, functions) for variables in variables_list]
+        return results
+
+    def _evaluate_vectorized(self, variables_list, all_variables, all_functions):
+        """
+        Evaluate the expression over all the samples at once.
+
+        Return the list of results, or None if the vectorized results can't
+        be trusted to be the same as the ones computed sample by sample.
+        """
+        num_samples = len(variables_list)
+        vector_variables = dict(all_variables)
+        for name in variables_list[0]:
+            vector_variables[self.casify(name)] = numpy.array([variables[name] for variables in variables_list])
+
+        actions = self._evaluate_actions(vector_variables, all_functions, vectorized=True)
+        # Any division by zero, overflow, or invalid operation may be an error
+        # (or a different value) when computed on python numbers, so bail out.
+        with numpy.errstate(all='raise', under='ignore'):
+            result = self.math_interpreter.reduce_tree(actions)
+
+        result = numpy.asarray(result)
+        if result.ndim == 0:
+            # The expression doesn't depend on the sampled variables.
+            result = numpy.repeat(result, num_samples)
+        if result.shape != (num_samples,) or result.dtype.kind not in 'fc' or not numpy.all(numpy.isfinite(result)):
+            return None
+        return list(result)
+
+
+class ParseCache(object):
+    """
+    A bounded, least-recently-used cache of `CompiledExpression`s.
+
+    Compiled expressions are keyed by `(math_expr, case_sensitive)`; they don't
+    hold any variable or function values, so they can be shared by every
+    evaluation of the same expression in the process.
+
+    Each lookup is counted, and emitted as a `calc.parse_cache` metric tagged
+    with its result, when the metrics of the platform are available.
+    """
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._expressions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expressions)
+
+    def get(self, math_expr, case_sensitive=False):
+        """
+        Return the `CompiledExpression` for `math_expr`, parsing it if it isn't cached yet.
+
+        Expressions that fail to parse aren't cached, and raise the parse error every time.
+        """
+        key = (math_expr, case_sensitive)
+        with self._lock:
+            expression = self._expressions.pop(key, None)
+            if expression is not None:
+                self._expressions[key] = expression
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._emit_lookup(hit=expression is not None)
+        if expression is not None:
+            return expression
+
+        expression = CompiledExpression(math_expr, case_sensitive)
+
+        with self._lock:
+            self._expressions[key] = expression
+            while len(self._expressions) > self.max_size:
+                self._expressions.popitem(last=False)
+        return expression
+
+    def clear(self):
+        """
+        Remove every cached expression, and reset the counters.
+        """
+        with self._lock:
+            self._expressions.clear()
+            self.hits = 0
+            self.misses = 0
+
+    @staticmethod
+    def _emit_lookup(hit):
+        """
+        Emit the metric of a lookup in the cache.
+        """
+        if dog_stats_api is not None:
+            dog_stats_api.increment('calc.parse_cache', tags=['result:{}'.format('hit' if hit else 'miss')])
+
+    def stats(self):
+        """
+        Return a dictionary of the counters of this cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self),
+            'max_size': self.max_size,
+            'hit_rate': float(self.hits) / lookups if lookups else 0.0,
+        }
+
+
+# Instructor answers and hints get evaluated over and over with the same strings,
+# so keep their parse trees around for the life of the process.  Student answers
+# are rarely evaluated twice, and aren't cached, so that they can't evict them.
+PARSE_CACHE = ParseCache()
+
+
+def compile_expression(math_expr, case_sensitive=False, cache=True):
+    """
+    Return a `CompiledExpression` for evaluating `math_expr`.
+
+    If `cache`, the expression is only parsed the first time it is seen; after
+    that, it comes from `PARSE_CACHE`.  Pass `cache=False` for expressions that
+    aren't likely to be seen again, such as student answers.
+    """
+    if not cache:
+        return CompiledExpression(math_expr, case_sensitive)
+    return PARSE_CACHE.get(math_expr, case_sensitive)
+
+
+def evaluator(variables, functions, math_expr, case_sensitive=False, cache=True):
     """
     Evaluate an expression; that is, take a string of math and return a float.
 
     -Variables are passed as a dictionary from string to value. They must be
      python numbers.
     -Unary functions are passed as a dictionary from string to function.
+    -If `cache` is False, the expression isn't kept in `PARSE_CACHE`, see
+     `compile_expression`.
     """
     # No need to go further.
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    check_parens(math_expr)
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
-
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
-
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
-
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
-
-    return math_interpreter.reduce_tree(evaluate_actions)
+    return compile_expression(math_expr, case_sensitive, cache).evaluate(variables, functions)
 
 
 def check_parens(formula):
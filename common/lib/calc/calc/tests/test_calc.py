@@ -5,6 +5,7 @@ Unit tests for calc.py
 import unittest
 import numpy
 import calc
+from mock import patch
 from pyparsing import ParseException
 
 # numpy's default behavior when it evaluates a function outside its domain
@@ -554,3 +555,123 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({}, {}, "(1+2")
         with self.assertRaisesRegexp(calc.UnmatchedParenthesis, 'no matching opening parenthesis'):
             calc.evaluator({}, {}, "(1+2))")
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Run tests for calc.compile_expression, and evaluating over many samples.
+    """
+
+    SAMPLES = [{'x': 0.5, 'y': 2.0}, {'x': 1.5, 'y': -3.0}, {'x': 3.0, 'y': 0.25}]
+
+    def assert_same_as_evaluator(self, math_expr, samples=None, case_sensitive=False):
+        """
+        Check that `evaluate_many` returns what `evaluator` does, sample by sample.
+        """
+        samples = samples or self.SAMPLES
+        results = calc.compile_expression(math_expr, case_sensitive).evaluate_many(samples, {})
+        expected = [calc.evaluator(sample, {}, math_expr, case_sensitive) for sample in samples]
+        self.assertEqual(len(results), len(expected))
+        for result, expected_result in zip(results, expected):
+            if numpy.isnan(expected_result):
+                self.assertTrue(numpy.isnan(result), msg=math_expr)
+            else:
+                self.assertAlmostEqual(result, expected_result, delta=1e-12, msg=math_expr)
+
+    def test_evaluate_many(self):
+        for math_expr in ["x+y", "-x^y^2", "x*y/3 - 2", "sin(x)*cos(y)", "sqrt(y)", "x||y", "x + i*y", "5", "pi*e"]:
+            self.assert_same_as_evaluator(math_expr)
+
+    def test_case_sensitivity(self):
+        self.assert_same_as_evaluator("X+Y")
+        with self.assertRaisesRegexp(calc.UndefinedVariable, r'X, Y'):
+            calc.compile_expression("X+Y", case_sensitive=True).evaluate_many(self.SAMPLES, {})
+
+    def test_fallback_to_scalar_evaluation(self):
+        # `fact` doesn't accept arrays, and 1/0 is a domain error for one sample only
+        self.assert_same_as_evaluator("fact(3)*x")
+        self.assert_same_as_evaluator("arccot(x)")
+        self.assert_same_as_evaluator("x||(y-2)")
+        with self.assertRaises(ZeroDivisionError):
+            calc.compile_expression("1/(y-2)").evaluate_many(self.SAMPLES, {})
+
+    def test_empty_expression(self):
+        results = calc.compile_expression("  ").evaluate_many(self.SAMPLES, {})
+        self.assertEqual(len(results), len(self.SAMPLES))
+        self.assertTrue(all(numpy.isnan(result) for result in results))
+
+    def test_parse_errors_raised_on_compile(self):
+        with self.assertRaises(calc.UnmatchedParenthesis):
+            calc.compile_expression("(x+y")
+        with self.assertRaises(ParseException):
+            calc.compile_expression("x+")
+
+    def test_reuse_compiled_expression(self):
+        expression = calc.compile_expression("x^2")
+        self.assertEqual(expression.evaluate({'x': 3.0}, {}), 9.0)
+        self.assertEqual(expression.evaluate({'x': 4.0}, {}), 16.0)
+
+
+class ParseCacheTest(unittest.TestCase):
+    """
+    Run tests for the cache of parsed expressions used by calc.evaluator
+    """
+
+    def setUp(self):
+        super(ParseCacheTest, self).setUp()
+        calc.PARSE_CACHE.clear()
+        self.addCleanup(calc.PARSE_CACHE.clear)
+
+    def test_evaluator_uses_cache(self):
+        self.assertEqual(calc.evaluator({'x': 2.0}, {}, "x*3"), 6.0)
+        self.assertEqual(calc.evaluator({'x': 4.0}, {}, "x*3"), 12.0)
+        self.assertEqual(calc.evaluator({'X': 4.0}, {}, "X*3", case_sensitive=True), 12.0)
+
+        stats = calc.PARSE_CACHE.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['size'], 2)
+        self.assertAlmostEqual(stats['hit_rate'], 1 / 3.0)
+
+    def test_uncached_expressions(self):
+        self.assertEqual(calc.evaluator({'x': 2.0}, {}, "x*3", cache=False), 6.0)
+        expression = calc.compile_expression("x*4", cache=False)
+        self.assertEqual(expression.evaluate({'x': 2.0}, {}), 8.0)
+        self.assertIsNot(calc.compile_expression("x*4", cache=False), expression)
+
+        self.assertEqual(len(calc.PARSE_CACHE), 0)
+        self.assertEqual(calc.PARSE_CACHE.stats()['misses'], 0)
+
+    @patch('calc.calc.dog_stats_api')
+    def test_metrics(self, mock_dog_stats_api):
+        calc.evaluator({'x': 2.0}, {}, "x*3")
+        calc.evaluator({'x': 4.0}, {}, "x*3")
+        self.assertEqual(
+            [call[1]['tags'] for call in mock_dog_stats_api.increment.call_args_list],
+            [['result:miss'], ['result:hit']],
+        )
+        mock_dog_stats_api.increment.assert_called_with('calc.parse_cache', tags=['result:hit'])
+
+    def test_values_bound_late(self):
+        functions = {'f': lambda x: x + 1}
+        self.assertEqual(calc.evaluator({}, functions, "f(1)"), 2)
+        self.assertEqual(calc.evaluator({}, {'f': lambda x: x * 10}, "f(1)"), 10)
+        with self.assertRaises(calc.UndefinedVariable):
+            calc.evaluator({}, {}, "f(1)")
+
+    def test_errors_not_cached(self):
+        for __ in range(2):
+            with self.assertRaises(calc.UnmatchedParenthesis):
+                calc.evaluator({}, {}, "(1+2")
+        self.assertEqual(len(calc.PARSE_CACHE), 0)
+
+    def test_bounded(self):
+        cache = calc.ParseCache(max_size=2)
+        first = cache.get("1+1")
+        cache.get("2+2")
+        self.assertIs(cache.get("1+1"), first)
+        cache.get("3+3")
+        self.assertEqual(len(cache), 2)
+        # "2+2" was the least recently used expression
+        cache.get("2+2")
+        self.assertEqual(cache.stats()['misses'], 4)
@@ -1,3 +1,5 @@
 """Capa's specialized use of codejail.safe_exec."""
 
+from .local_cache import LocalCache, TwoTierCache
 from .safe_exec import safe_exec, update_hash
+from .worker_pool import WORKER_POOL
@@ -0,0 +1,123 @@
+"""An in-process tier for the cache of safe_exec results."""
+
+import cPickle as pickle
+import threading
+from collections import OrderedDict
+
+from dogapi import dog_stats_api
+
+
+class LocalCache(object):
+    """
+    A bounded, per-process, least-recently-used cache.
+
+    Values are kept pickled, so that callers can't change the cached values
+    through the objects they get back (safe_exec updates the problem's globals
+    with the cached results), and so that the size of the cache is known.
+    Entries are evicted to keep the cache within `max_entries` entries and
+    `max_bytes` pickled bytes in total.
+
+    """
+    def __init__(self, max_entries=0, max_bytes=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Return whether this cache holds anything at all."""
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    @property
+    def total_bytes(self):
+        """Return the number of pickled bytes held by the cache."""
+        return self._total_bytes
+
+    @property
+    def num_entries(self):
+        """Return the number of values held by the cache."""
+        return len(self._entries)
+
+    def configure(self, max_entries, max_bytes):
+        """Change the limits of this cache, evicting entries if needed."""
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key):
+        """Return the value cached for `key` (marking it as most recently used), or None."""
+        with self._lock:
+            pickled = self._entries.pop(key, None)
+            if pickled is None:
+                return None
+            self._entries[key] = pickled
+        return pickle.loads(pickled)
+
+    def set(self, key, value):
+        """Cache `value` under `key`, unless it's larger than the whole cache."""
+        if not self.enabled:
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= len(previous)
+            self._entries[key] = pickled
+            self._total_bytes += len(pickled)
+            self._evict()
+
+    def clear(self):
+        """Remove every cached value."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache is within its limits.
+
+        Must be called with the lock held.
+
+        """
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            __, pickled = self._entries.popitem(last=False)
+            self._total_bytes -= len(pickled)
+            dog_stats_api.increment('capa.safe_exec.local_cache.evicted')
+
+
+class TwoTierCache(object):
+    """
+    A `LocalCache` in front of a shared cache, such as a Django cache.
+
+    Values found in the shared cache are copied to the local cache, and values
+    are set in both.  Like the safe_exec cache, it has .get(key) and
+    .set(key, value) methods.
+
+    """
+    def __init__(self, local_cache, cache):
+        self.local_cache = local_cache
+        self.cache = cache
+
+    def get(self, key):
+        """Return the value cached for `key` in either tier, or None."""
+        value = self.local_cache.get(key)
+        if value is not None:
+            dog_stats_api.increment('capa.safe_exec.local_cache.hit')
+            return value
+
+        dog_stats_api.increment('capa.safe_exec.local_cache.miss')
+        value = self.cache.get(key)
+        if value is not None:
+            self.local_cache.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """Cache `value` under `key` in both tiers."""
+        self.local_cache.set(key, value)
+        self.cache.set(key, value)
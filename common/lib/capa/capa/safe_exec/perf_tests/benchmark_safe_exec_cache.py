@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+Benchmarks the cost of looking up cached safe_exec results, for globals
+typical of `loncapa/python` problems.
+
+For each context, the cache key is computed as safe_exec used to compute it
+(a `json_safe` copy of the globals, walked with `update_hash`) and as it
+computes it now (`update_globals_hash`), and a cached result is read from a
+cache that pickles its values, as Django caches do, and from a `LocalCache`.
+The shared cache is in-process here, so the network round trip of a real
+memcached hit comes on top of its time.
+
+Usage:
+    python -m capa.safe_exec.perf_tests.benchmark_safe_exec_cache [--repeat 5] [--number 200]
+"""
+from __future__ import print_function
+
+import argparse
+import cPickle as pickle
+import gc
+import hashlib
+import random
+from timeit import default_timer
+
+from codejail.safe_exec import json_safe
+
+from ..local_cache import LocalCache, TwoTierCache
+from ..safe_exec import update_globals_hash, update_hash
+
+SCRIPT_CODE = """\
+import random
+def check_answer(expect, ans):
+    return abs(float(ans) - float(expect)) < 0.01 * abs(float(expect))
+""" * 20
+
+
+def problem_context(rng):
+    """
+    Returns the context of a problem's script: the variables that capa sets
+    and a few randomized parameters.
+    """
+    return {
+        'seed': rng.randint(0, 999),
+        'anonymous_student_id': u'%032x' % rng.getrandbits(128),
+        'script_code': SCRIPT_CODE,
+        'python_path': [],
+        'extra_files': None,
+        'mass': rng.uniform(1, 10),
+        'velocity': rng.uniform(1, 10),
+        'names': [u'alpha', u'beta', u'gamma'],
+        'DEBUG': False,
+    }
+
+
+def customresponse_context(rng):
+    """
+    Returns the context of a customresponse check function with several
+    inputs.
+    """
+    context = problem_context(rng)
+    context.update({
+        'submission': [u'%.3f' % rng.uniform(0, 100) for __ in xrange(5)],
+        'answers': {u'i4x-edX-Bench-problem-p_2_%d' % index: u'%.3f' % rng.uniform(0, 100) for index in xrange(5)},
+        'expect': u'42',
+        'correct': ['unknown'] * 5,
+        'messages': [''] * 5,
+        'overall_message': '',
+        'debug': False,
+    })
+    return context
+
+
+def data_table_context(rng):
+    """
+    Returns the context of a problem with a precomputed table of data points
+    and a lookup table of constants.
+    """
+    context = problem_context(rng)
+    context.update({
+        'table': [[rng.uniform(-1, 1) for __ in xrange(20)] for __ in xrange(500)],
+        'constants': {u'const_%d' % index: rng.uniform(0, 1) for index in xrange(200)},
+    })
+    return context
+
+
+def array_context(rng):
+    """
+    Returns the context of a problem with a large precomputed array.
+    """
+    context = problem_context(rng)
+    context['samples'] = [rng.gauss(0, 1) for __ in xrange(20000)]
+    return context
+
+
+CONTEXTS = [
+    ('problem script', problem_context),
+    ('customresponse check', customresponse_context),
+    ('data table (500x20)', data_table_context),
+    ('array (20000)', array_context),
+]
+
+
+def old_cache_key(code, globals_dict, random_seed):
+    """
+    Returns the cache key safe_exec used before update_globals_hash.
+    """
+    md5er = hashlib.md5()
+    md5er.update(repr(code))
+    update_hash(md5er, json_safe(globals_dict))
+    return "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+
+
+def cache_key(code, globals_dict, random_seed):
+    """
+    Returns the cache key safe_exec uses now.
+    """
+    md5er = hashlib.md5()
+    md5er.update(repr(code))
+    update_globals_hash(md5er, globals_dict)
+    return "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
+
+
+class PicklingCache(object):
+    """
+    A cache that pickles its values, like the Django cache backends.
+    """
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        """ Returns the unpickled value for key, or None. """
+        pickled = self.values.get(key)
+        return None if pickled is None else pickle.loads(pickled)
+
+    def set(self, key, value):
+        """ Pickles and stores value for key. """
+        self.values[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def timed(function, repeat, number):
+    """
+    Returns the best time, in microseconds, of one call of function, over
+    repeat runs of number calls.
+    """
+    best = None
+    for __ in xrange(repeat):
+        gc.collect()
+        start = default_timer()
+        for __ in xrange(number):
+            function()
+        elapsed = (default_timer() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000000
+
+
+def run_benchmark(repeat, number):
+    """
+    Prints the benchmark results for each context.
+    """
+    rng = random.Random(0)
+    code = "answer = check_answer(expect, submission[0])"
+
+    print('{:<24}{:>12}{:>12}{:>14}{:>14}{:>14}'.format(
+        'Context (us)', 'old key', 'new key', 'shared hit', 'local hit', 'two-tier hit',
+    ))
+    for name, make_context in CONTEXTS:
+        globals_dict = make_context(rng)
+        # The results of a check are the globals, with a few more values.
+        key = cache_key(code, globals_dict, 1)
+        result = (None, json_safe(dict(globals_dict, answer=True)))
+
+        shared_cache = PicklingCache()
+        shared_cache.set(key, result)
+        local_cache = LocalCache(max_entries=100, max_bytes=100 * 1024 * 1024)
+        local_cache.set(key, result)
+        two_tier_cache = TwoTierCache(local_cache, shared_cache)
+
+        print('{:<24}{:>12.0f}{:>12.0f}{:>14.0f}{:>14.0f}{:>14.0f}'.format(
+            name,
+            timed(lambda: old_cache_key(code, globals_dict, 1), repeat, number),
+            timed(lambda: cache_key(code, globals_dict, 1), repeat, number),
+            timed(lambda: shared_cache.get(key), repeat, number),
+            timed(lambda: local_cache.get(key), repeat, number),
+            timed(lambda: two_tier_cache.get(key), repeat, number),
+        ))
+
+
+def main():
+    """
+    Parses the command line and runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs of each operation.')
+    parser.add_argument('--number', type=int, default=200, help='Number of calls of each operation per run.')
+    args = parser.parse_args()
+    run_benchmark(args.repeat, args.number)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,10 +4,19 @@ from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
 from . import lazymod
+from .worker_pool import WORKER_POOL
 from dogapi import dog_stats_api
 from six import text_type
 
 import hashlib
+import json
+import marshal
+from json.encoder import encode_basestring_ascii
+
+try:
+    from json.encoder import c_make_encoder
+except ImportError:
+    c_make_encoder = None
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -74,6 +83,96 @@ def update_hash(hasher, obj):
         hasher.update(repr(obj))
 
 
+# The values of globals that `json_safe` keeps, and the names it drops.
+JSON_SAFE_TYPES = (type(None), int, long, float, str, unicode, list, tuple, dict)
+UNSAFE_GLOBALS = ("__builtins__",)
+
+# The exact types of the values of arrays that are marshalled, see `_is_array`.
+SCALAR_TYPES = frozenset([type(None), bool, int, long, float, str, unicode])
+ARRAY_TYPES = frozenset([list, tuple])
+
+
+def _raise_not_serializable(obj):
+    """The `default` of the fast JSON encoder: nothing but JSON types are encoded."""
+    raise TypeError(repr(obj) + " is not JSON serializable")
+
+
+def canonical_json(obj):
+    """
+    Encode `obj` as JSON with sorted keys and no whitespace.
+
+    Equal JSON-safe objects always have the same encoding.  Raises TypeError or
+    ValueError if `obj` isn't JSON-safe.
+
+    `json.dumps` only uses its C encoder when keys aren't sorted, and the bulk
+    of large contexts is lists of numbers and strings, so these are encoded
+    with the C encoder directly.  Anything that turns out to hold a dict (or a
+    string with a brace in it) is encoded again with sorted keys.
+
+    """
+    if c_make_encoder is not None:
+        encoder = c_make_encoder(
+            {}, _raise_not_serializable, encode_basestring_ascii, None, ':', ',', False, False, True
+        )
+        encoded = "".join(encoder(obj, 0))
+        if "{" not in encoded:
+            return encoded
+    return json.dumps(obj, sort_keys=True, separators=(',', ':'))
+
+
+def _is_array(value):
+    """
+    Return whether `value` is a list or tuple made only of lists, tuples and scalars.
+
+    Such values, like tables of numbers, can be hashed through `marshal`, which
+    is much faster than encoding their floats as JSON.  Lists that appear more
+    than once aren't considered arrays.
+
+    """
+    if type(value) not in ARRAY_TYPES:
+        return False
+    seen = set()
+    arrays = [value]
+    while arrays:
+        array = arrays.pop()
+        if id(array) in seen:
+            return False
+        seen.add(id(array))
+        item_types = set(map(type, array))
+        if not item_types <= SCALAR_TYPES:
+            if not item_types <= SCALAR_TYPES | ARRAY_TYPES:
+                return False
+            arrays.extend(item for item in array if type(item) in ARRAY_TYPES)
+    return True
+
+
+def update_globals_hash(hasher, globals_dict):
+    """
+    Update a `hashlib` hasher with the JSON-safe part of `globals_dict`.
+
+    This hashes what `json_safe(globals_dict)` would keep, without copying it.
+    Each global is encoded once, as canonical JSON, and globals that can't be
+    encoded are skipped, as `json_safe` would drop them.  Arrays of scalars are
+    marshalled instead, which tells tuples from lists and str from unicode: at
+    worst, values that are equal once passed through JSON miss the cache.
+
+    """
+    for name in sorted(globals_dict):
+        value = globals_dict[name]
+        if name in UNSAFE_GLOBALS or not isinstance(value, JSON_SAFE_TYPES):
+            continue
+        try:
+            encoded_name = canonical_json(name)
+            if _is_array(value):
+                encoded_value = "m" + marshal.dumps(value, 2)
+            else:
+                encoded_value = "j" + canonical_json(value)
+        except (TypeError, ValueError):
+            continue
+        hasher.update("%s%d:" % (encoded_name, len(encoded_value)))
+        hasher.update(encoded_value)
+
+
 @dog_stats_api.timed('capa.safe_exec.time')
 def safe_exec(
     code,
@@ -103,20 +202,20 @@ def safe_exec(
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  See `TwoTierCache` to keep recent results in the process.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
 
     If `unsafely` is true, then the code will actually be executed without sandboxing.
+    Otherwise, it's executed by a warm sandbox worker if `WORKER_POOL` is enabled.
 
     """
     # Check the cache for a previous result.
     if cache:
-        safe_globals = json_safe(globals_dict)
         md5er = hashlib.md5()
         md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
+        update_globals_hash(md5er, globals_dict)
         key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
         cached = cache.get(key)
         if cached is not None:
@@ -134,6 +233,8 @@ def safe_exec(
     # Decide which code executor to use.
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif WORKER_POOL.enabled:
+        exec_fn = WORKER_POOL.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
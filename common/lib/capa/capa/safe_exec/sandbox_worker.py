@@ -0,0 +1,125 @@
+"""
+The program run by the sandboxed Python in a warm sandbox worker.
+
+This module isn't imported: `worker_pool` reads its source and runs it with
+the sandboxed Python, under the same user and limits as codejail.  The worker
+imports the given modules and tells it is ready, then handles a single request
+read from stdin as a line of JSON, writes its JSON reply to its original stdout
+and exits.  Nothing the code does (patching modules, installing signal
+handlers, writing to the reply's file descriptor) can outlive its execution.
+
+"""
+import json
+import os
+import resource
+import signal
+import sys
+import tempfile
+import traceback
+
+OK_TYPES = (type(None), int, long, float, str, unicode, list, tuple, dict)
+BAD_KEYS = ("__builtins__",)
+
+
+class DevNull(object):
+    """Sandboxed code can't print to stdout, which carries the replies."""
+    def write(self, *args, **kwargs):
+        pass
+
+    def flush(self):
+        pass
+
+
+def warm_up(module_names):
+    """Import the modules that problems are assumed to use."""
+    os.environ["OPENBLAS_NUM_THREADS"] = "1"    # See TNL-6456
+    for module_name in module_names:
+        try:
+            __import__(module_name)
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+
+def jsonable(value):
+    """Return whether `value` can be sent back as JSON."""
+    if not isinstance(value, OK_TYPES):
+        return False
+    try:
+        json.dumps(value)
+    except Exception:  # pylint: disable=broad-except
+        return False
+    return True
+
+
+def cpu_time():
+    """Return the CPU time used by the worker so far, in seconds."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def limit_cpu(cpu):
+    """
+    Allow at most `cpu` more seconds of CPU time, from now on, and return the
+    CPU time at which the worker gets SIGXCPU, or None if there is no limit.
+
+    Only the soft limit moves: the hard limit, set when the worker started,
+    can't be raised again, and has to last for all of its executions.
+    """
+    if not cpu:
+        return None
+    limit = int(cpu_time()) + 1 + cpu
+    __, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    return limit
+
+
+def exit_on_cpu_limit(signum, frame):  # pylint: disable=unused-argument
+    """Stop the worker when the code it runs exceeds its CPU limit, like codejail's process is killed."""
+    os._exit(1)  # pylint: disable=protected-access
+
+
+def execute(request):
+    """Run the code of `request` in its directory, and return the resulting globals."""
+    os.chdir(request["dir"])
+    tempfile.tempdir = os.environ["TMPDIR"] = os.path.abspath("tmp")
+    sys.path.extend(request["python_path"])
+
+    g_dict = request["globals"]
+    exec(request["code"], g_dict)  # pylint: disable=exec-used
+    return {k: v for k, v in g_dict.items() if k not in BAD_KEYS and jsonable(v)}
+
+
+def main():
+    """Warm up, then handle a single request."""
+    replies = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+    sys.stdout = DevNull()
+
+    signal.signal(signal.SIGXCPU, exit_on_cpu_limit)
+    warm_up(sys.argv[1:])
+    replies.write(json.dumps({"ready": True}) + "\n")
+    replies.flush()
+
+    line = sys.stdin.readline()
+    if not line:
+        return
+    cpu_limit = None
+    try:
+        request = json.loads(line)
+        cpu_limit = limit_cpu(request["cpu"])
+        reply = {"globals": execute(request)}
+    except Exception:  # pylint: disable=broad-except
+        reply = {"error": traceback.format_exc()}
+    if cpu_limit is not None and cpu_time() >= cpu_limit:
+        # The code outlived its CPU limit, by handling SIGXCPU itself.
+        os._exit(1)  # pylint: disable=protected-access
+    replies.write(json.dumps(reply) + "\n")
+    replies.flush()
+    # Don't run whatever exit handlers the code registered.
+    os._exit(0)  # pylint: disable=protected-access
+
+
+if __name__ == "__main__":
+    main()
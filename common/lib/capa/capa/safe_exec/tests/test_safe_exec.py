@@ -10,7 +10,8 @@ import unittest
 import pytest
 from six import text_type
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import LocalCache, TwoTierCache, safe_exec, update_hash
+from capa.safe_exec.safe_exec import update_globals_hash
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -167,6 +168,46 @@ class TestSafeExecCaching(unittest.TestCase):
         safe_exec(code, g, cache=DictCache(cache))
         self.assertEqual(g['a'], 17)
 
+    def test_cache_key_uses_json_safe_globals(self):
+        # Globals that aren't passed to the sandbox don't change the cache key.
+        code = "b = a['x'] + 1"
+        cache = {}
+        safe_exec(code, {'a': {'x': 1, 'y': [1, 2]}, 'f': len}, cache=DictCache(cache))
+        self.assertEqual(len(cache), 1)
+
+        cache[cache.keys()[0]] = (None, {'b': 17})
+        g = {'a': {'y': (1, 2), 'x': 1}, 'os': os}
+        safe_exec(code, g, cache=DictCache(cache))
+        self.assertEqual(g['b'], 17)
+
+        # But different values do.
+        g = {'a': {'x': 2, 'y': [1, 2]}}
+        safe_exec(code, g, cache=DictCache(cache))
+        self.assertEqual(g['b'], 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_two_tier_cache(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=10000)
+        cache = {}
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=TwoTierCache(local_cache, DictCache(cache)))
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(cache.values()[0], (None, {'a': 3}))
+        self.assertEqual(local_cache.num_entries, 1)
+
+        # The local cache is checked first.
+        cache[cache.keys()[0]] = (None, {'a': 17})
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=TwoTierCache(local_cache, DictCache(cache)))
+        self.assertEqual(g['a'], 3)
+
+        # And filled from the shared cache.
+        local_cache.clear()
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=TwoTierCache(local_cache, DictCache(cache)))
+        self.assertEqual(g['a'], 17)
+        self.assertEqual(local_cache.num_entries, 1)
+
     def test_unicode_submission(self):
         # Check that using non-ASCII unicode does not raise an encoding error.
         # Try several non-ASCII unicode characters.
@@ -236,6 +277,118 @@ class TestUpdateHash(unittest.TestCase):
         self.assertEqual(h1, h2)
 
 
+class TestUpdateGlobalsHash(unittest.TestCase):
+    """Test the safe_exec.update_globals_hash function, which hashes the JSON-safe part of globals."""
+
+    def hash_globals(self, globals_dict):
+        """Return the md5 hash that `update_globals_hash` makes us."""
+        md5er = hashlib.md5()
+        update_globals_hash(md5er, globals_dict)
+        return md5er.hexdigest()
+
+    def test_different_values(self):
+        hashes = {
+            self.hash_globals(globals_dict)
+            for globals_dict in [
+                {}, {'a': 1}, {'a': 10}, {'a': "1"}, {'b': 1}, {'a': 1.5}, {'a': [1, 2]}, {'a': [2, 1]},
+                {'a': {'b': 1}}, {'a': None}, {'a': True}, {'a': 1, 'b': 1}, {'a1': 1},
+            ]
+        }
+        self.assertEqual(len(hashes), 13)
+
+    def test_dict_ordering(self):
+        d1 = {k: 1 for k in "abcdefghijklmnopqrstuvwxyz"}
+        d2 = dict(d1)
+        for i in xrange(10000):
+            d2[i] = 1
+        for i in xrange(10000):
+            del d2[i]
+        self.assertNotEqual(d1.keys(), d2.keys())
+
+        self.assertEqual(self.hash_globals(d1), self.hash_globals(d2))
+        self.assertEqual(
+            self.hash_globals({'a': [1, 2, [d1], 3, 4]}),
+            self.hash_globals({'a': [1, 2, [d2], 3, 4]}),
+        )
+
+    def test_json_equivalent_values(self):
+        # Values that are the same once they are passed through JSON hash the same.
+        self.assertEqual(
+            self.hash_globals({'a': 'x', 'b': {1: 2, 'c': (1, 2)}}),
+            self.hash_globals({'a': u'x', 'b': {'1': 2, 'c': [1, 2]}}),
+        )
+
+    def test_arrays(self):
+        table = [[float(i * j) for j in xrange(10)] for i in xrange(10)]
+        self.assertEqual(
+            self.hash_globals({'table': table, 'names': ['a', 'b']}),
+            self.hash_globals({'table': [list(row) for row in table], 'names': ['a', 'b']}),
+        )
+        self.assertNotEqual(
+            self.hash_globals({'table': table}),
+            self.hash_globals({'table': table[:-1] + [table[-1][:-1] + [0.5]]}),
+        )
+        # Arrays that hold the same list twice are encoded as JSON.
+        row = [1.0, 2.0]
+        self.assertNotEqual(self.hash_globals({'table': [row, row]}), self.hash_globals({'table': [row, [1.0]]}))
+        # And recursive ones are skipped.
+        row.append(row)
+        self.assertEqual(self.hash_globals({'table': row}), self.hash_globals({}))
+
+    def test_skipped_globals(self):
+        expected = self.hash_globals({'a': 1})
+        self.assertEqual(self.hash_globals({'a': 1, '__builtins__': {}}), expected)
+        self.assertEqual(self.hash_globals({'a': 1, 'os': os}), expected)
+        self.assertEqual(self.hash_globals({'a': 1, 'b': [os]}), expected)
+        self.assertEqual(self.hash_globals({'a': 1, 'b': {(1, 2): 3}}), expected)
+        self.assertEqual(self.hash_globals({'a': 1, 'b': '\xff'}), expected)
+
+
+class TestLocalCache(unittest.TestCase):
+    """Test the LocalCache used in front of the shared safe_exec cache."""
+
+    def test_least_recently_used(self):
+        cache = LocalCache(max_entries=2, max_bytes=10000)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(cache.num_entries, 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_max_bytes(self):
+        cache = LocalCache(max_entries=10, max_bytes=200)
+        cache.set('big', 'x' * 300)
+        self.assertIsNone(cache.get('big'))
+
+        cache.set('a', 'x' * 80)
+        cache.set('b', 'x' * 80)
+        cache.set('c', 'x' * 80)
+        self.assertLessEqual(cache.total_bytes, 200)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('c'), 'x' * 80)
+
+        cache.configure(max_entries=1, max_bytes=200)
+        self.assertEqual(cache.num_entries, 1)
+        cache.clear()
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_disabled(self):
+        cache = LocalCache()
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_values_are_copied(self):
+        cache = LocalCache(max_entries=10, max_bytes=10000)
+        value = (None, {'a': [1, 2]})
+        cache.set('a', value)
+        value[1]['a'].append(3)
+        cache.get('a')[1]['a'].append(4)
+        self.assertEqual(cache.get('a'), (None, {'a': [1, 2]}))
+
+
 class TestRealProblems(unittest.TestCase):
     def test_802x(self):
         code = textwrap.dedent("""\
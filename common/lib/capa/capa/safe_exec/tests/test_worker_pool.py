@@ -0,0 +1,154 @@
+"""Test worker_pool.py"""
+
+import sys
+import unittest
+import zipfile
+from cStringIO import StringIO
+
+from codejail import jail_code
+from codejail.safe_exec import SafeExecException
+from mock import patch
+
+from capa.safe_exec.worker_pool import WARM_UP_REALTIME, WorkerPool
+
+
+@patch.dict(jail_code.COMMANDS, {"python": {"cmdline_start": [sys.executable, "-E", "-B"], "user": None}})
+@patch.dict(jail_code.LIMITS, {"CPU": 1, "REALTIME": 3})
+@patch("capa.safe_exec.worker_pool.WARM_MODULES", ["json", "math"])
+class TestWorkerPool(unittest.TestCase):
+    """
+    Test the pool of sandbox workers, with the current Python as the sandbox.
+    """
+    def setUp(self):
+        super(TestWorkerPool, self).setUp()
+        self.pool = WorkerPool(size=1)
+        self.addCleanup(self.pool.shutdown)
+
+    def fill_pool(self):
+        """
+        Start the idle workers of the pool, and wait for them to be ready.
+        """
+        with self.pool._lock:  # pylint: disable=protected-access
+            self.pool._fill(self.pool.size)  # pylint: disable=protected-access
+        for worker in self.pool._idle_workers:  # pylint: disable=protected-access
+            self.assertTrue(worker.is_ready(WARM_UP_REALTIME))
+
+    def warm_exec(self, code, globals_dict, **kwargs):
+        """
+        Execute code in a warm worker of the pool.
+        """
+        self.fill_pool()
+        with patch("capa.safe_exec.worker_pool.codejail_safe_exec") as mock_codejail_safe_exec:
+            self.pool.safe_exec(code, globals_dict, **kwargs)
+        self.assertFalse(mock_codejail_safe_exec.called)
+
+    def test_enabled(self):
+        self.assertTrue(self.pool.enabled)
+        self.assertFalse(WorkerPool().enabled)
+        with patch.dict(jail_code.COMMANDS, clear=True):
+            self.assertFalse(self.pool.enabled)
+
+    def test_cold_pool_uses_codejail(self):
+        with patch("capa.safe_exec.worker_pool.codejail_safe_exec") as mock_codejail_safe_exec:
+            self.pool.safe_exec("a = 1", {}, slug="cold")
+        mock_codejail_safe_exec.assert_called_once_with(
+            "a = 1", {}, python_path=None, extra_files=None, slug="cold",
+        )
+        self.assertEqual(len(self.pool._idle_workers), 1)  # pylint: disable=protected-access
+
+    def test_warming_up_pool_uses_codejail(self):
+        with self.pool._lock:  # pylint: disable=protected-access
+            self.pool._fill(self.pool.size)  # pylint: disable=protected-access
+        worker = self.pool._idle_workers[0]  # pylint: disable=protected-access
+        with patch.object(worker, "is_ready", return_value=False):
+            with patch("capa.safe_exec.worker_pool.codejail_safe_exec") as mock_codejail_safe_exec:
+                self.pool.safe_exec("a = 1", {})
+        self.assertTrue(mock_codejail_safe_exec.called)
+        self.assertEqual(list(self.pool._idle_workers), [worker])  # pylint: disable=protected-access
+
+    def test_set_values(self):
+        globals_dict = {"a": 17, "b": [1, 2]}
+        self.warm_exec("c = a + len(b)\nimport math\nm = math", globals_dict)
+        self.assertEqual(globals_dict["c"], 19)
+        self.assertNotIn("m", globals_dict)
+
+    def test_exception(self):
+        with self.assertRaisesRegexp(SafeExecException, "ZeroDivisionError"):
+            self.warm_exec("1/0", {})
+
+    def test_realtime_limit(self):
+        with patch.dict(jail_code.LIMITS, {"REALTIME": 1}):
+            with self.assertRaisesRegexp(SafeExecException, "sandbox worker stopped"):
+                self.warm_exec("while True: pass", {})
+
+    def test_cpu_limit(self):
+        with patch.dict(jail_code.LIMITS, {"REALTIME": 10}):
+            with self.assertRaisesRegexp(SafeExecException, "sandbox worker stopped"):
+                self.warm_exec("while True: pass", {})
+
+    def test_cpu_limit_with_sigxcpu_handler(self):
+        code = (
+            "import signal, time\n"
+            "signal.signal(signal.SIGXCPU, lambda signum, frame: None)\n"
+            "while time.clock() < 4: pass\n"
+        )
+        with patch.dict(jail_code.LIMITS, {"REALTIME": 10}):
+            with self.assertRaisesRegexp(SafeExecException, "sandbox worker stopped"):
+                self.warm_exec(code, {})
+
+    def test_python_path(self):
+        zip_file = StringIO()
+        with zipfile.ZipFile(zip_file, "w") as python_lib:
+            python_lib.writestr("constants.py", "X = 42\n")
+        globals_dict = {}
+        self.warm_exec(
+            "import constants\nimport os\nx = constants.X\ntmp = os.environ['TMPDIR']",
+            globals_dict,
+            python_path=["python_lib.zip"],
+            extra_files=[("python_lib.zip", zip_file.getvalue())],
+        )
+        self.assertEqual(globals_dict["x"], 42)
+        self.assertTrue(globals_dict["tmp"].endswith("/tmp"))
+
+    def test_single_execution_workers(self):
+        first_globals, second_globals = {}, {}
+        self.warm_exec("import os\npid = os.getpid()", first_globals)
+        self.warm_exec("import os\npid = os.getpid()", second_globals)
+        self.assertNotEqual(first_globals["pid"], second_globals["pid"])
+
+    def test_executions_cant_tamper_with_each_other(self):
+        tampering_code = (
+            "import json, os, signal, sys\n"
+            "json.dumps = lambda *args, **kwargs: '{\"globals\": {\"forged\": 1}}'\n"
+            "sys.modules['math'] = None\n"
+            "signal.signal(signal.SIGXCPU, signal.SIG_IGN)\n"
+            "os.write(3, '{\"globals\": {\"forged\": 2}}\\n' * 3)\n"
+        )
+        try:
+            self.warm_exec(tampering_code, {})
+        except SafeExecException:
+            pass
+        globals_dict = {"a": 1}
+        self.warm_exec(
+            "import math, signal\nb = a + 1\nc = math.sqrt(4)\n"
+            "ignored = signal.getsignal(signal.SIGXCPU) == signal.SIG_IGN",
+            globals_dict,
+        )
+        self.assertEqual(globals_dict["b"], 2)
+        self.assertEqual(globals_dict["c"], 2.0)
+        self.assertFalse(globals_dict["ignored"])
+        self.assertNotIn("forged", globals_dict)
+
+    def test_expired_workers(self):
+        self.pool.configure(size=1, max_age=0)
+        self.fill_pool()
+        with patch("capa.safe_exec.worker_pool.codejail_safe_exec") as mock_codejail_safe_exec:
+            self.pool.safe_exec("a = 1", {})
+        self.assertTrue(mock_codejail_safe_exec.called)
+
+    def test_shutdown(self):
+        self.fill_pool()
+        worker = self.pool._idle_workers[0]  # pylint: disable=protected-access
+        self.pool.shutdown()
+        self.assertIsNotNone(worker.process.poll())
+        self.assertEqual(len(self.pool._idle_workers), 0)  # pylint: disable=protected-access
@@ -0,0 +1,321 @@
+"""
+A pool of warm sandbox workers, to run safe_exec code without waiting for a
+new sandboxed Python to start and import numpy and friends.
+
+Each worker is a sandboxed Python started the way codejail starts one (as the
+configured sandbox user, with the same resource limits) that imports the
+modules problems are assumed to use while it waits for its first request.
+Codejail forbids sandboxed processes to fork, so a worker runs the code of its
+request itself.  A worker handles a single execution and then exits, so that
+executions are as isolated from each other as they are with codejail: code
+that patches the warm modules, or writes to the worker's stdout, can only
+affect its own result.
+
+Workers that are older than `max_age` seconds, or that didn't warm up in
+WARM_UP_REALTIME seconds, are discarded rather than used.  When the pool has no
+idle worker that is ready, the code is run by codejail as usual, rather than
+waiting for one.
+
+"""
+import atexit
+import json
+import logging
+import os
+import resource
+import select
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from functools import partial
+
+from codejail import jail_code
+from codejail.safe_exec import safe_exec as codejail_safe_exec
+from codejail.safe_exec import SafeExecException, json_safe
+from dogapi import dog_stats_api
+
+log = logging.getLogger(__name__)
+
+# The program run by the workers, see sandbox_worker.py.
+sandbox_worker_py_file = os.path.join(os.path.dirname(__file__), "sandbox_worker.py")
+with open(sandbox_worker_py_file) as sandbox_worker_file:
+    SANDBOX_WORKER_PY = sandbox_worker_file.read()
+
+# The modules imported by the workers before they get any code to run.
+WARM_MODULES = [
+    "json", "random", "math", "numpy", "scipy", "calc", "eia",
+    "chem.chemcalc", "chem.chemtools", "chem.miller", "verifiers.draganddrop",
+]
+
+# CPU seconds that a worker may spend importing the warm modules, on top of
+# the CPU limit of the code it runs, and seconds it may take to do so.
+WARM_UP_CPU = 10
+WARM_UP_REALTIME = 30
+
+
+def _set_process_limits(rlimits):
+    """Set the resource limits of a new worker, in the child process."""
+    for limit, value in rlimits:
+        resource.setrlimit(limit, value)
+
+
+def _create_rlimits():
+    """
+    Return the resource limits of a new worker: codejail's, with time to warm up.
+    The worker lowers its CPU limit itself before it runs any code.
+    """
+    limits = jail_code.LIMITS
+    rlimits = [(resource.RLIMIT_NPROC, (0, 0))]
+    if limits["CPU"]:
+        cpu = limits["CPU"] + WARM_UP_CPU
+        rlimits.append((resource.RLIMIT_CPU, (cpu, cpu + 1)))
+    if limits.get("VMEM"):
+        rlimits.append((resource.RLIMIT_AS, (limits["VMEM"], limits["VMEM"])))
+    rlimits.append((resource.RLIMIT_FSIZE, (limits.get("FSIZE", 0), limits.get("FSIZE", 0))))
+    return rlimits
+
+
+class SandboxWorker(object):
+    """A sandboxed Python process that runs code it reads from its stdin."""
+
+    def __init__(self):
+        command = jail_code.COMMANDS["python"]
+        self.user = command["user"]
+        cmd = []
+        if self.user:
+            cmd.extend(["sudo", "-u", self.user])
+        cmd.extend(command["cmdline_start"])
+        cmd.extend(["-c", SANDBOX_WORKER_PY])
+        cmd.extend(WARM_MODULES)
+
+        with open(os.devnull, "w") as devnull:
+            self.process = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                cwd=tempfile.gettempdir(),
+                env={},
+                close_fds=True,
+                preexec_fn=partial(_set_process_limits, _create_rlimits()),
+            )
+        self.started = time.time()
+        self.executions = 0
+        self.ready = False
+
+    def is_usable(self, max_age):
+        """Return whether this worker can (eventually) run code."""
+        age = time.time() - self.started
+        return (
+            self.process.poll() is None and
+            self.executions == 0 and
+            age < max_age and
+            (self.ready or age < WARM_UP_REALTIME)
+        )
+
+    def is_ready(self, timeout=0):
+        """Return whether the worker has imported the warm modules, waiting up to `timeout` seconds for it."""
+        if not self.ready and select.select([self.process.stdout], [], [], timeout)[0]:
+            self.ready = self._read_reply(WARM_UP_REALTIME) == {"ready": True}
+        return self.ready
+
+    def execute(self, request, realtime):
+        """
+        Send `request` to the worker and return its reply, or None if the worker
+        died or took more than `realtime` seconds.
+        """
+        self.executions += 1
+        try:
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            return None
+        return self._read_reply(realtime)
+
+    def _read_reply(self, timeout):
+        """Return the next reply of the worker, killing it if it takes more than `timeout` seconds."""
+        killer = threading.Timer(timeout, self.kill) if timeout else None
+        try:
+            if killer:
+                killer.start()
+            reply = self.process.stdout.readline()
+        except (IOError, OSError):
+            reply = ""
+        finally:
+            if killer:
+                killer.cancel()
+        try:
+            return json.loads(reply) if reply else None
+        except ValueError:
+            return None
+
+    def kill(self):
+        """Stop the worker, if it's still running."""
+        if self.process.poll() is not None:
+            return
+        if self.user:
+            # The worker runs as the sandbox user, under sudo.
+            subprocess.call(["sudo", "pkill", "-9", "-P", str(self.process.pid)])
+        try:
+            self.process.kill()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+class WorkerPool(object):
+    """
+    A per-process pool of warm `SandboxWorker`s.
+
+    The pool holds up to `size` idle workers, and starts a new one whenever one
+    is taken, so that it warms up while the code runs.  The workers that were
+    started first, which are the most likely to be warm, are taken first.
+
+    """
+    def __init__(self, size=0, max_age=300):
+        self.size = size
+        self.max_age = max_age
+        self._idle_workers = deque()
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Return whether safe_exec should use the pool."""
+        return self.size > 0 and jail_code.is_configured("python")
+
+    def configure(self, size, max_age):
+        """Change the settings of the pool, discarding its idle workers."""
+        self.size = size
+        self.max_age = max_age
+        self.shutdown()
+
+    def shutdown(self):
+        """Stop the idle workers."""
+        with self._lock:
+            workers = self._take_idle_workers()
+        for worker in workers:
+            worker.kill()
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        Execute code as "python" in a sandbox worker, like `codejail.safe_exec.safe_exec`.
+
+        The code can use the JSON-safe globals in `globals_dict`, which are updated
+        with its resulting globals.  `python_path` names files or directories to add
+        to its Python path: those that aren't in `extra_files`, a list of (filename,
+        contents) pairs, are copied into its directory.
+
+        """
+        worker = self._acquire()
+        if worker is None:
+            codejail_safe_exec(code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug)
+            return
+
+        tmpdir = tempfile.mkdtemp(prefix="codejail-")
+        try:
+            os.chmod(tmpdir, 0775)
+            os.mkdir(os.path.join(tmpdir, "tmp"))
+            os.chmod(os.path.join(tmpdir, "tmp"), 0777)
+
+            extra_names = set(name for name, __ in extra_files or ())
+            for name, contents in extra_files or ():
+                with open(os.path.join(tmpdir, name), "wb") as extra_file:
+                    extra_file.write(contents)
+            sandbox_path = []
+            for pydir in python_path or ():
+                pybase = os.path.basename(pydir)
+                sandbox_path.append(pybase)
+                if pybase not in extra_names:
+                    if os.path.isdir(pydir):
+                        shutil.copytree(pydir, os.path.join(tmpdir, pybase), symlinks=True)
+                    else:
+                        shutil.copy(pydir, tmpdir)
+
+            log.debug("Executing jailed code %s in a sandbox worker", slug)
+            reply = worker.execute(
+                {
+                    "code": code,
+                    "globals": json_safe(globals_dict),
+                    "dir": tmpdir,
+                    "python_path": sandbox_path,
+                    "cpu": jail_code.LIMITS["CPU"],
+                },
+                jail_code.LIMITS.get("REALTIME"),
+            )
+        finally:
+            worker.kill()
+            self._remove_tmpdir(worker, tmpdir)
+
+        if not isinstance(reply, dict) or not isinstance(reply.get("globals", {}), dict):
+            reply = None
+        if reply is None:
+            raise SafeExecException(
+                "Couldn't execute jailed code: the sandbox worker stopped, with status code: {}".format(
+                    worker.process.returncode,
+                )
+            )
+        if "globals" not in reply:
+            raise SafeExecException("Couldn't execute jailed code: {}".format(reply.get("error")))
+        globals_dict.update(reply["globals"])
+
+    def _acquire(self):
+        """
+        Return a warm worker to run code in, or None if none is ready yet, and
+        start new workers to take its place.  This doesn't wait for workers to
+        warm up.
+        """
+        with self._lock:
+            if os.getpid() != self._pid:
+                # This process was forked: the idle workers belong to the parent.
+                self._idle_workers.clear()
+                self._pid = os.getpid()
+            worker = None
+            discarded = []
+            warming_up = []
+            while self._idle_workers and worker is None:
+                candidate = self._idle_workers.pop()
+                if not candidate.is_usable(self.max_age):
+                    discarded.append(candidate)
+                elif candidate.is_ready():
+                    worker = candidate
+                else:
+                    warming_up.append(candidate)
+            self._idle_workers.extend(reversed(warming_up))
+            self._fill(self.size)
+
+        for candidate in discarded:
+            if not candidate.ready and candidate.process.poll() is None:
+                log.warning("A sandbox worker failed to warm up")
+            candidate.kill()
+        dog_stats_api.increment('capa.safe_exec.worker_pool.acquired', tags=[
+            'warm:{}'.format(worker is not None),
+        ])
+        return worker
+
+    def _fill(self, size):
+        """Start new workers until the pool has `size` idle ones.  Must be called with the lock held."""
+        while len(self._idle_workers) < size:
+            self._idle_workers.appendleft(SandboxWorker())
+
+    def _remove_tmpdir(self, worker, tmpdir):
+        """Remove the directory of an execution, and the files the sandbox user made in it."""
+        if worker.user:
+            subprocess.call([
+                "sudo", "-u", worker.user,
+                "find", os.path.join(tmpdir, "tmp"), "-mindepth", "1", "-maxdepth", "1",
+                "-exec", "rm", "-rf", "{}", ";",
+            ])
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    def _take_idle_workers(self):
+        """Remove and return the idle workers.  Must be called with the lock held."""
+        workers = list(self._idle_workers) if os.getpid() == self._pid else []
+        self._idle_workers.clear()
+        return workers
+
+
+WORKER_POOL = WorkerPool()
+atexit.register(WORKER_POOL.shutdown)
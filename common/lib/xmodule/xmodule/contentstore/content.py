@@ -222,7 +222,7 @@ class StaticContent(object):
         return any(path.lower().endswith(excluded_ext.lower()) for excluded_ext in excluded_exts)
 
     @staticmethod
-    def get_canonicalized_asset_path(course_key, path, base_url, excluded_exts, encode=True):
+    def get_canonicalized_asset_path(course_key, path, base_url, excluded_exts, encode=True, asset_index=None):
         """
         Returns a fully-qualified path to a piece of static content.
 
@@ -232,6 +232,8 @@ class StaticContent(object):
         Args:
             course_key: key to the course which owns this asset
             path: the path to said content
+            asset_index: an optional CourseAssetIndex of the course, to look the asset up
+                in instead of the contentstore
 
         Returns:
             string: fully-qualified path to asset
@@ -246,13 +248,18 @@ class StaticContent(object):
         # Check the status of the asset to see if this can be served via CDN aka publicly.
         serve_from_cdn = False
         content_digest = None
-        try:
-            content = AssetManager.find(asset_key, as_stream=True)
-            serve_from_cdn = not getattr(content, "locked", True)
-            content_digest = getattr(content, "content_digest", None)
-        except (ItemNotFoundError, NotFoundError):
-            # If we can't find the item, just treat it as if it's locked.
-            serve_from_cdn = False
+        if asset_index is not None and asset_index.covers(asset_key):
+            # Assets missing from the index are treated as locked, like the ones we can't find below.
+            locked, content_digest = asset_index.get(asset_key, (True, None))
+            serve_from_cdn = not locked
+        else:
+            try:
+                content = AssetManager.find(asset_key, as_stream=True)
+                serve_from_cdn = not getattr(content, "locked", True)
+                content_digest = getattr(content, "content_digest", None)
+            except (ItemNotFoundError, NotFoundError):
+                # If we can't find the item, just treat it as if it's locked.
+                serve_from_cdn = False
 
         # Do a generic check to see if anything about this asset disqualifies it from being CDN'd.
         is_excluded = False
@@ -268,7 +275,7 @@ class StaticContent(object):
         for query_name, query_val in query_params:
             if query_val.startswith("/static/"):
                 new_val = StaticContent.get_canonicalized_asset_path(
-                    course_key, query_val, base_url, excluded_exts, encode=False)
+                    course_key, query_val, base_url, excluded_exts, encode=False, asset_index=asset_index)
                 updated_query_params.append((query_name, new_val))
             else:
                 # Make sure we're encoding Unicode strings down to their byte string
@@ -294,6 +301,12 @@ class StaticContent(object):
     def stream_data(self):
         yield self._data
 
+    def stream_data_in_range(self, first_byte, last_byte):
+        """
+        Stream the data between first_byte and last_byte (included)
+        """
+        yield self._data[first_byte:last_byte + 1]
+
     @staticmethod
     def serialize_asset_key_with_slash(asset_key):
         """
@@ -314,26 +327,32 @@ class StaticContentStream(StaticContent):
                                                   length=length, locked=locked, content_digest=content_digest)
         self._stream = stream
 
+    @property
+    def chunk_size(self):
+        """
+        The size of the chunks the stream is stored in (GridFS chunks), which reads are aligned on.
+        """
+        return getattr(self._stream, 'chunk_size', None) or STREAM_DATA_CHUNK_SIZE
+
     def stream_data(self):
         while True:
-            chunk = self._stream.read(STREAM_DATA_CHUNK_SIZE)
+            chunk = self._stream.read(self.chunk_size)
             if len(chunk) == 0:
                 break
             yield chunk
 
     def stream_data_in_range(self, first_byte, last_byte):
         """
-        Stream the data between first_byte and last_byte (included)
+        Stream the data between first_byte and last_byte (included), one stored chunk at a time
         """
+        chunk_size = self.chunk_size
         self._stream.seek(first_byte)
         position = first_byte
-        while True:
-            if last_byte < position + STREAM_DATA_CHUNK_SIZE - 1:
-                chunk = self._stream.read(last_byte - position + 1)
-                yield chunk
+        while position <= last_byte:
+            chunk = self._stream.read(min(chunk_size - position % chunk_size, last_byte - position + 1))
+            if len(chunk) == 0:
                 break
-            chunk = self._stream.read(STREAM_DATA_CHUNK_SIZE)
-            position += STREAM_DATA_CHUNK_SIZE
+            position += len(chunk)
             yield chunk
 
     def close(self):
@@ -348,6 +367,55 @@ class StaticContentStream(StaticContent):
         return content
 
 
+class CourseAssetIndex(object):
+    """
+    Whether each asset (and thumbnail) of a course is locked, and its content digest,
+    to canonicalize the urls of the assets of the course without looking each of them up.
+    """
+    def __init__(self, course_key, assets):
+        """
+        `assets` maps the (category, name) of each asset of the course to its (locked, content_digest).
+        """
+        self.course_key = course_key
+        self.assets = assets
+
+    @classmethod
+    def from_contentstore(cls, store, course_key):
+        """
+        Builds the index of the given course from the assets that `store` has for it.
+        """
+        assets = {}
+        contents = store.get_all_content_for_course(course_key)[0]
+        contents.extend(store.get_all_content_thumbnails_for_course(course_key))
+        for content in contents:
+            asset_key = content['asset_key']
+            assets[(asset_key.block_type, asset_key.block_id)] = (
+                bool(content.get('locked', False)), content.get('md5'),
+            )
+        return cls(course_key, assets)
+
+    def covers(self, asset_key):
+        """
+        Returns whether the given asset would be stored as an asset of the course of
+        this index, so that it exists if and only if it is in the index.
+        """
+        # Like the contentstore, ignore the run of the assets of old-style courses, which they don't store.
+        deprecated = getattr(self.course_key, 'deprecated', False)
+        course_key = asset_key.course_key
+        return (
+            getattr(asset_key, 'deprecated', False) == deprecated and
+            course_key.org == self.course_key.org and
+            course_key.course == self.course_key.course and
+            (deprecated or course_key.run == self.course_key.run)
+        )
+
+    def get(self, asset_key, default=None):
+        """
+        Returns the (locked, content_digest) of the given asset of the course, or `default`.
+        """
+        return self.assets.get((asset_key.block_type, asset_key.block_id), default)
+
+
 class ContentStore(object):
     '''
     Abstraction for all ContentStore providers (e.g. MongoDB)
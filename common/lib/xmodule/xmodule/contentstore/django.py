@@ -2,9 +2,14 @@ from __future__ import absolute_import
 from importlib import import_module
 
 from django.conf import settings
+from django.dispatch import Signal
 
 _CONTENTSTORE = {}
 
+# Sent whenever assets of a course are saved, changed or deleted in a contentstore, so that
+# what is cached about the course's assets can be refreshed.
+course_assets_changed = Signal(providing_args=["course_key"])  # pylint: disable=invalid-name
+
 
 def load_function(path):
     """
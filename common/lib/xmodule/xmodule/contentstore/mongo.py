@@ -10,6 +10,7 @@ from fs.osfs import OSFS
 from bson.son import SON
 
 from mongodb_proxy import autoretry_read
+from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import AssetKey
 from xmodule.contentstore.content import XASSET_LOCATION_TAG
 from xmodule.exceptions import NotFoundError
@@ -17,6 +18,7 @@ from xmodule.modulestore.django import ASSET_IGNORE_REGEX
 from xmodule.util.misc import escape_invalid_characters
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
 from .content import StaticContent, ContentStore, StaticContentStream
+from .django import course_assets_changed
 
 
 class MongoContentStore(ContentStore):
@@ -85,7 +87,7 @@ class MongoContentStore(ContentStore):
         # The way to version files in gridFS is to not use the file id as the _id but just as the filename.
         # Then you can upload as many versions as you like and access by date or version. Because we use
         # the location as the _id, we must delete before adding (there's no replace method in gridFS)
-        self.delete(content_id)  # delete is a noop if the entry doesn't exist; so, don't waste time checking
+        self.fs.delete(content_id)  # delete is a noop if the entry doesn't exist; so, don't waste time checking
 
         thumbnail_location = content.thumbnail_location.to_deprecated_list_repr() if content.thumbnail_location else None
         with self.fs.new_file(_id=content_id, filename=unicode(content.location), content_type=content.content_type,
@@ -100,16 +102,31 @@ class MongoContentStore(ContentStore):
             else:
                 fp.write(content.data)
 
+        self._send_assets_changed(content.location.course_key)
         return content
 
     def delete(self, location_or_id):
         """
         Delete an asset.
         """
+        asset_key = location_or_id
+        if isinstance(asset_key, basestring):
+            try:
+                asset_key = AssetKey.from_string(asset_key)
+            except InvalidKeyError:
+                pass
         if isinstance(location_or_id, AssetKey):
             location_or_id, _ = self.asset_db_key(location_or_id)
         # Deletes of non-existent files are considered successful
         self.fs.delete(location_or_id)
+        if isinstance(asset_key, AssetKey):
+            self._send_assets_changed(asset_key.course_key)
+
+    def _send_assets_changed(self, course_key):
+        """
+        Tells the receivers of the course_assets_changed signal that assets of the given course changed.
+        """
+        course_assets_changed.send(sender=self.__class__, course_key=course_key)
 
     @autoretry_read()
     def find(self, location, throw_on_not_found=True, as_stream=False):
@@ -357,6 +374,7 @@ class MongoContentStore(ContentStore):
         result = self.fs_files.update({'_id': asset_db_key}, {"$set": attr_dict}, upsert=False)
         if not result.get('updatedExisting', True):
             raise NotFoundError(asset_db_key)
+        self._send_assets_changed(location.course_key)
 
     @autoretry_read()
     def get_attrs(self, location):
@@ -413,6 +431,7 @@ class MongoContentStore(ContentStore):
                 # getattr b/c caching may mean some pickled instances don't have attr
                 locked=asset.get('locked', False)
             )
+        self._send_assets_changed(dest_course_key)
 
     def delete_all_course_assets(self, course_key):
         """
@@ -425,6 +444,7 @@ class MongoContentStore(ContentStore):
         for asset in matching_assets:
             asset_key = self.make_id_son(asset)
             self.fs.delete(asset_key)
+        self._send_assets_changed(course_key)
 
     # codifying the original order which pymongo used for the dicts coming out of location_to_dict
     # stability of order is more important than sanity of order as any changes to order make things
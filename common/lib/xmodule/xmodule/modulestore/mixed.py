@@ -606,6 +606,21 @@ class MixedModuleStore(ModuleStoreDraftAndPublished, ModuleStoreWriteBase):
         except NotImplementedError:
             return None, None
 
+    @strip_key
+    def get_changed_blocks(self, course_key, version_guid, **kwargs):
+        """
+        Returns the usage keys of the blocks of the given course that were
+        added or changed since the given version of the course.
+
+        Returns None if the store of the course doesn't keep versions, or
+        the given version is not found.
+        """
+        try:
+            store = self._verify_modulestore_support(course_key, 'get_changed_blocks')
+        except NotImplementedError:
+            return None
+        return store.get_changed_blocks(course_key, version_guid)
+
     def get_modulestore_type(self, course_id):
         """
         Returns a type which identifies which modulestore is servicing the given course_id.
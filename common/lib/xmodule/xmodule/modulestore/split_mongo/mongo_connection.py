@@ -8,6 +8,8 @@ import zlib
 import pymongo
 import pytz
 import re
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
 from time import time
 
@@ -15,6 +17,7 @@ from time import time
 from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
 try:
+    from django.conf import settings
     from django.core.cache import caches, InvalidCacheBackendError
     DJANGO_AVAILABLE = True
 except ImportError:
@@ -26,7 +29,7 @@ import logging
 from contracts import check, new_contract
 from mongodb_proxy import autoretry_read
 from xmodule.exceptions import HeartbeatFailure
-from xmodule.modulestore import BlockData
+from xmodule.modulestore import BlockData, EditInfo
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
 
@@ -113,6 +116,8 @@ class QueryTimer(object):
         """
         self._metric_base = metric_base
         self._sample_rate = sample_rate
+        # Number of blocks of code timed so far, which profilers can sample.
+        self.call_count = 0
 
     @contextmanager
     def timer(self, metric_name, course_context):
@@ -129,6 +134,7 @@ class QueryTimer(object):
         """
         tagger = Tagger(self._sample_rate)
         metric_name = "{}.{}".format(self._metric_base, metric_name)
+        self.call_count += 1
 
         start = time()
         try:
@@ -225,27 +231,209 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+def get_local_structure_cache_limits():
+    """
+    Return the (max_structures, max_blocks) limits of the in-process structure cache.
+
+    Both default to 0, which disables the in-process tier. They are read from the
+    ``COURSE_STRUCTURE_LOCAL_CACHE`` Django setting, if it exists.
+    """
+    config = {}
+    if DJANGO_AVAILABLE:
+        config = getattr(settings, 'COURSE_STRUCTURE_LOCAL_CACHE', None) or {}
+    return config.get('MAX_STRUCTURES', 0), config.get('MAX_BLOCKS', 0)
+
+
+def copy_structure(structure):
+    """
+    Return a copy of ``structure`` that split can modify the way it modifies the structures it reads.
+
+    The structure, its map of blocks, and the attributes, fields, defaults, asides and editing info of
+    each block are copied, for instance for split to load the definitions of the blocks into their fields.
+    The values of the fields are shared: split only changes them in place in the structures it copies
+    entirely, with ``version_structure``.
+    """
+    structure_copy = dict(structure)
+    structure_copy['blocks'] = {
+        block_key: _copy_block_data(block_data) for block_key, block_data in structure['blocks'].iteritems()
+    }
+    return structure_copy
+
+
+def _copy_block_data(block_data):
+    """
+    Return a copy of the given ``BlockData``, sharing the values of its fields.
+    """
+    block_copy = BlockData.__new__(BlockData)
+    block_copy.__dict__.update(block_data.__dict__)
+    block_copy.fields = dict(block_data.fields)
+    block_copy.defaults = dict(block_data.defaults)
+    block_copy.asides = dict(block_data.get_asides())
+    block_copy.edit_info = EditInfo.__new__(EditInfo)
+    block_copy.edit_info.__dict__.update(block_data.edit_info.__dict__)
+    return block_copy
+
+
+class LocalStructureCache(object):
+    """
+    A bounded, per-process, least-recently-used cache of course structures.
+
+    Structures are immutable once they are written, and are keyed by their version id,
+    so they never need to be invalidated; entries are only evicted to keep the cache
+    within ``max_structures`` entries and ``max_blocks`` blocks in total.
+
+    The structures are kept unpickled, and never handed out: each ``get`` returns a
+    shallow :func:`copy_structure` of the cached structure, since split modifies the
+    structures it reads (for instance when it loads the definitions of their blocks).
+    """
+    def __init__(self, max_structures=0, max_blocks=0):
+        self.max_structures = max_structures
+        self.max_blocks = max_blocks
+        self._entries = OrderedDict()
+        self._total_blocks = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """
+        Return whether this cache holds anything at all.
+        """
+        return self.max_structures > 0 and self.max_blocks > 0
+
+    @property
+    def total_blocks(self):
+        """
+        Return the number of blocks held by all the cached structures.
+        """
+        return self._total_blocks
+
+    def __len__(self):
+        return len(self._entries)
+
+    def configure(self, max_structures, max_blocks):
+        """
+        Change the limits of this cache, evicting entries if needed.
+        """
+        with self._lock:
+            self.max_structures = max_structures
+            self.max_blocks = max_blocks
+            return self._evict()
+
+    def get(self, key):
+        """
+        Return a copy of the structure cached for ``key`` (marking it as most recently used), or None.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+            self._entries[key] = entry
+        return copy_structure(entry[0])
+
+    def set(self, key, structure, pickled_data=None):
+        """
+        Cache ``structure`` under ``key``, and return the number of entries evicted to make room.
+
+        ``pickled_data`` is the structure already pickled, if the caller has it.  The cached
+        structure is unpickled from it, so that it shares nothing with ``structure``.
+        """
+        if not self.enabled:
+            return 0
+
+        num_blocks = len(structure.get('blocks', ()))
+        if num_blocks > self.max_blocks:
+            # A single structure that is larger than the whole cache would just flush everything else.
+            return 0
+
+        if pickled_data is None:
+            pickled_data = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
+        cached_structure = pickle.loads(pickled_data)
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_blocks -= previous[1]
+            self._entries[key] = (cached_structure, num_blocks)
+            self._total_blocks += num_blocks
+            return self._evict()
+
+    def clear(self):
+        """
+        Remove every cached structure.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total_blocks = 0
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache is within its limits.
+
+        Must be called with the lock held. Returns the number of evicted entries.
+        """
+        evicted = 0
+        while self._entries and (
+                len(self._entries) > self.max_structures or self._total_blocks > self.max_blocks
+        ):
+            __, (__, num_blocks) = self._entries.popitem(last=False)
+            self._total_blocks -= num_blocks
+            evicted += 1
+        return evicted
+
+
+LOCAL_STRUCTURE_CACHE = LocalStructureCache()
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
     The course structures are pickled and compressed when cached.
 
+    Structures are also kept unpickled in the in-process
+    :data:`LOCAL_STRUCTURE_CACHE`, when it's enabled by the
+    ``COURSE_STRUCTURE_LOCAL_CACHE`` setting, so that repeated reads of the
+    same version don't have to fetch and decompress it again.
+
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
     """
     def __init__(self):
         self.cache = None
+        self.local_cache = LOCAL_STRUCTURE_CACHE
         if DJANGO_AVAILABLE:
             try:
                 self.cache = get_cache('course_structure_cache')
             except InvalidCacheBackendError:
                 pass
 
+            limits = get_local_structure_cache_limits()
+            if limits != (self.local_cache.max_structures, self.local_cache.max_blocks):
+                self.local_cache.configure(*limits)
+
     def get(self, key, course_context=None):
         """Pull the compressed, pickled struct data from cache and deserialize."""
         if self.cache is None:
             return None
 
+        if self.local_cache.enabled:
+            with TIMER.timer("CourseStructureCache.get_local", course_context) as tagger:
+                structure = self.local_cache.get(key)
+                tagger.tag(from_local_cache=str(structure is not None).lower())
+                if structure is not None:
+                    tagger.measure('blocks', len(structure['blocks']))
+                    return structure
+
+        structure, pickled_data = self._get_from_cache(key, course_context)
+        if structure is not None:
+            self._set_local(key, structure, pickled_data, course_context)
+        return structure
+
+    def _get_from_cache(self, key, course_context=None):
+        """
+        Pull the compressed, pickled struct data from the django cache and deserialize.
+
+        Returns the structure and its pickled data, or (None, None).
+        """
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
             compressed_pickled_data = self.cache.get(key)
             tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
@@ -253,14 +441,14 @@ class CourseStructureCache(object):
             if compressed_pickled_data is None:
                 # Always log cache misses, because they are unexpected
                 tagger.sample_rate = 1
-                return None
+                return None, None
 
             tagger.measure('compressed_size', len(compressed_pickled_data))
 
             pickled_data = zlib.decompress(compressed_pickled_data)
             tagger.measure('uncompressed_size', len(pickled_data))
 
-            return pickle.loads(pickled_data)
+            return pickle.loads(pickled_data), pickled_data
 
     def set(self, key, structure, course_context=None):
         """Given a structure, will pickle, compress, and write to cache."""
@@ -278,6 +466,19 @@ class CourseStructureCache(object):
             # Stuctures are immutable, so we set a timeout of "never"
             self.cache.set(key, compressed_pickled_data, None)
 
+        self._set_local(key, structure, pickled_data, course_context)
+
+    def _set_local(self, key, structure, pickled_data, course_context=None):
+        """Add a structure to the in-process cache, recording any evictions."""
+        if not self.local_cache.enabled:
+            return
+
+        with TIMER.timer("CourseStructureCache.set_local", course_context) as tagger:
+            evicted = self.local_cache.set(key, structure, pickled_data)
+            tagger.measure('evicted', evicted)
+            tagger.measure('cached_structures', len(self.local_cache))
+            tagger.measure('cached_blocks', self.local_cache.total_blocks)
+
 
 class MongoConnection(object):
     """
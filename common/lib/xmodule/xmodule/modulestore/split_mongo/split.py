@@ -1615,6 +1615,43 @@ class SplitMongoModuleStore(SplitBulkWriteMixin, ModuleStoreWriteBase):
             return usage_key, block.edit_info.original_usage_version
         return None, None
 
+    def get_changed_blocks(self, course_key, version_guid):
+        """
+        Returns the usage keys of the blocks of the given course that were
+        added or changed since its structure of the given version, by
+        comparing the two structures.  Blocks only differing in their
+        edit info are not considered to be changed.
+
+        Returns None if the structure of the given version is not found.
+        """
+        blocks = self._lookup_course(course_key).structure['blocks']
+        previous_structure = self.get_structure(course_key, version_guid)
+        if previous_structure is None:
+            return None
+
+        previous_blocks = previous_structure['blocks']
+        return [
+            course_key.make_usage_key(block_key.type, block_key.id)
+            for block_key, block_data in blocks.iteritems()
+            if self._has_block_content_changed(previous_blocks.get(block_key), block_data)
+        ]
+
+    @staticmethod
+    def _has_block_content_changed(previous_block_data, block_data):
+        """
+        Returns whether the given database representations of a block have
+        different content (fields, including children, and definition).
+        """
+        if previous_block_data is None:
+            return True
+        return (
+            previous_block_data.block_type != block_data.block_type or
+            previous_block_data.definition != block_data.definition or
+            previous_block_data.fields != block_data.fields or
+            previous_block_data.defaults != block_data.defaults or
+            previous_block_data.get_asides() != block_data.get_asides()
+        )
+
     def create_definition_from_data(self, course_key, new_def_data, category, user_id):
         """
         Pull the definition fields out of descriptor and save to the db as a new definition
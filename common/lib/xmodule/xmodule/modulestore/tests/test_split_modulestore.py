@@ -11,6 +11,7 @@ import unittest
 import os
 
 import ddt
+from bson.objectid import ObjectId
 from contracts import contract
 from django.core.cache import caches, InvalidCacheBackendError
 
@@ -18,7 +19,7 @@ from openedx.core.lib import tempdir
 from openedx.core.lib.tests import attr
 from xblock.fields import Reference, ReferenceList, ReferenceValueDict
 from xmodule.course_module import CourseDescriptor
-from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore import BlockData, ModuleStoreEnum
 from xmodule.modulestore.exceptions import (
     ItemNotFoundError, VersionConflictError,
     DuplicateItemError, DuplicateCourseError,
@@ -32,6 +33,7 @@ from xmodule.fields import Date, Timedelta
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
 from xmodule.modulestore.tests.test_modulestore import check_has_course_method
 from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import LOCAL_STRUCTURE_CACHE, LocalStructureCache
 from xmodule.modulestore.tests.factories import check_mongo_calls
 from xmodule.modulestore.tests.mongo_connection import MONGO_PORT_NUM, MONGO_HOST
 from xmodule.modulestore.tests.utils import mock_tab_from_json
@@ -949,8 +951,10 @@ class TestCourseStructureCache(SplitModuleTest):
 
         # make sure we clear the cache before every test...
         self.cache.clear()
+        LOCAL_STRUCTURE_CACHE.clear()
         # ... and after
         self.addCleanup(self.cache.clear)
+        self.addCleanup(LOCAL_STRUCTURE_CACHE.clear)
 
         # make a new course:
         self.user = random.getrandbits(32)
@@ -991,6 +995,24 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(cached_structure, not_cached_structure)
 
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_local_structure_cache_limits')
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_local_structure_cache(self, mock_get_cache, mock_get_limits):
+        mock_get_cache.return_value = self.cache
+        mock_get_limits.return_value = (10, 1000)
+        self.addCleanup(LOCAL_STRUCTURE_CACHE.configure, 0, 0)
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # the structure is served from memory, without touching the django cache
+        self.cache.clear()
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+
+        self.assertEqual(cached_structure, not_cached_structure)
+        self.assertIsNot(cached_structure, not_cached_structure)
+
     def test_dummy_cache(self):
         with check_mongo_calls(1):
             not_cached_structure = self._get_structure(self.new_course)
@@ -1012,6 +1034,88 @@ class TestCourseStructureCache(SplitModuleTest):
         )
 
 
+@attr(shard=2)
+class TestLocalStructureCache(unittest.TestCase):
+    """Tests for the in-process LocalStructureCache"""
+
+    def _structure(self, num_blocks):
+        """
+        Return a fake structure with ``num_blocks`` blocks.
+        """
+        return {'blocks': {BlockKey('html', str(index)): BlockData() for index in range(num_blocks)}}
+
+    def test_disabled(self):
+        cache = LocalStructureCache()
+        self.assertFalse(cache.enabled)
+        self.assertEqual(cache.set('a', self._structure(1)), 0)
+        self.assertIsNone(cache.get('a'))
+
+    def test_evicts_least_recently_used_by_count(self):
+        cache = LocalStructureCache(max_structures=2, max_blocks=100)
+        cache.set('a', self._structure(1))
+        cache.set('b', self._structure(1))
+        # reading 'a' makes 'b' the least recently used entry
+        self.assertIsNotNone(cache.get('a'))
+        self.assertEqual(cache.set('c', self._structure(1)), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_evicts_by_blocks(self):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        cache.set('a', self._structure(6))
+        self.assertEqual(cache.set('b', self._structure(6)), 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.total_blocks, 6)
+
+    def test_oversized_structure_not_cached(self):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        cache.set('a', self._structure(5))
+        self.assertEqual(cache.set('b', self._structure(11)), 0)
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+
+    def test_get_returns_copies(self):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        cache.set('a', {'blocks': {BlockKey('html', '0'): BlockData(fields={'children': []})}})
+        structure = cache.get('a')
+        block = structure['blocks'][BlockKey('html', '0')]
+        block.fields['data'] = 'changed'
+        block.definition_loaded = True
+        block.edit_info._subtree_edited_on = 'changed'  # pylint: disable=protected-access
+        structure['blocks'][BlockKey('html', '1')] = BlockData()
+
+        cached_block = cache.get('a')['blocks'][BlockKey('html', '0')]
+        self.assertEqual(cached_block.fields, {'children': []})
+        self.assertFalse(cached_block.definition_loaded)
+        self.assertIsNone(cached_block.edit_info._subtree_edited_on)  # pylint: disable=protected-access
+        self.assertEqual(cache.get('a')['blocks'].keys(), [BlockKey('html', '0')])
+
+    def test_set_shares_nothing(self):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        structure = {'blocks': {BlockKey('html', '0'): BlockData(fields={'children': []})}}
+        cache.set('a', structure)
+        structure['blocks'][BlockKey('html', '0')].fields['children'].append(BlockKey('html', '1'))
+        self.assertEqual(cache.get('a')['blocks'][BlockKey('html', '0')].fields, {'children': []})
+
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.pickle.loads')
+    def test_get_does_not_unpickle(self, mock_loads):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        mock_loads.return_value = self._structure(1)
+        cache.set('a', self._structure(1))
+        mock_loads.reset_mock()
+        self.assertIsNotNone(cache.get('a'))
+        self.assertFalse(mock_loads.called)
+
+    def test_configure_shrinks(self):
+        cache = LocalStructureCache(max_structures=10, max_blocks=10)
+        for key in 'abc':
+            cache.set(key, self._structure(1))
+        self.assertEqual(cache.configure(1, 10), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get('c'))
+
+
 @attr(shard=2)
 class SplitModuleItemTests(SplitModuleTest):
     '''
@@ -1602,6 +1706,27 @@ class TestItemCrud(SplitModuleTest):
         other_updated = modulestore().update_item(other_block, self.user_id)
         self.assertIn(moved_child.version_agnostic(), version_agnostic(other_updated.children))
 
+    def test_get_changed_blocks(self):
+        """
+        test that only the updated blocks are reported as changed since a previous version of the course
+        """
+        locator = BlockUsageLocator(
+            CourseLocator(org="testx", course="GreekHero", run="run", branch=BRANCH_NAME_DRAFT),
+            'problem', block_id="problem3_2"
+        )
+        problem = modulestore().get_item(locator)
+        pre_version_guid = problem.location.version_guid
+        self.assertEqual(modulestore().get_changed_blocks(locator.course_key, pre_version_guid), [])
+
+        problem.max_attempts = 4
+        problem.save()  # decache above setting into the kvs
+        modulestore().update_item(problem, self.user_id)
+        self.assertEqual(
+            version_agnostic(modulestore().get_changed_blocks(locator.course_key, pre_version_guid)),
+            [locator.version_agnostic()],
+        )
+        self.assertIsNone(modulestore().get_changed_blocks(locator.course_key, ObjectId()))
+
     @patch('xmodule.tabs.CourseTab.from_json', side_effect=mock_tab_from_json)
     def test_update_definition(self, _from_json):
         """
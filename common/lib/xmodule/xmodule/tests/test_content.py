@@ -216,6 +216,31 @@ class ContentTest(unittest.TestCase):
 
         self.assertEqual(total_length, last_byte - first_byte + 1)
 
+    def test_static_content_stream_stream_data_in_range_chunk_aligned(self):
+        """
+        Test that StaticContentStream stream_data_in_range reads the stream one stored chunk at a time
+        """
+        data = SAMPLE_STRING
+        item = FakeGridFsItem(data)
+        item.chunk_size = 256
+        static_content_stream = StaticContentStream('loc', 'name', 'type', item, length=item.length)
+
+        first_byte = 100
+        last_byte = 1500
+        chunks = list(static_content_stream.stream_data_in_range(first_byte, last_byte))
+
+        self.assertEqual(''.join(chunks), data[first_byte:last_byte + 1])
+        self.assertEqual(len(chunks[0]), 156)
+        self.assertTrue(all(len(chunk) == 256 for chunk in chunks[1:-1]))
+        self.assertEqual(len(chunks[-1]), (last_byte + 1) % 256)
+
+    def test_static_content_stream_data_in_range(self):
+        """
+        Test StaticContent stream_data_in_range function, for content held in memory
+        """
+        content = StaticContent('loc', 'name', 'type', SAMPLE_STRING)
+        self.assertEqual(''.join(content.stream_data_in_range(100, 1500)), SAMPLE_STRING[100:1501])
+
     def test_static_content_write_js(self):
         """
         Test that only one filename starts with 000.
@@ -1,8 +1,17 @@
+import logging
 import re
 from django.conf import settings
 
+from capa.safe_exec import WORKER_POOL, LocalCache, TwoTierCache
+
+log = logging.getLogger(__name__)
+
 DEFAULT_PYTHON_LIB_FILENAME = 'python_lib.zip'
 
+# The in-process tier of the cache of safe_exec results, which is enabled with
+# the SAFE_EXEC_LOCAL_CACHE setting.
+SAFE_EXEC_LOCAL_CACHE = LocalCache()
+
 
 def can_execute_unsafe_code(course_id):
     """
@@ -38,3 +47,38 @@ def get_python_lib_zip(contentstore, course_id):
         return zip_lib.data
     else:
         return None
+
+
+def get_safe_exec_cache(cache):
+    """
+    Return the cache to use for the results of safe_exec, given the shared `cache`.
+
+    If the SAFE_EXEC_LOCAL_CACHE setting has non-zero limits, recent results are
+    also kept in this process, in front of `cache`.
+    """
+    if cache is None:
+        return None
+    config = getattr(settings, 'SAFE_EXEC_LOCAL_CACHE', None) or {}
+    limits = config.get('MAX_ENTRIES', 0), config.get('MAX_BYTES', 0)
+    if limits != (SAFE_EXEC_LOCAL_CACHE.max_entries, SAFE_EXEC_LOCAL_CACHE.max_bytes):
+        SAFE_EXEC_LOCAL_CACHE.configure(*limits)
+    if not SAFE_EXEC_LOCAL_CACHE.enabled:
+        return cache
+    return TwoTierCache(SAFE_EXEC_LOCAL_CACHE, cache)
+
+
+def configure_sandbox_worker_pool():
+    """
+    Configure the pool of warm sandbox workers used by safe_exec from the
+    CODE_JAIL_WORKER_POOL setting.  A SIZE of 0 disables it.
+    """
+    config = getattr(settings, 'CODE_JAIL_WORKER_POOL', None) or {}
+    if config.get('MAX_EXECUTIONS', 1) > 1:
+        # Executions in the same worker could tamper with each other.
+        log.warning(
+            "CODE_JAIL_WORKER_POOL MAX_EXECUTIONS is ignored: sandbox workers run a single execution"
+        )
+    WORKER_POOL.configure(
+        size=config.get('SIZE', 0),
+        max_age=config.get('MAX_AGE', 300),
+    )
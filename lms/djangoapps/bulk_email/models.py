@@ -2,6 +2,7 @@
 Models for bulk email
 """
 import logging
+from string import Formatter
 
 import markupsafe
 from config_models.models import ConfigurationModel
@@ -365,21 +366,19 @@ class CourseEmailTemplate(models.Model):
         Such encoding is left to the email code, which will use the value
         of settings.DEFAULT_CHARSET to encode the message.
         """
+        return CompiledEmailTemplate(format_string, message_body).render(context)
 
-        # Substitute all %%-encoded keywords in the message body
-        if 'user_id' in context and 'course_id' in context:
-            message_body = substitute_keywords_with_data(message_body, context)
-
-        result = format_string.format(**context)
-
-        # Note that the body tag in the template will now have been
-        # "formatted", so we need to do the same to the tag being
-        # searched for.
-        message_body_tag = COURSE_EMAIL_MESSAGE_BODY_TAG.format()
-        result = result.replace(message_body_tag, message_body, 1)
+    def compile_plaintext(self, plaintext):
+        """
+        Return the plain text message of body `plaintext`, compiled to be rendered for many recipients.
+        """
+        return CompiledEmailTemplate(self.plain_template, plaintext)
 
-        # finally, return the result, after wrapping long lines and without converting to an encoded byte array.
-        return wrap_message(result)
+    def compile_htmltext(self, htmltext):
+        """
+        Return the HTML message of body `htmltext`, compiled to be rendered for many recipients.
+        """
+        return CompiledEmailTemplate(self.html_template, htmltext, escape_context=True)
 
     def render_plaintext(self, plaintext, context):
         """
@@ -388,7 +387,7 @@ class CourseEmailTemplate(models.Model):
         Convert plain text body (`plaintext`) into plaintext email message using the
         stored plain template and the provided `context` dict.
         """
-        return CourseEmailTemplate._render(self.plain_template, plaintext, context)
+        return self.compile_plaintext(plaintext).render(context)
 
     def render_htmltext(self, htmltext, context):
         """
@@ -397,11 +396,80 @@ class CourseEmailTemplate(models.Model):
         Convert HTML text body (`htmltext`) into HTML email message using the
         stored HTML template and the provided `context` dict.
         """
-        # HTML-escape string values in the context (used for keyword substitution).
-        for key, value in context.iteritems():
-            if isinstance(value, basestring):
-                context[key] = markupsafe.escape(value)
-        return CourseEmailTemplate._render(self.html_template, htmltext, context)
+        return self.compile_htmltext(htmltext).render(context)
+
+
+class CompiledEmailTemplate(object):
+    """
+    A course email template and message body, parsed once so that the message
+    can be rendered for many recipients.
+
+    Rendering gives the same result as formatting the template with the
+    context, then replacing the message body tag with the message body.  Only
+    the fields of the template are formatted for each recipient, and the
+    keywords of the message body are only substituted if it has any.
+    """
+    _formatter = Formatter()
+
+    def __init__(self, format_string, message_body, escape_context=False):
+        """
+        `escape_context` tells whether string values of the context are
+        HTML-escaped before being used (for HTML templates).
+        """
+        # Note that the body tag will be "formatted" in the template, so that
+        # the message body goes where the formatted tag is.
+        before_body, body_tag, after_body = format_string.partition(COURSE_EMAIL_MESSAGE_BODY_TAG)
+        self.parts = [(list(self._formatter.parse(before_body)), bool(body_tag))]
+        if body_tag:
+            self.parts.append((list(self._formatter.parse(after_body)), False))
+        self.message_body = message_body
+        self.has_keywords = '%%' in message_body
+        self.escape_context = escape_context
+
+    def render(self, context):
+        """
+        Return the message for the given `context` dict, as a unicode string.
+        """
+        if self.escape_context:
+            context = {
+                key: markupsafe.escape(value) if isinstance(value, basestring) else value
+                for key, value in context.iteritems()
+            }
+
+        # Substitute all %%-encoded keywords in the message body
+        message_body = self.message_body
+        if self.has_keywords and 'user_id' in context and 'course_id' in context:
+            message_body = substitute_keywords_with_data(message_body, context)
+
+        pieces = []
+        for parsed_format, ends_with_body in self.parts:
+            for literal_text, field_name, format_spec, conversion in parsed_format:
+                pieces.append(literal_text)
+                if field_name is not None:
+                    pieces.append(self._format_field(field_name, format_spec, conversion, context))
+            if ends_with_body:
+                pieces.append(message_body)
+
+        # finally, return the result, after wrapping long lines and without converting to an encoded byte array.
+        return wrap_message(u''.join(pieces))
+
+    def _format_field(self, field_name, format_spec, conversion, context):
+        """
+        Return a replacement field of the template formatted like format() does.
+        """
+        value, __ = self._formatter.get_field(field_name, (), context)
+        # ``Formatter.convert_field`` applies ``!s`` as ``str()``, which fails on
+        # non-ASCII values; ``unicode.format`` uses ``unicode()`` instead.
+        if conversion == 's':
+            value = unicode(value)
+        elif conversion == 'r':
+            value = repr(value)
+        else:
+            value = self._formatter.convert_field(value, conversion)
+        if '{' in format_spec:
+            # Nested fields of the format specification
+            format_spec = self._formatter.vformat(format_spec, (), context)
+        return self._formatter.format_field(value, format_spec)
 
 
 class CourseAuthorization(models.Model):
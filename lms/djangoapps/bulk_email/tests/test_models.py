@@ -253,6 +253,33 @@ class CourseEmailTemplateTest(TestCase):
         self.assertIn(context['course_title'], message)
         self.assertIn(context['name'], message)
 
+    def test_render_html_keeps_context(self):
+        # The plain text and HTML messages are rendered with the same context.
+        template = CourseEmailTemplate.get_template()
+        context = self._add_xss_fields(self._get_sample_html_context())
+        template.render_htmltext("My new html text.", context)
+        self.assertEqual(context['name'], "<script>alert('Profile Name!');</alert>")
+
+    def test_compiled_template(self):
+        template = CourseEmailTemplate(plain_template=u"{course_title:>8} {{message_body}} {name!r} {{{email}}}")
+        compiled = template.compile_plaintext(u"Dear %%USER_FULLNAME%%, {name}")
+        context = {'course_title': u"Course", 'user_id': 12345, 'course_id': "course-v1:edx+100+1"}
+        for name, email in ((u"Alice", u"alice@test.com"), (u"Bob", u"bob@test.com")):
+            context.update(name=name, email=email)
+            self.assertEqual(
+                compiled.render(context),
+                u"  Course Dear {0}, {{name}} u'{0}' {{{1}}}".format(name, email),
+            )
+        del context['email']
+        with self.assertRaises(KeyError):
+            compiled.render(context)
+
+    def test_compiled_template_unicode_conversion(self):
+        plain_template = u"{name!s} {course_title!s:>8} {{message_body}}"
+        compiled = CourseEmailTemplate(plain_template=plain_template).compile_plaintext(u"Hi")
+        context = {'name': u"J\xf6rg", 'course_title': u"Caf\xe9", 'user_id': 12345, 'course_id': "course-v1:edx+100+1"}
+        self.assertEqual(compiled.render(context), plain_template.format(message_body=u"Hi", **context))
+
 
 @attr(shard=1)
 class CourseAuthorizationTest(TestCase):
@@ -27,17 +27,22 @@ from abc import ABCMeta, abstractmethod
 from collections import defaultdict, namedtuple
 
 from contracts import contract, new_contract
+from django.conf import settings
 from django.db import DatabaseError, IntegrityError, transaction
 from opaque_keys.edx.asides import AsideUsageKeyV1, AsideUsageKeyV2
 from opaque_keys.edx.block_types import BlockTypeKeyV1
 from opaque_keys.edx.keys import CourseKey
-from xblock.core import XBlockAside
+from xblock.core import XBlock, XBlockAside
 from xblock.exceptions import InvalidScopeError, KeyValueMultiSaveError
 from xblock.fields import Scope, UserScope
-from xblock.runtime import KeyValueStore
+from xblock.plugin import PluginMissingError
+from xblock.runtime import KeyValueStore, Mixologist
 
 from courseware.user_state_client import DjangoXBlockUserStateClient
+from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.djangoapps.content.block_structure.exceptions import BlockStructureNotFound
 from xmodule.modulestore.django import modulestore
+from xmodule.x_module import XModuleDescriptor
 
 from .models import StudentModule, XModuleStudentInfoField, XModuleStudentPrefsField, XModuleUserStateSummaryField
 
@@ -56,13 +61,24 @@ def _all_usage_keys(descriptors, aside_types):
     Return a set of all usage_ids for the `descriptors` and for
     as all asides in `aside_types` for those descriptors.
     """
+    return _usage_keys_with_asides(
+        set(descriptor.scope_ids.usage_id for descriptor in descriptors),
+        aside_types,
+    )
+
+
+def _usage_keys_with_asides(usage_keys, aside_types):
+    """
+    Return a set of the `usage_keys` and of the usage keys of all asides
+    in `aside_types` for those blocks.
+    """
     usage_ids = set()
-    for descriptor in descriptors:
-        usage_ids.add(descriptor.scope_ids.usage_id)
+    for usage_key in usage_keys:
+        usage_ids.add(usage_key)
 
         for aside_type in aside_types:
-            usage_ids.add(AsideUsageKeyV1(descriptor.scope_ids.usage_id, aside_type))
-            usage_ids.add(AsideUsageKeyV2(descriptor.scope_ids.usage_id, aside_type))
+            usage_ids.add(AsideUsageKeyV1(usage_key, aside_type))
+            usage_ids.add(AsideUsageKeyV2(usage_key, aside_type))
 
     return usage_ids
 
@@ -72,14 +88,46 @@ def _all_block_types(descriptors, aside_types):
     Return a set of all block_types for the supplied `descriptors` and for
     the asides types in `aside_types` associated with those descriptors.
     """
-    block_types = set()
-    for descriptor in descriptors:
-        block_types.add(BlockTypeKeyV1(descriptor.entry_point, descriptor.scope_ids.block_type))
+    return _block_types_with_asides(
+        set((descriptor.entry_point, descriptor.scope_ids.block_type) for descriptor in descriptors),
+        aside_types,
+    )
+
+
+def _block_types_with_asides(block_types, aside_types):
+    """
+    Return a set of the block type keys for the ``(entry_point, block_type)``
+    pairs in `block_types` and for the aside types in `aside_types`.
+    """
+    block_type_keys = set()
+    for entry_point, block_type in block_types:
+        block_type_keys.add(BlockTypeKeyV1(entry_point, block_type))
 
     for aside_type in aside_types:
-        block_types.add(BlockTypeKeyV1(XBlockAside.entry_point, aside_type))
+        block_type_keys.add(BlockTypeKeyV1(XBlockAside.entry_point, aside_type))
 
-    return block_types
+    return block_type_keys
+
+
+def _block_class(block_type):
+    """
+    Return the XBlock class that the modulestore uses for blocks of
+    `block_type`, with the mixins of the LMS, or None if it isn't installed.
+    """
+    try:
+        block_class = XBlock.load_class(block_type, select=settings.XBLOCK_SELECT_FUNCTION)
+    except PluginMissingError:
+        return None
+    return Mixologist(settings.XBLOCK_MIXINS).mix(block_class)
+
+
+def _has_required_blocks(block_class):
+    """
+    Return whether blocks of `block_class` depend on blocks which aren't
+    their descendants (see `XModuleDescriptor.get_required_module_descriptors`).
+    """
+    method = getattr(block_class, 'get_required_module_descriptors', None)
+    return method is not None and method.__func__ is not XModuleDescriptor.get_required_module_descriptors.__func__
 
 
 class DjangoKeyValueStore(KeyValueStore):
@@ -172,7 +220,19 @@ class DjangoOrmFieldCache(object):
             xblocks (list of :class:`XBlock`): XBlocks to cache fields for.
             aside_types (list of str): Aside types to cache fields for.
         """
-        for field_object in self._read_objects(fields, xblocks, aside_types):
+        self.cache_keys(fields, _all_usage_keys(xblocks, aside_types), _all_block_types(xblocks, aside_types))
+
+    def cache_keys(self, fields, usage_keys, block_types):
+        """
+        Load all fields specified by ``fields`` for the blocks identified by
+        ``usage_keys`` and ``block_types`` into this cache.
+
+        Arguments:
+            fields (list of str): Field names to cache.
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to cache fields for.
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to cache fields for.
+        """
+        for field_object in self._read_objects(fields, usage_keys, block_types):
             self._cache[self._cache_key_for_field_object(field_object)] = field_object
 
     @contract(kvs_key=DjangoKeyValueStore.Key)
@@ -306,17 +366,16 @@ class DjangoOrmFieldCache(object):
         raise NotImplementedError()
 
     @abstractmethod
-    def _read_objects(self, fields, xblocks, aside_types):
+    def _read_objects(self, fields, usage_keys, block_types):
         """
         Return an iterator for all objects stored in the underlying datastore
-        for the ``fields`` on the ``xblocks`` and the ``aside_types`` associated
-        with them.
+        for the ``fields`` on the blocks identified by ``usage_keys`` and
+        ``block_types``.
 
         Arguments:
             fields (list of str): Field names to return values for
-            xblocks (list of :class:`~XBlock`): XBlocks to load fields for
-            aside_types (list of str): Asides to load field for (which annotate the supplied
-                xblocks).
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to load fields for
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to load fields for
         """
         raise NotImplementedError()
 
@@ -351,7 +410,7 @@ class UserStateCache(object):
         self.user = user
         self._client = DjangoXBlockUserStateClient(self.user)
 
-    def cache_fields(self, fields, xblocks, aside_types):  # pylint: disable=unused-argument
+    def cache_fields(self, fields, xblocks, aside_types):
         """
         Load all fields specified by ``fields`` for the supplied ``xblocks``
         and ``aside_types`` into this cache.
@@ -361,10 +420,20 @@ class UserStateCache(object):
             xblocks (list of :class:`XBlock`): XBlocks to cache fields for.
             aside_types (list of str): Aside types to cache fields for.
         """
-        block_field_state = self._client.get_many(
-            self.user.username,
-            _all_usage_keys(xblocks, aside_types),
-        )
+        self.cache_keys(fields, _all_usage_keys(xblocks, aside_types), None)
+
+    def cache_keys(self, fields, usage_keys, block_types):  # pylint: disable=unused-argument
+        """
+        Load all fields specified by ``fields`` for the blocks identified by
+        ``usage_keys`` into this cache.  ``DjangoXBlockUserStateClient.get_many``
+        reads their state with an ``IN`` query per chunk of them.
+
+        Arguments:
+            fields (list of str): Field names to cache.
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to cache fields for.
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to cache fields for.
+        """
+        block_field_state = self._client.get_many(self.user.username, usage_keys)
         for user_state in block_field_state:
             self._cache[user_state.block_key] = user_state.state
 
@@ -517,21 +586,20 @@ class UserStateSummaryCache(DjangoOrmFieldCache):
             value=value,
         )
 
-    def _read_objects(self, fields, xblocks, aside_types):
+    def _read_objects(self, fields, usage_keys, block_types):
         """
         Return an iterator for all objects stored in the underlying datastore
-        for the ``fields`` on the ``xblocks`` and the ``aside_types`` associated
-        with them.
+        for the ``fields`` on the blocks identified by ``usage_keys`` and
+        ``block_types``.
 
         Arguments:
             fields (list of :class:`~Field`): Fields to return values for
-            xblocks (list of :class:`~XBlock`): XBlocks to load fields for
-            aside_types (list of str): Asides to load field for (which annotate the supplied
-                xblocks).
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to load fields for
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to load fields for
         """
         return XModuleUserStateSummaryField.objects.chunked_filter(
             'usage_id__in',
-            _all_usage_keys(xblocks, aside_types),
+            usage_keys,
             field_name__in=set(field.name for field in fields),
         )
 
@@ -579,21 +647,20 @@ class PreferencesCache(DjangoOrmFieldCache):
             value=value,
         )
 
-    def _read_objects(self, fields, xblocks, aside_types):
+    def _read_objects(self, fields, usage_keys, block_types):
         """
         Return an iterator for all objects stored in the underlying datastore
-        for the ``fields`` on the ``xblocks`` and the ``aside_types`` associated
-        with them.
+        for the ``fields`` on the blocks identified by ``usage_keys`` and
+        ``block_types``.
 
         Arguments:
             fields (list of str): Field names to return values for
-            xblocks (list of :class:`~XBlock`): XBlocks to load fields for
-            aside_types (list of str): Asides to load field for (which annotate the supplied
-                xblocks).
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to load fields for
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to load fields for
         """
         return XModuleStudentPrefsField.objects.chunked_filter(
             'module_type__in',
-            _all_block_types(xblocks, aside_types),
+            block_types,
             student=self.user.pk,
             field_name__in=set(field.name for field in fields),
         )
@@ -641,17 +708,16 @@ class UserInfoCache(DjangoOrmFieldCache):
             value=value,
         )
 
-    def _read_objects(self, fields, xblocks, aside_types):
+    def _read_objects(self, fields, usage_keys, block_types):
         """
         Return an iterator for all objects stored in the underlying datastore
-        for the ``fields`` on the ``xblocks`` and the ``aside_types`` associated
-        with them.
+        for the ``fields`` on the blocks identified by ``usage_keys`` and
+        ``block_types``.
 
         Arguments:
             fields (list of str): Field names to return values for
-            xblocks (list of :class:`~XBlock`): XBlocks to load fields for
-            aside_types (list of str): Asides to load field for (which annotate the supplied
-                xblocks).
+            usage_keys (set of :class:`UsageKey`): Blocks (and asides) to load fields for
+            block_types (set of :class:`BlockTypeKeyV1`): Block (and aside) types to load fields for
         """
         return XModuleStudentInfoField.objects.filter(
             student=self.user.pk,
@@ -793,6 +859,108 @@ class FieldDataCache(object):
         cache.add_descriptor_descendents(descriptor, depth, descriptor_filter)
         return cache
 
+    def add_block_descendents(self, usage_key, depth=None, course_version=None):
+        """
+        Add the block `usage_key` and its descendants to this FieldDataCache,
+        finding them in the cached block structure of the course rather than
+        by instantiating their xblocks.
+
+        The fields of the blocks are those of their XBlock classes, and the
+        data of each scope is only loaded for the blocks that have fields in
+        that scope.  Falls back to `add_descriptor_descendents` when the block
+        structure isn't available, doesn't contain the block, or wasn't
+        collected from the `course_version` of the course.
+
+        Arguments:
+            usage_key: The usage key of the block
+            depth is the number of levels of descendant modules to load StudentModules for, in addition to
+                the supplied block. If depth is None, load all descendant StudentModules
+            course_version: The version of the course that the caller has loaded, if known
+        """
+        if not self.user.is_authenticated:
+            return
+
+        block_structure = self._get_block_structure(usage_key, course_version)
+        if block_structure is None:
+            self.add_descriptor_descendents(modulestore().get_item(usage_key), depth)
+            return
+
+        block_classes = {}
+        block_keys_by_scope = defaultdict(set)
+        block_types_by_scope = defaultdict(set)
+        fields_by_scope = defaultdict(set)
+        for block_key, block_depth in _block_structure_descendents(block_structure, usage_key, depth):
+            block_type = block_key.block_type
+            if block_type not in block_classes:
+                block_class = _block_class(block_type)
+                if block_class is not None:
+                    for field in block_class.fields.values():
+                        block_types_by_scope[field.scope].add((block_class.entry_point, block_type))
+                        fields_by_scope[field.scope].add(field)
+                block_classes[block_type] = block_class
+            block_class = block_classes[block_type]
+            if block_class is None:
+                continue
+
+            if block_structure.get_xblock_field(block_key, 'has_score', False):
+                self.scorable_locations.add(block_key)
+            for scope, block_types in block_types_by_scope.iteritems():
+                if (block_class.entry_point, block_type) in block_types:
+                    block_keys_by_scope[scope].add(block_key)
+
+            if _has_required_blocks(block_class):
+                # The blocks that a block requires are only known to its xblock.
+                required_depth = block_depth - 1 if block_depth is not None else None
+                for required_descriptor in modulestore().get_item(block_key).get_required_module_descriptors():
+                    self.add_descriptor_descendents(required_descriptor, required_depth)
+
+        for scope, fields in fields_by_scope.items():
+            if scope not in self.cache:
+                continue
+
+            self.cache[scope].cache_keys(
+                fields,
+                _usage_keys_with_asides(block_keys_by_scope[scope], self.asides),
+                _block_types_with_asides(block_types_by_scope[scope], self.asides),
+            )
+
+    @classmethod
+    def cache_for_block_descendents(cls, course_id, user, usage_key, depth=None, course_version=None,
+                                    asides=None, read_only=False):
+        """
+        course_id: the course in the context of which we want StudentModules.
+        user: the django user for whom to load modules.
+        usage_key: The usage key of the block
+        depth is the number of levels of descendant modules to load StudentModules for, in addition to
+            the supplied block. If depth is None, load all descendant StudentModules
+        course_version: The version of the course that the caller has loaded, if known
+
+        See `add_block_descendents`.
+        """
+        cache = FieldDataCache([], course_id, user, asides=asides, read_only=read_only)
+        cache.add_block_descendents(usage_key, depth, course_version)
+        return cache
+
+    def _get_block_structure(self, usage_key, course_version):
+        """
+        Returns the collected block structure of the course if it contains
+        `usage_key` and is up to date with `course_version`, otherwise None.
+        """
+        try:
+            block_structure = get_course_in_cache(self.course_id)
+        except BlockStructureNotFound:
+            return None
+
+        if usage_key not in block_structure:
+            return None
+
+        if course_version is not None:
+            collected_version = block_structure.get_xblock_field(block_structure.root_block_usage_key, 'course_version')
+            if collected_version != course_version:
+                return None
+
+        return block_structure
+
     def _fields_to_cache(self, descriptors):
         """
         Returns a map of scopes to fields in that scope that should be cached
@@ -930,6 +1098,27 @@ class FieldDataCache(object):
         return sum(len(cache) for cache in self.cache.values())
 
 
+def _block_structure_descendents(block_structure, usage_key, depth):
+    """
+    Return ``(block_key, depth)`` pairs for the block `usage_key` and its
+    descendants in `block_structure`, down to the specified `depth`, where
+    ``depth`` is the number of levels left below each block (None for all).
+    """
+    blocks = [(usage_key, depth)]
+    visited = {usage_key}
+    index = 0
+    while index < len(blocks):
+        block_key, block_depth = blocks[index]
+        index += 1
+        if block_depth is None or block_depth > 0:
+            child_depth = block_depth - 1 if block_depth is not None else None
+            for child_key in block_structure.get_children(block_key):
+                if child_key not in visited:
+                    visited.add(child_key)
+                    blocks.append((child_key, child_depth))
+    return blocks
+
+
 class ScoresClient(object):
     """
     Basic client interface for retrieving Score information.
@@ -988,6 +1177,29 @@ class ScoresClient(object):
         client.fetch_scores(scorable_locations)
         return client
 
+    @classmethod
+    def create_for_users(cls, course_id, user_ids, block_types):
+        """
+        Create ScoresClients, keyed by user id, with pre-fetched data for the
+        blocks of the given types, using a single query for all the users.
+        """
+        clients = {user_id: cls(course_id, user_id) for user_id in user_ids}
+        scores_qset = StudentModule.objects.filter(
+            student_id__in=clients.keys(),
+            course_id=course_id,
+            module_type__in=set(block_types),
+        )
+        for student_id, location, correct, total, created in scores_qset.values_list(
+                'student_id', 'module_state_key', 'grade', 'max_grade', 'created'
+        ):
+            # pylint: disable=protected-access
+            clients[student_id]._locations_to_scores[location.map_into_course(course_id)] = cls.Score(
+                correct, total, created
+            )
+        for client in clients.itervalues():
+            client._has_fetched = True  # pylint: disable=protected-access
+        return clients
+
 
 # @contract(user_id=int, usage_key=UsageKey, score="number|None", max_score="number|None")
 def set_score(user_id, usage_key, score, max_score):
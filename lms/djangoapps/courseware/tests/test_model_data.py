@@ -26,8 +26,13 @@ from courseware.tests.factories import (
     course_id,
     location
 )
+from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
+from openedx.core.djangoapps.content.block_structure.exceptions import BlockStructureNotFound
 from openedx.core.lib.tests import attr
 from student.tests.factories import UserFactory
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 
 
 def mock_field(scope, name):
@@ -434,3 +439,53 @@ class TestStudentInfoStorage(OtherUserFailureTestMixin, StorageTestBase, TestCas
     storage_class = XModuleStudentInfoField
     other_key_factory = partial(DjangoKeyValueStore.Key, Scope.user_info, 2, 'mock_problem')  # user_id=2, not 1
     existing_field_name = "existing_field"
+
+
+@attr(shard=1)
+class TestFieldDataCacheFromBlockStructure(ModuleStoreTestCase):
+    """Tests for prefetching the field data of blocks found in the block structure of their course"""
+
+    def setUp(self):
+        super(TestFieldDataCacheFromBlockStructure, self).setUp()
+        with self.store.default_store(ModuleStoreEnum.Type.split):
+            course = CourseFactory.create()
+            chapter = ItemFactory.create(parent=course, category='chapter')
+            sequential = ItemFactory.create(parent=chapter, category='sequential')
+            vertical = ItemFactory.create(parent=sequential, category='vertical')
+            self.problem = ItemFactory.create(parent=vertical, category='problem')
+            self.course = self.store.get_course(course.id)
+        get_course_in_cache(self.course.id)
+
+        self.user = UserFactory.create()
+        cmfStudentModuleFactory(
+            student=self.user,
+            course_id=self.course.id,
+            module_state_key=self.problem.location,
+            state=json.dumps({'attempts': 2}),
+        )
+        self.attempts_key = DjangoKeyValueStore.Key(Scope.user_state, self.user.id, self.problem.location, 'attempts')
+
+    def cache_for_course(self, **kwargs):
+        """Returns a FieldDataCache for the blocks of the course."""
+        return FieldDataCache.cache_for_block_descendents(self.course.id, self.user, self.course.location, **kwargs)
+
+    def test_prefetch_without_xblocks(self):
+        with patch('courseware.model_data.modulestore') as mock_modulestore:
+            field_data_cache = self.cache_for_course(course_version=self.course.course_version)
+        self.assertFalse(mock_modulestore.called)
+        self.assertEqual(DjangoKeyValueStore(field_data_cache).get(self.attempts_key), 2)
+        self.assertIn(self.problem.location, field_data_cache.scorable_locations)
+
+    def test_depth(self):
+        field_data_cache = self.cache_for_course(depth=3)
+        self.assertFalse(DjangoKeyValueStore(field_data_cache).has(self.attempts_key))
+
+    @patch('courseware.model_data.get_course_in_cache', Mock(side_effect=BlockStructureNotFound('course')))
+    def test_no_block_structure(self):
+        field_data_cache = self.cache_for_course()
+        self.assertEqual(DjangoKeyValueStore(field_data_cache).get(self.attempts_key), 2)
+
+    def test_outdated_block_structure(self):
+        with patch.object(FieldDataCache, 'add_descriptor_descendents') as mock_add_descriptor_descendents:
+            self.cache_for_course(course_version='another version')
+        self.assertEqual(mock_add_descriptor_descendents.call_args[0][0].location, self.course.location)
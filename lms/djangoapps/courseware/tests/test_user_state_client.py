@@ -5,8 +5,13 @@ defined in edx_user_state_client.
 
 from collections import defaultdict
 
+import ddt
+from django.test import TestCase
 from edx_user_state_client.tests import UserStateClientTestBase
+from mock import patch
+from opaque_keys.edx.locator import CourseLocator
 
+from courseware.models import StudentModule
 from courseware.tests.factories import UserFactory
 from courseware.user_state_client import DjangoXBlockUserStateClient
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
@@ -34,3 +39,117 @@ class TestDjangoUserStateClient(UserStateClientTestBase, ModuleStoreTestCase):
         super(TestDjangoUserStateClient, self).setUp()
         self.client = DjangoXBlockUserStateClient()
         self.users = defaultdict(UserFactory.create)
+
+
+@ddt.ddt
+class TestDjangoUserStateClientSetMany(TestCase):
+    """
+    Tests of the queries made by DjangoXBlockUserStateClient.set_many, which
+    don't depend on the number of blocks.
+    """
+    shard = 4
+    # Tell Django to clean out all databases, not just default
+    multi_db = True
+
+    def setUp(self):
+        super(TestDjangoUserStateClientSetMany, self).setUp()
+        self.user = UserFactory.create()
+        self.client = DjangoXBlockUserStateClient(self.user)
+        self.course_key = CourseLocator('org', 'course', 'run')
+
+    def _block_keys(self, block_type, num_blocks):
+        """ Returns the keys of some blocks of the given type. """
+        return [
+            self.course_key.make_usage_key(block_type, '{}_{}'.format(block_type, index)) for index in range(num_blocks)
+        ]
+
+    def _set_many(self, block_keys, state):
+        """ Sets the same state for all the given blocks. """
+        self.client.set_many(self.user.username, {block_key: state for block_key in block_keys})
+
+    def _assert_state(self, block_keys, state):
+        """ Asserts the stored state of the given blocks. """
+        stored_states = {
+            stored.block_key: stored.state for stored in self.client.get_many(self.user.username, block_keys)
+        }
+        self.assertEqual(stored_states, {block_key: state for block_key in block_keys})
+
+    def _history_length(self, block_key):
+        """ Returns the number of history entries of the given block. """
+        return len(list(self.client.get_history(self.user.username, block_key)))
+
+    @ddt.data(2, 10)
+    def test_create(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        # Read the stored rows, insert the new ones, then read their ids.
+        with self.assertNumQueries(5, using='default'):
+            # History is kept for problems only.
+            with self.assertNumQueries(num_blocks, using='student_module_history'):
+                self._set_many(problem_keys, {'a_field': 'a_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value'})
+        self.assertEqual(self._history_length(problem_keys[0]), 1)
+
+    def test_create_one(self):
+        problem_keys = self._block_keys('problem', 1)
+        with self.assertNumQueries(4, using='default'):
+            with self.assertNumQueries(1, using='student_module_history'):
+                self._set_many(problem_keys, {'a_field': 'a_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value'})
+
+    @ddt.data(2, 10)
+    def test_update(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        self._set_many(problem_keys, {'a_field': 'a_value'})
+        with self.assertNumQueries(4, using='default'):
+            with self.assertNumQueries(num_blocks, using='student_module_history'):
+                self._set_many(problem_keys, {'b_field': 'b_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value', 'b_field': 'b_value'})
+        self.assertEqual(self._history_length(problem_keys[-1]), 2)
+
+    @ddt.data(2, 10)
+    def test_create_large_state(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        # Each state is too large to share an INSERT query with another one.
+        with patch.object(DjangoXBlockUserStateClient, 'STATE_WRITE_CHUNK_BYTES', 20):
+            with self.assertNumQueries(4 + num_blocks, using='default'):
+                self._set_many(problem_keys, {'a_field': 'a_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value'})
+
+    @ddt.data(2, 10)
+    def test_update_large_state(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        self._set_many(problem_keys, {'a_field': 'a_value'})
+        # Each state is too large to share an UPDATE query with another one.
+        with patch.object(DjangoXBlockUserStateClient, 'STATE_WRITE_CHUNK_BYTES', 40):
+            with self.assertNumQueries(3 + num_blocks, using='default'):
+                self._set_many(problem_keys, {'b_field': 'b_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value', 'b_field': 'b_value'})
+
+    @ddt.data(2, 10)
+    def test_unchanged(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        self._set_many(problem_keys, {'a_field': 'a_value'})
+        with self.assertNumQueries(1, using='default'):
+            with self.assertNumQueries(0, using='student_module_history'):
+                self._set_many(problem_keys, {'a_field': 'a_value'})
+        self.assertEqual(self._history_length(problem_keys[0]), 1)
+
+    @ddt.data(2, 10)
+    def test_create_and_update(self, num_blocks):
+        problem_keys = self._block_keys('problem', num_blocks)
+        video_keys = self._block_keys('video', num_blocks)
+        self._set_many(problem_keys, {'a_field': 'a_value'})
+        with self.assertNumQueries(8, using='default'):
+            with self.assertNumQueries(num_blocks, using='student_module_history'):
+                self._set_many(problem_keys + video_keys, {'b_field': 'b_value'})
+        self._assert_state(problem_keys, {'a_field': 'a_value', 'b_field': 'b_value'})
+        self._assert_state(video_keys, {'b_field': 'b_value'})
+
+    def test_score_not_overwritten(self):
+        problem_keys = self._block_keys('problem', 2)
+        self._set_many(problem_keys, {'a_field': 'a_value'})
+        StudentModule.objects.filter(student=self.user).update(grade=1, max_grade=2)
+        self._set_many(problem_keys, {'a_field': 'new_value'})
+        self.assertEqual(
+            list(StudentModule.objects.filter(student=self.user).values_list('grade', 'max_grade')), [(1, 2), (1, 2)]
+        )
@@ -11,8 +11,11 @@ from time import time
 from django.conf import settings
 from django.core.paginator import Paginator
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import router, transaction
+from django.db.models import Case, TextField, Value, When
+from django.db.models.signals import post_save
 from django.db.utils import IntegrityError
+from django.utils import timezone
 from edx_django_utils import monitoring as monitoring_utils
 from edx_user_state_client.interface import XBlockUserState, XBlockUserStateClient
 from xblock.fields import Scope
@@ -52,6 +55,13 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
     # Use this sample rate for DataDog events.
     API_DATADOG_SAMPLE_RATE = 0.1
 
+    # Largest number of StudentModules written by a single UPDATE or INSERT query.
+    STATE_WRITE_CHUNK_SIZE = 500
+
+    # Largest total size of the state written by a single UPDATE or INSERT query,
+    # which keeps the queries well below MySQL's max_allowed_packet.
+    STATE_WRITE_CHUNK_BYTES = 1024 * 1024
+
     class ServiceUnavailable(XBlockUserStateClient.ServiceUnavailable):
         """
         This error is raised if the service backing this client is currently unavailable.
@@ -249,6 +259,10 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                 are overlaid over the stored state. To delete fields, use
                 :meth:`delete` or :meth:`delete_many`.
             scope (Scope): The scope to load data from
+
+        The stored rows are read with one query per course, the new rows are
+        created with a single INSERT, and the changed rows are written with a
+        single UPDATE, whatever the number of blocks.
         """
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
@@ -256,10 +270,9 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         # count how many times this function gets called
         self._nr_stat_increment('set_many', 'calls')
 
-        # We do a find_or_create for every block (rather than re-using field objects
-        # that were queried in get_many) so that if the score has
-        # been changed by some other piece of the code, we don't overwrite
-        # that score.
+        # We read the stored state of every block again (rather than re-using field
+        # objects that were queried in get_many) so that if the state has been
+        # changed by some other piece of the code, we don't overwrite it.
         if self.user is not None and self.user.username == username:
             user = self.user
         else:
@@ -272,51 +285,39 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
         evt_time = time()
 
+        existing_modules = {
+            usage_key: student_module
+            for student_module, usage_key in self._get_student_modules(username, block_keys_to_state.keys())
+        }
+        created_modules = []
+        updated_modules = []
         for usage_key, state in block_keys_to_state.items():
-            try:
-                student_module, created = StudentModule.objects.get_or_create(
+            student_module = existing_modules.get(usage_key)
+            created = student_module is None
+            num_fields_before = num_fields_after = num_new_fields_set = len(state)
+            num_fields_updated = 0
+            if created:
+                student_module = StudentModule(
                     student=user,
                     course_id=usage_key.course_key,
                     module_state_key=usage_key,
-                    defaults={
-                        'state': json.dumps(state),
-                        'module_type': usage_key.block_type,
-                    },
+                    state=json.dumps(state),
+                    module_type=usage_key.block_type,
                 )
-            except IntegrityError:
-                # PLAT-1109 - Until we switch to read committed, we cannot rely
-                # on get_or_create to be able to see rows created in another
-                # process. This seems to happen frequently, and ignoring it is the
-                # best course of action for now
-                log.warning("set_many: IntegrityError for student {} - course_id {} - usage key {}".format(
-                    user, repr(unicode(usage_key.course_key)), usage_key
-                ))
-                return
-
-            num_fields_before = num_fields_after = num_new_fields_set = len(state)
-            num_fields_updated = 0
-            if not created:
+                created_modules.append(student_module)
+            else:
                 if student_module.state is None:
-                    current_state = {}
+                    stored_state = {}
                 else:
-                    current_state = json.loads(student_module.state)
+                    stored_state = json.loads(student_module.state)
+                current_state = dict(stored_state)
                 num_fields_before = len(current_state)
                 current_state.update(state)
                 num_fields_after = len(current_state)
-                student_module.state = json.dumps(current_state)
-                try:
-                    with transaction.atomic():
-                        # Updating the object - force_update guarantees no INSERT will occur.
-                        student_module.save(force_update=True)
-                except IntegrityError:
-                    # The UPDATE above failed. Log information - but ignore the error.
-                    # See https://openedx.atlassian.net/browse/TNL-5365
-                    log.warning("set_many: IntegrityError for student {} - course_id {} - usage key {}".format(
-                        user, repr(unicode(usage_key.course_key)), usage_key
-                    ))
-                    log.warning("set_many: All {} block keys: {}".format(
-                        len(block_keys_to_state), block_keys_to_state.keys()
-                    ))
+                # Only rows whose state changes are written.
+                if student_module.state is None or current_state != stored_state:
+                    student_module.state = json.dumps(current_state)
+                    updated_modules.append(student_module)
 
             # DataDog and New Relic reporting
 
@@ -342,6 +343,21 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             num_fields_updated = max(0, len(state) - num_new_fields_set)
             self._ddog_histogram(evt_time, 'set_many.fields_updated', num_fields_updated)
 
+        saved_modules = self._update_student_modules(user, updated_modules)
+        saved_modules += self._create_student_modules(user, created_modules)
+
+        # The rows were written without Model.save(), so send its signal, which
+        # writes the history of the state.
+        for student_module, created in saved_modules:
+            post_save.send(
+                sender=StudentModule,
+                instance=student_module,
+                created=created,
+                update_fields=None,
+                raw=False,
+                using=router.db_for_write(StudentModule, instance=student_module),
+            )
+
         # Events for the entire set_many call.
         finish_time = time()
         duration = (finish_time - evt_time) * 1000  # milliseconds
@@ -349,6 +365,100 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         self._ddog_histogram(evt_time, 'set_many.response_time', duration)
         self._nr_stat_accumulate('set_many', 'duration', duration)
 
+    def _update_student_modules(self, user, student_modules):
+        """
+        Writes the state of existing :class:`~StudentModule`s, with a single UPDATE
+        query per chunk of them (see :meth:`_state_write_chunks`).
+
+        Returns a list of ``(student_module, created)`` pairs for the updated
+        modules, whose post_save signal has to be sent.
+        """
+        if not student_modules:
+            return []
+
+        modified = timezone.now()
+        try:
+            with transaction.atomic():
+                for chunk in self._state_write_chunks(student_modules):
+                    StudentModule.objects.filter(pk__in=[student_module.pk for student_module in chunk]).update(
+                        state=Case(
+                            *[When(pk=student_module.pk, then=Value(student_module.state)) for student_module in chunk],
+                            output_field=TextField()
+                        ),
+                        modified=modified,
+                    )
+        except IntegrityError:
+            # The UPDATE above failed. Log information - but ignore the error.
+            # See https://openedx.atlassian.net/browse/TNL-5365
+            log.warning("set_many: IntegrityError for student {} updating usage keys {}".format(
+                user, [student_module.module_state_key for student_module in student_modules]
+            ))
+            return []
+
+        for student_module in student_modules:
+            student_module.modified = modified
+        return [(student_module, False) for student_module in student_modules]
+
+    def _state_write_chunks(self, student_modules):
+        """
+        Yields lists of the given :class:`~StudentModule`s, each holding at most
+        STATE_WRITE_CHUNK_SIZE modules and STATE_WRITE_CHUNK_BYTES of state - or
+        a single module, when its state alone is larger than that.
+        """
+        chunk = []
+        chunk_bytes = 0
+        for student_module in student_modules:
+            state_bytes = len(student_module.state or '')
+            if chunk and (
+                    len(chunk) >= self.STATE_WRITE_CHUNK_SIZE or
+                    chunk_bytes + state_bytes > self.STATE_WRITE_CHUNK_BYTES
+            ):
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+            chunk.append(student_module)
+            chunk_bytes += state_bytes
+        if chunk:
+            yield chunk
+
+    def _create_student_modules(self, user, student_modules):
+        """
+        Inserts new :class:`~StudentModule`s, with a single INSERT query per chunk
+        of them when there are several (see :meth:`_state_write_chunks`).
+
+        Returns a list of ``(student_module, created)`` pairs for the created
+        modules, whose post_save signal has to be sent.
+        """
+        if not student_modules:
+            return []
+
+        try:
+            with transaction.atomic():
+                if len(student_modules) == 1:
+                    # save() sends the post_save signal itself.
+                    student_modules[0].save(force_insert=True)
+                    return []
+                for chunk in self._state_write_chunks(student_modules):
+                    StudentModule.objects.bulk_create(chunk)
+        except IntegrityError:
+            # PLAT-1109 - Until we switch to read committed, we cannot rely
+            # on reading the rows before creating them to see rows created in
+            # another process. This seems to happen frequently, and ignoring it
+            # is the best course of action for now
+            log.warning("set_many: IntegrityError for student {} creating usage keys {}".format(
+                user, [student_module.module_state_key for student_module in student_modules]
+            ))
+            return []
+
+        if any(student_module.pk is None for student_module in student_modules):
+            # Most databases don't return the ids of bulk inserted rows.
+            modules_by_usage_key = {
+                student_module.module_state_key: student_module for student_module in student_modules
+            }
+            for created_module, usage_key in self._get_student_modules(user.username, modules_by_usage_key.keys()):
+                modules_by_usage_key[usage_key].pk = created_module.pk
+        return [(student_module, True) for student_module in student_modules]
+
     def delete_many(self, username, block_keys, scope=Scope.user_state, fields=None):
         """
         Delete the stored XBlock state for a many xblock usages.
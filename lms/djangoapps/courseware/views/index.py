@@ -314,11 +314,12 @@ class CoursewareIndex(View):
         Prefetches all descendant data for the requested section and
         sets up the runtime, which binds the request user to the section.
         """
-        self.field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+        self.field_data_cache = FieldDataCache.cache_for_block_descendents(
             self.course_key,
             self.effective_user,
-            self.course,
+            self.course.location,
             depth=CONTENT_DEPTH,
+            course_version=getattr(self.course, 'course_version', None),
             read_only=CrawlersConfig.is_crawler(request),
         )
 
@@ -337,8 +338,11 @@ class CoursewareIndex(View):
         sets up the runtime, which binds the request user to the section.
         """
         # Pre-fetch all descendant data
+        self.field_data_cache.add_block_descendents(
+            self.section.location,
+            course_version=getattr(self.course, 'course_version', None),
+        )
         self.section = modulestore().get_item(self.section.location, depth=None, lazy=False)
-        self.field_data_cache.add_descriptor_descendents(self.section, depth=None)
 
         # Bind section to user
         self.section = get_module_for_descriptor(
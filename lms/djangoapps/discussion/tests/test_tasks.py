@@ -156,7 +156,7 @@ class TaskTestCase(ModuleStoreTestCase):
 
     def setUp(self):
         super(TaskTestCase, self).setUp()
-        self.request_patcher = mock.patch('requests.request')
+        self.request_patcher = mock.patch('lms.lib.comment_client.utils.SESSION.request')
         self.mock_request = self.request_patcher.start()
 
         self.ace_send_patcher = mock.patch('edx_ace.ace.send')
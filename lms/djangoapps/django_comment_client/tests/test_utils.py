@@ -4,9 +4,12 @@ import json
 
 import ddt
 import mock
+import requests
 
 from django.urls import reverse
 from django.test import RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.utils import translation
 from edx_django_utils.cache import RequestCache
 from mock import Mock, patch
 from pytz import UTC
@@ -33,7 +36,16 @@ from django_comment_common.utils import (
     set_course_discussion_settings
 )
 from lms.djangoapps.teams.tests.factories import CourseTeamFactory
-from lms.lib.comment_client.utils import CommentClientMaintenanceError, perform_request
+from lms.lib.comment_client.thread import Thread
+from lms.lib.comment_client.user import User as CommentClientUser
+from lms.lib.comment_client.utils import (
+    CommentClientMaintenanceError,
+    CommentClientRequestError,
+    CommentServiceSession,
+    clear_forums_config,
+    get_endpoint,
+    perform_request,
+)
 from openedx.core.djangoapps.course_groups import cohorts
 from openedx.core.djangoapps.course_groups.cohorts import set_course_cohorted
 from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory, config_course_cohorts
@@ -1814,6 +1826,10 @@ class GroupModeratorPermissionsTestCase(ModuleStoreTestCase):
 class ClientConfigurationTestCase(TestCase):
     """Simple test cases to ensure enabling/disabling the use of the comment service works as intended."""
 
+    def setUp(self):
+        super(ClientConfigurationTestCase, self).setUp()
+        self.addCleanup(clear_forums_config)
+
     def test_disabled(self):
         """Ensures that an exception is raised when forums are disabled."""
         config = ForumsConfig.current()
@@ -1823,7 +1839,7 @@ class ClientConfigurationTestCase(TestCase):
         with self.assertRaises(CommentClientMaintenanceError):
             perform_request('GET', 'http://www.google.com')
 
-    @patch('requests.request')
+    @patch('lms.lib.comment_client.utils.SESSION.request')
     def test_enabled(self, mock_request):
         """Ensures that requests proceed normally when forums are enabled."""
         config = ForumsConfig.current()
@@ -1839,6 +1855,129 @@ class ClientConfigurationTestCase(TestCase):
         result = perform_request('GET', 'http://www.google.com')
         self.assertEqual(result, {})
 
+    @patch('lms.lib.comment_client.utils.SESSION.request')
+    def test_config_read_once(self, mock_request):
+        """Ensures that the config isn't read for each request, but is read again once saved."""
+        config = ForumsConfig.current()
+        config.enabled = True
+        config.save()
+        mock_request.return_value = Mock(status_code=200, json=lambda: {})
+
+        with self.assertNumQueries(1):
+            perform_request('GET', 'http://www.google.com')
+        with self.assertNumQueries(0):
+            perform_request('GET', 'http://www.google.com')
+
+        config.enabled = False
+        config.save()
+        with self.assertRaises(CommentClientMaintenanceError):
+            perform_request('GET', 'http://www.google.com')
+
+
+class FindManyTestCase(TestCase):
+    """Tests for fetching several comment client models at once."""
+
+    def setUp(self):
+        super(FindManyTestCase, self).setUp()
+        config = ForumsConfig.current()
+        config.enabled = True
+        config.save()
+        RequestCache.clear_all_namespaces()
+        self.addCleanup(RequestCache.clear_all_namespaces)
+        self.addCleanup(clear_forums_config)
+
+        patcher = patch('lms.lib.comment_client.utils.SESSION.request', side_effect=self.respond)
+        self.mock_request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, method, url, **kwargs):
+        """Responds to a request for a thread or user with its id, or with a 404 error for the id "missing"."""
+        instance_id = url.rsplit('/', 1)[1]
+        if instance_id == 'missing':
+            return Mock(status_code=404, text='missing')
+        return Mock(status_code=200, json=lambda: {
+            'id': instance_id, 'title': u'Thread {}'.format(instance_id), 'username': u'user_{}'.format(instance_id),
+        })
+
+    def test_find_many(self):
+        threads = Thread.find_many(['1', '2', '3'])
+        self.assertEqual([thread.id for thread in threads], ['1', '2', '3'])
+        self.assertEqual([thread.title for thread in threads], ['Thread 1', 'Thread 2', 'Thread 3'])
+        self.assertEqual(self.mock_request.call_count, 3)
+
+    def test_cached_for_request(self):
+        Thread.find_many(['1', '2'])
+        threads = Thread.find_many(['2', '3', '1'])
+        self.assertEqual([thread.title for thread in threads], ['Thread 2', 'Thread 3', 'Thread 1'])
+        self.assertEqual(self.mock_request.call_count, 3)
+
+        # Other attributes or retrieve arguments are other requests.
+        CommentClientUser.find_many(['1'], course_id='course-v1:org+course+run')
+        Thread.find_many(['1'], retrieve_kwargs={'with_responses': True})
+        self.assertEqual(self.mock_request.call_count, 5)
+
+    def test_cache_cleared_by_changes(self):
+        Thread.find_many(['1'])
+        perform_request('post', 'http://localhost:4567/api/v1/threads/1/votes')
+        Thread.find_many(['1'])
+        self.assertEqual(self.mock_request.call_count, 3)
+
+    def test_request_language(self):
+        with translation.override('fr'):
+            CommentClientUser.find_many(['1', '2'])
+        for call in self.mock_request.call_args_list:
+            self.assertEqual(call[1]['headers']['Accept-Language'], 'fr')
+
+    def test_error(self):
+        with self.assertRaises(CommentClientRequestError):
+            Thread.find_many(['1', 'missing'])
+
+
+@ddt.ddt
+class CommentServiceSessionTestCase(TestCase):
+    """Tests for the pooled session to the comments service."""
+
+    @override_settings(COMMENTS_SERVICE_CONNECTION_POOL={
+        'POOL_CONNECTIONS': 2, 'POOL_MAXSIZE': 20, 'KEEP_ALIVE': False, 'MAX_RETRIES': 3, 'BACKOFF_FACTOR': 0.5,
+    })
+    def test_configuration(self):
+        session = CommentServiceSession()
+        adapter = session.get_adapter('http://localhost:4567/api/v1/threads')
+        self.assertEqual(adapter._pool_connections, 2)  # pylint: disable=protected-access
+        self.assertEqual(adapter._pool_maxsize, 20)  # pylint: disable=protected-access
+        self.assertEqual(adapter.max_retries.total, 3)
+        self.assertEqual(adapter.max_retries.backoff_factor, 0.5)
+        self.assertEqual(session.headers['Connection'], 'close')
+
+    def test_forked_process(self):
+        session = CommentServiceSession()
+        adapter = session.get_adapter('http://localhost:4567/api/v1/threads')
+        with patch('lms.lib.comment_client.utils.os.getpid', return_value=-1):
+            with patch('requests.Session.request') as mock_request:
+                session.request('get', 'http://localhost:4567/api/v1/threads')
+        self.assertTrue(mock_request.called)
+        self.assertIsNot(session.get_adapter('http://localhost:4567/api/v1/threads'), adapter)
+
+    def test_cookies_not_kept(self):
+        session = CommentServiceSession()
+        request = requests.Request('GET', 'http://localhost:4567/api/v1/threads').prepare()
+        session.cookies.set_cookie_if_ok(
+            requests.cookies.create_cookie('session', 'of-a-user'),
+            requests.cookies.MockRequest(request),
+        )
+        self.assertEqual(len(session.cookies), 0)
+
+    @ddt.data(
+        ('http://localhost:4567/api/v1/threads', 'api/v1/threads'),
+        ('http://localhost:4567/api/v1/threads/5b3a1e6e4d0b3a0018a1b2c3', 'api/v1/threads/:id'),
+        ('http://localhost:4567/api/v1/users/42/active_threads', 'api/v1/users/:id/active_threads'),
+        ('http://localhost:4567/api/v1/i4x-edX-toy-course-2012_Fall/threads', 'api/v1/:id/threads'),
+        ('http://localhost:4567/api/v1/comments/abc/abuse_flag?request_id=1', 'api/v1/comments/:id/abuse_flag'),
+    )
+    @ddt.unpack
+    def test_get_endpoint(self, url, expected_endpoint):
+        self.assertEqual(get_endpoint(url), expected_endpoint)
+
 
 def set_discussion_division_settings(
         course_key, enable_cohorts=False, always_divide_inline_discussions=False,
@@ -10,6 +10,8 @@ WAFFLE_NAMESPACE = u'grades'
 # Switches
 ASSUME_ZERO_GRADE_IF_ABSENT = u'assume_zero_grade_if_absent'
 DISABLE_REGRADE_ON_POLICY_CHANGE = u'disable_regrade_on_policy_change'
+BATCH_COURSE_GRADES = u'batch_course_grades'
+COALESCE_SUBSECTION_GRADE_TASKS = u'coalesce_subsection_grade_tasks'
 
 # Course Flags
 REJECTED_EXAM_OVERRIDES_GRADE = u'rejected_exam_overrides_grade'
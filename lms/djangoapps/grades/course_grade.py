@@ -242,6 +242,9 @@ class CourseGrade(CourseGradeBase):
     Course Grade class when grades are updated or read from storage.
     """
     def __init__(self, user, course_data, *args, **kwargs):
+        # Whether force-updated subsection grades are left unsaved, to be
+        # persisted in bulk.
+        self._bulk_update_subsections = kwargs.pop('bulk_update_subsections', False)
         super(CourseGrade, self).__init__(user, course_data, *args, **kwargs)
         self._subsection_grade_factory = SubsectionGradeFactory(user, course_data=course_data)
 
@@ -279,7 +282,11 @@ class CourseGrade(CourseGradeBase):
 
     def _get_subsection_grade(self, subsection, force_update_subsections=False):
         if self.force_update_subsections:
-            return self._subsection_grade_factory.update(subsection, force_update_subsections=force_update_subsections)
+            return self._subsection_grade_factory.update(
+                subsection,
+                force_update_subsections=force_update_subsections,
+                read_only=self._bulk_update_subsections,
+            )
         else:
             # Pass read_only here so the subsection grades can be persisted in bulk at the end.
             return self._subsection_grade_factory.create(subsection, read_only=True)
@@ -0,0 +1,235 @@
+"""
+CourseGradeBatch Class
+"""
+from logging import getLogger
+
+from lms.djangoapps.course_blocks.api import get_course_blocks, has_individual_student_override_provider
+from lms.djangoapps.course_blocks.transformers.user_partitions import UserPartitionTransformer
+from lms.djangoapps.course_blocks.usage_info import CourseUsageInfo
+from openedx.features.content_type_gating.models import ContentTypeGatingConfig
+from student.models import bulk_anonymous_ids_for_users
+from student.roles import CourseBetaTesterRole
+from xmodule.partitions.partitions_service import get_user_partition_groups
+
+from .config import should_persist_grades
+from .course_data import CourseData
+from .course_grade import CourseGrade
+from .models import PersistentCourseGrade, PersistentSubsectionGrade
+from .scores import possibly_scored
+from .subsection_grade import CreateSubsectionGrade
+from .subsection_grade_factory import SubsectionGradeFactory
+
+log = getLogger(__name__)
+
+
+class CourseGradeBatch(object):
+    """
+    Computes the course grades of a batch of users together.
+
+    On entering the batch, the stored grades and the CSM scores of all of
+    its users are prefetched with a handful of set-based queries.  The
+    course structure is transformed once for all the users with the same
+    access to the course: the same groups in its user partitions, and no
+    staff or beta tester role.  Users whose transformed course structures
+    have the same set of visible blocks share a single structure instance.
+    Updated grades are not saved as they are computed, but are persisted
+    in bulk by persist.
+
+    Use as a context manager, so that the prefetched data is cleared once
+    the batch is done with.
+    """
+    def __init__(self, users, course_data):
+        """
+        Arguments:
+            users: list of the users (User) in the batch.
+            course_data: the CourseData of the course, which isn't
+                specific to any user.
+        """
+        self.users = users
+        self.course_data = course_data
+
+        # Transformed course structures, keyed by their set of blocks.
+        self._structures = {}
+
+        # Transformed course structures, keyed by the starting block and the
+        # access of the users they were transformed for.
+        self._structures_by_access = {}
+
+        # Whether the transformed course structures of users with the same
+        # blocks can be shared.  Individual student overrides change the
+        # fields of blocks, without changing which blocks are visible.
+        self._share_structures = not has_individual_student_override_provider()
+
+        # Whether the course structure can be transformed once for all the
+        # users with the same access.  The children of library content
+        # blocks are selected for each user, regardless of their access.
+        self._share_structures_by_access = self._share_structures and not any(
+            block_key.block_type == 'library_content' for block_key in course_data.collected_structure
+        )
+
+        # (user, course_grade, force_update_subsections) of the course
+        # grades updated to this point.
+        self._updated_grades = []
+
+    def __enter__(self):
+        course_key = self.course_data.course_key
+        PersistentCourseGrade.prefetch(course_key, self.users)
+        PersistentSubsectionGrade.prefetch(course_key, self.users)
+        SubsectionGradeFactory.prefetch_scores(course_key, self.users, {
+            block_key.block_type
+            for block_key in self.course_data.collected_structure
+            if possibly_scored(block_key)
+        })
+        bulk_anonymous_ids_for_users(self.users, course_key)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        course_key = self.course_data.course_key
+        PersistentCourseGrade.clear_prefetched_data(course_key)
+        PersistentSubsectionGrade.clear_prefetched_data(course_key)
+        SubsectionGradeFactory.clear_prefetched_scores(course_key)
+        self._structures.clear()
+        self._structures_by_access.clear()
+
+    def course_data_for(self, user):
+        """
+        Returns the CourseData for the given user in the batch.
+        """
+        return _BatchCourseData(self, user)
+
+    def get_structure(self, user, starting_block_usage_key):
+        """
+        Returns the course structure transformed for the given user,
+        which is shared with any other users of the batch with the same
+        access or the same visible blocks.
+        """
+        access_key = None
+        if self._share_structures_by_access:
+            access_key = self._access_key(user)
+        if access_key is not None:
+            structure = self._structures_by_access.get((starting_block_usage_key, access_key))
+            if structure is not None:
+                return structure
+
+        structure = get_course_blocks(
+            user,
+            starting_block_usage_key,
+            collected_block_structure=self.course_data.collected_structure,
+        )
+        if not self._share_structures:
+            return structure
+        structure = self._structures.setdefault(frozenset(structure), structure)
+        if access_key is not None:
+            self._structures_by_access[(starting_block_usage_key, access_key)] = structure
+        return structure
+
+    def _access_key(self, user):
+        """
+        Returns what the transformed course structure of the given user
+        depends on, or None if the user has staff access, which bypasses
+        some of the transformers.
+        """
+        course_key = self.course_data.course_key
+        if CourseUsageInfo(course_key, user).has_staff_access:
+            return None
+
+        user_partitions = self.course_data.collected_structure.get_transformer_data(
+            UserPartitionTransformer, 'user_partitions',
+        ) or []
+        user_groups = get_user_partition_groups(course_key, user_partitions, user, 'id')
+        return (
+            CourseBetaTesterRole(course_key).has_user(user),
+            ContentTypeGatingConfig.enabled_for_enrollment(user=user, course_key=course_key),
+            frozenset((partition_id, group.id) for partition_id, group in user_groups.iteritems()),
+        )
+
+    def update(self, user, course_data, force_update_subsections=False):
+        """
+        Computes and returns the CourseGrade for the given user in the
+        batch.  The grade is persisted, along with its subsection grades,
+        when the batch is persisted.
+        """
+        course_grade = CourseGrade(
+            user,
+            course_data,
+            force_update_subsections=force_update_subsections,
+            bulk_update_subsections=True,
+        )
+        course_grade = course_grade.update()
+        self._updated_grades.append((user, course_grade, force_update_subsections))
+        return course_grade
+
+    @property
+    def updated_users(self):
+        """
+        Returns the users whose course grades were updated, but not yet
+        persisted.
+        """
+        return [user for user, __, __ in self._updated_grades]
+
+    def persist(self):
+        """
+        Persists, in bulk, the course and subsection grades updated to this
+        point.  Returns a list of (user, course_grade, persisted) for each
+        of these course grades.
+        """
+        course_key = self.course_data.course_key
+        should_persist = should_persist_grades(course_key)
+
+        updated_grades = []
+        forced_subsection_grades, created_subsection_grades, course_grade_params = [], [], []
+        for user, course_grade, force_update_subsections in self._updated_grades:
+            # pylint: disable=protected-access
+            subsection_grades = course_grade._subsection_grade_factory.pop_unsaved()
+            if should_persist and force_update_subsections:
+                forced_subsection_grades.append((user, subsection_grades))
+
+            persisted = should_persist and course_grade.attempted
+            if persisted:
+                if not force_update_subsections:
+                    created_subsection_grades.append((user, subsection_grades))
+                course_grade_params.append(dict(
+                    user_id=user.id,
+                    course_version=course_grade.course_data.version,
+                    course_edited_timestamp=course_grade.course_data.edited_on,
+                    grading_policy_hash=course_grade.course_data.grading_policy_hash,
+                    percent_grade=course_grade.percent,
+                    letter_grade=course_grade.letter_grade or "",
+                    passed=course_grade.passed,
+                ))
+            updated_grades.append((user, course_grade, persisted))
+
+        CreateSubsectionGrade.bulk_update_or_create_models(
+            forced_subsection_grades, course_key, force_update_subsections=True,
+        )
+        CreateSubsectionGrade.bulk_update_or_create_models(created_subsection_grades, course_key)
+        if course_grade_params:
+            PersistentCourseGrade.bulk_update_or_create(course_key, course_grade_params)
+
+        log.info(
+            u'Grades: Batch persisted, %s, users: %d, course grades: %d',
+            course_key, len(updated_grades), len(course_grade_params),
+        )
+        self._updated_grades = []
+        return updated_grades
+
+
+class _BatchCourseData(CourseData):
+    """
+    CourseData of a user in a CourseGradeBatch, whose course structure is
+    shared with other users of the batch.
+    """
+    def __init__(self, batch, user):
+        super(_BatchCourseData, self).__init__(
+            user,
+            course=batch.course_data.course,
+            collected_block_structure=batch.course_data.collected_structure,
+            course_key=batch.course_data.course_key,
+        )
+        self._batch = batch
+
+    @property
+    def structure(self):
+        if self._structure is None:
+            self._structure = self._batch.get_structure(self.user, self.location)
+        return self._structure
@@ -2,6 +2,7 @@
 Course Grade Factory Class
 """
 from collections import namedtuple
+from itertools import islice
 from logging import getLogger
 
 import dogstats_wrapper as dog_stats_api
@@ -10,7 +11,9 @@ from six import text_type
 from openedx.core.djangoapps.signals.signals import COURSE_GRADE_CHANGED, COURSE_GRADE_NOW_PASSED
 
 from .config import assume_zero_if_absent, should_persist_grades
+from .config.waffle import BATCH_COURSE_GRADES, waffle
 from .course_data import CourseData
+from .course_grade_batch import CourseGradeBatch
 from .course_grade import CourseGrade, ZeroCourseGrade
 from .models import PersistentCourseGrade, prefetch
 
@@ -23,6 +26,10 @@ class CourseGradeFactory(object):
     """
     GradeResult = namedtuple('GradeResult', ['student', 'course_grade', 'error'])
 
+    # Number of users whose grades are computed together by iter, when
+    # batching is enabled.
+    BATCH_SIZE = 100
+
     def read(
             self,
             user,
@@ -83,6 +90,7 @@ class CourseGradeFactory(object):
             collected_block_structure=None,
             course_key=None,
             force_update=False,
+            batch_size=None,
     ):
         """
         Given a course and an iterable of students (User), yield a GradeResult
@@ -92,6 +100,11 @@ class CourseGradeFactory(object):
 
         If an error occurred, course_grade will be None and err_msg will be an
         exception message. If there was no error, err_msg is an empty string.
+
+        If batch_size is given, or the batch_course_grades switch is enabled,
+        the students are graded in batches of that many (or BATCH_SIZE)
+        students, whose data is read and written in bulk.  See
+        CourseGradeBatch.
         """
         # Pre-fetch the collected course_structure (in _iter_grade_result) so:
         # 1. Correctness: the same version of the course is used to
@@ -110,10 +123,68 @@ class CourseGradeFactory(object):
             )
         )
         stats_tags = [u'action:{}'.format(course_data.course_key)]
+        if batch_size is None and waffle().is_enabled(BATCH_COURSE_GRADES):
+            batch_size = self.BATCH_SIZE
+        if batch_size:
+            users = iter(users)
+            batch_users = list(islice(users, batch_size))
+            while batch_users:
+                for result in self._iter_batch_grade_results(batch_users, course_data, force_update, stats_tags):
+                    yield result
+                batch_users = list(islice(users, batch_size))
+            return
+
         for user in users:
             with dog_stats_api.timer('lms.grades.CourseGradeFactory.iter', tags=stats_tags):
                 yield self._iter_grade_result(user, course_data, force_update)
 
+    def _iter_batch_grade_results(self, users, course_data, force_update, stats_tags):
+        """
+        Yields the GradeResults of the given batch of users, after
+        persisting their updated grades in bulk.
+        """
+        with CourseGradeBatch(users, course_data) as batch:
+            with dog_stats_api.timer('lms.grades.CourseGradeFactory.iter_batch', tags=stats_tags):
+                results = [self._batch_grade_result(batch, user, force_update) for user in users]
+                errors = {}
+                updated_users = batch.updated_users
+                try:
+                    updated_grades = batch.persist()
+                except Exception as exc:  # pylint: disable=broad-except
+                    # None of the updated grades of the batch were persisted.
+                    updated_grades = []
+                    errors.update((user, exc) for user in updated_users)
+                for user, course_grade, persisted in updated_grades:
+                    try:
+                        self._send_update_signals(user, course_grade.course_data, course_grade, persisted)
+                    except Exception as exc:  # pylint: disable=broad-except
+                        errors[user] = exc
+            for result in results:
+                if result.student in errors:
+                    result = self._grade_error_result(result.student, course_data, errors[result.student])
+                yield result
+
+    def _batch_grade_result(self, batch, user, force_update):
+        """
+        Returns the GradeResult for the given user of the batch, reading
+        the user's persisted grade unless force_update.
+        """
+        try:
+            course_data = batch.course_data_for(user)
+            if force_update:
+                course_grade = batch.update(user, course_data, force_update_subsections=True)
+            else:
+                try:
+                    course_grade = self._read(user, course_data)
+                except PersistentCourseGrade.DoesNotExist:
+                    if assume_zero_if_absent(course_data.course_key):
+                        course_grade = self._create_zero(user, course_data)
+                    else:
+                        course_grade = batch.update(user, course_data)
+            return self.GradeResult(user, course_grade, None)
+        except Exception as exc:  # pylint: disable=broad-except
+            return self._grade_error_result(user, batch.course_data, exc)
+
     def _iter_grade_result(self, user, course_data, force_update):
         try:
             kwargs = {
@@ -129,15 +200,22 @@ class CourseGradeFactory(object):
             course_grade = method(**kwargs)
             return self.GradeResult(user, course_grade, None)
         except Exception as exc:  # pylint: disable=broad-except
-            # Keep marching on even if this student couldn't be graded for
-            # some reason, but log it for future reference.
-            log.exception(
-                'Cannot grade student %s in course %s because of exception: %s',
-                user.id,
-                course_data.course_key,
-                text_type(exc)
-            )
-            return self.GradeResult(user, None, exc)
+            return self._grade_error_result(user, course_data, exc)
+
+    def _grade_error_result(self, user, course_data, exc):
+        """
+        Returns the GradeResult for the given user, who couldn't be graded
+        because of the given exception.
+        """
+        # Keep marching on even if this student couldn't be graded for
+        # some reason, but log it for future reference.
+        log.exception(
+            'Cannot grade student %s in course %s because of exception: %s',
+            user.id,
+            course_data.course_key,
+            text_type(exc)
+        )
+        return self.GradeResult(user, None, exc)
 
     @staticmethod
     def _create_zero(user, course_data):
@@ -201,6 +279,16 @@ class CourseGradeFactory(object):
                 passed=course_grade.passed,
             )
 
+        CourseGradeFactory._send_update_signals(user, course_data, course_grade, should_persist)
+        return course_grade
+
+    @staticmethod
+    def _send_update_signals(user, course_data, course_grade, persisted):
+        """
+        Sends a COURSE_GRADE_CHANGED signal for the given updated
+        CourseGrade, and a COURSE_GRADE_NOW_PASSED signal if the learner
+        has passed the course.
+        """
         COURSE_GRADE_CHANGED.send_robust(
             sender=None,
             user=user,
@@ -217,7 +305,5 @@ class CourseGradeFactory(object):
 
         log.info(
             u'Grades: Update, %s, User: %s, %s, persisted: %s',
-            course_data.full_string(), user.id, course_grade, should_persist,
+            course_data.full_string(), user.id, course_grade, persisted,
         )
-
-        return course_grade
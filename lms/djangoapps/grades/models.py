@@ -15,7 +15,8 @@ from collections import defaultdict, namedtuple
 from hashlib import sha1
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Value, When
 from django.utils.timezone import now
 from lazy import lazy
 from model_utils.models import TimeStampedModel
@@ -32,6 +33,9 @@ log = logging.getLogger(__name__)
 
 BLOCK_RECORD_LIST_VERSION = 1
 
+# Maximum number of grades updated by a single query.
+BULK_UPDATE_CHUNK_SIZE = 500
+
 # Used to serialize information about a block at the time it was used in
 # grade calculation.
 BlockRecord = namedtuple('BlockRecord', ['locator', 'weight', 'raw_possible', 'graded'])
@@ -223,6 +227,33 @@ class VisibleBlocks(models.Model):
         non_existent_brls = {brl.hash_value for brl in block_record_lists if brl.hash_value not in cached_records}
         cls.bulk_create(user_id, course_key, non_existent_brls)
 
+    @classmethod
+    def bulk_get_or_create_for_course(cls, course_key, block_record_lists):
+        """
+        Bulk creates VisibleBlocks for the given iterator of
+        BlockRecordList objects, of any number of users in the given
+        course, but only for those that aren't already created.
+
+        Unlike bulk_get_or_create, this doesn't rely on a per-user cache
+        of the visible blocks, but looks all of the hashes up in a single
+        query.
+        """
+        block_record_lists_by_hash = {brl.hash_value: brl for brl in block_record_lists}
+        if not block_record_lists_by_hash:
+            return
+        existing_hashes = set(
+            cls.objects.filter(hashed__in=block_record_lists_by_hash.keys()).values_list('hashed', flat=True)
+        )
+        cls.objects.bulk_create([
+            VisibleBlocks(
+                blocks_json=brl.json_value,
+                hashed=brl.hash_value,
+                course_id=course_key,
+            )
+            for hash_value, brl in block_record_lists_by_hash.iteritems()
+            if hash_value not in existing_hashes
+        ])
+
     @classmethod
     def _initialize_cache(cls, user_id, course_key):
         """
@@ -455,6 +486,80 @@ class PersistentSubsectionGrade(TimeStampedModel):
             cls._emit_grade_calculated_event(grade)
         return grades
 
+    @classmethod
+    def bulk_update_or_create_grades(cls, grade_params_iter, course_key):
+        """
+        Bulk creation or update of the grades of any number of users in
+        the given course.
+
+        The existing grades are read in a single query.  New grades are
+        bulk created, and the existing grades whose values changed are
+        updated in bulk.  Returns the grades.
+        """
+        grade_params_iter = list(grade_params_iter)
+        if not grade_params_iter:
+            return []
+
+        user_ids = {params['user_id'] for params in grade_params_iter}
+        PersistentSubsectionGradeOverride.bulk_prefetch(user_ids, course_key)
+
+        map(cls._prepare_params, grade_params_iter)
+        VisibleBlocks.bulk_get_or_create_for_course(
+            course_key, [params['visible_blocks'] for params in grade_params_iter]
+        )
+        map(cls._prepare_params_visible_blocks_id, grade_params_iter)
+        map(cls._prepare_params_override, grade_params_iter)
+
+        grades = cls._bulk_write_grades(grade_params_iter, course_key)
+        for grade in grades:
+            cls._emit_grade_calculated_event(grade)
+        return grades
+
+    @classmethod
+    def _bulk_write_grades(cls, grade_params_iter, course_key, retry_conflicts=True):
+        """
+        Creates or updates the grades with the given prepared params, and
+        returns them.  If other processes created some of the new grades
+        in the meantime, these grades are written again, as updates.
+        """
+        existing_grades = {
+            (grade.user_id, grade.full_usage_key): grade
+            for grade in cls.objects.filter(
+                user_id__in={params['user_id'] for params in grade_params_iter},
+                course_id=course_key,
+            )
+        }
+        grades, new_grades, changed_grades = [], [], []
+        for params in grade_params_iter:
+            grade = existing_grades.get((params['user_id'], params['usage_key']))
+            if grade is None:
+                grade = PersistentSubsectionGrade(**params)
+                new_grades.append((params, grade))
+            else:
+                params = dict(params)
+                first_attempted = params.pop('first_attempted')
+                changed_fields = _set_changed_fields(grade, params, exclude=('user_id', 'usage_key', 'course_id'))
+                if first_attempted is not None and grade.first_attempted is None:
+                    grade.first_attempted = first_attempted
+                    changed_fields.append('first_attempted')
+                if changed_fields:
+                    changed_grades.append((grade, changed_fields))
+            grades.append(grade)
+
+        _bulk_update_changed_fields(cls, changed_grades)
+        try:
+            _bulk_create_atomically(cls, [grade for __, grade in new_grades])
+        except IntegrityError:
+            if not retry_conflicts:
+                raise
+            log.warning(u'Grades: Subsection grades created concurrently, updating them instead: %s', course_key)
+            rewritten_grades = iter(cls._bulk_write_grades(
+                [params for params, __ in new_grades], course_key, retry_conflicts=False,
+            ))
+            created_grades = {id(grade) for __, grade in new_grades}
+            grades = [next(rewritten_grades) if id(grade) in created_grades else grade for grade in grades]
+        return grades
+
     @classmethod
     def _prepare_params(cls, params):
         """
@@ -619,6 +724,71 @@ class PersistentCourseGrade(TimeStampedModel):
         cls._update_cache(course_id, user_id, grade)
         return grade
 
+    @classmethod
+    def bulk_update_or_create(cls, course_id, grade_params_iter):
+        """
+        Creates or updates the course grades of any number of users in
+        the given course.
+
+        The existing grades are read in a single query.  New grades are
+        bulk created, and the existing grades whose values changed are
+        updated in bulk.  Returns the PersistentCourseGrade objects.
+        """
+        grades = cls._bulk_write_grades(course_id, list(grade_params_iter))
+        for grade in grades:
+            cls._emit_grade_calculated_event(grade)
+            cls._update_cache(course_id, grade.user_id, grade)
+        return grades
+
+    @classmethod
+    def _bulk_write_grades(cls, course_id, grade_params_iter, retry_conflicts=True):
+        """
+        Creates or updates the grades with the given params, and returns
+        them.  If other processes created some of the new grades in the
+        meantime, these grades are written again, as updates.
+        """
+        existing_grades = {
+            grade.user_id: grade
+            for grade in cls.objects.filter(
+                user_id__in=[params['user_id'] for params in grade_params_iter],
+                course_id=course_id,
+            )
+        }
+        grades, new_grades, changed_grades = [], [], []
+        for original_params in grade_params_iter:
+            params = dict(original_params)
+            user_id = params.pop('user_id')
+            passed = params.pop('passed')
+            if params.get('course_version', None) is None:
+                params['course_version'] = ""
+
+            grade = existing_grades.get(user_id)
+            if grade is None:
+                grade = cls(user_id=user_id, course_id=course_id, passed_timestamp=now() if passed else None, **params)
+                new_grades.append((original_params, grade))
+            else:
+                changed_fields = _set_changed_fields(grade, params)
+                if passed and not grade.passed_timestamp:
+                    grade.passed_timestamp = now()
+                    changed_fields.append('passed_timestamp')
+                if changed_fields:
+                    changed_grades.append((grade, changed_fields))
+            grades.append(grade)
+
+        _bulk_update_changed_fields(cls, changed_grades)
+        try:
+            _bulk_create_atomically(cls, [grade for __, grade in new_grades])
+        except IntegrityError:
+            if not retry_conflicts:
+                raise
+            log.warning(u'Grades: Course grades created concurrently, updating them instead: %s', course_id)
+            rewritten_grades = iter(cls._bulk_write_grades(
+                course_id, [params for params, __ in new_grades], retry_conflicts=False,
+            ))
+            created_grades = {id(grade) for __, grade in new_grades}
+            grades = [next(rewritten_grades) if id(grade) in created_grades else grade for grade in grades]
+        return grades
+
     @classmethod
     def _update_cache(cls, course_id, user_id, grade):
         course_cache = get_cache(cls._CACHE_NAMESPACE).get(cls._cache_key(course_id))
@@ -673,6 +843,22 @@ class PersistentSubsectionGradeOverride(models.Model):
             cls.objects.filter(grade__user_id=user_id, grade__course_id=course_key)
         }
 
+    @classmethod
+    def bulk_prefetch(cls, user_ids, course_key):
+        """
+        Prefetches the overrides of all of the given users in the course,
+        in a single query.
+        """
+        prefetched = {user_id: {} for user_id in user_ids}
+        for override in cls.objects.select_related('grade').filter(
+                grade__user_id__in=prefetched.keys(),
+                grade__course_id=course_key,
+        ):
+            prefetched[override.grade.user_id][override.grade.usage_key] = override
+        cache = get_cache(cls._CACHE_NAMESPACE)
+        for user_id, overrides in prefetched.iteritems():
+            cache[(user_id, str(course_key))] = overrides
+
     @classmethod
     def get_override(cls, user_id, usage_key):
         prefetch_values = get_cache(cls._CACHE_NAMESPACE).get((user_id, str(usage_key.course_key)), None)
@@ -743,3 +929,52 @@ class PersistentSubsectionGradeOverrideHistory(models.Model):
 def prefetch(user, course_key):
     PersistentSubsectionGradeOverride.prefetch(user.id, course_key)
     VisibleBlocks.bulk_read(user.id, course_key)
+
+
+def _bulk_update_changed_fields(model_class, changed_models):
+    """
+    Saves the changed fields of the given (model, changed field names)
+    pairs, with a single UPDATE query per chunk of the models whose same
+    fields changed.
+    """
+    models_by_fields = defaultdict(list)
+    for model, changed_fields in changed_models:
+        models_by_fields[tuple(sorted(changed_fields))].append(model)
+
+    modified = now()
+    for field_names, changed in models_by_fields.iteritems():
+        for start in range(0, len(changed), BULK_UPDATE_CHUNK_SIZE):
+            chunk = changed[start:start + BULK_UPDATE_CHUNK_SIZE]
+            values = {
+                field_name: Case(
+                    *[When(pk=model.pk, then=Value(getattr(model, field_name))) for model in chunk],
+                    output_field=model_class._meta.get_field(field_name)  # pylint: disable=protected-access
+                )
+                for field_name in field_names
+            }
+            model_class.objects.filter(pk__in=[model.pk for model in chunk]).update(modified=modified, **values)
+        for model in changed:
+            model.modified = modified
+
+
+def _bulk_create_atomically(model_class, new_models):
+    """
+    Creates the given models with a single INSERT query, in a savepoint
+    which is rolled back if the query fails.
+    """
+    if new_models:
+        with transaction.atomic():
+            model_class.objects.bulk_create(new_models)
+
+
+def _set_changed_fields(model, values, exclude=()):
+    """
+    Sets the given field values on the given model, and returns the
+    names of the fields whose values changed.
+    """
+    changed_fields = []
+    for field_name, value in values.iteritems():
+        if field_name not in exclude and getattr(model, field_name) != value:
+            setattr(model, field_name, value)
+            changed_fields.append(field_name)
+    return changed_fields
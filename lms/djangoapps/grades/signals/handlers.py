@@ -24,9 +24,11 @@ from .signals import (
     SUBSECTION_OVERRIDE_CHANGED,
 )
 from .. import events
+from ..config.waffle import COALESCE_SUBSECTION_GRADE_TASKS, waffle
 from ..constants import ScoreDatabaseTableEnum
 from ..course_grade_factory import CourseGradeFactory
 from ..scores import weighted_score
+from ..task_coalescing import register_pending_task
 from ..tasks import (
     RECALCULATE_GRADE_DELAY_SECONDS,
     recalculate_subsection_grade_v3,
@@ -213,24 +215,27 @@ def enqueue_subsection_update(sender, **kwargs):  # pylint: disable=unused-argum
     """
     Handles the PROBLEM_WEIGHTED_SCORE_CHANGED or SUBSECTION_OVERRIDE_CHANGED signals by
     enqueueing a subsection update operation to occur asynchronously.
+
+    With the coalesce_subsection_grade_tasks switch enabled, pending
+    updates of the same block are coalesced into a single one.
     """
     events.grade_updated(**kwargs)
-    recalculate_subsection_grade_v3.apply_async(
-        kwargs=dict(
-            user_id=kwargs['user_id'],
-            anonymous_user_id=kwargs.get('anonymous_user_id'),
-            course_id=kwargs['course_id'],
-            usage_id=kwargs['usage_id'],
-            only_if_higher=kwargs.get('only_if_higher'),
-            expected_modified_time=to_timestamp(kwargs['modified']),
-            score_deleted=kwargs.get('score_deleted', False),
-            event_transaction_id=unicode(get_event_transaction_id()),
-            event_transaction_type=unicode(get_event_transaction_type()),
-            score_db_table=kwargs['score_db_table'],
-            force_update_subsections=kwargs.get('force_update_subsections', False),
-        ),
-        countdown=RECALCULATE_GRADE_DELAY_SECONDS,
+    task_kwargs = dict(
+        user_id=kwargs['user_id'],
+        anonymous_user_id=kwargs.get('anonymous_user_id'),
+        course_id=kwargs['course_id'],
+        usage_id=kwargs['usage_id'],
+        only_if_higher=kwargs.get('only_if_higher'),
+        expected_modified_time=to_timestamp(kwargs['modified']),
+        score_deleted=kwargs.get('score_deleted', False),
+        event_transaction_id=unicode(get_event_transaction_id()),
+        event_transaction_type=unicode(get_event_transaction_type()),
+        score_db_table=kwargs['score_db_table'],
+        force_update_subsections=kwargs.get('force_update_subsections', False),
     )
+    if waffle().is_enabled(COALESCE_SUBSECTION_GRADE_TASKS):
+        task_kwargs = register_pending_task(task_kwargs)
+    recalculate_subsection_grade_v3.apply_async(kwargs=task_kwargs, countdown=RECALCULATE_GRADE_DELAY_SECONDS)
 
 
 @receiver(SUBSECTION_SCORE_CHANGED)
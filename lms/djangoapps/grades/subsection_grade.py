@@ -268,6 +268,25 @@ class CreateSubsectionGrade(NonZeroSubsectionGrade):
         ]
         return PersistentSubsectionGrade.bulk_create_grades(params, student.id, course_key)
 
+    @classmethod
+    def bulk_update_or_create_models(cls, subsection_grades_by_student, course_key, force_update_subsections=False):
+        """
+        Saves or updates, in bulk, the subsection grades of any number of
+        students in a persisted model.
+
+        Arguments:
+            subsection_grades_by_student: iterable of (student, list of
+                CreateSubsectionGrade) pairs.
+        """
+        params = [
+            subsection_grade._persisted_model_params(student)  # pylint: disable=protected-access
+            for student, subsection_grades in subsection_grades_by_student
+            for subsection_grade in subsection_grades
+            # pylint: disable=protected-access
+            if subsection_grade._should_persist_per_attempted(force_update_subsections=force_update_subsections)
+        ]
+        return PersistentSubsectionGrade.bulk_update_or_create_grades(params, course_key)
+
     def _should_persist_per_attempted(self, score_deleted=False, force_update_subsections=False):
         """
         Returns whether the SubsectionGrade's model should be
@@ -7,6 +7,7 @@ from courseware.model_data import ScoresClient
 from lms.djangoapps.grades.config import assume_zero_if_absent, should_persist_grades
 from lms.djangoapps.grades.models import PersistentSubsectionGrade
 from lms.djangoapps.grades.scores import possibly_scored
+from openedx.core.lib.cache_utils import get_cache
 from openedx.core.lib.grade_utils import is_score_higher_or_equal
 from student.models import anonymous_id_for_user
 from submissions import api as submissions_api
@@ -21,6 +22,8 @@ class SubsectionGradeFactory(object):
     """
     Factory for Subsection Grades.
     """
+    _CACHE_NAMESPACE = u'grades.subsection_grade_factory.SubsectionGradeFactory'
+
     def __init__(self, student, course=None, course_structure=None, course_data=None):
         self.student = student
         self.course_data = course_data or CourseData(student, course=course, structure=course_structure)
@@ -63,9 +66,29 @@ class SubsectionGradeFactory(object):
         )
         self._unsaved_subsection_grades.clear()
 
-    def update(self, subsection, only_if_higher=None, score_deleted=False, force_update_subsections=False, persist_grade=True):
+    def pop_unsaved(self):
+        """
+        Returns, and forgets, all the unsaved subsection_grades to this
+        point, so they can be persisted along with those of other users.
+        """
+        unsaved_subsection_grades = self._unsaved_subsection_grades.values()
+        self._unsaved_subsection_grades.clear()
+        return unsaved_subsection_grades
+
+    def update(
+            self,
+            subsection,
+            only_if_higher=None,
+            score_deleted=False,
+            force_update_subsections=False,
+            persist_grade=True,
+            read_only=False,
+    ):
         """
         Updates the SubsectionGrade object for the student and subsection.
+
+        If read_only is True, the updated grade is not saved right away,
+        but is left to be persisted in bulk.
         """
         self._log_event(log.debug, u"update, subsection: {}".format(subsection.location), subsection)
 
@@ -74,6 +97,10 @@ class SubsectionGradeFactory(object):
         )
 
         if persist_grade and should_persist_grades(self.course_data.course_key):
+            if read_only:
+                self._unsaved_subsection_grades[subsection.location] = calculated_grade
+                return calculated_grade
+
             if only_if_higher:
                 try:
                     grade_model = PersistentSubsectionGrade.read_grade(self.student.id, subsection.location)
@@ -98,12 +125,34 @@ class SubsectionGradeFactory(object):
 
         return calculated_grade
 
+    @classmethod
+    def prefetch_scores(cls, course_key, users, block_types):
+        """
+        Prefetches the scores stored in the user state (in CSM) for the
+        blocks of the given types, for all of the given users in the
+        course.
+        """
+        get_cache(cls._CACHE_NAMESPACE)[cls._cache_key(course_key)] = ScoresClient.create_for_users(
+            course_key, [user.id for user in users], block_types,
+        )
+
+    @classmethod
+    def clear_prefetched_scores(cls, course_key):
+        """
+        Clears prefetched scores for this course from the RequestCache.
+        """
+        get_cache(cls._CACHE_NAMESPACE).pop(cls._cache_key(course_key), None)
+
     @lazy
     def _csm_scores(self):
         """
         Lazily queries and returns all the scores stored in the user
         state (in CSM) for the course, while caching the result.
         """
+        prefetched_scores = get_cache(self._CACHE_NAMESPACE).get(self._cache_key(self.course_data.course_key), {})
+        if self.student.id in prefetched_scores:
+            return prefetched_scores[self.student.id]
+
         scorable_locations = [block_key for block_key in self.course_data.structure if possibly_scored(block_key)]
         return ScoresClient.create_for_locations(self.course_data.course_key, self.student.id, scorable_locations)
 
@@ -161,3 +210,7 @@ class SubsectionGradeFactory(object):
             getattr(subsection, 'subtree_edited_on', None),
             self.student.id,
         ))
+
+    @classmethod
+    def _cache_key(cls, course_key):
+        return u"csm_scores_cache.{}".format(course_key)
@@ -0,0 +1,91 @@
+"""
+Coalescing of pending recalculate_subsection_grade tasks.
+
+Every change to a learner's score enqueues a task to recalculate the
+subsection grades containing the scored block.  When the score changes
+repeatedly in a short time (a learner resubmitting, or a rescore), the
+queue fills with tasks that all recalculate the same grades.
+
+Instead, the kwargs of the pending tasks for the same user, block and
+score table are merged into a record in the cache, and each enqueued
+task carries a token.  When a task runs, it is skipped if a newer task
+for the same record is pending, and the newest task runs once with the
+merged kwargs.  Tasks whose record expired, or was lost, simply run with
+their own kwargs.
+"""
+from hashlib import md5
+from uuid import uuid4
+
+import dogstats_wrapper as dog_stats_api
+from django.core.cache import cache
+
+# How long the record of the pending tasks for a block is kept, which
+# bounds the window in which tasks are coalesced.
+COALESCING_TIMEOUT_SECONDS = 300
+
+# Task kwarg holding the token of an enqueued task.
+TOKEN_KWARG = 'coalescing_token'
+
+
+def register_pending_task(task_kwargs):
+    """
+    Records the kwargs of a task about to be enqueued, merged with those
+    of any pending tasks for the same block.  Returns the kwargs to
+    enqueue the task with.
+    """
+    cache_key = _cache_key(task_kwargs)
+    token = uuid4().hex
+    record = cache.get(cache_key)
+    if record is None:
+        record = {'tokens': [], 'kwargs': task_kwargs}
+    else:
+        record['kwargs'] = _merge_kwargs(record['kwargs'], task_kwargs)
+    record['tokens'].append(token)
+    cache.set(cache_key, record, COALESCING_TIMEOUT_SECONDS)
+    return dict(task_kwargs, **{TOKEN_KWARG: token})
+
+
+def claim_task(task_kwargs):
+    """
+    Returns the kwargs the given task should run with, or None if the task
+    was coalesced into a newer pending task.
+    """
+    token = task_kwargs.get(TOKEN_KWARG)
+    run_kwargs = {name: value for name, value in task_kwargs.iteritems() if name != TOKEN_KWARG}
+    if token is not None:
+        cache_key = _cache_key(task_kwargs)
+        record = cache.get(cache_key)
+        if record is not None and token in record['tokens']:
+            if record['tokens'][-1] != token:
+                dog_stats_api.increment('lms.grades.recalculate_subsection_grade.coalesced')
+                return None
+            cache.delete(cache_key)
+            run_kwargs = record['kwargs']
+
+    dog_stats_api.increment('lms.grades.recalculate_subsection_grade.executed')
+    return run_kwargs
+
+
+def _merge_kwargs(older_kwargs, newer_kwargs):
+    """
+    Returns the kwargs of a single task that has the effect of running
+    tasks with the older and newer kwargs in turn.  The newer task's
+    event transaction is kept.
+    """
+    merged_kwargs = dict(newer_kwargs)
+    merged_kwargs['expected_modified_time'] = max(
+        older_kwargs['expected_modified_time'], newer_kwargs['expected_modified_time'],
+    )
+    merged_kwargs['only_if_higher'] = older_kwargs.get('only_if_higher') and newer_kwargs.get('only_if_higher')
+    for flag_name in ('score_deleted', 'force_update_subsections'):
+        merged_kwargs[flag_name] = bool(older_kwargs.get(flag_name) or newer_kwargs.get(flag_name))
+    return merged_kwargs
+
+
+def _cache_key(task_kwargs):
+    """
+    Returns the cache key of the record of pending tasks for the user,
+    block and score table of the given task.
+    """
+    pending_task_id = u'{user_id}.{usage_id}.{score_db_table}'.format(**task_kwargs)
+    return 'grades.recalculate_subsection_grade.{}'.format(md5(pending_task_id.encode('utf-8')).hexdigest())
@@ -34,6 +34,7 @@ from .exceptions import DatabaseNotReadyError
 from .services import GradesService
 from .signals.signals import SUBSECTION_SCORE_CHANGED
 from .subsection_grade_factory import SubsectionGradeFactory
+from .task_coalescing import claim_task
 from .transformer import GradesTransformer
 
 log = getLogger(__name__)
@@ -180,8 +181,15 @@ def recalculate_subsection_grade_v3(self, **kwargs):
     """
     Latest version of the recalculate_subsection_grade task.  See docstring
     for _recalculate_subsection_grade for further description.
+
+    Tasks enqueued with a coalescing_token are skipped when a newer task
+    for the same block is pending; see task_coalescing.
     """
-    _recalculate_subsection_grade(self, **kwargs)
+    run_kwargs = claim_task(kwargs)
+    if run_kwargs is None:
+        log.info(u"Grades: recalculate_subsection_grade_v3 coalesced. Task ID: %s.", self.request.id)
+        return
+    _recalculate_subsection_grade(self, **run_kwargs)
 
 
 def _recalculate_subsection_grade(self, **kwargs):
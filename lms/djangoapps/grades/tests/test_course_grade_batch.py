@@ -0,0 +1,79 @@
+"""
+Tests for the CourseGradeBatch class.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+
+from lms.djangoapps.course_blocks.api import get_course_blocks
+from student.tests.factories import UserFactory
+
+from ..course_data import CourseData
+from ..course_grade_batch import CourseGradeBatch
+from ..subsection_grade_factory import SubsectionGradeFactory
+from .base import GradeTestBase
+from .utils import mock_get_score
+
+
+class TestCourseGradeBatch(GradeTestBase):
+    """
+    Tests for computing the course grades of a batch of users.
+    """
+    def setUp(self):
+        super(TestCourseGradeBatch, self).setUp()
+        self.users = [UserFactory.create(), UserFactory.create(), UserFactory.create()]
+        self.course_data = CourseData(user=None, course=self.course)
+
+    def test_shared_structure(self):
+        with CourseGradeBatch(self.users, self.course_data) as batch:
+            structures = [batch.course_data_for(user).structure for user in self.users]
+        self.assertIs(structures[0], structures[1])
+
+    @patch('lms.djangoapps.grades.course_grade_batch.get_course_blocks', wraps=get_course_blocks)
+    def test_structure_transformed_once_per_access(self, mock_get_course_blocks):
+        with CourseGradeBatch(self.users, self.course_data) as batch:
+            batch.course_data_for(self.users[0]).structure  # pylint: disable=expression-not-assigned
+            with CaptureQueriesContext(connection) as access_queries:
+                batch._access_key(self.users[1])  # pylint: disable=protected-access
+            # Only the access of the other users is looked up.
+            with self.assertNumQueries(len(access_queries)):
+                structure = batch.course_data_for(self.users[2]).structure
+        self.assertEqual(mock_get_course_blocks.call_count, 1)
+        self.assertIsNotNone(structure)
+
+    @patch('lms.djangoapps.grades.course_grade_batch.get_course_blocks', wraps=get_course_blocks)
+    def test_structure_transformed_for_staff(self, mock_get_course_blocks):
+        staff_user = UserFactory.create(is_staff=True)
+        with CourseGradeBatch(self.users + [staff_user], self.course_data) as batch:
+            structures = [batch.course_data_for(user).structure for user in (self.users[0], staff_user)]
+        self.assertEqual(mock_get_course_blocks.call_count, 2)
+        # The structures still have the same blocks.
+        self.assertIs(structures[0], structures[1])
+
+    @patch('lms.djangoapps.grades.course_grade_batch.has_individual_student_override_provider')
+    def test_structure_not_shared_with_overrides(self, mock_has_override_provider):
+        mock_has_override_provider.return_value = True
+        with CourseGradeBatch(self.users, self.course_data) as batch:
+            structures = [batch.course_data_for(user).structure for user in self.users]
+        self.assertIsNot(structures[0], structures[1])
+
+    def test_prefetched_scores(self):
+        with CourseGradeBatch(self.users, self.course_data) as batch:
+            for user in self.users:
+                factory = SubsectionGradeFactory(user, course_data=batch.course_data_for(user))
+                with self.assertNumQueries(0):
+                    factory._csm_scores  # pylint: disable=pointless-statement, protected-access
+
+    def test_persist(self):
+        with CourseGradeBatch(self.users, self.course_data) as batch:
+            with mock_get_score(1, 2):
+                course_grades = [
+                    batch.update(user, batch.course_data_for(user), force_update_subsections=True)
+                    for user in self.users
+                ]
+            self.assertEqual(batch.updated_users, self.users)
+            self.assertEqual(
+                batch.persist(),
+                [(user, course_grade, True) for user, course_grade in zip(self.users, course_grades)],
+            )
+            self.assertEqual(batch.updated_users, [])
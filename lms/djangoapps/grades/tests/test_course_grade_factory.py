@@ -15,6 +15,7 @@ from xmodule.modulestore.tests.factories import CourseFactory
 from ..config.waffle import ASSUME_ZERO_GRADE_IF_ABSENT, waffle
 from ..course_grade import CourseGrade, ZeroCourseGrade
 from ..course_grade_factory import CourseGradeFactory
+from ..models import PersistentCourseGrade, PersistentSubsectionGrade
 from ..subsection_grade import ReadSubsectionGrade, ZeroSubsectionGrade
 from .base import GradeTestBase
 from .utils import mock_get_score
@@ -182,6 +183,39 @@ class TestCourseGradeFactory(GradeTestBase):
             ))
         self.assertEqual(mock_update.called, force_update)
 
+    @ddt.data(True, False)
+    def test_iter_in_batches(self, force_update):
+        users = [self.request.user, UserFactory.create(), UserFactory.create()]
+        with mock_get_score(1, 2):
+            results = list(CourseGradeFactory().iter(
+                users=users, course=self.course, force_update=force_update, batch_size=2,
+            ))
+
+        self.assertEqual([result.student for result in results], users)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.course_grade.percent, 0.5)
+
+        user_ids = [user.id for user in users]
+        self.assertEqual(
+            PersistentCourseGrade.objects.filter(course_id=self.course.id, user_id__in=user_ids).count(),
+            len(users),
+        )
+        self.assertEqual(
+            PersistentSubsectionGrade.objects.filter(course_id=self.course.id, user_id__in=user_ids).count(),
+            2 * len(users),
+        )
+        for user in users:
+            self.assertEqual(CourseGradeFactory().read(user, self.course).percent, 0.5)
+
+    def test_iter_in_batches_reads_persisted_grades(self):
+        with mock_get_score(1, 2):
+            CourseGradeFactory().update(self.request.user, self.course, force_update_subsections=True)
+        with patch('lms.djangoapps.grades.course_grade_batch.CourseGrade.update') as mock_update:
+            results = list(CourseGradeFactory().iter(users=[self.request.user], course=self.course, batch_size=2))
+        self.assertFalse(mock_update.called)
+        self.assertEqual(results[0].course_grade.percent, 0.5)
+
     def test_course_grade_summary(self):
         with mock_get_score(1, 2):
             self.subsection_grade_factory.update(self.course_structure[self.sequence.location])
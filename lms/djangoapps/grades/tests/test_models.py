@@ -16,6 +16,7 @@ from freezegun import freeze_time
 from mock import patch
 from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
 
+from lms.djangoapps.grades import models
 from lms.djangoapps.grades.models import (
     BLOCK_RECORD_LIST_VERSION,
     BlockRecord,
@@ -294,6 +295,55 @@ class PersistentSubsectionGradeTest(GradesModelTestCase):
             grade = PersistentSubsectionGrade.update_or_create_grade(**self.params)
         self._assert_tracker_emitted_event(tracker_mock, grade)
 
+    def test_bulk_update_or_create_grades(self):
+        created_grade = PersistentSubsectionGrade.update_or_create_grade(**self.params)
+        grade_params = [
+            dict(self.params, earned_all=7.0, first_attempted=None),
+            dict(self.params, user_id=54321),
+        ]
+        with self.assertNumQueries(7):
+            updated_grade, __ = PersistentSubsectionGrade.bulk_update_or_create_grades(
+                grade_params, self.course_key,
+            )
+        self.assertEqual(updated_grade.id, created_grade.id)
+
+        read_grade = PersistentSubsectionGrade.read_grade(self.params["user_id"], self.usage_key)
+        self.assertEqual(read_grade.earned_all, 7.0)
+        self.assertEqual(read_grade.first_attempted, self.params["first_attempted"])
+
+        read_grade = PersistentSubsectionGrade.read_grade(54321, self.usage_key)
+        self.assertEqual(read_grade.earned_all, 6.0)
+        self.assertEqual(read_grade.visible_blocks.blocks, self.block_records)
+
+    def test_bulk_update_grades(self):
+        user_ids = [self.params['user_id'], 54321, 54322]
+        for user_id in user_ids:
+            PersistentSubsectionGrade.update_or_create_grade(**dict(self.params, user_id=user_id))
+        grade_params = [dict(self.params, user_id=user_id, earned_all=7.0) for user_id in user_ids]
+        # The changed grades are written with a single query.
+        with self.assertNumQueries(4):
+            PersistentSubsectionGrade.bulk_update_or_create_grades(grade_params, self.course_key)
+        for user_id in user_ids:
+            self.assertEqual(PersistentSubsectionGrade.read_grade(user_id, self.usage_key).earned_all, 7.0)
+
+    def test_bulk_update_or_create_concurrently_created_grades(self):
+        bulk_create_atomically = models._bulk_create_atomically  # pylint: disable=protected-access
+
+        def create_concurrently(model_class, new_models):
+            """ Creates one of the new grades in the meantime, the first time. """
+            if not create_concurrently.done:
+                create_concurrently.done = True
+                PersistentSubsectionGrade.update_or_create_grade(**dict(self.params, user_id=54321))
+            bulk_create_atomically(model_class, new_models)
+        create_concurrently.done = False
+
+        grade_params = [dict(self.params, user_id=user_id, earned_all=7.0) for user_id in (54321, 54322)]
+        with patch('lms.djangoapps.grades.models._bulk_create_atomically', side_effect=create_concurrently):
+            grades = PersistentSubsectionGrade.bulk_update_or_create_grades(grade_params, self.course_key)
+        self.assertEqual([grade.user_id for grade in grades], [54321, 54322])
+        for user_id in (54321, 54322):
+            self.assertEqual(PersistentSubsectionGrade.read_grade(user_id, self.usage_key).earned_all, 7.0)
+
     def test_create_event(self):
         with patch('lms.djangoapps.grades.events.tracker') as tracker_mock:
             grade = PersistentSubsectionGrade.update_or_create_grade(**self.params)
@@ -446,6 +496,52 @@ class PersistentCourseGradesTest(GradesModelTestCase):
         with self.assertRaises(error):
             PersistentCourseGrade.update_or_create(**self.params)
 
+    def test_bulk_update_or_create(self):
+        created_grade = PersistentCourseGrade.update_or_create(**self.params)
+        course_id = self.params.pop("course_id")
+        grade_params = [
+            dict(self.params, percent_grade=88.8),
+            dict(self.params, user_id=54321, passed=False),
+        ]
+        with self.assertNumQueries(5):
+            updated_grade, __ = PersistentCourseGrade.bulk_update_or_create(course_id, grade_params)
+        self.assertEqual(updated_grade.id, created_grade.id)
+        self.assertEqual(updated_grade.passed_timestamp, created_grade.passed_timestamp)
+
+        self.assertEqual(PersistentCourseGrade.read(self.params["user_id"], course_id).percent_grade, 88.8)
+        self.assertIsNone(PersistentCourseGrade.read(54321, course_id).passed_timestamp)
+
+    def test_bulk_update(self):
+        course_id = self.params.pop("course_id")
+        user_ids = [self.params["user_id"], 54321, 54322]
+        for user_id in user_ids:
+            PersistentCourseGrade.update_or_create(course_id=course_id, **dict(self.params, user_id=user_id))
+        grade_params = [dict(self.params, user_id=user_id, percent_grade=88.8) for user_id in user_ids]
+        # The changed grades are written with a single query.
+        with self.assertNumQueries(2):
+            PersistentCourseGrade.bulk_update_or_create(course_id, grade_params)
+        for user_id in user_ids:
+            self.assertEqual(PersistentCourseGrade.objects.get(user_id=user_id).percent_grade, 88.8)
+
+    def test_bulk_update_or_create_concurrently_created_grades(self):
+        course_id = self.params.pop("course_id")
+        bulk_create_atomically = models._bulk_create_atomically  # pylint: disable=protected-access
+
+        def create_concurrently(model_class, new_models):
+            """ Creates one of the new grades in the meantime, the first time. """
+            if not create_concurrently.done:
+                create_concurrently.done = True
+                PersistentCourseGrade.update_or_create(course_id=course_id, **dict(self.params, user_id=54321))
+            bulk_create_atomically(model_class, new_models)
+        create_concurrently.done = False
+
+        grade_params = [dict(self.params, user_id=user_id, percent_grade=88.8) for user_id in (54321, 54322)]
+        with patch('lms.djangoapps.grades.models._bulk_create_atomically', side_effect=create_concurrently):
+            grades = PersistentCourseGrade.bulk_update_or_create(course_id, grade_params)
+        self.assertEqual([grade.user_id for grade in grades], [54321, 54322])
+        for user_id in (54321, 54322):
+            self.assertEqual(PersistentCourseGrade.objects.get(user_id=user_id).percent_grade, 88.8)
+
     def test_grade_does_not_exist(self):
         with self.assertRaises(PersistentCourseGrade.DoesNotExist):
             PersistentCourseGrade.read(self.params["user_id"], self.params["course_id"])
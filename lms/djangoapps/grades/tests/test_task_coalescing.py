@@ -0,0 +1,77 @@
+"""
+Tests for the coalescing of recalculate_subsection_grade tasks.
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from mock import patch
+
+from ..constants import ScoreDatabaseTableEnum
+from ..task_coalescing import TOKEN_KWARG, claim_task, register_pending_task
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TaskCoalescingTest(TestCase):
+    """
+    Tests for registering and claiming pending tasks.
+    """
+    shard = 4
+
+    def setUp(self):
+        super(TaskCoalescingTest, self).setUp()
+        cache.clear()
+        self.task_kwargs = dict(
+            user_id=1,
+            anonymous_user_id=None,
+            course_id=u'course-v1:edX+Test+Run',
+            usage_id=u'block-v1:edX+Test+Run+type@problem+block@problem',
+            only_if_higher=None,
+            expected_modified_time=100,
+            score_deleted=False,
+            event_transaction_id=u'first',
+            event_transaction_type=u'edx.grades.problem.submitted',
+            score_db_table=ScoreDatabaseTableEnum.courseware_student_module,
+            force_update_subsections=False,
+        )
+
+    def test_single_task(self):
+        enqueued_kwargs = register_pending_task(self.task_kwargs)
+        self.assertIn(TOKEN_KWARG, enqueued_kwargs)
+        self.assertEqual(claim_task(enqueued_kwargs), self.task_kwargs)
+
+    def test_task_without_token(self):
+        self.assertEqual(claim_task(self.task_kwargs), self.task_kwargs)
+
+    def test_expired_record(self):
+        enqueued_kwargs = register_pending_task(self.task_kwargs)
+        cache.clear()
+        self.assertEqual(claim_task(enqueued_kwargs), self.task_kwargs)
+
+    @patch('lms.djangoapps.grades.task_coalescing.dog_stats_api')
+    def test_coalesced_tasks(self, mock_dog_stats_api):
+        first_kwargs = register_pending_task(dict(self.task_kwargs, score_deleted=True))
+        second_kwargs = register_pending_task(dict(
+            self.task_kwargs,
+            expected_modified_time=200,
+            only_if_higher=True,
+            event_transaction_id=u'second',
+        ))
+        other_block_kwargs = register_pending_task(dict(self.task_kwargs, usage_id=u'other'))
+
+        self.assertIsNone(claim_task(first_kwargs))
+        self.assertEqual(claim_task(second_kwargs), dict(
+            self.task_kwargs,
+            expected_modified_time=200,
+            score_deleted=True,
+            event_transaction_id=u'second',
+        ))
+        self.assertEqual(claim_task(other_block_kwargs), dict(self.task_kwargs, usage_id=u'other'))
+
+        # A retry of the executed task, or a late duplicate, runs as is.
+        self.assertEqual(claim_task(first_kwargs), dict(self.task_kwargs, score_deleted=True))
+
+        self.assertEqual(
+            [call[0][0] for call in mock_dog_stats_api.increment.call_args_list],
+            ['lms.grades.recalculate_subsection_grade.coalesced'] +
+            ['lms.grades.recalculate_subsection_grade.executed'] * 3,
+        )
@@ -156,6 +156,14 @@ class RecalculateSubsectionGradeTest(HasCourseWithProblemsMixin, ModuleStoreTest
             PROBLEM_WEIGHTED_SCORE_CHANGED.send(sender=None, **send_args)
             mock_task_apply.assert_called_once_with(countdown=RECALCULATE_GRADE_DELAY_SECONDS, kwargs=local_task_args)
 
+    @patch('lms.djangoapps.grades.tasks._update_subsection_grades')
+    @patch('lms.djangoapps.grades.tasks.claim_task', return_value=None)
+    def test_coalesced_task_not_run(self, mock_claim_task, mock_update_subsection_grades):
+        self.set_up_course()
+        recalculate_subsection_grade_v3.apply_async(kwargs=self.recalculate_subsection_grade_kwargs)
+        mock_claim_task.assert_called_once_with(self.recalculate_subsection_grade_kwargs)
+        self.assertFalse(mock_update_subsection_grades.called)
+
     @patch('lms.djangoapps.grades.signals.signals.SUBSECTION_SCORE_CHANGED.send')
     def test_triggers_subsection_score_signal(self, mock_subsection_signal):
         """
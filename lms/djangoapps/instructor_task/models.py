@@ -18,12 +18,14 @@ import hashlib
 import json
 import logging
 import os.path
+import shutil
+import tempfile
 from uuid import uuid4
 
 from boto.exception import BotoServerError
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.db import models, transaction
 from opaque_keys.edx.django.models import CourseKeyField
 from six import text_type
@@ -36,6 +38,9 @@ logger = logging.getLogger(__name__)
 QUEUING = 'QUEUING'
 PROGRESS = 'PROGRESS'
 
+# Reports are written to a temporary file that is kept in memory up to this size.
+REPORT_SPOOL_MAX_MEMORY_SIZE = 5 * 1024 * 1024
+
 
 class InstructorTask(models.Model):
     """
@@ -183,9 +188,7 @@ class InstructorTask(models.Model):
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download.
     """
     @classmethod
     def from_config(cls, config_name):
@@ -269,14 +272,41 @@ class DjangoStorageReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of
         strings), write the rows to the storage backend in csv format.
+
+        `rows` can be any iterable, such as a generator: the rows are written
+        one at a time to a temporary file, which is kept in memory until it
+        gets larger than REPORT_SPOOL_MAX_MEMORY_SIZE bytes, and the storage
+        backend reads the file a chunk at a time.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_MEMORY_SIZE) as output_buffer:
+            # Adding unicode signature (BOM) for MS Excel 2013 compatibility
+            output_buffer.write(codecs.BOM_UTF8)
+            csvwriter = csv.writer(output_buffer)
+            csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            output_buffer.seek(0)
+            self.store(course_id, filename, File(output_buffer, name=filename))
+
+    def store_concatenated(self, course_id, filename, part_filenames):
+        """
+        Given a course_id, filename, and the filenames of CSV files written
+        by `store_rows` for the same course, write their concatenation to the
+        storage backend, with a single unicode signature (BOM).
+        """
+        with tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_MEMORY_SIZE) as output_buffer:
+            output_buffer.write(codecs.BOM_UTF8)
+            for part_filename in part_filenames:
+                with self.storage.open(self.path_to(course_id, part_filename)) as part_file:
+                    if part_file.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                        part_file.seek(0)
+                    shutil.copyfileobj(part_file, output_buffer)
+            output_buffer.seek(0)
+            self.store(course_id, filename, File(output_buffer, name=filename))
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file `filename` of the given course, if it exists.
         """
-        output_buffer = ContentFile('')
-        # Adding unicode signature (BOM) for MS Excel 2013 compatibility
-        output_buffer.write(codecs.BOM_UTF8)
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        output_buffer.seek(0)
-        self.store(course_id, filename, output_buffer)
+        self.storage.delete(self.path_to(course_id, filename))
 
     def links_for(self, course_id):
         """
@@ -45,6 +45,7 @@ from lms.djangoapps.instructor_task.tasks_helper.misc import (
 from lms.djangoapps.instructor_task.tasks_helper.module_state import (
     delete_problem_module_state,
     perform_module_state_update,
+    perform_module_state_update_subtask,
     override_score_module_state,
     rescore_problem_module_state,
     reset_attempts_module_state
@@ -77,7 +78,10 @@ def rescore_problem(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('rescored')
     update_fcn = partial(rescore_problem_module_state, xmodule_instance_args)
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    visit_fcn = partial(
+        perform_module_state_update, update_fcn, None,
+        create_subtask_fcn=partial(_create_module_state_subtask, xmodule_instance_args),
+    )
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -90,7 +94,10 @@ def override_problem_score(entry_id, xmodule_instance_args):
     action_name = ugettext_noop('overridden')
     update_fcn = partial(override_score_module_state, xmodule_instance_args)
 
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    visit_fcn = partial(
+        perform_module_state_update, update_fcn, None,
+        create_subtask_fcn=partial(_create_module_state_subtask, xmodule_instance_args),
+    )
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -112,7 +119,10 @@ def reset_problem_attempts(entry_id, xmodule_instance_args):
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('reset')
     update_fcn = partial(reset_attempts_module_state, xmodule_instance_args)
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    visit_fcn = partial(
+        perform_module_state_update, update_fcn, None,
+        create_subtask_fcn=partial(_create_module_state_subtask, xmodule_instance_args),
+    )
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
@@ -134,10 +144,47 @@ def delete_problem_state(entry_id, xmodule_instance_args):
     # Translators: This is a past-tense verb that is inserted into task progress messages as {action}.
     action_name = ugettext_noop('deleted')
     update_fcn = partial(delete_problem_module_state, xmodule_instance_args)
-    visit_fcn = partial(perform_module_state_update, update_fcn, None)
+    visit_fcn = partial(
+        perform_module_state_update, update_fcn, None,
+        create_subtask_fcn=partial(_create_module_state_subtask, xmodule_instance_args),
+    )
     return run_main_task(entry_id, visit_fcn, action_name)
 
 
+# The functions that update each StudentModule, by the action name of their tasks.
+MODULE_STATE_UPDATE_FUNCTIONS = {
+    'rescored': rescore_problem_module_state,
+    'overridden': override_score_module_state,
+    'reset': reset_attempts_module_state,
+    'deleted': delete_problem_module_state,
+}
+
+
+@task
+def update_problem_module_states(entry_id, action_name, xmodule_instance_args, module_ids, subtask_status_dict):
+    """
+    Updates some of the StudentModules of a rescore, override, reset or delete task.
+
+    Large tasks are split into such subtasks by perform_module_state_update().
+    `entry_id` is the id value of the InstructorTask entry of the task, `action_name` its
+    past-tense verb, and `module_ids` the ids of the StudentModules to update.
+    `subtask_status_dict` is the initial status of this subtask, see SubtaskStatus.
+
+    `xmodule_instance_args` provides information needed by _get_module_instance_for_task()
+    to instantiate an xmodule instance.
+    """
+    update_fcn = partial(MODULE_STATE_UPDATE_FUNCTIONS[action_name], xmodule_instance_args)
+    return perform_module_state_update_subtask(update_fcn, entry_id, action_name, module_ids, subtask_status_dict)
+
+
+def _create_module_state_subtask(xmodule_instance_args, entry_id, action_name, module_ids, initial_subtask_status):
+    """Creates a subtask to update the StudentModules with the given ids."""
+    return update_problem_module_states.subtask(
+        (entry_id, action_name, xmodule_instance_args, module_ids, initial_subtask_status.to_dict()),
+        task_id=initial_subtask_status.task_id,
+    )
+
+
 @task(base=BaseInstructorTask)
 def send_bulk_course_email(entry_id, _xmodule_instance_args):
     """Sends emails to recipients enrolled in a course.
@@ -183,10 +230,57 @@ def calculate_grades_csv(entry_id, xmodule_instance_args):
         xmodule_instance_args.get('task_id'), entry_id, action_name
     )
 
-    task_fn = partial(CourseGradeReport.generate, xmodule_instance_args)
+    task_fn = partial(
+        CourseGradeReport.generate, xmodule_instance_args,
+        create_shard_subtask_fcn=partial(_create_grade_report_shard_subtask, xmodule_instance_args),
+    )
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(
+    routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+    default_retry_delay=settings.COURSE_GRADE_REPORT_SHARD_RETRY_DELAY,
+    max_retries=settings.COURSE_GRADE_REPORT_SHARD_MAX_RETRIES,
+)
+def generate_grade_report_shard(entry_id, xmodule_instance_args, shard, subtask_status_dict):
+    """
+    Generates the grade report rows of a shard of the learners of a course, into partial CSV files.
+
+    The grade reports of large courses are split into such subtasks by CourseGradeReport.generate().
+    `entry_id` is the id value of the InstructorTask entry of the report, `shard` describes
+    the learners of the shard, and `subtask_status_dict` is the initial status of this
+    subtask, see SubtaskStatus.
+    """
+    return CourseGradeReport.generate_shard(
+        entry_id, xmodule_instance_args, shard, subtask_status_dict, _create_grade_report_merge_subtask
+    )
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
+def merge_grade_report_shards(entry_id, num_shards, subtask_status_dict):
+    """
+    Merges the partial CSV files of the `num_shards` shards of a grade report into the report,
+    once all the shards are done.
+    """
+    return CourseGradeReport.merge_shards(entry_id, num_shards, subtask_status_dict)
+
+
+def _create_grade_report_shard_subtask(xmodule_instance_args, entry_id, shard, initial_subtask_status):
+    """Creates a subtask to generate the grade report rows of the given shard of learners."""
+    return generate_grade_report_shard.subtask(
+        (entry_id, xmodule_instance_args, shard, initial_subtask_status.to_dict()),
+        task_id=initial_subtask_status.task_id,
+    )
+
+
+def _create_grade_report_merge_subtask(entry_id, num_shards, initial_subtask_status):
+    """Creates a subtask to merge the partial CSV files of the shards of a grade report."""
+    return merge_grade_report_shards.subtask(
+        (entry_id, num_shards, initial_subtask_status.to_dict()),
+        task_id=initial_subtask_status.task_id,
+    )
+
+
 @task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)
 def calculate_problem_grade_report(entry_id, xmodule_instance_args):
     """
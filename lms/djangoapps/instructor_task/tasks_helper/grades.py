@@ -1,13 +1,20 @@
 """
 Functionality for generating grade reports.
 """
+import cPickle as pickle
+import json
 import logging
+import random
 import re
+import tempfile
 from collections import OrderedDict
 from datetime import datetime
-from itertools import chain, izip, izip_longest
+from itertools import chain, izip_longest
 from time import time
+from uuid import uuid4
 
+from celery import current_task
+from celery.states import FAILURE, READY_STATES, RETRY, SUCCESS
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from lazy import lazy
@@ -19,11 +26,18 @@ from course_blocks.api import get_course_blocks
 from courseware.courses import get_course_by_id
 from courseware.user_state_client import DjangoXBlockUserStateClient
 from instructor_analytics.basic import list_problem_responses
-from instructor_analytics.csvs import format_dictlist
 from lms.djangoapps.certificates.models import CertificateWhitelist, GeneratedCertificate, certificate_info_for_user
 from lms.djangoapps.grades.context import grading_context, grading_context_for_course
+from lms.djangoapps.grades.course_grade import CourseGrade
 from lms.djangoapps.grades.models import PersistentCourseGrade, PersistentSubsectionGrade
 from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
+from lms.djangoapps.instructor_task.models import REPORT_SPOOL_MAX_MEMORY_SIZE, InstructorTask
+from lms.djangoapps.instructor_task.subtasks import (
+    SubtaskStatus,
+    check_subtask_is_valid,
+    initialize_subtask_info,
+    update_subtask_status
+)
 from lms.djangoapps.teams.models import CourseTeamMembership
 from lms.djangoapps.verify_student.services import IDVerificationService
 from openedx.core.djangoapps.content.block_structure.api import get_course_in_cache
@@ -32,12 +46,20 @@ from openedx.core.djangoapps.user_api.course_tag.api import BulkCourseTags
 from openedx.core.djangoapps.waffle_utils import WaffleSwitchNamespace
 from student.models import CourseEnrollment
 from student.roles import BulkRoleCache
+from util.db import outer_atomic
 from xmodule.modulestore.django import modulestore
+from xmodule.partitions.partitions import UserPartition
 from xmodule.partitions.partitions_service import PartitionService
 from xmodule.split_test_module import get_split_user_partitions
 
+from .profiling import profile_iterator, profile_stage
 from .runner import TaskProgress
-from .utils import upload_csv_to_report_store
+from .utils import (
+    delete_csv_parts_from_report_store,
+    merge_csv_parts_in_report_store,
+    upload_csv_part_to_report_store,
+    upload_csv_to_report_store
+)
 
 WAFFLE_NAMESPACE = 'instructor_task'
 WAFFLE_SWITCHES = WaffleSwitchNamespace(name=WAFFLE_NAMESPACE)
@@ -61,18 +83,47 @@ def _user_enrollment_status(user, course_id):
     return NOT_ENROLLED_IN_COURSE
 
 
+def _shard_part_name(entry_id, csv_name, part):
+    """
+    Returns the name of the file of a part of a grade report generated in shards, where
+    `part` is the index of a shard or 'header'.  The files are stored in a subdirectory
+    of the course, so that they aren't listed with its reports.
+    """
+    return u'grade_report_shards/{entry_id}/{csv_name}_{part}.csv'.format(
+        entry_id=entry_id, csv_name=csv_name, part=part
+    )
+
+
 def _flatten(iterable):
     return list(chain.from_iterable(iterable))
 
 
+def _read_spooled_objects(spooled_file):
+    """
+    Generates the objects pickled one after the other in the given temporary
+    file, and closes it.
+    """
+    with spooled_file:
+        spooled_file.seek(0)
+        while True:
+            try:
+                yield pickle.load(spooled_file)
+            except EOFError:
+                return
+
+
 class _CourseGradeReportContext(object):
     """
     Internal class that provides a common context to use for a single grade
     report.  When a report is parallelized across multiple processes,
     elements of this context are serialized and parsed across process
     boundaries.
+
+    `columns`, when given, are the columns of the report as returned by
+    `serialized_columns`, which are then used instead of the ones of the
+    current course.
     """
-    def __init__(self, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+    def __init__(self, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name, columns=None):
         self.task_info_string = (
             u'Task: {task_id}, '
             u'InstructorTask ID: {entry_id}, '
@@ -87,6 +138,7 @@ class _CourseGradeReportContext(object):
         self.action_name = action_name
         self.course_id = course_id
         self.task_progress = TaskProgress(self.action_name, total=None, start_time=time())
+        self._columns = columns
 
     @lazy
     def course(self):
@@ -98,14 +150,20 @@ class _CourseGradeReportContext(object):
 
     @lazy
     def course_experiments(self):
+        if self._columns is not None:
+            return [UserPartition.from_json(partition) for partition in self._columns['course_experiments']]
         return get_split_user_partitions(self.course.user_partitions)
 
     @lazy
     def teams_enabled(self):
+        if self._columns is not None:
+            return self._columns['teams_enabled']
         return self.course.teams_enabled
 
     @lazy
     def cohorts_enabled(self):
+        if self._columns is not None:
+            return self._columns['cohorts_enabled']
         return is_course_cohorted(self.course_id)
 
     @lazy
@@ -114,6 +172,21 @@ class _CourseGradeReportContext(object):
         Returns an OrderedDict that maps an assignment type to a dict of
         subsection-headers and average-header.
         """
+        if self._columns is not None:
+            graders = CourseGrade.get_subsection_type_graders(self.course)
+            return OrderedDict(
+                (assignment_info['assignment_type'], {
+                    'subsection_headers': OrderedDict(
+                        (UsageKey.from_string(location).map_into_course(self.course_id), header_name)
+                        for location, header_name in assignment_info['subsection_headers']
+                    ),
+                    'average_header': assignment_info['average_header'],
+                    'separate_subsection_avg_headers': assignment_info['separate_subsection_avg_headers'],
+                    'grader': graders.get(assignment_info['assignment_type']),
+                })
+                for assignment_info in self._columns['graded_assignments']
+            )
+
         grading_cxt = grading_context(self.course, self.course_structure)
         graded_assignments_map = OrderedDict()
         for assignment_type_name, subsection_infos in grading_cxt['all_graded_subsections_by_type'].iteritems():
@@ -143,6 +216,30 @@ class _CourseGradeReportContext(object):
             }
         return graded_assignments_map
 
+    def serialized_columns(self):
+        """
+        Returns the columns of the report that depend on the course, in a form that
+        can be passed to the subtasks generating parts of the report, so that their
+        rows match its headers even if the course changes in the meantime.
+        """
+        return {
+            'graded_assignments': [
+                {
+                    'assignment_type': assignment_type,
+                    'subsection_headers': [
+                        [text_type(location), header_name]
+                        for location, header_name in assignment_info['subsection_headers'].iteritems()
+                    ],
+                    'average_header': assignment_info['average_header'],
+                    'separate_subsection_avg_headers': assignment_info['separate_subsection_avg_headers'],
+                }
+                for assignment_type, assignment_info in self.graded_assignments.iteritems()
+            ],
+            'cohorts_enabled': self.cohorts_enabled,
+            'course_experiments': [partition.to_json() for partition in self.course_experiments],
+            'teams_enabled': self.teams_enabled,
+        }
+
     def update_status(self, message):
         """
         Updates the status on the celery task to the given message.
@@ -202,31 +299,291 @@ class CourseGradeReport(object):
     USER_BATCH_SIZE = 100
 
     @classmethod
-    def generate(cls, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+    def generate(cls, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name,
+                 create_shard_subtask_fcn=None):
         """
         Public method to generate a grade report.
+
+        If `create_shard_subtask_fcn` is provided, the report of a course with enough learners
+        is instead generated by subtasks, see `_queue_shard_subtasks`.
         """
         with modulestore().bulk_operations(course_id):
             context = _CourseGradeReportContext(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name)
+            if create_shard_subtask_fcn is not None:
+                shards = cls._shards(context)
+                if len(shards) > 1:
+                    return CourseGradeReport()._queue_shard_subtasks(
+                        context, _entry_id, shards, create_shard_subtask_fcn
+                    )
             return CourseGradeReport()._generate(context)
 
+    @classmethod
+    def generate_shard(cls, entry_id, xmodule_instance_args, shard, subtask_status_dict, create_merge_subtask_fcn):
+        """
+        Generates the rows of the learners of a `shard` of the grade report of the
+        InstructorTask entry `entry_id`, into partial CSV files.
+
+        `shard` is one of the dicts returned by `_shards`, along with the 'num_shards' of
+        the report, its 'action_name', its 'columns' as written in its headers, and the
+        'merge_task_id' of the subtask that merges the partial files.  `subtask_status_dict`
+        is the status of the subtask, as created by SubtaskStatus.to_dict().  This is run by
+        a celery task with the same arguments.
+
+        A shard that fails is retried from scratch, up to the `max_retries` of its task,
+        without regenerating the other shards.  Once every shard is done, the merge subtask
+        is queued with `create_merge_subtask_fcn`.
+
+        Returns the final status of the subtask, as a dict.
+        """
+        subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+        current_task_id = subtask_status.task_id
+        TASK_LOG.info(u"Preparing to grade shard %d of %d as subtask %s for instructor task %d: status = %s",
+                      shard['index'], shard['num_shards'], current_task_id, entry_id, subtask_status)
+
+        # Reject subtasks that are unknown to the entry, or that were already run.
+        check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+        entry = InstructorTask.objects.get(pk=entry_id)
+        course_id = entry.course_id
+        context = _CourseGradeReportContext(
+            xmodule_instance_args, entry_id, course_id, json.loads(entry.task_input), shard['action_name'],
+            columns=shard['columns'],
+        )
+        try:
+            with modulestore().bulk_operations(course_id):
+                succeeded, failed = CourseGradeReport()._generate_shard(context, entry_id, shard)
+        except Exception as exc:
+            TASK_LOG.exception(u'%s, Grade report shard %d failed', context.task_info_string, shard['index'])
+            if subtask_status.retried_withmax < current_task.max_retries:
+                raise cls._retry_shard(entry_id, xmodule_instance_args, shard, subtask_status, exc)
+            subtask_status.increment(failed=shard['num_learners'], state=FAILURE)
+            update_subtask_status(entry_id, current_task_id, subtask_status)
+            cls._queue_merge_subtask_when_done(entry_id, shard, create_merge_subtask_fcn)
+            raise
+
+        subtask_status.increment(succeeded=succeeded, failed=failed, state=SUCCESS)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        cls._queue_merge_subtask_when_done(entry_id, shard, create_merge_subtask_fcn)
+        return subtask_status.to_dict()
+
+    @classmethod
+    def merge_shards(cls, entry_id, num_shards, subtask_status_dict):
+        """
+        Concatenates the partial CSV files of the `num_shards` shards of the grade report
+        of the InstructorTask entry `entry_id` into the report, in the order of the shards,
+        and deletes them.  The report isn't uploaded if a shard failed.
+
+        Returns the final status of the subtask, as a dict.
+        """
+        subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+        current_task_id = subtask_status.task_id
+        check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+        entry = InstructorTask.objects.get(pk=entry_id)
+        course_id = entry.course_id
+        part_names = {
+            csv_name: [_shard_part_name(entry_id, csv_name, part) for part in ['header'] + range(num_shards)]
+            for csv_name in ('grade_report', 'grade_report_err')
+        }
+        try:
+            shard_statuses = [
+                status for task_id, status in json.loads(entry.subtasks)['status'].iteritems()
+                if task_id != current_task_id
+            ]
+            if all(status['state'] == SUCCESS for status in shard_statuses):
+                date = datetime.now(UTC)
+                merge_csv_parts_in_report_store(part_names['grade_report'], 'grade_report', course_id, date)
+                if any(status['failed'] for status in shard_statuses):
+                    merge_csv_parts_in_report_store(part_names['grade_report_err'], 'grade_report_err', course_id, date)
+                state = SUCCESS
+            else:
+                TASK_LOG.error(u"Grade report of instructor task %d not merged: some of its shards failed", entry_id)
+                state = FAILURE
+        except Exception:
+            TASK_LOG.exception(u"Grade report merge subtask %s for instructor task %d: failed unexpectedly!",
+                               current_task_id, entry_id)
+            subtask_status.increment(state=FAILURE)
+            update_subtask_status(entry_id, current_task_id, subtask_status)
+            raise
+        finally:
+            for names in part_names.itervalues():
+                delete_csv_parts_from_report_store(names, course_id)
+
+        subtask_status.increment(state=state)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        return subtask_status.to_dict()
+
     def _generate(self, context):
         """
         Internal method for generating a grade report for the given context.
         """
         context.update_status(u'Starting grades')
-        success_headers = self._success_headers(context)
+        with profile_stage('structure'):
+            success_headers = self._success_headers(context)
         error_headers = self._error_headers()
         batched_rows = self._batched_rows(context)
 
-        context.update_status(u'Compiling grades')
-        success_rows, error_rows = self._compile(context, batched_rows)
-
-        context.update_status(u'Uploading grades')
+        # The rows are compiled while they are uploaded.
+        context.update_status(u'Compiling and uploading grades')
+        error_rows = []
+        success_rows = self._compile(context, batched_rows, error_rows)
         self._upload(context, success_headers, success_rows, error_headers, error_rows)
 
         return context.update_status(u'Completed grades')
 
+    @staticmethod
+    def _shards(context):
+        """
+        Splits the learners of the course into at most settings.COURSE_GRADE_REPORT_SHARDS
+        shards of at least settings.COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD learners.
+
+        Returns a list of dicts, one per shard, with its 'index', the number of its learners
+        ('num_learners'), and the range of their user ids: from 'first_user_id' included
+        to 'end_user_id' excluded, where None means no limit.  The ranges cover all ids, so
+        that learners who enroll after the shards were made are still in the report.
+        """
+        max_shards = settings.COURSE_GRADE_REPORT_SHARDS
+        if max_shards <= 1:
+            return []
+        user_ids = list(
+            get_user_model().objects.filter(
+                courseenrollment__course_id=context.course_id,
+            ).values_list('id', flat=True).order_by('id')
+        )
+        num_shards = min(max_shards, len(user_ids) // max(settings.COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD, 1))
+        if num_shards <= 1:
+            return []
+
+        shard_size = (len(user_ids) + num_shards - 1) // num_shards
+        starts = range(0, len(user_ids), shard_size)
+        return [
+            {
+                'index': index,
+                'num_learners': len(user_ids[start:start + shard_size]),
+                'first_user_id': user_ids[start] if index > 0 else None,
+                'end_user_id': user_ids[start + shard_size] if start + shard_size < len(user_ids) else None,
+            }
+            for index, start in enumerate(starts)
+        ]
+
+    def _queue_shard_subtasks(self, context, entry_id, shards, create_shard_subtask_fcn):
+        """
+        Queues a subtask per shard, as created by `create_shard_subtask_fcn`, and reserves
+        the subtask that merges their partial CSV files into the report.
+
+        The course structure is read here to write the headers of the report, so that the
+        subtasks find it in the block structure cache.  The subtasks are passed the columns
+        of these headers, so that all the rows match them.
+
+        Returns the task progress as stored in the InstructorTask entry.
+        """
+        entry = InstructorTask.objects.get(pk=entry_id)
+
+        # As with bulk email, the task may be run again when celery loses its connection
+        # to the broker: its subtasks are already queued then.
+        if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+            TASK_LOG.warning(u"Task %s has already queued its subtasks!  InstructorTask = %s", entry.task_id, entry)
+            return json.loads(entry.task_output)
+
+        context.update_status(u'Starting grades')
+        with profile_stage('structure'):
+            success_headers = self._success_headers(context)
+            columns = context.serialized_columns()
+        with profile_stage('csv'):
+            upload_csv_part_to_report_store(
+                [success_headers], _shard_part_name(entry_id, 'grade_report', 'header'), context.course_id
+            )
+            upload_csv_part_to_report_store(
+                [self._error_headers()], _shard_part_name(entry_id, 'grade_report_err', 'header'), context.course_id
+            )
+
+        shard_task_ids = [str(uuid4()) for __ in shards]
+        merge_task_id = str(uuid4())
+        num_learners = sum(shard['num_learners'] for shard in shards)
+        TASK_LOG.info(u"%s, Task type: %s, Queuing %d subtasks to grade %d learners",
+                      context.task_info_string, context.action_name, len(shards), num_learners)
+        # Make sure this is committed to database before handing off subtasks to celery.
+        with outer_atomic():
+            progress = initialize_subtask_info(
+                entry, context.action_name, num_learners, shard_task_ids + [merge_task_id]
+            )
+
+        for shard, task_id in zip(shards, shard_task_ids):
+            shard = dict(
+                shard,
+                num_shards=len(shards),
+                action_name=context.action_name,
+                columns=columns,
+                merge_task_id=merge_task_id,
+            )
+            create_shard_subtask_fcn(entry_id, shard, SubtaskStatus.create(task_id)).apply_async()
+        return progress
+
+    def _generate_shard(self, context, entry_id, shard):
+        """
+        Uploads the rows of the learners of the given shard to partial CSV files.
+
+        Returns the numbers of learners that were graded, and that failed to be.
+        """
+        error_rows = []
+        success_rows = self._compile(context, self._shard_batched_rows(context, shard), error_rows)
+        upload_csv_part_to_report_store(
+            success_rows, _shard_part_name(entry_id, 'grade_report', shard['index']), context.course_id
+        )
+        upload_csv_part_to_report_store(
+            error_rows, _shard_part_name(entry_id, 'grade_report_err', shard['index']), context.course_id
+        )
+        return context.task_progress.succeeded, context.task_progress.failed
+
+    def _shard_batched_rows(self, context, shard):
+        """
+        A generator of batches of (success_rows, error_rows) for the learners of the
+        given shard, in the order of their ids.
+        """
+        users = get_user_model().objects.filter(courseenrollment__course_id=context.course_id)
+        if shard['first_user_id'] is not None:
+            users = users.filter(id__gte=shard['first_user_id'])
+        if shard['end_user_id'] is not None:
+            users = users.filter(id__lt=shard['end_user_id'])
+        user_ids = list(users.values_list('id', flat=True).order_by('id'))
+        for start in range(0, len(user_ids), self.USER_BATCH_SIZE):
+            batch_ids = user_ids[start:start + self.USER_BATCH_SIZE]
+            batch_users = get_user_model().objects.filter(id__in=batch_ids).select_related('profile').order_by('id')
+            yield self._rows_for_users(context, list(batch_users))
+
+    @staticmethod
+    def _retry_shard(entry_id, xmodule_instance_args, shard, subtask_status, exc):
+        """
+        Requeues the current shard subtask, after a delay that grows with its number of
+        retries.  Returns the exception to raise to celery.
+        """
+        subtask_status.increment(retried_withmax=1, state=RETRY)
+        # As with bulk email, update the InstructorTask *before* retrying, so that the
+        # update can't race with the retried subtask.
+        update_subtask_status(entry_id, subtask_status.task_id, subtask_status)
+        countdown = (2 ** (subtask_status.retried_withmax - 1)) * current_task.default_retry_delay
+        countdown *= random.uniform(.75, 1.25)
+        TASK_LOG.warning(u"Retrying grade report shard %d of instructor task %d in %s seconds",
+                         shard['index'], entry_id, countdown)
+        return current_task.retry(
+            args=[entry_id, xmodule_instance_args, shard, subtask_status.to_dict()],
+            exc=exc,
+            countdown=countdown,
+        )
+
+    @staticmethod
+    def _queue_merge_subtask_when_done(entry_id, shard, create_merge_subtask_fcn):
+        """
+        Queues the subtask that merges the partial files of the shards, if every shard is done.
+
+        Shards that finish at the same time may all queue it: check_subtask_is_valid()
+        rejects the extra ones.
+        """
+        merge_task_id = shard['merge_task_id']
+        statuses = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)['status']
+        if all(status['state'] in READY_STATES for task_id, status in statuses.iteritems() if task_id != merge_task_id):
+            create_merge_subtask_fcn(entry_id, shard['num_shards'], SubtaskStatus.create(merge_task_id)).apply_async()
+
     def _success_headers(self, context):
         """
         Returns a list of all applicable column headers for this grade report.
@@ -252,36 +609,43 @@ class CourseGradeReport(object):
         """
         A generator of batches of (success_rows, error_rows) for this report.
         """
-        for users in self._batch_users(context):
-            users = filter(lambda u: u is not None, users)
-            yield self._rows_for_users(context, users)
+        batched_users = (filter(lambda u: u is not None, users) for users in self._batch_users(context))
+        for users in profile_iterator('learners', batched_users):
+            with profile_stage('grades'):
+                rows = self._rows_for_users(context, users)
+            yield rows
 
-    def _compile(self, context, batched_rows):
+    def _compile(self, context, batched_rows, error_rows):
         """
-        Compiles and returns the complete list of (success_rows, error_rows) for
-        the given batched_rows and context.
+        Returns a generator of the success rows of the given batched_rows,
+        which adds their error rows to `error_rows` and updates the metrics
+        on task status as it goes.
         """
-        # partition and chain successes and errors
-        success_rows, error_rows = izip(*batched_rows)
-        success_rows = list(chain(*success_rows))
-        error_rows = list(chain(*error_rows))
-
-        # update metrics on task status
-        context.task_progress.succeeded = len(success_rows)
-        context.task_progress.failed = len(error_rows)
-        context.task_progress.attempted = context.task_progress.succeeded + context.task_progress.failed
-        context.task_progress.total = context.task_progress.attempted
-        return success_rows, error_rows
+        task_progress = context.task_progress
+        task_progress.succeeded = task_progress.failed = 0
+        for batch_success_rows, batch_error_rows in batched_rows:
+            for row in batch_success_rows:
+                yield row
+            error_rows.extend(batch_error_rows)
+
+            # update metrics on task status
+            task_progress.succeeded += len(batch_success_rows)
+            task_progress.failed += len(batch_error_rows)
+            task_progress.attempted = task_progress.succeeded + task_progress.failed
+            task_progress.total = task_progress.attempted
 
     def _upload(self, context, success_headers, success_rows, error_headers, error_rows):
         """
         Creates and uploads a CSV for the given headers and rows.
+
+        The error rows are only complete once the success rows are consumed.
         """
         date = datetime.now(UTC)
-        upload_csv_to_report_store([success_headers] + success_rows, 'grade_report', context.course_id, date)
-        if len(error_rows) > 0:
-            error_rows = [error_headers] + error_rows
-            upload_csv_to_report_store(error_rows, 'grade_report_err', context.course_id, date)
+        with profile_stage('csv'):
+            upload_csv_to_report_store(chain([success_headers], success_rows), 'grade_report', context.course_id, date)
+            if len(error_rows) > 0:
+                error_rows = [error_headers] + error_rows
+                upload_csv_to_report_store(error_rows, 'grade_report_err', context.course_id, date)
 
     def _grades_header(self, context):
         """
@@ -376,6 +740,11 @@ class CourseGradeReport(object):
         subsection_grades = []
         grade_results = []
         for subsection_location in subsection_headers:
+            if subsection_location not in course_grade.course_data.effective_structure:
+                # The subsection was removed from the course after the headers of the report were written.
+                grade_results.append([u'Not Attempted'])
+                subsection_grades.append(None)
+                continue
             subsection_grade = course_grade.subsection_grade(subsection_location)
             if subsection_grade.attempted_graded:
                 grade_result = subsection_grade.percent_graded
@@ -390,7 +759,7 @@ class CourseGradeReport(object):
             if assignment_info['grader']:
                 if course_grade.attempted:
                     subsection_breakdown = [
-                        {'percent': subsection_grade.percent_graded}
+                        {'percent': subsection_grade.percent_graded if subsection_grade else 0.0}
                         for subsection_grade in subsection_grades
                     ]
                     assignment_average, _ = assignment_info['grader'].total_with_drops(subsection_breakdown)
@@ -474,7 +843,8 @@ class CourseGradeReport(object):
         Returns a list of rows for the given users for this report.
         """
         with modulestore().bulk_operations(context.course_id):
-            bulk_context = _CourseGradeBulkContext(context, users)
+            with profile_stage('scores'):
+                bulk_context = _CourseGradeBulkContext(context, users)
 
             success_rows, error_rows = [], []
             for user, course_grade, error in CourseGradeFactory().iter(
@@ -518,8 +888,9 @@ class ProblemGradeReport(object):
         # as the keys.  It is structured in this way to keep the values related.
         header_row = OrderedDict([('id', 'Student ID'), ('email', 'Email'), ('username', 'Username')])
 
-        course = get_course_by_id(course_id)
-        graded_scorable_blocks = cls._graded_scorable_blocks_to_header(course)
+        with profile_stage('structure'):
+            course = get_course_by_id(course_id)
+            graded_scorable_blocks = cls._graded_scorable_blocks_to_header(course)
 
         # Just generate the static fields for now.
         rows = [list(header_row.values()) + ['Enrollment Status', 'Grade'] + _flatten(graded_scorable_blocks.values())]
@@ -528,9 +899,11 @@ class ProblemGradeReport(object):
 
         # Bulk fetch and cache enrollment states so we can efficiently determine
         # whether each user is currently enrolled in the course.
-        CourseEnrollment.bulk_fetch_enrollment_states(enrolled_students, course_id)
+        with profile_stage('scores'):
+            CourseEnrollment.bulk_fetch_enrollment_states(enrolled_students, course_id)
 
-        for student, course_grade, error in CourseGradeFactory().iter(enrolled_students, course):
+        course_grades = CourseGradeFactory().iter(enrolled_students, course)
+        for student, course_grade, error in profile_iterator('grades', course_grades):
             student_fields = [getattr(student, field_name) for field_name in header_row]
             task_progress.attempted += 1
 
@@ -563,12 +936,13 @@ class ProblemGradeReport(object):
             if task_progress.attempted % status_interval == 0:
                 task_progress.update_task_state(extra_meta=current_step)
 
-        # Perform the upload if any students have been successfully graded
-        if len(rows) > 1:
-            upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
-        # If there are any error rows, write them out as well
-        if len(error_rows) > 1:
-            upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
+        with profile_stage('csv'):
+            # Perform the upload if any students have been successfully graded
+            if len(rows) > 1:
+                upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
+            # If there are any error rows, write them out as well
+            if len(error_rows) > 1:
+                upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
 
         return task_progress.update_task_state(extra_meta={'step': 'Uploading CSV'})
 
@@ -640,15 +1014,17 @@ class ProblemResponses(object):
                 block and it child blocks.
 
         Returns:
-              Tuple[List[Dict], List[str]]: Returns a list of dictionaries
+              Tuple[Iterable[Dict], List[str]]: Returns an iterable of dictionaries
                 containing the student data which will be included in the
                 final csv, and the features/keys to include in that CSV.
+                The dictionaries are read back from a temporary file, as the
+                keys are only known once the data of every block is built.
         """
         usage_key = UsageKey.from_string(usage_key_str).map_into_course(course_key)
         user = get_user_model().objects.get(pk=user_id)
         course_blocks = get_course_blocks(user, usage_key)
 
-        student_data = []
+        student_data = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_MEMORY_SIZE)
         max_count = settings.FEATURES.get('MAX_PROBLEM_RESPONSES_COUNT')
 
         store = modulestore()
@@ -681,7 +1057,6 @@ class ProblemResponses(object):
 
                 responses = list_problem_responses(course_key, block_key, max_count)
 
-                student_data += responses
                 for response in responses:
                     response['title'] = title
                     # A human-readable location for the current block
@@ -691,6 +1066,7 @@ class ProblemResponses(object):
                     user_data = generated_report_data.get(response['username'], {})
                     response.update(user_data)
                     student_data_keys = student_data_keys.union(user_data.keys())
+                    pickle.dump(response, student_data, pickle.HIGHEST_PROTOCOL)
                 if max_count is not None:
                     max_count -= len(responses)
                     if max_count <= 0:
@@ -705,7 +1081,7 @@ class ProblemResponses(object):
             ['block_key', 'state']
         )
 
-        return student_data, student_data_keys_list
+        return _read_spooled_objects(student_data), student_data_keys_list
 
     @classmethod
     def generate(cls, _xmodule_instance_args, _entry_id, course_id, task_input, action_name):
@@ -728,16 +1104,13 @@ class ProblemResponses(object):
             usage_key_str=problem_location
         )
 
-        for data in student_data:
-            for key in student_data_keys:
-                data.setdefault(key, '')
-
-        header, rows = format_dictlist(student_data, student_data_keys)
-
-        task_progress.attempted = task_progress.succeeded = len(rows)
-        task_progress.skipped = task_progress.total - task_progress.attempted
-
-        rows.insert(0, header)
+        def rows():
+            """ Generates the rows of the report, counting them. """
+            for data in student_data:
+                task_progress.attempted += 1
+                yield [data.get(key, '') for key in student_data_keys]
+            task_progress.succeeded = task_progress.attempted
+            task_progress.skipped = task_progress.total - task_progress.attempted
 
         current_step = {'step': 'Uploading CSV'}
         task_progress.update_task_state(extra_meta=current_step)
@@ -745,7 +1118,7 @@ class ProblemResponses(object):
         # Perform the upload
         problem_location = re.sub(r'[:/]', '_', problem_location)
         csv_name = 'student_state_from_{}'.format(problem_location)
-        report_name = upload_csv_to_report_store(rows, csv_name, course_id, start_date)
+        report_name = upload_csv_to_report_store(chain([student_data_keys], rows()), csv_name, course_id, start_date)
         current_step = {'step': 'CSV uploaded', 'report_name': report_name}
 
         return task_progress.update_task_state(extra_meta=current_step)
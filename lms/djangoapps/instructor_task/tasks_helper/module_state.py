@@ -5,6 +5,8 @@ import json
 import logging
 from time import time
 
+from celery.states import FAILURE, SUCCESS
+from django.conf import settings
 from django.utils.translation import ugettext_noop
 from opaque_keys.edx.keys import UsageKey
 
@@ -24,13 +26,17 @@ from xblock.runtime import KvsFieldData
 from xblock.scorable import Score
 from xmodule.modulestore.django import modulestore
 from ..exceptions import UpdateProblemModuleStateError
+from ..models import InstructorTask
+from ..subtasks import SubtaskStatus, check_subtask_is_valid, queue_subtasks_for_query, update_subtask_status
+from .profiling import profile_iterator, profile_stage
 from .runner import TaskProgress
 from .utils import UNKNOWN_TASK_ID, UPDATE_STATUS_FAILED, UPDATE_STATUS_SKIPPED, UPDATE_STATUS_SUCCEEDED
 
 TASK_LOG = logging.getLogger('edx.celery.task')
 
 
-def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, task_input, action_name):
+def perform_module_state_update(update_fcn, filter_fcn, entry_id, course_id, task_input, action_name,
+                                create_subtask_fcn=None):
     """
     Performs generic update by visiting StudentModule instances with the update_fcn provided.
 
@@ -42,6 +48,13 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     on the particular student module failed.
     A raised exception indicates a fatal condition -- that no other student modules should be considered.
 
+    If `create_subtask_fcn` is provided and there are more than
+    settings.INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK student modules to update, they are
+    instead split into chunks that are updated by subtasks, as created by `create_subtask_fcn`.
+    It is passed the list of items to be processed by a subtask and its initial SubtaskStatus,
+    like the `create_subtask_fcn` of `queue_subtasks_for_query`.  The subtasks record their
+    progress in the InstructorTask entry, see `perform_module_state_update_subtask`.
+
     The return value is a dict containing the task's results, with the following keys:
 
           'attempted': number of attempts made
@@ -59,41 +72,34 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
 
     """
     start_time = time()
-    usage_keys = []
-    problem_url = task_input.get('problem_url')
-    entrance_exam_url = task_input.get('entrance_exam_url')
     student_identifier = task_input.get('student')
     override_score_task = action_name == ugettext_noop('overridden')
-    problems = {}
-
-    # if problem_url is present make a usage key from it
-    if problem_url:
-        usage_key = UsageKey.from_string(problem_url).map_into_course(course_id)
-        usage_keys.append(usage_key)
-
-        # find the problem descriptor:
-        problem_descriptor = modulestore().get_item(usage_key)
-        problems[unicode(usage_key)] = problem_descriptor
-
-    # if entrance_exam is present grab all problems in it
-    if entrance_exam_url:
-        problems = get_problems_in_section(entrance_exam_url)
-        usage_keys = [UsageKey.from_string(location) for location in problems.keys()]
+    with profile_stage('structure'):
+        usage_keys, problems = _get_problems_to_update(course_id, task_input)
 
     modules_to_update = _get_modules_to_update(
         course_id, usage_keys, student_identifier, filter_fcn, override_score_task
     )
 
+    items_per_task = settings.INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK
+    if create_subtask_fcn is not None and items_per_task and not isinstance(modules_to_update, list):
+        total_num_modules = modules_to_update.count()
+        if total_num_modules > items_per_task:
+            return _queue_module_state_subtasks(
+                entry_id, action_name, create_subtask_fcn, modules_to_update, items_per_task, total_num_modules
+            )
+
     task_progress = TaskProgress(action_name, len(modules_to_update), start_time)
     task_progress.update_task_state()
 
-    for module_to_update in modules_to_update:
+    for module_to_update in profile_iterator('modules', modules_to_update):
         task_progress.attempted += 1
         module_descriptor = problems[unicode(module_to_update.module_state_key)]
         # There is no try here:  if there's an error, we let it throw, and the task will
         # be marked as FAILED, with a stack trace.
         with dog_stats_api.timer('instructor_tasks.module.time.step', tags=[u'action:{name}'.format(name=action_name)]):
-            update_status = update_fcn(module_descriptor, module_to_update, task_input)
+            with profile_stage('update'):
+                update_status = update_fcn(module_descriptor, module_to_update, task_input)
             if update_status == UPDATE_STATUS_SUCCEEDED:
                 # If the update_fcn returns true, then it performed some kind of work.
                 # Logging of failures is left to the update_fcn itself.
@@ -108,6 +114,102 @@ def perform_module_state_update(update_fcn, filter_fcn, _entry_id, course_id, ta
     return task_progress.update_task_state()
 
 
+def _queue_module_state_subtasks(entry_id, action_name, create_subtask_fcn, modules_to_update, items_per_task,
+                                 total_num_modules):
+    """
+    Queues subtasks to update the given student modules, in chunks of `items_per_task`.
+
+    Returns the task progress as stored in the InstructorTask entry.
+    """
+    entry = InstructorTask.objects.get(pk=entry_id)
+
+    # As with bulk email, the task may be run again when celery loses its connection
+    # to the broker: its subtasks are already queued then.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already queued its subtasks!  InstructorTask = %s", entry.task_id, entry)
+        return json.loads(entry.task_output)
+
+    def _create_subtask(item_list, initial_subtask_status):
+        """Creates a subtask to update the student modules of the given items."""
+        return create_subtask_fcn(entry_id, action_name, [item['pk'] for item in item_list], initial_subtask_status)
+
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_subtask,
+        [modules_to_update.order_by('pk')],
+        [],
+        items_per_task,
+        total_num_modules,
+    )
+
+
+def perform_module_state_update_subtask(update_fcn, entry_id, action_name, module_ids, subtask_status_dict):
+    """
+    Updates the StudentModule instances with the given ids with the `update_fcn` provided,
+    as part of the InstructorTask entry `entry_id`, like `perform_module_state_update`.
+
+    `subtask_status_dict` is the status of the subtask, as created by SubtaskStatus.to_dict().
+    The counts of updated modules are added to the progress of the InstructorTask entry when
+    the subtask is done.  An exception raised by `update_fcn` fails the subtask, with the
+    modules that were not updated yet counted as failed.
+
+    Returns the final status of the subtask, as a dict.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    TASK_LOG.info(u"Preparing to update %d modules as subtask %s for instructor task %d: action = %s, status = %s",
+                  len(module_ids), current_task_id, entry_id, action_name, subtask_status)
+
+    # Reject subtasks that are unknown to the entry, or that were already run.
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    task_input = json.loads(entry.task_input)
+    tags = [u'action:{name}'.format(name=action_name)]
+    succeeded = failed = skipped = 0
+    try:
+        __, problems = _get_problems_to_update(course_id, task_input)
+        modules_to_update = StudentModule.objects.filter(pk__in=module_ids).select_related('student').order_by('pk')
+        with modulestore().bulk_operations(course_id):
+            for module_to_update in modules_to_update:
+                module_descriptor = problems[unicode(module_to_update.module_state_key)]
+                with dog_stats_api.timer('instructor_tasks.module.time.step', tags=tags):
+                    update_status = update_fcn(module_descriptor, module_to_update, task_input)
+                if update_status == UPDATE_STATUS_SUCCEEDED:
+                    succeeded += 1
+                elif update_status == UPDATE_STATUS_FAILED:
+                    failed += 1
+                elif update_status == UPDATE_STATUS_SKIPPED:
+                    skipped += 1
+                else:
+                    raise UpdateProblemModuleStateError("Unexpected update_status returned: {}".format(update_status))
+    except Exception:
+        TASK_LOG.exception(u"Module state update subtask %s for instructor task %d: failed unexpectedly!",
+                           current_task_id, entry_id)
+        failed = len(module_ids) - succeeded - skipped
+        _record_subtask_counts(subtask_status, succeeded, failed, skipped, FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        raise
+
+    _record_subtask_counts(subtask_status, succeeded, failed, skipped, SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    TASK_LOG.info(u"Module state update subtask %s for instructor task %d: returning status %s",
+                  current_task_id, entry_id, subtask_status)
+    return subtask_status.to_dict()
+
+
+def _record_subtask_counts(subtask_status, succeeded, failed, skipped, state):
+    """
+    Adds the counts of updated modules to the status of a subtask, and sets its state.
+    """
+    subtask_status.increment(succeeded=succeeded, failed=failed, skipped=skipped, state=state)
+    # Unlike the recipients of bulk emails, skipped modules count as attempted, as they do
+    # in perform_module_state_update.
+    subtask_status.attempted += skipped
+
+
 @outer_atomic
 def rescore_problem_module_state(xmodule_instance_args, module_descriptor, student_module, task_input):
     '''
@@ -387,6 +489,33 @@ def _get_task_id_from_xmodule_args(xmodule_instance_args):
         return xmodule_instance_args.get('task_id', UNKNOWN_TASK_ID)
 
 
+def _get_problems_to_update(course_id, task_input):
+    """
+    Returns the usage keys of the problems named by `task_input`, and a dict of their descriptors
+    keyed by the string of their usage key.
+    """
+    usage_keys = []
+    problem_url = task_input.get('problem_url')
+    entrance_exam_url = task_input.get('entrance_exam_url')
+    problems = {}
+
+    # if problem_url is present make a usage key from it
+    if problem_url:
+        usage_key = UsageKey.from_string(problem_url).map_into_course(course_id)
+        usage_keys.append(usage_key)
+
+        # find the problem descriptor:
+        problem_descriptor = modulestore().get_item(usage_key)
+        problems[unicode(usage_key)] = problem_descriptor
+
+    # if entrance_exam is present grab all problems in it
+    if entrance_exam_url:
+        problems = get_problems_in_section(entrance_exam_url)
+        usage_keys = [UsageKey.from_string(location) for location in problems.keys()]
+
+    return usage_keys, problems
+
+
 def _get_modules_to_update(course_id, usage_keys, student_identifier, filter_fcn, override_score_task=False):
     """
     Fetches a StudentModule instances for a given `course_id`, `student` object, and `usage_keys`.
@@ -0,0 +1,237 @@
+"""
+Profiling of the stages of instructor tasks.
+
+`run_main_task` profiles the task that it runs, and the task functions
+mark their stages (loading the course structure, reading scores, computing
+grades, writing the CSV...) with `profile_stage`, or wrap the iterators that
+they stream with `profile_iterator`.  For the task and each of its stages,
+the profile records:
+
+  'wall_ms': wall clock time
+  'cpu_ms': CPU time of the process
+  'max_rss_kb': growth of the peak resident memory of the process
+  'queries': number of SQL queries
+  'modulestore_calls': number of operations of the split modulestore on its
+      database and caches
+  'traced_kb': memory allocated and not freed, as traced by `tracemalloc`
+      (only when INSTRUCTOR_TASK_PROFILE_TRACEMALLOC is set and
+      `tracemalloc` is available)
+
+A stage can be entered many times, and its measures add up.  Stages may be
+nested: the measures of a stage exclude those of the stages nested in it,
+so that the time spent computing the grades streamed to a CSV file isn't
+counted as time spent writing the file.  The measures of the task include
+everything.
+"""
+import logging
+import resource
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from time import time
+
+from django.db import connections
+
+import dogstats_wrapper as dog_stats_api
+from xmodule.modulestore.split_mongo.mongo_connection import TIMER as SPLIT_MONGO_TIMER
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+TASK_LOG = logging.getLogger('edx.celery.task')
+
+# Number of allocation sites logged at the end of a task traced with tracemalloc.
+TRACEMALLOC_TOP_ALLOCATIONS = 10
+
+_PROFILER = threading.local()
+
+
+class _QueryCounter(deque):
+    """
+    Queries log of a database connection that counts the queries instead of
+    keeping them, passing them on to `queries_log` if given.
+    """
+    def __init__(self, queries_log=None):
+        super(_QueryCounter, self).__init__(maxlen=0)
+        self.queries_log = queries_log
+        self.count = 0
+
+    def append(self, query):
+        self.count += 1
+        if self.queries_log is not None:
+            self.queries_log.append(query)
+
+
+class TaskProfiler(object):
+    """
+    Records the measures of a task and of its stages, see the module docstring.
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.total = None
+        self.stages = OrderedDict()
+        self._stack = []
+        self._query_counters = {}
+        self._saved_query_logging = {}
+
+    @contextmanager
+    def profile_task(self):
+        """
+        Profiles everything run in this context as the task.
+        """
+        self._start_counting_queries()
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        previous_profiler = getattr(_PROFILER, 'current', None)
+        _PROFILER.current = self
+        try:
+            start = self._measures()
+            try:
+                yield self
+            finally:
+                self.total = self._difference(self._measures(), start)
+        finally:
+            _PROFILER.current = previous_profiler
+            if started_tracing:
+                self._log_top_allocations()
+                tracemalloc.stop()
+            self._stop_counting_queries()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Profiles everything run in this context as part of the stage `name`.
+        """
+        self._pause_current_stage()
+        self._stack.append([name, self._measures()])
+        try:
+            yield
+        finally:
+            self._pause_current_stage()
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] = self._measures()
+
+    def results(self):
+        """
+        Returns a dict of the measures of the task, and of each of its stages.
+        """
+        return {
+            'total': _rounded(self.total),
+            'stages': OrderedDict((name, _rounded(measures)) for name, measures in self.stages.iteritems()),
+        }
+
+    def _pause_current_stage(self):
+        """
+        Adds the measures of the current stage since it was last (re)started to its totals.
+        """
+        if not self._stack:
+            return
+        name, start = self._stack[-1]
+        measures = self._difference(self._measures(), start)
+        if name in self.stages:
+            measures = {key: value + measures[key] for key, value in self.stages[name].iteritems()}
+        self.stages[name] = measures
+
+    def _measures(self):
+        """
+        Returns the current values of the counters behind the measures.
+        """
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        measures = {
+            'wall_ms': time() * 1000,
+            'cpu_ms': (usage.ru_utime + usage.ru_stime) * 1000,
+            # ru_maxrss is in kilobytes on Linux.
+            'max_rss_kb': usage.ru_maxrss,
+            'queries': sum(counter.count for counter in self._query_counters.itervalues()),
+            'modulestore_calls': SPLIT_MONGO_TIMER.call_count,
+        }
+        if self.trace_memory:
+            measures['traced_kb'] = tracemalloc.get_traced_memory()[0] / 1024.0
+        return measures
+
+    @staticmethod
+    def _difference(measures, start):
+        """
+        Returns the measures between `start` and `measures`.
+        """
+        return {key: value - start[key] for key, value in measures.iteritems()}
+
+    def _start_counting_queries(self):
+        """
+        Makes the database connections count their queries.
+        """
+        for connection in connections.all():
+            queries_log = connection.queries_log
+            self._saved_query_logging[connection.alias] = (connection.force_debug_cursor, queries_log)
+            # Queries are still logged where they were, for instance by assertNumQueries.
+            counter = _QueryCounter(queries_log if connection.queries_logged else None)
+            self._query_counters[connection.alias] = connection.queries_log = counter
+            connection.force_debug_cursor = True
+
+    def _stop_counting_queries(self):
+        """
+        Restores the query logging of the database connections.
+        """
+        for connection in connections.all():
+            if connection.alias in self._saved_query_logging:
+                connection.force_debug_cursor, connection.queries_log = self._saved_query_logging[connection.alias]
+        self._saved_query_logging = {}
+
+    def _log_top_allocations(self):
+        """
+        Logs the places of the code that hold the most traced memory.
+        """
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        for stat in statistics[:TRACEMALLOC_TOP_ALLOCATIONS]:
+            TASK_LOG.info(u'Task memory allocation: %s', stat)
+
+
+def _rounded(measures):
+    """
+    Returns the given measures rounded to integers.
+    """
+    return {key: int(round(value)) for key, value in measures.iteritems()}
+
+
+@contextmanager
+def profile_stage(name):
+    """
+    Profiles everything run in this context as part of the stage `name` of the
+    task being profiled, if any.
+    """
+    profiler = getattr(_PROFILER, 'current', None)
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
+
+
+def profile_iterator(name, iterable):
+    """
+    Generates the items of `iterable`, profiling the work of getting each of
+    them as part of the stage `name` of the task being profiled, if any.
+    """
+    iterator = iter(iterable)
+    while True:
+        with profile_stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def record_profile_metrics(results, action_name):
+    """
+    Sends the measures of the profile `results` of a task as metrics.
+    """
+    for stage, measures in [('total', results['total'])] + results['stages'].items():
+        tags = [u'action:{}'.format(action_name), u'stage:{}'.format(stage)]
+        for key, value in measures.iteritems():
+            dog_stats_api.histogram(u'instructor_tasks.profile.{}'.format(key), value, tags=tags)
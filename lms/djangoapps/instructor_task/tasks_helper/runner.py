@@ -3,12 +3,15 @@ import logging
 from time import time
 
 from celery import current_task
+from django.conf import settings
 from django.db import reset_queries
 
 import dogstats_wrapper as dog_stats_api
 from lms.djangoapps.instructor_task.models import PROGRESS, InstructorTask
 from util.db import outer_atomic
 
+from .profiling import TaskProfiler, record_profile_metrics
+
 TASK_LOG = logging.getLogger('edx.celery.task')
 
 
@@ -80,6 +83,10 @@ def run_main_task(entry_id, task_fcn, action_name):
               Should be past-tense.  Pass-through of input `action_name`.
           'duration_ms': how long the task has (or had) been running.
 
+    When settings.INSTRUCTOR_TASK_PROFILE_STAGES is set, the result also gets a
+    'profile' of the resources used by the task and its stages, see the
+    `profiling` module.
+
     """
 
     # Get the InstructorTask to be updated. If this fails then let the exception return to Celery.
@@ -110,7 +117,13 @@ def run_main_task(entry_id, task_fcn, action_name):
 
     # Now do the work
     with dog_stats_api.timer('instructor_tasks.time.overall', tags=[u'action:{name}'.format(name=action_name)]):
-        task_progress = task_fcn(entry_id, course_id, task_input, action_name)
+        if settings.INSTRUCTOR_TASK_PROFILE_STAGES:
+            profiler = TaskProfiler(trace_memory=settings.INSTRUCTOR_TASK_PROFILE_TRACEMALLOC)
+            with profiler.profile_task():
+                task_progress = task_fcn(entry_id, course_id, task_input, action_name)
+            _add_profile(task_progress, profiler.results(), action_name, task_info_string)
+        else:
+            task_progress = task_fcn(entry_id, course_id, task_input, action_name)
 
     # Release any queries that the connection has been hanging onto
     reset_queries()
@@ -120,6 +133,26 @@ def run_main_task(entry_id, task_fcn, action_name):
     return task_progress
 
 
+def _add_profile(task_progress, profile, action_name, task_info_string):
+    """
+    Adds the `profile` of a task to its result, and records it in the log and in metrics.
+
+    The result is stored in the task_output column of the InstructorTask: the
+    measures of the stages are left out of it when they don't fit, and the
+    whole profile when even its total doesn't fit.
+    """
+    TASK_LOG.info(u'%s, Task type: %s, Profile: %s', task_info_string, action_name, profile)
+    record_profile_metrics(profile, action_name)
+    for task_profile in (profile, {'total': profile['total']}):
+        task_progress['profile'] = task_profile
+        try:
+            InstructorTask.create_output_for_success(task_progress)
+            return
+        except ValueError:
+            pass
+    task_progress.pop('profile')
+
+
 def _get_current_task():
     """
     Stub to make it easier to test without actually running Celery.
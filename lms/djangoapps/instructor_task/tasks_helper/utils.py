@@ -31,17 +31,61 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
         report_name: string - Name of the generated report
     """
     report_store = ReportStore.from_config(config_name)
-    report_name = u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
-        course_prefix=course_filename_prefix_generator(course_id),
-        csv_name=csv_name,
-        timestamp_str=timestamp.strftime("%Y-%m-%d-%H%M")
-    )
+    report_name = _report_name(csv_name, course_id, timestamp)
 
     report_store.store_rows(course_id, report_name, rows)
     tracker_emit(csv_name)
     return report_name
 
 
+def upload_csv_part_to_report_store(rows, part_name, course_id, config_name='GRADES_DOWNLOAD'):
+    """
+    Upload data as a CSV using ReportStore, as a part of a report that is
+    later put together by `merge_csv_parts_in_report_store`.
+
+    A part of the same name, left by an earlier attempt, is replaced.
+    """
+    report_store = ReportStore.from_config(config_name)
+    report_store.delete(course_id, part_name)
+    report_store.store_rows(course_id, part_name, rows)
+
+
+def merge_csv_parts_in_report_store(part_names, csv_name, course_id, timestamp, config_name='GRADES_DOWNLOAD'):
+    """
+    Concatenate CSV parts uploaded by `upload_csv_part_to_report_store` into
+    a report, named like the ones of `upload_csv_to_report_store`.
+
+    Returns:
+        report_name: string - Name of the generated report
+    """
+    report_store = ReportStore.from_config(config_name)
+    report_name = _report_name(csv_name, course_id, timestamp)
+
+    report_store.store_concatenated(course_id, report_name, part_names)
+    tracker_emit(csv_name)
+    return report_name
+
+
+def delete_csv_parts_from_report_store(part_names, course_id, config_name='GRADES_DOWNLOAD'):
+    """
+    Delete CSV parts uploaded by `upload_csv_part_to_report_store`.
+    """
+    report_store = ReportStore.from_config(config_name)
+    for part_name in part_names:
+        report_store.delete(course_id, part_name)
+
+
+def _report_name(csv_name, course_id, timestamp):
+    """
+    Returns the file name of a CSV report of the course, generated at `timestamp`.
+    """
+    return u"{course_prefix}_{csv_name}_{timestamp_str}.csv".format(
+        course_prefix=course_filename_prefix_generator(course_id),
+        csv_name=csv_name,
+        timestamp_str=timestamp.strftime("%Y-%m-%d-%H%M")
+    )
+
+
 def tracker_emit(report_name):
     """
     Emits a 'report.requested' event for the given report.
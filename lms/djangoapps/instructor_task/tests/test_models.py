@@ -1,7 +1,9 @@
 """
 Tests for instructor_task/models.py.
 """
+import codecs
 import copy
+import gzip
 import time
 from cStringIO import StringIO
 
@@ -52,6 +54,30 @@ class ReportStoreTestMixin(object):
         )
 
 
+    def test_store_rows_from_generator(self):
+        """
+        Test that ReportStore.store_rows() stores the rows of a generator as CSV.
+        """
+        report_store = self.create_report_store()
+        rows = ([u'row{}'.format(index), u'caf\xe9'] for index in range(3))
+        report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        self.assertEqual(
+            self.read_report(report_store, 'report.csv'),
+            codecs.BOM_UTF8 + 'row0,caf\xc3\xa9\r\nrow1,caf\xc3\xa9\r\nrow2,caf\xc3\xa9\r\n',
+        )
+
+    def read_report(self, report_store, filename):
+        """
+        Returns the content of a stored report, uncompressed.
+        """
+        with report_store.storage.open(report_store.path_to(self.course_id, filename)) as report_file:
+            content = report_file.read()
+        if content.startswith('\x1f\x8b'):
+            content = gzip.GzipFile(fileobj=StringIO(content)).read()
+        return content
+
+
 class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, SimpleTestCase):
     """
     Test the old LocalFSReportStore configuration.
@@ -116,6 +142,25 @@ class DjangoStorageReportStoreS3TestCase(MockS3Mixin, ReportStoreTestMixin, Test
             return ReportStore.from_config(config_name='GRADES_DOWNLOAD')
 
 
+    @patch('openedx.core.storage.S3ReportStorage.multipart_chunk_size', 5 * 1024 * 1024)
+    def test_multipart_upload(self):
+        """
+        Test that reports larger than a part are uploaded in parts.
+        """
+        report_store = self.create_report_store()
+        rows = (['x' * 1023] for __ in xrange(6 * 1024))
+        with patch.object(
+            report_store.storage.bucket, 'initiate_multipart_upload',
+            wraps=report_store.storage.bucket.initiate_multipart_upload,
+        ) as mock_initiate_multipart_upload:
+            report_store.store_rows(self.course_id, 'report.csv', rows)
+
+        self.assertTrue(mock_initiate_multipart_upload.called)
+        content = self.read_report(report_store, 'report.csv')
+        self.assertEqual(len(content), len(codecs.BOM_UTF8) + 6 * 1024 * 1025)
+        self.assertEqual(content[-1025:], 'x' * 1023 + '\r\n')
+
+
 class TestS3ReportStorage(MockS3Mixin, TestCase):
     """
     Test the S3ReportStorage to make sure that configuration overrides from settings.FINANCIAL_REPORTS
@@ -0,0 +1,92 @@
+"""
+Unit tests for the profiling of instructor tasks.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+
+from lms.djangoapps.instructor_task.models import InstructorTask
+from lms.djangoapps.instructor_task.tasks_helper.profiling import TaskProfiler, profile_iterator, profile_stage
+from lms.djangoapps.instructor_task.tasks_helper.runner import _add_profile
+from xmodule.modulestore.split_mongo.mongo_connection import TIMER as SPLIT_MONGO_TIMER
+
+
+class TestTaskProfiler(TestCase):
+    """
+    Tests for TaskProfiler.
+    """
+    def _modulestore_call(self):
+        """ Makes the split modulestore count a call. """
+        with SPLIT_MONGO_TIMER.timer('test', None):
+            pass
+
+    def test_nested_stages(self):
+        profiler = TaskProfiler()
+        with profiler.profile_task():
+            User.objects.count()
+            with profile_stage('outer'):
+                User.objects.count()
+                self._modulestore_call()
+                with profile_stage('inner'):
+                    User.objects.count()
+                    self._modulestore_call()
+                    self._modulestore_call()
+            with profile_stage('inner'):
+                User.objects.count()
+
+        results = profiler.results()
+        self.assertEqual(results['stages'].keys(), ['outer', 'inner'])
+        self.assertEqual(results['total']['queries'], 4)
+        self.assertEqual(results['total']['modulestore_calls'], 3)
+        self.assertEqual(results['stages']['outer']['queries'], 1)
+        self.assertEqual(results['stages']['outer']['modulestore_calls'], 1)
+        self.assertEqual(results['stages']['inner']['queries'], 2)
+        self.assertEqual(results['stages']['inner']['modulestore_calls'], 2)
+        self.assertItemsEqual(
+            results['total'].keys(), ['wall_ms', 'cpu_ms', 'max_rss_kb', 'queries', 'modulestore_calls']
+        )
+
+    def test_profile_iterator(self):
+        def users():
+            """ Generates users, with a query for each of them. """
+            for __ in range(3):
+                yield User.objects.first()
+
+        profiler = TaskProfiler()
+        with profiler.profile_task():
+            self.assertEqual(len(list(profile_iterator('users', users()))), 3)
+        self.assertEqual(profiler.results()['stages']['users']['queries'], 3)
+
+    def test_no_profiler(self):
+        with profile_stage('stage'):
+            User.objects.count()
+        self.assertEqual(list(profile_iterator('stage', [1, 2])), [1, 2])
+
+    def test_queries_still_captured(self):
+        with CaptureQueriesContext(connection) as queries:
+            with TaskProfiler().profile_task():
+                User.objects.count()
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(connection.force_debug_cursor)
+
+    @patch('lms.djangoapps.instructor_task.tasks_helper.runner.record_profile_metrics')
+    def test_add_profile(self, mock_record_profile_metrics):
+        measures = {'wall_ms': 1, 'cpu_ms': 1, 'max_rss_kb': 0, 'queries': 2, 'modulestore_calls': 3}
+        profile = {'total': measures, 'stages': {'stage': measures}}
+        task_progress = {'action_name': 'graded'}
+        _add_profile(task_progress, profile, 'graded', 'task')
+        self.assertEqual(task_progress['profile'], profile)
+        mock_record_profile_metrics.assert_called_once_with(profile, 'graded')
+
+        # Only the total is kept when the stages don't fit in the task output.
+        profile['stages'] = {'stage {}'.format(index): measures for index in range(20)}
+        _add_profile(task_progress, profile, 'graded', 'task')
+        self.assertEqual(task_progress['profile'], {'total': measures})
+
+        # The profile is left out when not even its total fits.
+        task_progress = {'action_name': 'graded', 'message': 'x' * 950}
+        _add_profile(task_progress, profile, 'graded', 'task')
+        self.assertNotIn('profile', task_progress)
+        InstructorTask.create_output_for_success(task_progress)
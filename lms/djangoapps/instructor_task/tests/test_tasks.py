@@ -11,6 +11,7 @@ from uuid import uuid4
 
 import ddt
 from celery.states import FAILURE, SUCCESS
+from django.test.utils import override_settings
 from django.utils.translation import ugettext_noop
 from mock import MagicMock, Mock, patch
 from opaque_keys.edx.locations import i4xEncoder
@@ -527,6 +528,18 @@ class TestResetAttemptsInstructorTask(TestInstructorTasks):
         # check that entries were reset
         self._assert_num_attempts(students, 0)
 
+    @override_settings(INSTRUCTOR_TASK_PROFILE_STAGES=True)
+    def test_reset_profile(self):
+        self._create_students_with_state(2, json.dumps({'attempts': 3}))
+        task_entry = self._create_input_entry()
+        status = self._run_task_with_mock_celery(reset_problem_attempts, task_entry.id, task_entry.task_id)
+        profile = status['profile']
+        self.assertItemsEqual(profile['stages'].keys(), ['structure', 'modules', 'update'])
+        self.assertGreaterEqual(
+            profile['total']['queries'], sum(stage['queries'] for stage in profile['stages'].values())
+        )
+        self.assertGreater(profile['stages']['update']['queries'], 0)
+
     def test_reset_with_zero_attempts(self):
         initial_attempts = 0
         input_state = json.dumps({'attempts': initial_attempts})
@@ -539,6 +552,29 @@ class TestResetAttemptsInstructorTask(TestInstructorTasks):
         # check that entries were reset
         self._assert_num_attempts(students, 0)
 
+    @override_settings(INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK=3)
+    def test_reset_in_subtasks(self):
+        input_state = json.dumps({'attempts': 3})
+        num_students = 10
+        students = self._create_students_with_state(num_students, input_state)
+        StudentModule.objects.filter(student=students[0]).update(state=json.dumps({'attempts': 0}))
+        task_entry = self._create_input_entry()
+        self._run_task_with_mock_celery(reset_problem_attempts, task_entry.id, task_entry.task_id)
+
+        # check that the subtasks recorded their progress in the entry:
+        entry = InstructorTask.objects.get(id=task_entry.id)
+        self.assertEquals(entry.task_state, SUCCESS)
+        subtasks = json.loads(entry.subtasks)
+        self.assertEquals(subtasks['total'], 4)
+        self.assertEquals(subtasks['succeeded'], 4)
+        output = json.loads(entry.task_output)
+        self.assertEquals(output['action_name'], 'reset')
+        self.assertEquals(output['total'], num_students)
+        self.assertEquals(output['attempted'], num_students)
+        self.assertEquals(output['succeeded'], num_students - 1)
+        self.assertEquals(output['skipped'], 1)
+        self._assert_num_attempts(students, 0)
+
     def _test_reset_with_student(self, use_email):
         """Run a reset task for one student, with several StudentModules for the problem defined."""
         num_students = 10
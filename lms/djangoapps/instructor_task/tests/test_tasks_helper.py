@@ -8,15 +8,19 @@ Unit tests for LMS instructor-initiated background tasks helper functions.
 
 """
 
+import json
 import os
 import shutil
 import tempfile
 import urllib
 from contextlib import contextmanager
 from datetime import datetime, timedelta
+from functools import partial
+from uuid import uuid4
 
 import ddt
 import unicodecsv
+from celery.states import FAILURE, SUCCESS
 from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
 from course_modes.models import CourseMode
 from course_modes.tests.factories import CourseModeFactory
@@ -55,6 +59,7 @@ from xmodule.partitions.partitions import Group, UserPartition
 import openedx.core.djangoapps.user_api.course_tag.api as course_tag_api
 from lms.djangoapps.certificates.models import CertificateStatuses, GeneratedCertificate
 from lms.djangoapps.certificates.tests.factories import CertificateWhitelistFactory, GeneratedCertificateFactory
+from lms.djangoapps.grades.course_grade_factory import CourseGradeFactory
 from lms.djangoapps.grades.models import PersistentCourseGrade
 from lms.djangoapps.grades.transformer import GradesTransformer
 from lms.djangoapps.instructor_task.tasks_helper.certs import generate_students_certificates
@@ -64,12 +69,14 @@ from lms.djangoapps.instructor_task.tasks_helper.enrollments import (
     upload_may_enroll_csv,
     upload_students_csv,
 )
+from lms.djangoapps.instructor_task.tasks import _create_grade_report_shard_subtask
 from lms.djangoapps.instructor_task.tasks_helper.grades import (
     ENROLLED_IN_COURSE,
     NOT_ENROLLED_IN_COURSE,
     CourseGradeReport,
     ProblemGradeReport,
     ProblemResponses,
+    _CourseGradeBulkContext,
 )
 from lms.djangoapps.instructor_task.tasks_helper.misc import (
     cohort_students_and_upload,
@@ -81,14 +88,16 @@ from lms.djangoapps.instructor_task.tests.test_base import (
     InstructorTaskModuleTestCase,
     TestReportMixin,
 )
+from lms.djangoapps.instructor_task.tests.factories import InstructorTaskFactory
 from lms.djangoapps.teams.tests.factories import CourseTeamFactory, CourseTeamMembershipFactory
 from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVerificationFactory
+from openedx.core.djangoapps.course_groups.cohorts import set_course_cohorted
 from openedx.core.djangoapps.course_groups.models import CohortMembership, CourseUserGroupPartitionGroup
 from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
 from openedx.core.djangoapps.credit.tests.factories import CreditCourseFactory
 from openedx.core.djangoapps.user_api.partition_schemes import RandomUserPartitionScheme
 from openedx.core.djangoapps.util.testing import ContentGroupTestCase, TestConditionalContent
-from ..models import ReportStore
+from ..models import InstructorTask, ReportStore
 from ..tasks_helper.utils import UPDATE_STATUS_FAILED, UPDATE_STATUS_SUCCEEDED
 
 
@@ -442,6 +451,163 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         )
 
 
+@override_settings(COURSE_GRADE_REPORT_SHARDS=3, COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD=2)
+class TestShardedGradeReport(InstructorGradeReportTestCase):
+    """
+    Tests grade reports generated in shards by subtasks.
+    """
+    def setUp(self):
+        super(TestShardedGradeReport, self).setUp()
+        self.course = CourseFactory.create()
+        self.students = [self.create_student(u'student{}'.format(index)) for index in range(7)]
+        self.entry = InstructorTaskFactory.create(course_id=self.course.id, task_id=str(uuid4()))
+
+    def _generate(self, create_shard_subtask_fcn=None):
+        """
+        Generates the grade report, with its subtasks run eagerly.
+        """
+        with patch('lms.djangoapps.instructor_task.tasks_helper.runner._get_current_task'):
+            return CourseGradeReport.generate(
+                None, self.entry.id, self.course.id, {}, 'graded',
+                create_shard_subtask_fcn=create_shard_subtask_fcn or partial(_create_grade_report_shard_subtask, {}),
+            )
+
+    def _fail_grading(self, fail):
+        """
+        Makes grading the batches of users for which `fail(users)` is true raise an exception.
+        """
+        def bulk_context(context, users):
+            """ Fails, or returns the actual bulk context. """
+            if fail(users):
+                raise ValueError('Cannot grade students')
+            return _CourseGradeBulkContext(context, users)
+
+        patcher = patch('lms.djangoapps.instructor_task.tasks_helper.grades._CourseGradeBulkContext', bulk_context)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _assert_entry(self, num_succeeded, num_failed):
+        """
+        Asserts the progress of the shards and of the merge recorded in the entry.
+        """
+        entry = InstructorTask.objects.get(pk=self.entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        subtasks = json.loads(entry.subtasks)
+        self.assertEqual(subtasks['total'], 4)
+        self.assertEqual(subtasks['succeeded'] + subtasks['failed'], 4)
+        self.assertDictContainsSubset(
+            {'total': 7, 'attempted': 7, 'succeeded': num_succeeded, 'failed': num_failed},
+            json.loads(entry.task_output),
+        )
+        return subtasks
+
+    def _assert_no_shard_files(self):
+        """
+        Asserts that the partial files of the shards were deleted.
+        """
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        shards_dir = report_store.path_to(self.course.id, u'grade_report_shards/{}'.format(self.entry.id))
+        self.assertEqual(report_store.storage.listdir(shards_dir), ([], []))
+
+    def test_sharded_report(self):
+        result = self._generate()
+        self.assertDictContainsSubset({'total': 7, 'attempted': 0}, result)
+        self._assert_entry(num_succeeded=7, num_failed=0)
+
+        # The rows are in the order of the user ids, across shards.
+        self.verify_rows_in_csv(
+            [{'Student ID': unicode(student.id), 'Username': student.username} for student in self.students],
+            ignore_other_columns=True,
+        )
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(len(report_store.links_for(self.course.id)), 1)
+        self._assert_no_shard_files()
+
+    def test_course_changed_after_headers(self):
+        def create_shard_subtask(*args):
+            """ Makes the course cohorted once the headers of the report were written. """
+            set_course_cohorted(self.course.id, True)
+            return _create_grade_report_shard_subtask({}, *args)
+
+        self._generate(create_shard_subtask)
+        self._assert_entry(num_succeeded=7, num_failed=0)
+
+        # The shards use the columns of the headers.
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        report_path = report_store.path_to(self.course.id, report_store.links_for(self.course.id)[0][0])
+        with report_store.storage.open(report_path) as csv_file:
+            csv_rows = list(unicodecsv.reader(csv_file, encoding='utf-8-sig'))
+        self.assertNotIn('Cohort Name', csv_rows[0])
+        self.assertEqual(len(csv_rows), 8)
+        self.assertTrue(all(len(row) == len(csv_rows[0]) for row in csv_rows))
+
+    def test_shard_retried(self):
+        failures = []
+
+        def fail_once(users):
+            """ Fails the first batch of users. """
+            failures.append(users)
+            return len(failures) == 1
+
+        self._fail_grading(fail_once)
+        self._generate()
+        subtasks = self._assert_entry(num_succeeded=7, num_failed=0)
+        self.assertEqual(subtasks['succeeded'], 4)
+        self.assertEqual(sorted(status['retried_withmax'] for status in subtasks['status'].values()), [0, 0, 0, 1])
+        self.verify_rows_in_csv(
+            [{'Username': student.username} for student in self.students], ignore_other_columns=True,
+        )
+        self._assert_no_shard_files()
+
+    def test_shard_failed(self):
+        first_student = self.students[0]
+        self._fail_grading(lambda users: first_student in users)
+        self._generate()
+
+        # The first shard, with 3 learners, failed after its retries, so the report isn't merged.
+        subtasks = self._assert_entry(num_succeeded=4, num_failed=3)
+        self.assertEqual(subtasks['failed'], 2)
+        self.assertEqual(
+            sorted(status['state'] for status in subtasks['status'].values()), [FAILURE, FAILURE, SUCCESS, SUCCESS]
+        )
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        self.assertEqual(report_store.links_for(self.course.id), [])
+        self._assert_no_shard_files()
+
+    def test_grading_errors(self):
+        last_student = self.students[-1]
+        grades_iter = CourseGradeFactory.iter
+
+        def fail_last_student(factory, users, **kwargs):
+            """ Grades the users, failing to grade the last student. """
+            for user, course_grade, error in grades_iter(factory, users, **kwargs):
+                if user == last_student:
+                    yield user, None, TypeError('Cannot grade student')
+                else:
+                    yield user, course_grade, error
+
+        with patch.object(CourseGradeFactory, 'iter', fail_last_student):
+            self._generate()
+
+        self._assert_entry(num_succeeded=6, num_failed=1)
+        report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        links = report_store.links_for(self.course.id)
+        self.assertEqual(len(links), 2)
+        error_report_index = [index for index, (name, __) in enumerate(links) if 'grade_report_err' in name][0]
+        self.verify_rows_in_csv(
+            [{'Student ID': unicode(last_student.id), 'Username': last_student.username}],
+            file_index=error_report_index,
+            ignore_other_columns=True,
+        )
+        self._assert_no_shard_files()
+
+    @override_settings(COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD=4)
+    def test_too_few_learners(self):
+        result = self._generate()
+        self.assertDictContainsSubset({'attempted': 7, 'succeeded': 7, 'failed': 0}, result)
+        self.assertEqual(InstructorTask.objects.get(pk=self.entry.id).subtasks, '')
+
+
 class TestTeamGradeReport(InstructorGradeReportTestCase):
     """ Test that teams appear correctly in the grade report when it is enabled for the course. """
 
@@ -520,6 +686,7 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskModuleTestCase):
             course_key=self.course.id,
             usage_key_str=str(self.course.location),
         )
+        student_data = list(student_data)
 
         self.assertEquals(len(student_data), 4)
 
@@ -540,6 +707,7 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskModuleTestCase):
                 course_key=self.course.id,
                 usage_key_str=str(problem.location),
             )
+            student_data = list(student_data)
         self.assertEquals(len(student_data), 1)
         self.assertDictContainsSubset({
             'username': 'student',
@@ -567,6 +735,7 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskModuleTestCase):
             course_key=self.course.id,
             usage_key_str=str(self.course.location),
         )
+        student_data = list(student_data)
         self.assertEquals(len(student_data), 1)
         self.assertDictContainsSubset({
             'username': 'student',
@@ -589,6 +758,7 @@ class TestProblemResponsesReport(TestReportMixin, InstructorTaskModuleTestCase):
             course_key=self.course.id,
             usage_key_str=str(self.course.location),
         )
+        student_data = list(student_data)
         self.assertEquals(len(student_data), 1)
         self.assertDictContainsSubset({
             'username': 'student',
@@ -196,6 +196,9 @@ if ENV_TOKENS.get('SESSION_COOKIE_NAME', None):
     SESSION_COOKIE_NAME = str(ENV_TOKENS.get('SESSION_COOKIE_NAME'))
 
 CACHES = ENV_TOKENS['CACHES']
+COURSE_STRUCTURE_LOCAL_CACHE = ENV_TOKENS.get('COURSE_STRUCTURE_LOCAL_CACHE', COURSE_STRUCTURE_LOCAL_CACHE)
+CONTENTSERVER_DISK_CACHE = ENV_TOKENS.get('CONTENTSERVER_DISK_CACHE', CONTENTSERVER_DISK_CACHE)
+COURSE_ASSET_INDEX_CACHE_SIZE = ENV_TOKENS.get('COURSE_ASSET_INDEX_CACHE_SIZE', COURSE_ASSET_INDEX_CACHE_SIZE)
 # Cache used for location mapping -- called many times with the same key/value
 # in a given request.
 if 'loc_cache' not in CACHES:
@@ -240,6 +243,7 @@ BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = ENV_TOKENS.get(
     'BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS',
     BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS
 )
+BULK_EMAIL_SEND_BATCH_SIZE = ENV_TOKENS.get('BULK_EMAIL_SEND_BATCH_SIZE', BULK_EMAIL_SEND_BATCH_SIZE)
 # We want Bulk Email running on the high-priority queue, so we define the
 # routing key that points to it. At the moment, the name is the same.
 # We have to reset the value here, since we have changed the value of the queue name.
@@ -249,6 +253,17 @@ BULK_EMAIL_ROUTING_KEY = ENV_TOKENS.get('BULK_EMAIL_ROUTING_KEY', HIGH_PRIORITY_
 # we have to reset the value here.
 BULK_EMAIL_ROUTING_KEY_SMALL_JOBS = ENV_TOKENS.get('BULK_EMAIL_ROUTING_KEY_SMALL_JOBS', DEFAULT_PRIORITY_QUEUE)
 
+# Instructor task overrides
+INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK',
+    INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK
+)
+INSTRUCTOR_TASK_PROFILE_STAGES = ENV_TOKENS.get('INSTRUCTOR_TASK_PROFILE_STAGES', INSTRUCTOR_TASK_PROFILE_STAGES)
+INSTRUCTOR_TASK_PROFILE_TRACEMALLOC = ENV_TOKENS.get(
+    'INSTRUCTOR_TASK_PROFILE_TRACEMALLOC',
+    INSTRUCTOR_TASK_PROFILE_TRACEMALLOC
+)
+
 # Queue to use for expiring old entitlements
 ENTITLEMENTS_EXPIRATION_ROUTING_KEY = ENV_TOKENS.get('ENTITLEMENTS_EXPIRATION_ROUTING_KEY', DEFAULT_PRIORITY_QUEUE)
 
@@ -334,6 +349,7 @@ LOGGING = get_logger_config(LOG_DIR,
 COURSE_LISTINGS = ENV_TOKENS.get('COURSE_LISTINGS', {})
 COMMENTS_SERVICE_URL = ENV_TOKENS.get("COMMENTS_SERVICE_URL", '')
 COMMENTS_SERVICE_KEY = ENV_TOKENS.get("COMMENTS_SERVICE_KEY", '')
+COMMENTS_SERVICE_CONNECTION_POOL = ENV_TOKENS.get('COMMENTS_SERVICE_CONNECTION_POOL', COMMENTS_SERVICE_CONNECTION_POOL)
 CERT_NAME_SHORT = ENV_TOKENS.get('CERT_NAME_SHORT', CERT_NAME_SHORT)
 CERT_NAME_LONG = ENV_TOKENS.get('CERT_NAME_LONG', CERT_NAME_LONG)
 CERT_QUEUE = ENV_TOKENS.get("CERT_QUEUE", 'test-pull')
@@ -364,6 +380,9 @@ for name, value in ENV_TOKENS.get("CODE_JAIL", {}).items():
         CODE_JAIL[name] = value
 
 COURSES_WITH_UNSAFE_CODE = ENV_TOKENS.get("COURSES_WITH_UNSAFE_CODE", [])
+CODE_JAIL_WORKER_POOL = ENV_TOKENS.get('CODE_JAIL_WORKER_POOL', CODE_JAIL_WORKER_POOL)
+SAFE_EXEC_LOCAL_CACHE = ENV_TOKENS.get('SAFE_EXEC_LOCAL_CACHE', SAFE_EXEC_LOCAL_CACHE)
+STATIC_URL_CACHE_SIZE = ENV_TOKENS.get('STATIC_URL_CACHE_SIZE', STATIC_URL_CACHE_SIZE)
 
 ASSET_IGNORE_REGEX = ENV_TOKENS.get('ASSET_IGNORE_REGEX', ASSET_IGNORE_REGEX)
 
@@ -638,6 +657,19 @@ DISABLE_ACCOUNT_ACTIVATION_REQUIREMENT_SWITCH = ENV_TOKENS.get(
 GRADES_DOWNLOAD_ROUTING_KEY = ENV_TOKENS.get('GRADES_DOWNLOAD_ROUTING_KEY', HIGH_MEM_QUEUE)
 
 GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
+COURSE_GRADE_REPORT_SHARDS = ENV_TOKENS.get('COURSE_GRADE_REPORT_SHARDS', COURSE_GRADE_REPORT_SHARDS)
+COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD = ENV_TOKENS.get(
+    'COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD',
+    COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD
+)
+COURSE_GRADE_REPORT_SHARD_RETRY_DELAY = ENV_TOKENS.get(
+    'COURSE_GRADE_REPORT_SHARD_RETRY_DELAY',
+    COURSE_GRADE_REPORT_SHARD_RETRY_DELAY
+)
+COURSE_GRADE_REPORT_SHARD_MAX_RETRIES = ENV_TOKENS.get(
+    'COURSE_GRADE_REPORT_SHARD_MAX_RETRIES',
+    COURSE_GRADE_REPORT_SHARD_MAX_RETRIES
+)
 
 # Rate limit for regrading tasks that a grading policy change can kick off
 POLICY_CHANGE_TASK_RATE_LIMIT = ENV_TOKENS.get('POLICY_CHANGE_TASK_RATE_LIMIT', POLICY_CHANGE_TASK_RATE_LIMIT)
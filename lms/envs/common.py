@@ -845,6 +845,23 @@ XBLOCK_FIELD_DATA_WRAPPERS = ()
 
 MODULESTORE_BRANCH = 'published-only'
 CONTENTSTORE = None
+
+# Course assets larger than the "course_assets" cache takes (1MB) can be copied
+# to a directory on the local disk of each server, and served from there.  The
+# least recently used files are removed to keep it under MAX_BYTES, and assets
+# larger than MAX_ASSET_BYTES aren't copied.  A DIRECTORY of None disables it.
+CONTENTSERVER_DISK_CACHE = {
+    'DIRECTORY': None,
+    'MAX_BYTES': 0,
+    'MAX_ASSET_BYTES': 0,
+}
+
+# Number of courses whose index of assets (their locked status and digest) each
+# process keeps, to link to and redirect to the current version of their assets
+# without looking each of them up in the contentstore.  The indexes are shared
+# through the "course_assets" cache, and rebuilt when the assets of their course
+# change.  0 disables them.
+COURSE_ASSET_INDEX_CACHE_SIZE = 0
 DOC_STORE_CONFIG = {
     'host': 'localhost',
     'db': 'xmodule',
@@ -884,6 +901,14 @@ MODULESTORE = {
     }
 }
 
+# In-process, least-recently-used tier in front of the 'course_structure_cache'
+# for split modulestore course structures, which keeps them pickled but not
+# compressed. Setting either limit to 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE = {
+    'MAX_STRUCTURES': 0,
+    'MAX_BLOCKS': 0,
+}
+
 #################### Python sandbox ############################################
 
 CODE_JAIL = {
@@ -899,6 +924,24 @@ CODE_JAIL = {
     },
 }
 
+# Pool of warm sandboxed Pythons that run the code of problems without waiting
+# for a new one to start and import numpy, see capa.safe_exec.worker_pool.
+# SIZE is the number of idle workers per process (0 disables the pool), and
+# idle workers are discarded after MAX_AGE seconds.  Each worker runs the code
+# of a single execution, so that executions can't tamper with each other.
+CODE_JAIL_WORKER_POOL = {
+    'SIZE': 0,
+    'MAX_AGE': 300,
+}
+
+# In-process, least-recently-used tier in front of the cache of safe_exec
+# results (the pickled results of problems' Python code). Setting either limit
+# to 0 disables it.
+SAFE_EXEC_LOCAL_CACHE = {
+    'MAX_ENTRIES': 0,
+    'MAX_BYTES': 0,
+}
+
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
 # of them must match the course id for that course to run unsafe code.
 #
@@ -951,6 +994,11 @@ MANAGERS = ADMINS
 STATIC_URL = '/static/'
 STATIC_ROOT = ENV_ROOT / "staticfiles"
 
+# Number of urls of course assets, resolved from the /static/ urls in course
+# content, that each process keeps until the assets of their course change.
+# 0 disables it.
+STATIC_URL_CACHE_SIZE = 0
+
 STATICFILES_DIRS = [
     COMMON_ROOT / "static",
     PROJECT_ROOT / "static",
@@ -1157,6 +1205,20 @@ EDXNOTES_INTERNAL_API = 'http://localhost:8120/api/v1'
 EDXNOTES_CONNECT_TIMEOUT = 0.5  # time in seconds
 EDXNOTES_READ_TIMEOUT = 1.5  # time in seconds
 
+############################ Comments service ##############################
+
+# The pool of keep-alive connections each process opens to the comments service.
+# POOL_MAXSIZE connections are kept open at most; failed connections, and 502,
+# 503 and 504 responses to idempotent requests, are retried up to MAX_RETRIES
+# times, waiting BACKOFF_FACTOR * 2 ** (retry - 1) seconds between tries.
+COMMENTS_SERVICE_CONNECTION_POOL = {
+    'POOL_CONNECTIONS': 1,
+    'POOL_MAXSIZE': 10,
+    'KEEP_ALIVE': True,
+    'MAX_RETRIES': 0,
+    'BACKOFF_FACTOR': 0,
+}
+
 ########################## Parental controls config  #######################
 
 # The age at which a learner no longer requires parental consent, or None
@@ -1928,6 +1990,12 @@ BLOCK_STRUCTURES_SETTINGS = dict(
 
     # Backend storage options
     PRUNING_ACTIVE=False,
+
+    # Maximum fraction of a course's blocks that may need to be
+    # re-collected for an updated course to be collected incrementally,
+    # when the incremental_collection waffle switch is enabled.  Above
+    # it, the whole course is re-collected.
+    INCREMENTAL_COLLECTION_MAX_RATIO=0.25,
 )
 
 ################################ Bulk Email ###################################
@@ -1974,6 +2042,10 @@ BULK_EMAIL_LOG_SENT_EMAILS = False
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Number of messages that a bulk email subtask renders before sending them one
+# after the other over its open connection.  Each batch is timed.
+BULK_EMAIL_SEND_BATCH_SIZE = 20
+
 ############################# Email Opt In ####################################
 
 # Minimum age for organization-wide email opt in
@@ -2055,7 +2127,7 @@ INSTALLED_APPS = [
     'openedx.core.djangoapps.plugin_api',
 
     # For content serving
-    'openedx.core.djangoapps.contentserver',
+    'openedx.core.djangoapps.contentserver.apps.ContentServerConfig',
 
     # Site configuration for theming and behavioral modification
     'openedx.core.djangoapps.site_configuration',
@@ -2583,6 +2655,21 @@ BADGR_ISSUER_SLUG = "example-issuer"
 # Number of seconds to wait on the badging server when contacting it before giving up.
 BADGR_TIMEOUT = 10
 
+###################### Instructor Tasks ######################
+# Problem rescore, reset, override and delete tasks that update more student
+# modules than this are split into subtasks that each update this many.
+# Set to 0 to update all the student modules in a single task.
+INSTRUCTOR_TASK_MODULE_STATES_PER_SUBTASK = 1000
+
+# Record the wall time, CPU time, memory, SQL queries and modulestore calls of
+# instructor tasks and of their stages in their results.  Counting the queries
+# makes every database connection use a debug cursor while the tasks run.
+INSTRUCTOR_TASK_PROFILE_STAGES = False
+
+# Also trace the memory allocated by the stages of instructor tasks with
+# tracemalloc, when it's available.  Tracing makes the tasks slower.
+INSTRUCTOR_TASK_PROFILE_TRACEMALLOC = False
+
 ###################### Grade Downloads ######################
 # These keys are used for all of our asynchronous downloadable files, including
 # the ones that contain information other than grades.
@@ -2594,6 +2681,18 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# The learners of a course are split into at most this many shards, graded in
+# parallel by subtasks, when generating its grade report.  Each shard has at
+# least COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD learners, so smaller courses
+# get fewer shards.  Set to 0 to generate grade reports in a single task.
+COURSE_GRADE_REPORT_SHARDS = 8
+COURSE_GRADE_REPORT_MIN_LEARNERS_PER_SHARD = 10000
+
+# Initial delay in seconds before retrying a failed grade report shard, which
+# doubles with each retry, and the number of retries.
+COURSE_GRADE_REPORT_SHARD_RETRY_DELAY = 60
+COURSE_GRADE_REPORT_SHARD_MAX_RETRIES = 3
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': 'edx-financial-reports',
@@ -1,9 +1,18 @@
+import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from .utils import CommentClientRequestError, extract, perform_request
+from django.db import connections
+from django.utils import translation
+from edx_django_utils.cache import RequestCache
+
+from .utils import FIND_MANY_CACHE_NAMESPACE, CommentClientRequestError, extract, get_forums_config, perform_request
 
 log = logging.getLogger(__name__)
 
+# The most requests find_many makes to the comments service at once.
+FIND_MANY_MAX_WORKERS = 8
+
 
 class Model(object):
 
@@ -97,6 +106,52 @@ class Model(object):
     def find(cls, id):
         return cls(id=id)
 
+    @classmethod
+    def find_many(cls, ids, retrieve_kwargs=None, **attributes):
+        """
+        Returns retrieved instances with the given ids, and attributes, in the same order as the ids.
+
+        The instances that weren't found during this request yet are retrieved concurrently, with
+        at most FIND_MANY_MAX_WORKERS requests at once, and kept for the rest of the request.  Any
+        request that changes data in the comments service drops the kept instances.
+        """
+        retrieve_kwargs = retrieve_kwargs or {}
+        request_cache = RequestCache(FIND_MANY_CACHE_NAMESPACE)
+
+        def cache_key(instance_id):
+            """ Returns the key of the instance with the given id in the request cache. """
+            return u'{}.{}.{}.{}'.format(
+                cls.__name__, instance_id, sorted(attributes.items()), sorted(retrieve_kwargs.items()),
+            )
+
+        instances = []
+        missing_instances = []
+        for instance_id in ids:
+            instance = cls(id=instance_id, **attributes)
+            cached_response = request_cache.get_cached_response(cache_key(instance_id))
+            if cached_response.is_found:
+                instance.attributes.update(copy.deepcopy(cached_response.value))
+                instance.retrieved = True
+            else:
+                missing_instances.append(instance)
+            instances.append(instance)
+
+        if missing_instances:
+            # Read the config in this thread, rather than in each of the workers.
+            get_forums_config()
+            language = translation.get_language()
+            max_workers = min(len(missing_instances), FIND_MANY_MAX_WORKERS)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(_retrieve_in_worker, instance, language, retrieve_kwargs)
+                    for instance in missing_instances
+                ]
+            for future, instance in zip(futures, missing_instances):
+                future.result()
+                request_cache.set(cache_key(instance.id), copy.deepcopy(instance.attributes))
+
+        return instances
+
     def _update_from_response(self, response_data):
         for k, v in response_data.items():
             if k in self.accessible_fields:
@@ -180,3 +235,15 @@ class Model(object):
                 raise CommentClientRequestError("Cannot perform action {0} without id".format(action))
         else:   # action must be in DEFAULT_ACTIONS_WITHOUT_ID now
             return cls.url_without_id()
+
+
+def _retrieve_in_worker(instance, language, retrieve_kwargs):
+    """
+    Retrieves the instance in a worker thread of find_many, in the language of the request.
+    """
+    try:
+        with translation.override(language):
+            instance.retrieve(**retrieve_kwargs)
+    finally:
+        # Worker threads don't get the end of request cleanup of Django.
+        connections.close_all()
@@ -1,17 +1,41 @@
 """" Common utilities for comment client wrapper """
 import logging
+import os
+import threading
 from contextlib import contextmanager
+from cookielib import DefaultCookiePolicy
 from time import time
+from urlparse import urlparse
 from uuid import uuid4
 
 import requests
+from django.conf import settings
+from django.db.models.signals import post_save
 from django.utils.translation import get_language
+from edx_django_utils.cache import RequestCache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import dogstats_wrapper as dog_stats_api
 from .settings import SERVICE_HOST as COMMENTS_SERVICE
 
 log = logging.getLogger(__name__)
 
+# Seconds for which a process reuses the ForumsConfig it read, rather than reading it for every request.
+# Saving a ForumsConfig makes the process that saved it read it again right away.
+FORUMS_CONFIG_CACHE_TIMEOUT = 60
+
+# The namespace of the request cache of Model.find_many.
+FIND_MANY_CACHE_NAMESPACE = 'comment_client.find_many'
+
+# The path segments of the comments service API that don't vary, which name the endpoints in metrics.
+# The other segments are ids.
+ENDPOINT_PATH_SEGMENTS = frozenset([
+    'api', 'v1', 'abuse_flag', 'abuse_unflag', 'active_threads', 'commentables', 'comments', 'heartbeat',
+    'pin', 'read', 'replace_username', 'retire', 'search', 'subscribed_threads', 'subscriptions', 'threads',
+    'unpin', 'users', 'votes',
+])
+
 
 def strip_none(dic):
     return dict([(k, v) for k, v in dic.iteritems() if v is not None])
@@ -37,6 +61,11 @@ def request_timer(request_id, method, url, tags=None):
         yield
     end = time()
     duration = end - start
+    dog_stats_api.histogram(
+        'comment_client.request.latency',
+        value=duration,
+        tags=[u'endpoint:{}'.format(get_endpoint(url)), u'method:{}'.format(method)],
+    )
 
     log.info(
         u"comment_client_request_log: request_id={request_id}, method={method}, "
@@ -49,11 +78,109 @@ def request_timer(request_id, method, url, tags=None):
     )
 
 
-def perform_request(method, url, data_or_params=None, raw=False,
-                    metric_action=None, metric_tags=None, paged_results=False):
+def get_endpoint(url):
+    """
+    Returns the endpoint of the comments service that the url is for, with its ids replaced by ":id".
+    """
+    return u'/'.join(
+        segment if segment in ENDPOINT_PATH_SEGMENTS else u':id'
+        for segment in urlparse(url).path.strip('/').split('/')
+    )
+
+
+class RejectCookiesPolicy(DefaultCookiePolicy):
+    """
+    A cookie policy which rejects every cookie set by a response.
+    """
+    def set_ok(self, cookie, request):
+        return False
+
+
+class CommentServiceSession(requests.Session):
+    """
+    A session with a pool of keep-alive connections to the comments service.
+
+    Its size, its retry policy and whether connections are kept alive are set
+    by the COMMENTS_SERVICE_CONNECTION_POOL setting.  A forked process gets new
+    connections rather than sharing the ones of its parent.  The session is
+    shared by the requests of all users, so it never keeps cookies.
+    """
+    def __init__(self):
+        super(CommentServiceSession, self).__init__()
+        self.cookies.set_policy(RejectCookiesPolicy())
+        self._pid = os.getpid()
+        self.configure()
+
+    def configure(self):
+        """
+        Mounts pooled adapters, configured by the COMMENTS_SERVICE_CONNECTION_POOL setting.
+        """
+        pool_settings = getattr(settings, 'COMMENTS_SERVICE_CONNECTION_POOL', {})
+        max_retries = pool_settings.get('MAX_RETRIES', 0)
+        adapter = HTTPAdapter(
+            pool_connections=pool_settings.get('POOL_CONNECTIONS', 1),
+            pool_maxsize=pool_settings.get('POOL_MAXSIZE', 10),
+            # Only idempotent requests are retried after a response was read, or on a 502, 503 or 504 error.
+            max_retries=Retry(
+                total=max_retries,
+                connect=max_retries,
+                read=max_retries,
+                status=max_retries,
+                status_forcelist=(502, 503, 504),
+                backoff_factor=pool_settings.get('BACKOFF_FACTOR', 0),
+                raise_on_status=False,
+            ),
+        )
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        if not pool_settings.get('KEEP_ALIVE', True):
+            self.headers['Connection'] = 'close'
+
+    def request(self, method, url, *args, **kwargs):  # pylint: disable=arguments-differ
+        if os.getpid() != self._pid:
+            # The connections of the pool belong to the parent process.
+            self.close()
+            self.configure()
+            self._pid = os.getpid()
+        return super(CommentServiceSession, self).request(method, url, *args, **kwargs)
+
+
+SESSION = CommentServiceSession()
+
+_forums_config = {}
+_forums_config_lock = threading.Lock()
+
+
+def get_forums_config():
+    """
+    Returns the current ForumsConfig, read at most once every FORUMS_CONFIG_CACHE_TIMEOUT seconds.
+    """
+    with _forums_config_lock:
+        if _forums_config.get('expires', 0) > time():
+            return _forums_config['config']
+
     # To avoid dependency conflict
     from django_comment_common.models import ForumsConfig
     config = ForumsConfig.current()
+    with _forums_config_lock:
+        _forums_config.update(config=config, expires=time() + FORUMS_CONFIG_CACHE_TIMEOUT)
+    return config
+
+
+def clear_forums_config(**kwargs):  # pylint: disable=unused-argument
+    """
+    Makes the next request read the current ForumsConfig.
+    """
+    with _forums_config_lock:
+        _forums_config.clear()
+
+
+post_save.connect(clear_forums_config, sender='django_comment_common.ForumsConfig')
+
+
+def perform_request(method, url, data_or_params=None, raw=False,
+                    metric_action=None, metric_tags=None, paged_results=False):
+    config = get_forums_config()
 
     if not config.enabled:
         raise CommentClientMaintenanceError('service disabled')
@@ -74,6 +201,10 @@ def perform_request(method, url, data_or_params=None, raw=False,
     request_id = uuid4()
     request_id_dict = {'request_id': request_id}
 
+    if method.lower() != 'get':
+        # The instances that find_many kept for this request may be out of date now.
+        RequestCache(FIND_MANY_CACHE_NAMESPACE).clear()
+
     if method in ['post', 'put', 'patch']:
         data = data_or_params
         params = request_id_dict
@@ -82,7 +213,7 @@ def perform_request(method, url, data_or_params=None, raw=False,
         params = data_or_params.copy()
         params.update(request_id_dict)
     with request_timer(request_id, method, url, metric_tags):
-        response = requests.request(
+        response = SESSION.request(
             method,
             url,
             data=data,
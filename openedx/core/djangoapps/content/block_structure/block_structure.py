@@ -5,11 +5,15 @@ Module with family of classes for block structures.
     BlockStructureModulestoreData - responsible for xBlock data.
 
 The following internal data structures are implemented:
-    _BlockRelations - Data structure for a single block's relations.
+    _BlockGraph - Data structure for all blocks' relations.
+    _BlockRelations - Data structure for a single block's relations,
+        used only by pickled data and for backward compatibility.
     _BlockData - Data structure for a single block's data.
 """
+from array import array
 from copy import deepcopy
 from functools import partial
+from itertools import izip
 from logging import getLogger
 
 from openedx.core.lib.graph_traversals import traverse_topologically, traverse_post_order
@@ -40,6 +44,274 @@ class _BlockRelations(object):
         self.children = []
 
 
+class _BlockGraph(object):
+    """
+    Data structure to encapsulate the blocks of a block structure and
+    their relations.
+
+    Each block is given an integer id, in the order in which it is
+    added, and the parents and children of each block are kept as
+    arrays of those ids.  Traversals work on the ids, so they don't need
+    to hash and compare usage keys (which is done in Python code) at
+    every step.
+    """
+    # Typecode of the arrays of block ids.
+    ID_TYPECODE = 'i'
+
+    def __init__(self):
+        # Usage key of each block id.  Entries of removed blocks are
+        # kept, so that the ids of the remaining blocks don't change.
+        # list [UsageKey]
+        self.keys = []
+
+        # Map of the usage key of each block in the graph to its id.
+        # dict {UsageKey: int}
+        self.ids = {}
+
+        # Ids of each block's parents, indexed by block id.
+        # list [array(int)]
+        self.parents = []
+
+        # Ids of each block's children, indexed by block id.
+        # list [array(int)]
+        self.children = []
+
+        # Whether each block id is still in the graph.
+        # bytearray
+        self.present = bytearray()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, usage_key):
+        return usage_key in self.ids
+
+    def iterkeys(self):
+        """
+        Returns an iterator of the usage keys of the blocks in the
+        graph, in the order they were added.
+        """
+        present = self.present
+        return (usage_key for block_id, usage_key in enumerate(self.keys) if present[block_id])
+
+    def get_parents(self, usage_key):
+        """
+        Returns a list of the usage keys of the given block's parents.
+        """
+        block_id = self.ids.get(usage_key)
+        if block_id is None:
+            return []
+        keys = self.keys
+        return [keys[parent_id] for parent_id in self.parents[block_id]]
+
+    def get_children(self, usage_key):
+        """
+        Returns a list of the usage keys of the given block's children.
+        """
+        block_id = self.ids.get(usage_key)
+        if block_id is None:
+            return []
+        keys = self.keys
+        return [keys[child_id] for child_id in self.children[block_id]]
+
+    def clear_parents(self, usage_key):
+        """
+        Forgets the parents of the given block, without updating the
+        parents' children.
+        """
+        self.parents[self.ids[usage_key]] = array(self.ID_TYPECODE)
+
+    def add_block(self, usage_key):
+        """
+        Adds the given block to the graph, if it isn't already there,
+        and returns its id.
+        """
+        block_id = self.ids.get(usage_key)
+        if block_id is None:
+            block_id = len(self.keys)
+            self.ids[usage_key] = block_id
+            self.keys.append(usage_key)
+            self.parents.append(array(self.ID_TYPECODE))
+            self.children.append(array(self.ID_TYPECODE))
+            self.present.append(1)
+        return block_id
+
+    def add_relation(self, parent_key, child_key):
+        """
+        Adds a parent to child relationship, adding the blocks as needed.
+        """
+        self._add_relation_ids(self.add_block(parent_key), self.add_block(child_key))
+
+    def remove_block(self, usage_key):
+        """
+        Removes the given block and its relations from the graph.
+
+        Returns:
+            ([UsageKey], [UsageKey]) - The usage keys of the removed
+                block's parents and children.
+        """
+        parents, children = self.get_parents(usage_key), self.get_children(usage_key)
+        block_id = self.ids.pop(usage_key)
+        for child_id in self.children[block_id]:
+            self.parents[child_id].remove(block_id)
+        for parent_id in self.parents[block_id]:
+            self.children[parent_id].remove(block_id)
+        self.parents[block_id] = array(self.ID_TYPECODE)
+        self.children[block_id] = array(self.ID_TYPECODE)
+        self.present[block_id] = 0
+        return parents, children
+
+    def traverse_topologically(self, start_key, filter_func=None, yield_descendants_of_unyielded=False):
+        """
+        Returns a generator of the usage keys of the blocks in a
+        topological sort starting at start_key, which must be in the
+        graph.  See openedx.core.lib.graph_traversals.traverse_topologically.
+        """
+        keys = self.keys
+        block_ids = traverse_topologically(
+            start_node=self.ids[start_key],
+            get_parents=self.parents.__getitem__,
+            get_children=self.children.__getitem__,
+            filter_func=self._id_filter(filter_func),
+            yield_descendants_of_unyielded=yield_descendants_of_unyielded,
+        )
+        return (keys[block_id] for block_id in block_ids)
+
+    def traverse_post_order(self, start_key, filter_func=None):
+        """
+        Returns a generator of the usage keys of the blocks in a
+        post-order sort starting at start_key, which must be in the
+        graph.  See openedx.core.lib.graph_traversals.traverse_post_order.
+        """
+        keys = self.keys
+        block_ids = traverse_post_order(
+            start_node=self.ids[start_key],
+            get_children=self.children.__getitem__,
+            filter_func=self._id_filter(filter_func),
+        )
+        return (keys[block_id] for block_id in block_ids)
+
+    def pruned(self, root_key):
+        """
+        Returns a new graph with only the blocks that are reachable from
+        the given root, with ids in the order of a post-order traversal.
+        """
+        pruned_graph = _BlockGraph()
+        if root_key not in self.ids:
+            return pruned_graph
+
+        pruned_ids = {}
+        for block_id in traverse_post_order(self.ids[root_key], self.children.__getitem__):
+            pruned_id = pruned_graph.add_block(self.keys[block_id])
+            pruned_ids[block_id] = pruned_id
+            for child_id in self.children[block_id]:
+                pruned_child_id = pruned_ids.get(child_id)
+                if pruned_child_id is not None:
+                    pruned_graph._add_relation_ids(pruned_id, pruned_child_id)  # pylint: disable=protected-access
+        return pruned_graph
+
+    def copy(self):
+        """
+        Returns a copy of this graph.  Usage keys are immutable, so they
+        are shared with the copy.
+        """
+        graph_copy = _BlockGraph()
+        graph_copy.keys = list(self.keys)
+        graph_copy.ids = dict(self.ids)
+        graph_copy.parents = [block_parents[:] for block_parents in self.parents]
+        graph_copy.children = [block_children[:] for block_children in self.children]
+        graph_copy.present = bytearray(self.present)
+        return graph_copy
+
+    def to_arrays(self):
+        """
+        Returns the graph as contiguous arrays, leaving out removed
+        blocks.
+
+        Returns:
+            (keys, child_offsets, children, parent_offsets, parents) -
+                Where the children of the block with usage key keys[i]
+                are the blocks with the ids in
+                children[child_offsets[i]:child_offsets[i + 1]], and
+                likewise for its parents.
+        """
+        present = self.present
+        old_ids = [block_id for block_id in xrange(len(self.keys)) if present[block_id]]
+        new_ids = {old_id: new_id for new_id, old_id in enumerate(old_ids)}
+
+        def flatten(relations):
+            """
+            Returns the (offsets, ids) of the given relations, renumbered.
+            """
+            offsets = array(self.ID_TYPECODE, [0])
+            flattened = array(self.ID_TYPECODE)
+            for old_id in old_ids:
+                flattened.extend(new_ids[related_id] for related_id in relations[old_id])
+                offsets.append(len(flattened))
+            return offsets, flattened
+
+        child_offsets, children = flatten(self.children)
+        parent_offsets, parents = flatten(self.parents)
+        return [self.keys[old_id] for old_id in old_ids], child_offsets, children, parent_offsets, parents
+
+    @classmethod
+    def from_arrays(cls, keys, child_offsets, children, parent_offsets, parents):
+        """
+        Returns a new graph for the arrays returned by to_arrays.
+        """
+        graph = cls()
+        graph.keys = list(keys)
+        graph.ids = dict(izip(graph.keys, xrange(len(graph.keys))))
+        graph.children = [children[child_offsets[i]:child_offsets[i + 1]] for i in xrange(len(graph.keys))]
+        graph.parents = [parents[parent_offsets[i]:parent_offsets[i + 1]] for i in xrange(len(graph.keys))]
+        graph.present = bytearray([1]) * len(graph.keys)
+        return graph
+
+    @classmethod
+    def from_block_relations(cls, block_relations):
+        """
+        Returns a new graph for the given map of usage keys to
+        _BlockRelations.
+        """
+        graph = cls()
+        for usage_key in block_relations:
+            graph.add_block(usage_key)
+        for usage_key, relations in block_relations.iteritems():
+            block_id = graph.ids[usage_key]
+            graph.parents[block_id].extend(graph.add_block(parent) for parent in relations.parents)
+            graph.children[block_id].extend(graph.add_block(child) for child in relations.children)
+        return graph
+
+    def to_block_relations(self):
+        """
+        Returns a new map of usage keys to _BlockRelations for this graph.
+        """
+        block_relations = {}
+        for usage_key in self.iterkeys():
+            relations = _BlockRelations()
+            relations.parents = self.get_parents(usage_key)
+            relations.children = self.get_children(usage_key)
+            block_relations[usage_key] = relations
+        return block_relations
+
+    def _add_relation_ids(self, parent_id, child_id):
+        """
+        Adds a parent to child relationship between the given block ids.
+        """
+        self.parents[child_id].append(parent_id)
+        self.children[parent_id].append(child_id)
+
+    def _id_filter(self, filter_func):
+        """
+        Returns a filter function on block ids for the given filter
+        function on usage keys.
+        """
+        if filter_func is None:
+            return None
+        keys = self.keys
+        return lambda block_id: filter_func(keys[block_id])
+
+
 class BlockStructure(object):
     """
     Base class for a block structure.  BlockStructures are constructed
@@ -56,14 +328,14 @@ class BlockStructure(object):
         # UsageKey
         self.root_block_usage_key = root_block_usage_key
 
-        # Map of a block's usage key to its block relations. The
-        # existence of a block in the structure is determined by its
-        # presence in this map.
-        # dict {UsageKey: _BlockRelations}
-        self._block_relations = {}
+        # Graph of the blocks and their relations. The existence of a
+        # block in the structure is determined by its presence in this
+        # graph.
+        # _BlockGraph
+        self._graph = _BlockGraph()
 
         # Add the root block.
-        self._add_block(self._block_relations, root_block_usage_key)
+        self._graph.add_block(root_block_usage_key)
 
     def __iter__(self):
         """
@@ -74,7 +346,26 @@ class BlockStructure(object):
         return self.get_block_keys()
 
     def __len__(self):
-        return len(self._block_relations)
+        return len(self._graph)
+
+    @property
+    def _block_relations(self):
+        """
+        Map of a block's usage key to its block relations, as a new
+        dict {UsageKey: _BlockRelations}.
+
+        Kept for compatibility with code (and pickled data) that
+        predates _BlockGraph; assigning to it replaces the structure's
+        relations.  It can also be assigned a _BlockGraph.
+        """
+        return self._graph.to_block_relations()
+
+    @_block_relations.setter
+    def _block_relations(self, block_relations):
+        if isinstance(block_relations, _BlockGraph):
+            self._graph = block_relations
+        else:
+            self._graph = _BlockGraph.from_block_relations(block_relations)
 
     #--- Block structure relation methods ---#
 
@@ -91,7 +382,7 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's parents.
         """
-        return self._block_relations[usage_key].parents if usage_key in self else []
+        return self._graph.get_parents(usage_key)
 
     def get_children(self, usage_key):
         """
@@ -105,7 +396,7 @@ class BlockStructure(object):
         Returns:
             [UsageKey] - A list of usage keys of the block's children.
         """
-        return self._block_relations[usage_key].children if usage_key in self else []
+        return self._graph.get_children(usage_key)
 
     def set_root_block(self, usage_key):
         """
@@ -120,7 +411,7 @@ class BlockStructure(object):
                 new root of the block structure.
         """
         self.root_block_usage_key = usage_key
-        self._block_relations[usage_key].parents = []
+        self._graph.clear_parents(usage_key)
 
     def __contains__(self, usage_key):
         """
@@ -135,7 +426,7 @@ class BlockStructure(object):
             bool - Whether or not a block with the given usage_key
                 is present in this block structure.
         """
-        return usage_key in self._block_relations
+        return usage_key in self._graph
 
     def get_block_keys(self):
         """
@@ -145,7 +436,7 @@ class BlockStructure(object):
             iterator(UsageKey) - An iterator of the usage
             keys of all the blocks in the block structure.
         """
-        return self._block_relations.iterkeys()
+        return self._graph.iterkeys()
 
     #--- Block structure traversal methods ---#
 
@@ -167,8 +458,12 @@ class BlockStructure(object):
             generator - A generator object created from the
                 traverse_topologically method.
         """
+        start_node = start_node or self.root_block_usage_key
+        if start_node in self._graph:
+            return self._graph.traverse_topologically(start_node, filter_func, yield_descendants_of_unyielded)
+
         return traverse_topologically(
-            start_node=start_node or self.root_block_usage_key,
+            start_node=start_node,
             get_parents=self.get_parents,
             get_children=self.get_children,
             filter_func=filter_func,
@@ -192,8 +487,12 @@ class BlockStructure(object):
             generator - A generator object created from the
                 traverse_post_order method.
         """
+        start_node = start_node or self.root_block_usage_key
+        if start_node in self._graph:
+            return self._graph.traverse_post_order(start_node, filter_func)
+
         return traverse_post_order(
-            start_node=start_node or self.root_block_usage_key,
+            start_node=start_node,
             get_children=self.get_children,
             filter_func=filter_func,
         )
@@ -205,29 +504,10 @@ class BlockStructure(object):
         """
         Mutates this block structure by removing any unreachable blocks.
         """
-
-        # Create a new block relations map to store only those blocks
-        # that are still linked
-        pruned_block_relations = {}
-        old_block_relations = self._block_relations
-
-        # Build the structure from the leaves up by doing a post-order
-        # traversal of the old structure, thereby encountering only
+        # The pruned graph is built from the leaves up, by a post-order
+        # traversal of the old graph, thereby encountering only
         # reachable blocks.
-        for block_key in self.post_order_traversal():
-            # If the block is in the old structure,
-            if block_key in old_block_relations:
-                # Add it to the new pruned structure
-                self._add_block(pruned_block_relations, block_key)
-
-                # Add a relationship to only those old children that
-                # were also added to the new pruned structure.
-                for child in old_block_relations[block_key].children:
-                    if child in pruned_block_relations:
-                        self._add_to_relations(pruned_block_relations, block_key, child)
-
-        # Replace this structure's relations with the newly pruned one.
-        self._block_relations = pruned_block_relations
+        self._graph = self._graph.pruned(self.root_block_usage_key)
 
     def _add_relation(self, parent_key, child_key):
         """
@@ -237,57 +517,26 @@ class BlockStructure(object):
             parent_key (UsageKey) - Usage key of the parent block.
             child_key (UsageKey) - Usage key of the child block.
         """
-        self._add_to_relations(self._block_relations, parent_key, child_key)
-
-    @staticmethod
-    def _add_to_relations(block_relations, parent_key, child_key):
-        """
-        Adds a parent to child relationship in the given block
-        relations map.
-
-        Arguments:
-            block_relations (dict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
-
-            parent_key (UsageKey) - Usage key of the parent block.
-
-            child_key (UsageKey) - Usage key of the child block.
-        """
-        BlockStructure._add_block(block_relations, parent_key)
-        BlockStructure._add_block(block_relations, child_key)
-
-        block_relations[child_key].parents.append(parent_key)
-        block_relations[parent_key].children.append(child_key)
-
-    @staticmethod
-    def _add_block(block_relations, usage_key):
-        """
-        Adds the given usage_key to the given block_relations map.
-
-        Arguments:
-            block_relations (dict({UsageKey: _BlockRelations})) -
-                Internal map of a block's usage key to its
-                parents/children relations.
-
-            usage_key (UsageKey) - Usage key of the block that is to
-                be added to the given block_relations.
-        """
-        if usage_key not in block_relations:
-            block_relations[usage_key] = _BlockRelations()
+        self._graph.add_relation(parent_key, child_key)
 
 
 class FieldData(object):
     """
     Data structure to encapsulate collected fields.
+
+    The fields defined directly on the class are stored in slots, so
+    there is no per-instance __dict__. Subclasses that add such fields
+    must list them in their own __slots__.
     """
+    __slots__ = ('fields',)
+
     def class_field_names(self):
         """
         Returns list of names of fields that are defined directly
-        on the class. Can be overridden by subclasses. All other
-        fields are assumed to be stored in the self.fields dict.
+        on the class. All other fields are assumed to be stored in the
+        self.fields dict.
         """
-        return ['fields']
+        return list(self._own_field_names())
 
     def __init__(self):
         # Map of field name to the field's value for this block.
@@ -295,8 +544,10 @@ class FieldData(object):
         self.fields = {}
 
     def __getattr__(self, field_name):
+        # Only called when normal attribute lookup fails, so an own
+        # field here is one that isn't set (yet).
         if self._is_own_field(field_name):
-            return super(FieldData, self).__getattr__(field_name)
+            raise AttributeError("Field {0} is not set".format(field_name))
         try:
             return self.fields[field_name]
         except KeyError:
@@ -314,19 +565,57 @@ class FieldData(object):
         else:
             del self.fields[field_name]
 
+    def __getstate__(self):
+        return {field_name: getattr(self, field_name) for field_name in self._own_field_names()}
+
+    def __setstate__(self, state):
+        # Instances pickled before __slots__ were added have their
+        # __dict__ as state, which is the same.
+        for field_name, value in state.iteritems():
+            object.__setattr__(self, field_name, value)
+
+    def __deepcopy__(self, memo):
+        # Copies the slots directly, rather than through the (much
+        # slower) generic reduce protocol, since block structures are
+        # copied for every user they are transformed for.
+        field_data_copy = object.__new__(type(self))
+        memo[id(self)] = field_data_copy
+        for field_name in self._own_field_names():
+            try:
+                value = object.__getattribute__(self, field_name)
+            except AttributeError:
+                continue
+            object.__setattr__(field_data_copy, field_name, deepcopy(value, memo))
+        return field_data_copy
+
     def _is_own_field(self, field_name):
         """
         Returns whether the given field_name is the name of an
         actual field of this class.
         """
-        return field_name in self.class_field_names()
+        return field_name in self._own_field_names()
+
+    @classmethod
+    def _own_field_names(cls):
+        """
+        Returns the frozenset of the names of the fields that are
+        defined directly on the class, which are its slots.
+        """
+        # Computed once per class, since it's needed on every attribute access.
+        own_field_names = cls.__dict__.get('_own_field_names_cache')
+        if own_field_names is None:
+            own_field_names = frozenset(
+                slot for klass in cls.__mro__ for slot in getattr(klass, '__slots__', ())
+            )
+            cls._own_field_names_cache = own_field_names
+        return own_field_names
 
 
 class TransformerData(FieldData):
     """
     Data structure to encapsulate collected data for a transformer.
     """
-    pass
+    __slots__ = ()
 
 
 class TransformerDataMap(dict):
@@ -347,6 +636,13 @@ class TransformerDataMap(dict):
         key = self._translate_key(key)
         dict.__delitem__(self, key)
 
+    def __deepcopy__(self, memo):
+        map_copy = TransformerDataMap()
+        memo[id(self)] = map_copy
+        for transformer_name, transformer_data in self.iteritems():
+            dict.__setitem__(map_copy, transformer_name, deepcopy(transformer_data, memo))
+        return map_copy
+
     def get_or_create(self, key):
         """
         Returns the TransformerData associated with the given
@@ -379,8 +675,7 @@ class BlockData(FieldData):
     """
     Data structure to encapsulate collected data for a single block.
     """
-    def class_field_names(self):
-        return super(BlockData, self).class_field_names() + ['location', 'transformer_data']
+    __slots__ = ('location', 'transformer_data')
 
     def __init__(self, usage_key):
         super(BlockData, self).__init__()
@@ -414,24 +709,33 @@ class BlockStructureBlockData(BlockStructure):
         # Map of a transformer's name to its non-block-specific data.
         self.transformer_data = TransformerDataMap()
 
+        # Block data columns that are yet to be decoded, when this block
+        # structure was deserialized from the compact format.
+        # LazyBlockDataColumns or None
+        self._lazy_block_data = None
+
     def copy(self):
         """
         Returns a new instance of BlockStructureBlockData with a
         deep-copy of this instance's contents.
         """
         from .factory import BlockStructureFactory
-        return BlockStructureFactory.create_new(
+        block_structure = BlockStructureFactory.create_new(
             self.root_block_usage_key,
-            deepcopy(self._block_relations),
+            self._graph.copy(),
             deepcopy(self.transformer_data),
             deepcopy(self._block_data_map),
         )
+        if self._lazy_block_data:
+            block_structure._lazy_block_data = self._lazy_block_data.copy()
+        return block_structure
 
     def iteritems(self):
         """
         Returns iterator of (UsageKey, BlockData) pairs for all
         blocks in the BlockStructure.
         """
+        self._decode_block_data()
         return self._block_data_map.iteritems()
 
     def itervalues(self):
@@ -439,12 +743,14 @@ class BlockStructureBlockData(BlockStructure):
         Returns iterator of BlockData for all blocks in the
         BlockStructure.
         """
+        self._decode_block_data()
         return self._block_data_map.itervalues()
 
     def __getitem__(self, usage_key):
         """
         Returns the BlockData associated with the given key.
         """
+        self._decode_block_data()
         return self._block_data_map[usage_key]
 
     def get_xblock_field(self, usage_key, field_name, default=None):
@@ -463,6 +769,7 @@ class BlockStructureBlockData(BlockStructure):
             default (any type) - The value to return if a field value is
                 not found.
         """
+        self._decode_xblock_field(field_name)
         block_data = self._block_data_map.get(usage_key)
         return getattr(block_data, field_name, default) if block_data else default
 
@@ -479,6 +786,7 @@ class BlockStructureBlockData(BlockStructure):
 
             override_data (object) - The data you want to set
         """
+        self._decode_xblock_field(field_name)
         block_data = self._block_data_map.get(usage_key)
         setattr(block_data, field_name, override_data)
 
@@ -529,6 +837,7 @@ class BlockStructureBlockData(BlockStructure):
             transformer (BlockStructureTransformer) - The transformer
                 whose dictionary data is requested.
         """
+        self._decode_transformer_block_data(transformer)
         return self._block_data_map[usage_key].transformer_data[transformer]
 
     def get_transformer_block_field(self, usage_key, transformer, key, default=None):
@@ -574,6 +883,7 @@ class BlockStructureBlockData(BlockStructure):
                 given key for the given transformer's data for the
                 requested block.
         """
+        self._decode_transformer_block_data(transformer)
         setattr(
             self._get_or_create_block(usage_key).transformer_data.get_or_create(transformer),
             key,
@@ -618,20 +928,12 @@ class BlockStructureBlockData(BlockStructure):
                 removed block's children become children of the
                 removed block's parents.
         """
-        children = self._block_relations[usage_key].children
-        parents = self._block_relations[usage_key].parents
-
-        # Remove block from its children.
-        for child in children:
-            self._block_relations[child].parents.remove(usage_key)
-
-        # Remove block from its parents.
-        for parent in parents:
-            self._block_relations[parent].children.remove(usage_key)
-
-        # Remove block.
-        self._block_relations.pop(usage_key, None)
+        # Remove block, along with its relations to its parents and
+        # children.
+        parents, children = self._graph.remove_block(usage_key)
         self._block_data_map.pop(usage_key, None)
+        if self._lazy_block_data:
+            self._lazy_block_data.removed_keys.add(usage_key)
 
         # Recreate the graph connections if descendants are to be kept.
         if keep_descendants:
@@ -750,6 +1052,33 @@ class BlockStructureBlockData(BlockStructure):
             raise TransformerException('Version attributes are not set on transformer {0}.', transformer.name())
         self.set_transformer_data(transformer, TRANSFORMER_VERSION_KEY, transformer.WRITE_VERSION)
 
+    def _decode_xblock_field(self, field_name):
+        """
+        Decodes the collected values of the given xBlock field, if they
+        are still encoded.
+        """
+        if self._lazy_block_data:
+            self._lazy_block_data.decode_xblock_field(self._block_data_map, field_name)
+
+    def _decode_transformer_block_data(self, transformer):
+        """
+        Decodes the block data of the given transformer, if it is still
+        encoded.
+        """
+        if self._lazy_block_data:
+            self._lazy_block_data.decode_transformer(
+                self._block_data_map,
+                self.transformer_data._translate_key(transformer),  # pylint: disable=protected-access
+            )
+
+    def _decode_block_data(self):
+        """
+        Decodes all of the block data that is still encoded.
+        """
+        if self._lazy_block_data is not None:
+            self._lazy_block_data.decode_all(self._block_data_map)
+            self._lazy_block_data = None
+
     def _get_or_create_block(self, usage_key):
         """
         Returns the BlockData associated with the given usage_key.
@@ -0,0 +1,221 @@
+"""
+Module for incrementally updating collected BlockStructure objects.
+
+When a course is published, usually only a few of its blocks have
+changed.  Rather than re-collecting the data of every registered
+transformer for the whole course, only the blocks that changed since the
+stored block structure was collected, along with their descendants and
+ancestors, are added to a partial block structure.  The transformers
+collect their data for that partial structure, which is then patched
+into the stored structure.
+
+The other children of those ancestors are also added to the partial
+structure, along with the children of any such block that is a
+split_test or library_content, since transformers look them up when
+collecting the data of their parents (e.g. the group verticals of a
+split_test).  Their own data didn't change, so the data collected for
+them in the partial structure is not kept.
+
+This relies on transformers computing the collected data of a block
+only from the block itself, its ancestors and its descendants, which is
+how data is percolated through block structures.  Blocks in the changed
+subtrees that also have parents outside of them (in DAGs) would not see
+all of their parents, so such updates are not done incrementally.
+"""
+# pylint: disable=protected-access
+from logging import getLogger
+
+from django.conf import settings
+
+from .block_structure import BlockStructureModulestoreData, _BlockGraph
+from .factory import BlockStructureFactory
+
+
+logger = getLogger(__name__)  # pylint: disable=C0103
+
+# Default maximum fraction of a course's blocks that may be re-collected
+# incrementally.
+DEFAULT_MAX_RATIO = 0.25
+
+# Types of blocks whose children are looked up by transformers when
+# collecting their data.
+CHILDREN_COLLECTING_BLOCK_TYPES = ('split_test', 'library_content')
+
+
+def get_changed_block_keys(collected_block_structure, modulestore):
+    """
+    Returns the set of usage keys of the blocks that were added or
+    changed in the modulestore since the given block structure was
+    collected, or None if that is not known.
+    """
+    root_block_usage_key = collected_block_structure.root_block_usage_key
+    collected_version = collected_block_structure.get_xblock_field(root_block_usage_key, 'course_version')
+    get_changed_blocks = getattr(modulestore, 'get_changed_blocks', None)
+    if collected_version is None or get_changed_blocks is None:
+        return None
+
+    changed_block_keys = get_changed_blocks(root_block_usage_key.course_key, collected_version)
+    return set(changed_block_keys) if changed_block_keys is not None else None
+
+
+def create_partial_from_modulestore(collected_block_structure, modulestore, changed_block_keys):
+    """
+    Creates a block structure with the blocks that need to be re-collected
+    for the given changed blocks, and the relations of the updated course.
+
+    Arguments:
+        collected_block_structure (BlockStructureBlockData) - The
+            previously collected block structure.
+
+        modulestore (ModuleStoreRead) - The modulestore with the updated
+            course.
+
+        changed_block_keys (set(UsageKey)) - The blocks that were added
+            or changed in the modulestore since the block structure was
+            collected.
+
+    Returns:
+        (BlockStructureModulestoreData, _BlockGraph, set(UsageKey)) - The
+            partial block structure, with instantiated xBlocks, the
+            relations of all the blocks of the updated course, and the
+            blocks of the partial block structure that are only there for
+            the transformers to look up, whose previously collected data is
+            kept.  None if the update can't be done incrementally.
+    """
+    root_block_usage_key = collected_block_structure.root_block_usage_key
+    if root_block_usage_key in changed_block_keys:
+        return None
+
+    # Instantiate the changed blocks and their descendants, which are all
+    # re-collected.
+    xblocks = {}
+
+    def add_subtree(xblock):
+        """
+        Adds the given xBlock and its descendants to the xblocks map.
+        """
+        if xblock.location in xblocks:
+            return
+        xblocks[xblock.location] = xblock
+        for child in xblock.get_children():
+            add_subtree(child)
+
+    for usage_key in changed_block_keys:
+        add_subtree(modulestore.get_item(usage_key, depth=None, lazy=True))
+
+    # The children of the changed blocks are up-to-date in their xBlocks,
+    # and those of the other blocks haven't changed since they were
+    # collected.
+    def get_children(usage_key):
+        """
+        Returns the current children of the given block.
+        """
+        if usage_key in changed_block_keys:
+            return [child.location for child in xblocks[usage_key].get_children()]
+        return collected_block_structure.get_children(usage_key)
+
+    graph = _BlockGraph()
+    graph.add_block(root_block_usage_key)
+    blocks_to_visit = [root_block_usage_key]
+    while blocks_to_visit:
+        usage_key = blocks_to_visit.pop()
+        for child_key in get_children(usage_key):
+            if child_key not in graph:
+                blocks_to_visit.append(child_key)
+            graph.add_relation(usage_key, child_key)
+
+    # Re-collect the changed blocks that are still in the course, with
+    # their descendants and ancestors.
+    subtree_root_keys = [usage_key for usage_key in changed_block_keys if usage_key in graph]
+    subtree_block_keys = set()
+    for subtree_root_key in subtree_root_keys:
+        subtree_block_keys.update(graph.traverse_post_order(subtree_root_key))
+
+    ancestor_keys = set()
+    blocks_to_visit = list(subtree_root_keys)
+    while blocks_to_visit:
+        for parent_key in graph.get_parents(blocks_to_visit.pop()):
+            if parent_key not in ancestor_keys:
+                ancestor_keys.add(parent_key)
+                blocks_to_visit.append(parent_key)
+
+    block_keys_to_collect = subtree_block_keys | ancestor_keys
+
+    # Add the unchanged children of the ancestors, and the children of
+    # those that are split_test or library_content blocks.
+    context_block_keys = set()
+    blocks_to_visit = list(ancestor_keys)
+    while blocks_to_visit:
+        for child_key in graph.get_children(blocks_to_visit.pop()):
+            if child_key not in block_keys_to_collect and child_key not in context_block_keys:
+                context_block_keys.add(child_key)
+                if child_key.block_type in CHILDREN_COLLECTING_BLOCK_TYPES:
+                    blocks_to_visit.append(child_key)
+
+    max_ratio = settings.BLOCK_STRUCTURES_SETTINGS.get('INCREMENTAL_COLLECTION_MAX_RATIO', DEFAULT_MAX_RATIO)
+    if len(block_keys_to_collect) + len(context_block_keys) > max_ratio * len(graph):
+        logger.info(
+            "BlockStructure: Too many blocks to collect incrementally; %s, %d of %d.",
+            root_block_usage_key,
+            len(block_keys_to_collect) + len(context_block_keys),
+            len(graph),
+        )
+        return None
+
+    for usage_key in subtree_block_keys:
+        if not all(parent_key in block_keys_to_collect for parent_key in graph.get_parents(usage_key)):
+            logger.info(
+                "BlockStructure: Changed block has parents that are not re-collected; %s, %s.",
+                root_block_usage_key,
+                usage_key,
+            )
+            return None
+
+    partial_block_keys = block_keys_to_collect | context_block_keys
+    partial_block_keys.add(root_block_usage_key)
+    partial_block_structure = BlockStructureModulestoreData(root_block_usage_key)
+    for usage_key in graph.traverse_topologically(root_block_usage_key):
+        if usage_key not in partial_block_keys:
+            continue
+        xblock = xblocks.get(usage_key) or modulestore.get_item(usage_key, lazy=True)
+        partial_block_structure._add_xblock(usage_key, xblock)
+        for child_key in graph.get_children(usage_key):
+            if child_key in partial_block_keys:
+                partial_block_structure._add_relation(usage_key, child_key)
+
+    return partial_block_structure, graph, context_block_keys
+
+
+def create_patched(collected_block_structure, partial_block_structure, graph, context_block_keys):
+    """
+    Returns a new block structure, with the given relations, in which the
+    data of the blocks of the given (collected) partial block structure,
+    other than the given context blocks, replaces that of the previously
+    collected block structure.
+    """
+    collected_block_structure._decode_block_data()
+    collected_block_data_map = collected_block_structure._block_data_map
+    partial_block_data_map = partial_block_structure._block_data_map
+
+    # The blocks that weren't re-collected have the course version they
+    # were collected from, rather than the current one.
+    root_block_usage_key = partial_block_structure.root_block_usage_key
+    course_version = partial_block_structure.get_xblock_field(root_block_usage_key, 'course_version')
+
+    block_data_map = {}
+    for usage_key in graph.iterkeys():
+        if usage_key in partial_block_structure and usage_key not in context_block_keys:
+            block_data = partial_block_data_map.get(usage_key)
+        else:
+            block_data = collected_block_data_map.get(usage_key)
+            if block_data is not None and 'course_version' in block_data.fields:
+                block_data.fields['course_version'] = course_version
+        if block_data is not None:
+            block_data_map[usage_key] = block_data
+
+    return BlockStructureFactory.create_new(
+        root_block_usage_key,
+        graph,
+        partial_block_structure.transformer_data,
+        block_data_map,
+    )
@@ -2,15 +2,21 @@
 Top-level module for the Block Structure framework with a class for managing
 BlockStructures.
 """
+# pylint: disable=protected-access
 from contextlib import contextmanager
+from logging import getLogger
 
-from . import config
+from . import config, incremental
 from .exceptions import UsageKeyNotInBlockStructure, TransformerDataIncompatible, BlockStructureNotFound
 from .factory import BlockStructureFactory
 from .store import BlockStructureStore
+from .transformer_registry import TransformerRegistry
 from .transformers import BlockStructureTransformers
 
 
+logger = getLogger(__name__)  # pylint: disable=C0103
+
+
 class BlockStructureManager(object):
     """
     Top-level class for managing Block Structures.
@@ -112,7 +118,8 @@ class BlockStructureManager(object):
         """
         with self._bulk_operations():
             if not self.store.is_up_to_date(self.root_block_usage_key, self.modulestore):
-                self._update_collected()
+                if self._update_collected_incrementally() is None:
+                    self._update_collected()
 
     def _update_collected(self):
         """
@@ -128,6 +135,75 @@ class BlockStructureManager(object):
             self.store.add(block_structure)
             return block_structure
 
+    def _update_collected_incrementally(self):
+        """
+        The store is updated by re-collecting transformers data only for
+        the blocks that changed in the modulestore since the stored block
+        structure was collected, and for their descendants and ancestors.
+
+        Returns the updated block structure, or None if the stored block
+        structure can't be updated incrementally, in which case the store
+        is left unchanged.
+        """
+        if not config.waffle().is_enabled(config.INCREMENTAL_COLLECTION):
+            return None
+
+        with self._bulk_operations():
+            try:
+                collected_block_structure = BlockStructureFactory.create_from_store(
+                    self.root_block_usage_key,
+                    self.store,
+                )
+            except BlockStructureNotFound:
+                return None
+
+            # Data of unchanged blocks is kept, so it must have been
+            # collected by the current version of every transformer.
+            if any(
+                collected_block_structure._get_transformer_data_version(transformer) != transformer.WRITE_VERSION
+                for transformer in TransformerRegistry.get_registered_transformers()
+            ):
+                return None
+
+            changed_block_keys = incremental.get_changed_block_keys(collected_block_structure, self.modulestore)
+            if changed_block_keys is None:
+                return None
+
+            partial = incremental.create_partial_from_modulestore(
+                collected_block_structure,
+                self.modulestore,
+                changed_block_keys,
+            )
+            if partial is None:
+                return None
+            partial_block_structure, graph, context_block_keys = partial
+
+            try:
+                BlockStructureTransformers.collect(partial_block_structure)
+                block_structure = incremental.create_patched(
+                    collected_block_structure,
+                    partial_block_structure,
+                    graph,
+                    context_block_keys,
+                )
+            except Exception:  # pylint: disable=broad-except
+                # A transformer needed blocks that aren't in the partial
+                # block structure; collect the whole course instead.
+                logger.exception(
+                    "BlockStructure: Failed to collect incrementally; %s.",
+                    self.root_block_usage_key,
+                )
+                return None
+            self.store.add(block_structure)
+            logger.info(
+                "BlockStructure: Collected incrementally; %s, %d changed, %d of %d blocks collected.",
+                self.root_block_usage_key,
+                len(changed_block_keys),
+                len(partial_block_structure),
+                len(block_structure),
+            )
+            return block_structure
+
     def clear(self):
         """
         Removes data for the block structure associated with the given
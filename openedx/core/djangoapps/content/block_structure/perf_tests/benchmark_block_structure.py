@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+Benchmarks the memory use and speed of BlockStructures on a synthetic
+course.
+
+The course has the usual chapter / sequential / vertical / component
+hierarchy, with a number of blocks close to the requested one.  Each
+operation is timed on the block structure, and on a map of usage keys to
+_BlockRelations (as block structures used to be implemented), traversed
+with the same generic graph_traversals functions.
+
+Usage:
+    python -m openedx.core.djangoapps.content.block_structure.perf_tests.benchmark_block_structure [--blocks 10000]
+"""
+# pylint: disable=protected-access
+from __future__ import print_function
+
+import argparse
+import gc
+import sys
+from array import array
+from copy import deepcopy
+from timeit import default_timer
+
+from opaque_keys.edx.locator import BlockUsageLocator, CourseLocator
+
+from openedx.core.lib.cache_utils import zpickle, zunpickle
+from openedx.core.lib.graph_traversals import traverse_post_order, traverse_topologically
+
+from ..block_structure import BlockStructureModulestoreData, FieldData
+from ..serialization import deserialize, serialize
+
+
+CHAPTERS = 20
+SEQUENTIALS_PER_CHAPTER = 5
+COMPONENTS_PER_VERTICAL = 5
+
+
+def create_course_structure(num_blocks):
+    """
+    Returns a collected block structure for a synthetic course with about
+    num_blocks blocks.
+    """
+    course_key = CourseLocator('edX', 'Benchmark', 'run')
+    root_key = BlockUsageLocator(course_key, 'course', 'course')
+    block_structure = BlockStructureModulestoreData(root_key)
+
+    verticals_per_sequential = max(
+        1, num_blocks // (CHAPTERS * SEQUENTIALS_PER_CHAPTER * (COMPONENTS_PER_VERTICAL + 1))
+    )
+
+    def add_child(parent_key, block_type, block_id):
+        """
+        Adds a new block, with some collected data, as a child of the given block.
+        """
+        child_key = BlockUsageLocator(course_key, block_type, block_id)
+        block_structure._add_relation(parent_key, child_key)
+        block_data = block_structure._get_or_create_block(child_key)
+        block_data.display_name = u'{} {}'.format(block_type, block_id)
+        block_data.graded = block_type == 'problem'
+        block_structure.set_transformer_block_field(child_key, 'benchmark', 'visible', True)
+        return child_key
+
+    for chapter in xrange(CHAPTERS):
+        chapter_key = add_child(root_key, 'chapter', 'c{}'.format(chapter))
+        for sequential in xrange(SEQUENTIALS_PER_CHAPTER):
+            sequential_key = add_child(chapter_key, 'sequential', 's{}_{}'.format(chapter, sequential))
+            for vertical in xrange(verticals_per_sequential):
+                vertical_id = '{}_{}_{}'.format(chapter, sequential, vertical)
+                vertical_key = add_child(sequential_key, 'vertical', 'v' + vertical_id)
+                for component in xrange(COMPONENTS_PER_VERTICAL):
+                    block_type = 'problem' if component % 2 else 'html'
+                    add_child(vertical_key, block_type, '{}_{}'.format(vertical_id, component))
+    return block_structure
+
+
+def deep_size(obj, seen=None):
+    """
+    Returns an estimate of the memory used by the given object and
+    everything it refers to, in bytes.
+    """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (basestring, int, long, float, bool, array, bytearray)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.iteritems())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_size(obj.__dict__, seen)
+    for klass in type(obj).__mro__:
+        for slot in getattr(klass, '__slots__', ()):
+            if slot != '__dict__':
+                size += deep_size(object.__getattribute__(obj, slot) if hasattr(obj, slot) else None, seen)
+    return size
+
+
+def timed(function, repeat):
+    """
+    Returns the best time, in milliseconds, of calling function repeat times.
+    """
+    best = None
+    for __ in xrange(repeat):
+        gc.collect()
+        start = default_timer()
+        function()
+        elapsed = default_timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def run_benchmark(num_blocks, repeat):
+    """
+    Prints the benchmark results for a course with about num_blocks blocks.
+    """
+    block_structure = create_course_structure(num_blocks)
+    block_relations = block_structure._block_relations
+    root_key = block_structure.root_block_usage_key
+    print('Blocks: {}'.format(len(block_structure)))
+
+    def relations_children(usage_key):
+        """ Children accessor of the block relations map. """
+        return block_relations[usage_key].children if usage_key in block_relations else []
+
+    def relations_parents(usage_key):
+        """ Parents accessor of the block relations map. """
+        return block_relations[usage_key].parents if usage_key in block_relations else []
+
+    def remove_problems():
+        """ Removes the problems from a copy of the structure, and prunes it. """
+        structure_copy = block_structure.copy()
+        structure_copy.remove_block_traversal(lambda usage_key: usage_key.block_type == 'problem')
+        structure_copy._prune_unreachable()
+
+    serialized = serialize(block_structure)
+    pickled = zpickle((block_relations, block_structure.transformer_data, block_structure._block_data_map))
+
+    results = [
+        ('topological traversal', lambda: list(block_structure.topological_traversal()), lambda: list(
+            traverse_topologically(root_key, relations_parents, relations_children)
+        )),
+        ('post-order traversal', lambda: list(block_structure.post_order_traversal()), lambda: list(
+            traverse_post_order(root_key, relations_children)
+        )),
+        ('copy relations', block_structure._graph.copy, lambda: deepcopy(block_relations)),
+        ('copy, remove blocks and prune', remove_problems, None),
+        ('get children of every block', lambda: [
+            block_structure.get_children(usage_key) for usage_key in block_structure
+        ], lambda: [relations_children(usage_key) for usage_key in block_relations]),
+        ('deserialize and read one field', lambda: deserialize(serialized, root_key).get_xblock_field(
+            root_key, 'display_name'
+        ), lambda: zunpickle(pickled)),
+    ]
+
+    print('{:<36}{:>16}{:>24}'.format(
+        'Operation (best of {}, ms)'.format(repeat), 'BlockStructure', 'dict of _BlockRelations',
+    ))
+    for name, function, reference_function in results:
+        print('{:<36}{:>16.1f}{:>24}'.format(
+            name,
+            timed(function, repeat),
+            '{:.1f}'.format(timed(reference_function, repeat)) if reference_function else '-',
+        ))
+
+    print()
+    print('Memory (KiB)')
+    print('{:<36}{:>16.0f}{:>24.0f}'.format(
+        'relations',
+        deep_size(block_structure._graph, set(id(key) for key in block_relations)) / 1024.0,
+        deep_size(block_relations, set(id(key) for key in block_relations)) / 1024.0,
+    ))
+    print('{:<36}{:>16.0f}'.format(
+        'block data',
+        deep_size(block_structure._block_data_map, set(id(key) for key in block_relations)) / 1024.0,
+    ))
+    print('{:<36}{:>16.0f}{:>24.0f}'.format('serialized', len(serialized) / 1024.0, len(pickled) / 1024.0))
+    print('{:<36}{:>16}'.format('bytes per FieldData', sys.getsizeof(FieldData())))
+
+
+def main():
+    """
+    Parses the command line and runs the benchmark.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--blocks', type=int, default=10000, help='Approximate number of blocks in the course.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of times to run each operation.')
+    args = parser.parse_args()
+    run_benchmark(args.blocks, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""
+Module for the compact serialization format of BlockStructure objects.
+
+Rather than pickling the internal objects of a block structure, the
+compact format stores:
+
+    * A table of the structure's usage keys. Every other section refers
+      to a block by its integer index into this table.
+    * The parents and children of each block, as flat integer arrays.
+    * The structure-wide transformer data.
+    * One column per collected xBlock field, and per transformer
+      block field, holding the values of only those blocks that have
+      one.
+
+Columns are kept encoded when the structure is deserialized, and are
+decoded the first time that field (or transformer) is accessed, so that
+a transform only pays for the data it actually reads.
+
+Serialized data starts with MAGIC followed by the format version, so that
+it can be told apart from the (legacy) zlib-compressed pickles.
+"""
+# pylint: disable=protected-access
+import cPickle as pickle
+import json
+import struct
+import sys
+import zlib
+from array import array
+
+from .block_structure import BlockData, TransformerData, TransformerDataMap, _BlockGraph
+from .exceptions import BlockStructureNotFound
+from .factory import BlockStructureFactory
+
+
+MAGIC = 'BSCF'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('!{}sB'.format(len(MAGIC)))
+_LENGTH = struct.Struct('!I')
+
+# Typecode of the integer arrays; they are always stored little-endian.
+_INDEX_TYPECODE = _BlockGraph.ID_TYPECODE
+
+# Fixed sections, in order, preceding the columns' sections.
+_KEYS, _CHILD_OFFSETS, _CHILDREN, _PARENT_OFFSETS, _PARENTS, _TRANSFORMER_DATA, _BLOCK_DATA_INDICES = range(7)
+_NUM_FIXED_SECTIONS = 7
+
+# Kinds of columns.
+_XBLOCK_FIELD = 'x'
+_TRANSFORMER_FIELD = 't'
+
+# Name of the transformer column listing the blocks that have any data
+# for that transformer.
+_TRANSFORMER_BLOCKS = None
+
+
+def is_compact(serialized_data):
+    """
+    Returns whether the given serialized data is in the compact format.
+    """
+    return serialized_data[:len(MAGIC)] == MAGIC
+
+
+def serialize(block_structure):
+    """
+    Returns the compact serialization of the given block structure.
+
+    Arguments:
+        block_structure (BlockStructureBlockData) - The block structure
+            to be serialized.
+    """
+    block_structure._decode_block_data()
+
+    keys, child_offsets, children, parent_offsets, parents = block_structure._graph.to_arrays()
+    num_nodes = len(keys)
+    block_data_map = block_structure._block_data_map
+
+    # Blocks that have been pruned out of the graph may still have data.
+    keys.extend(key for key in block_data_map if key not in block_structure)
+
+    block_data_indices = []
+    columns = {}
+    for index, key in enumerate(keys):
+        block_data = block_data_map.get(key)
+        if block_data is None:
+            continue
+        block_data_indices.append(index)
+
+        for field_name, value in block_data.fields.iteritems():
+            _add_to_column(columns, (_XBLOCK_FIELD, None, field_name), index, value)
+
+        for transformer_name, transformer_data in block_data.transformer_data.iteritems():
+            _add_to_column(columns, (_TRANSFORMER_FIELD, transformer_name, _TRANSFORMER_BLOCKS), index, None)
+            for field_name, value in transformer_data.fields.iteritems():
+                _add_to_column(columns, (_TRANSFORMER_FIELD, transformer_name, field_name), index, value)
+
+    column_names = sorted(columns)
+    sections = [
+        _pickle(keys),
+        _encode_indices(child_offsets),
+        _encode_indices(children),
+        _encode_indices(parent_offsets),
+        _encode_indices(parents),
+        _pickle({
+            transformer_name: transformer_data.fields
+            for transformer_name, transformer_data in block_structure.transformer_data.iteritems()
+        }),
+        _encode_indices(block_data_indices),
+    ]
+    for column_name in column_names:
+        indices, values = columns[column_name]
+        sections.append(_encode_indices(indices))
+        sections.append(_pickle(values) if column_name[2] is not _TRANSFORMER_BLOCKS else '')
+
+    directory = json.dumps({'num_nodes': num_nodes, 'columns': column_names})
+    payload = ''.join(
+        [_LENGTH.pack(len(sections) + 1), _LENGTH.pack(len(directory)), directory] +
+        [_LENGTH.pack(len(section)) + section for section in sections]
+    )
+    return _HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(payload)
+
+
+def deserialize(serialized_data, root_block_usage_key):
+    """
+    Returns the block structure for the given compact serialized data.
+
+    The structure's relations and transformer data are decoded right
+    away; its block data columns are decoded when first accessed.
+
+    Raises:
+        BlockStructureNotFound if the data is of an unknown format version.
+    """
+    __, version = _HEADER.unpack_from(serialized_data)
+    if version != FORMAT_VERSION:
+        raise BlockStructureNotFound(root_block_usage_key)
+
+    directory, sections = _split_sections(zlib.decompress(serialized_data[_HEADER.size:]))
+    keys = pickle.loads(sections[_KEYS])
+
+    graph = _BlockGraph.from_arrays(
+        keys[:directory['num_nodes']],
+        _decode_indices(sections[_CHILD_OFFSETS]),
+        _decode_indices(sections[_CHILDREN]),
+        _decode_indices(sections[_PARENT_OFFSETS]),
+        _decode_indices(sections[_PARENTS]),
+    )
+
+    transformer_data = TransformerDataMap()
+    for transformer_name, fields in pickle.loads(sections[_TRANSFORMER_DATA]).iteritems():
+        transformer_data[transformer_name] = TransformerData()
+        transformer_data[transformer_name].fields = fields
+
+    block_data_map = {}
+    for index in _decode_indices(sections[_BLOCK_DATA_INDICES]):
+        block_data_map[keys[index]] = BlockData(keys[index])
+
+    lazy_block_data = LazyBlockDataColumns(keys)
+    for position, (kind, transformer_name, field_name) in enumerate(directory['columns']):
+        section_index = _NUM_FIXED_SECTIONS + 2 * position
+        lazy_block_data.add_column(
+            kind,
+            transformer_name,
+            field_name,
+            sections[section_index],
+            sections[section_index + 1],
+        )
+
+    block_structure = BlockStructureFactory.create_new(
+        root_block_usage_key,
+        graph,
+        transformer_data,
+        block_data_map,
+    )
+    if lazy_block_data:
+        block_structure._lazy_block_data = lazy_block_data
+    return block_structure
+
+
+class LazyBlockDataColumns(object):
+    """
+    The still-encoded block data columns of a deserialized block structure.
+
+    Each column is decoded into the structure's BlockData objects when it
+    is first requested, and is then forgotten.
+    """
+    def __init__(self, keys):
+        # Table of usage keys, indexed by the columns.
+        self.keys = keys
+
+        # Map of xBlock field name to its encoded (indices, values).
+        # dict {string: (string, string)}
+        self.xblock_columns = {}
+
+        # Map of transformer name to its encoded columns, by field name.
+        # dict {string: dict {string: (string, string)}}
+        self.transformer_columns = {}
+
+        # Usage keys of blocks that were removed from the structure before
+        # their data was decoded.
+        self.removed_keys = set()
+
+    def __nonzero__(self):
+        return bool(self.xblock_columns or self.transformer_columns)
+
+    def add_column(self, kind, transformer_name, field_name, encoded_indices, encoded_values):
+        """
+        Adds an encoded column.
+        """
+        field_name = str(field_name) if field_name is not None else field_name
+        if kind == _XBLOCK_FIELD:
+            self.xblock_columns[field_name] = (encoded_indices, encoded_values)
+        else:
+            columns = self.transformer_columns.setdefault(str(transformer_name), {})
+            columns[field_name] = (encoded_indices, encoded_values)
+
+    def copy(self):
+        """
+        Returns a copy of these pending columns, sharing their (immutable)
+        encoded data.
+        """
+        lazy_copy = LazyBlockDataColumns(self.keys)
+        lazy_copy.xblock_columns = dict(self.xblock_columns)
+        lazy_copy.transformer_columns = dict(self.transformer_columns)
+        lazy_copy.removed_keys = set(self.removed_keys)
+        return lazy_copy
+
+    def decode_xblock_field(self, block_data_map, field_name):
+        """
+        Decodes the column of the given xBlock field, if still pending,
+        into the given block data map.
+        """
+        column = self.xblock_columns.pop(field_name, None)
+        if column is None:
+            return
+        for block_data, value in self._iter_column(block_data_map, column):
+            block_data.fields[field_name] = value
+
+    def decode_transformer(self, block_data_map, transformer_name):
+        """
+        Decodes the columns of the given transformer, if still pending,
+        into the given block data map.
+        """
+        columns = self.transformer_columns.pop(transformer_name, None)
+        if columns is None:
+            return
+        for block_data, __ in self._iter_column(block_data_map, columns[_TRANSFORMER_BLOCKS]):
+            block_data.transformer_data[transformer_name] = TransformerData()
+        for field_name, column in columns.iteritems():
+            if field_name is _TRANSFORMER_BLOCKS:
+                continue
+            for block_data, value in self._iter_column(block_data_map, column):
+                block_data.transformer_data[transformer_name].fields[field_name] = value
+
+    def decode_all(self, block_data_map):
+        """
+        Decodes every pending column into the given block data map.
+        """
+        for field_name in self.xblock_columns.keys():
+            self.decode_xblock_field(block_data_map, field_name)
+        for transformer_name in self.transformer_columns.keys():
+            self.decode_transformer(block_data_map, transformer_name)
+
+    def _iter_column(self, block_data_map, column):
+        """
+        Yields the (BlockData, value) pairs of the given encoded column,
+        skipping any blocks that are no longer in the structure.
+        """
+        encoded_indices, encoded_values = column
+        indices = _decode_indices(encoded_indices)
+        values = pickle.loads(encoded_values) if encoded_values else [None] * len(indices)
+        for index, value in zip(indices, values):
+            usage_key = self.keys[index]
+            if usage_key in self.removed_keys:
+                continue
+            block_data = block_data_map.get(usage_key)
+            if block_data is not None:
+                yield block_data, value
+
+
+def _add_to_column(columns, column_name, index, value):
+    """
+    Appends the given block index and value to the named column.
+    """
+    indices, values = columns.setdefault(column_name, ([], []))
+    indices.append(index)
+    values.append(value)
+
+
+def _encode_indices(indices):
+    """
+    Returns the little-endian binary encoding of the given integers.
+    """
+    encoded = array(_INDEX_TYPECODE, indices)
+    if sys.byteorder != 'little':
+        encoded.byteswap()
+    return encoded.tostring()
+
+
+def _decode_indices(encoded):
+    """
+    Returns the array of integers of the given little-endian encoding.
+    """
+    decoded = array(_INDEX_TYPECODE)
+    decoded.fromstring(encoded)
+    if sys.byteorder != 'little':
+        decoded.byteswap()
+    return decoded
+
+
+def _pickle(value):
+    """
+    Returns the pickled value, using the most compact protocol.
+    """
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _split_sections(payload):
+    """
+    Returns the (directory, sections) of the given decompressed payload.
+    """
+    num_sections, = _LENGTH.unpack_from(payload)
+    offset = _LENGTH.size
+    sections = []
+    for __ in xrange(num_sections):
+        length, = _LENGTH.unpack_from(payload, offset)
+        offset += _LENGTH.size
+        sections.append(payload[offset:offset + length])
+        offset += length
+    return json.loads(sections[0]), sections[1:]
@@ -6,7 +6,7 @@ from logging import getLogger
 
 from openedx.core.lib.cache_utils import zpickle, zunpickle
 
-from . import config
+from . import config, serialization
 from .block_structure import BlockStructureBlockData
 from .exceptions import BlockStructureNotFound
 from .factory import BlockStructureFactory
@@ -190,7 +190,14 @@ class BlockStructureStore(object):
     def _serialize(self, block_structure):
         """
         Serializes the data for the given block_structure.
+
+        The compact format is used when its waffle switch is enabled;
+        otherwise, the structure is pickled.
         """
+        if config.waffle().is_enabled(config.COMPACT_SERIALIZATION):
+            return serialization.serialize(block_structure)
+
+        block_structure._decode_block_data()
         data_to_cache = (
             block_structure._block_relations,
             block_structure.transformer_data,
@@ -201,7 +208,13 @@ class BlockStructureStore(object):
     def _deserialize(self, serialized_data, root_block_usage_key):
         """
         Deserializes the given data and returns the parsed block_structure.
+
+        Both the compact format and pickled data are supported, so that
+        data stored before the compact format was enabled is still read.
         """
+        if serialization.is_compact(serialized_data):
+            return serialization.deserialize(serialized_data, root_block_usage_key)
+
         block_relations, transformer_data, block_data_map = zunpickle(serialized_data)
         return BlockStructureFactory.create_new(
             root_block_usage_key,
@@ -2,6 +2,7 @@
 Tests for block_structure.py
 """
 from datetime import datetime
+import cPickle as pickle
 # pylint: disable=protected-access
 from collections import namedtuple
 from copy import deepcopy
@@ -46,6 +47,22 @@ class TestBlockStructure(TestCase, ChildrenMapTestMixin):
             self.assertIn(node, block_structure)
         self.assertNotIn(len(children_map) + 1, block_structure)
 
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_block_relations_view(self, children_map):
+        block_structure = self.create_block_structure(children_map, BlockStructure)
+        block_relations = block_structure._block_relations
+        self.assertSetEqual(set(block_relations), set(range(len(children_map))))
+
+        # a structure rebuilt from the view has the same relations
+        rebuilt_structure = BlockStructure(block_structure.root_block_usage_key)
+        rebuilt_structure._block_relations = block_relations
+        for node in range(len(children_map)):
+            self.assertEquals(block_structure.get_children(node), rebuilt_structure.get_children(node))
+            self.assertEquals(block_structure.get_parents(node), rebuilt_structure.get_parents(node))
+
 
 @ddt.ddt
 class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
@@ -261,6 +278,35 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
 
         self.assert_block_structure(block_structure, pruned_children_map, missing_blocks)
 
+    def test_block_data_pickling(self):
+        block_structure = self.create_block_structure(ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP)
+        block_structure._get_or_create_block(1).test_field = 'value'
+        block_structure.set_transformer_block_field(1, 'transformer', 'test_key', 'test_value')
+
+        for block_data in (pickle.loads(pickle.dumps(block_structure[1], 2)), deepcopy(block_structure[1])):
+            self.assertEquals(block_data.location, 1)
+            self.assertEquals(block_data.test_field, 'value')
+            self.assertEquals(block_data.transformer_data['transformer'].test_key, 'test_value')
+            self.assertFalse(hasattr(block_data, '__dict__'))
+
+    def test_block_data_unpickling_before_slots(self):
+        # A BlockData pickled (with the highest protocol, as in cached
+        # block structures) before its classes were given __slots__.
+        pickled_block_data = (
+            '\x80\x02copenedx.core.djangoapps.content.block_structure.block_structure\nBlockData\nq\x01)'
+            '\x81q\x02}q\x03(U\x06fieldsq\x04}q\x05U\ntest_fieldq\x06U\x05valueq\x07sU\x10transformer_dataq'
+            '\x08copenedx.core.djangoapps.content.block_structure.block_structure\nTransformerDataMap\nq\t)'
+            '\x81q\nU\x0btransformerq\x0bcopenedx.core.djangoapps.content.block_structure.block_structure\n'
+            'TransformerData\nq\x0c)\x81q\r}q\x0eh\x04}q\x0fU\x08test_keyq\x10U\ntest_valueq\x11ssbs}q\x12b'
+            'U\x08locationq\x13K\x01ub.'
+        )
+        block_data = pickle.loads(pickled_block_data)
+        self.assertEquals(block_data.location, 1)
+        self.assertEquals(block_data.test_field, 'value')
+        self.assertEquals(block_data.transformer_data['transformer'].test_key, 'test_value')
+        self.assertFalse(hasattr(block_data, '__dict__'))
+        self.assertFalse(hasattr(block_data.transformer_data['transformer'], '__dict__'))
+
     def test_remove_block_traversal(self):
         block_structure = self.create_block_structure(ChildrenMapTestMixin.LINEAR_CHILDREN_MAP)
         block_structure.remove_block_traversal(lambda block: block == 2)
@@ -0,0 +1,275 @@
+"""
+Tests for incremental.py
+"""
+# pylint: disable=protected-access
+import ddt
+from django.conf import settings
+from django.test import TestCase
+from mock import patch
+from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase, TEST_DATA_SPLIT_MODULESTORE
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from xmodule.partitions.partitions import Group, UserPartition
+
+from ..api import get_block_structure_manager
+from ..config import INCREMENTAL_COLLECTION, waffle
+from ..manager import BlockStructureManager
+from .helpers import (
+    MockModulestoreFactory, MockCache, MockTransformer, MockXBlock,
+    ChildrenMapTestMixin, UsageKeyFactoryMixin,
+    mock_registered_transformers,
+)
+
+
+class ContentTransformer(MockTransformer):
+    """
+    Test Transformer that collects the content of each block, merged
+    with the content of its ancestors, and records the blocks it
+    collected.
+    """
+    collected_blocks = []
+
+    @classmethod
+    def collect(cls, block_structure):
+        block_structure.request_xblock_fields('course_version')
+        for block_key in block_structure.topological_traversal():
+            cls.collected_blocks.append(block_key)
+            content = [block_structure.get_xblock(block_key).field_map.get('content')]
+            for parent_key in block_structure.get_parents(block_key):
+                content += block_structure.get_transformer_block_field(parent_key, cls, 'content')
+            block_structure.set_transformer_block_field(block_key, cls, 'content', content)
+
+
+@ddt.ddt
+class TestIncrementalCollection(UsageKeyFactoryMixin, ChildrenMapTestMixin, TestCase):
+    """
+    Tests for collecting block structures incrementally.
+    """
+    shard = 2
+
+    #       0
+    #      / \
+    #     1   2
+    #    / \   \
+    #   3   4   5
+    #  / \
+    # 6   7
+    CHILDREN_MAP = [[1, 2], [3, 4], [5], [6, 7], [], [], [], []]
+
+    def setUp(self):
+        super(TestIncrementalCollection, self).setUp()
+        ContentTransformer.collected_blocks = []
+        self.registered_transformers = [ContentTransformer()]
+
+        self.children_map = [list(children) for children in self.CHILDREN_MAP]
+        self.modulestore = MockModulestoreFactory.create(self.children_map, self.block_key_factory)
+        self.changed_block_keys = []
+        self.modulestore.get_changed_blocks = lambda course_key, version: self.changed_block_keys
+        self.set_course_version('v1')
+
+        self.bs_manager = BlockStructureManager(self.block_key_factory(0), self.modulestore, MockCache())
+
+        waffle_override = waffle().override(INCREMENTAL_COLLECTION, active=True)
+        waffle_override.__enter__()
+        self.addCleanup(waffle_override.__exit__, None, None, None)
+
+        self.update_collected()
+
+    def set_content(self, block_id, **fields):
+        """
+        Updates the given fields of the given block in the modulestore.
+        """
+        self.modulestore.blocks[self.block_key_factory(block_id)].field_map.update(fields)
+
+    def set_course_version(self, course_version):
+        """
+        Sets the course version of all the blocks in the modulestore.
+        """
+        for xblock in self.modulestore.blocks.itervalues():
+            xblock.field_map['course_version'] = course_version
+
+    def add_block(self, block_id, parent_id):
+        """
+        Adds a new block to the modulestore, as a child of the given block.
+        """
+        self.modulestore.blocks[self.block_key_factory(block_id)] = MockXBlock(
+            self.block_key_factory(block_id),
+            modulestore=self.modulestore,
+        )
+        self.modulestore.blocks[self.block_key_factory(parent_id)].children.append(self.block_key_factory(block_id))
+        self.children_map.append([])
+        self.children_map[parent_id].append(block_id)
+
+    def publish(self, *changed_block_ids):
+        """
+        Records a new version of the course, with the given changed blocks.
+        """
+        self.set_course_version('v2')
+        self.changed_block_keys = [self.block_key_factory(block_id) for block_id in changed_block_ids]
+
+    def update_collected(self, max_ratio=1):
+        """
+        Updates the collected block structure, and returns the ids of the
+        blocks that were collected.
+        """
+        ContentTransformer.collected_blocks = []
+        with patch.dict(settings.BLOCK_STRUCTURES_SETTINGS, INCREMENTAL_COLLECTION_MAX_RATIO=max_ratio):
+            with mock_registered_transformers(self.registered_transformers):
+                self.bs_manager.update_collected_if_needed()
+        return {block_key.block_id for block_key in ContentTransformer.collected_blocks}
+
+    def get_collected(self):
+        """
+        Returns the collected block structure, verifying its relations.
+        """
+        with mock_registered_transformers(self.registered_transformers):
+            block_structure = self.bs_manager.get_collected()
+        missing_blocks = set(range(len(self.children_map))) - {
+            int(block_key.block_id) for block_key in block_structure
+        }
+        self.assert_block_structure(block_structure, self.children_map, missing_blocks)
+        return block_structure
+
+    def assert_content(self, block_structure, block_id, expected_content):
+        """
+        Verifies the collected content of the given block.
+        """
+        block_key = self.block_key_factory(block_id)
+        self.assertEquals(
+            block_structure.get_transformer_block_field(block_key, ContentTransformer, 'content'),
+            expected_content,
+        )
+
+    def test_changed_block(self):
+        self.set_content(3, content='new')
+        self.publish(3)
+        self.assertEquals(self.update_collected(), {'0', '1', '2', '3', '4', '6', '7'})
+
+        block_structure = self.get_collected()
+        self.assert_content(block_structure, 6, [None, 'new', None, None])
+        self.assert_content(block_structure, 4, [None, None, None])
+        self.assert_content(block_structure, 5, [None, None, None])
+        for block_key in block_structure:
+            self.assertEquals(block_structure.get_xblock_field(block_key, 'course_version'), 'v2')
+
+    def test_added_block(self):
+        self.add_block(8, 2)
+        self.set_content(8, content='added')
+        self.publish(2, 8)
+        self.assertEquals(self.update_collected(), {'0', '1', '2', '5', '8'})
+
+        block_structure = self.get_collected()
+        self.assert_content(block_structure, 8, ['added', None, None])
+        self.assert_content(block_structure, 3, [None, None, None])
+
+    def test_removed_block(self):
+        self.modulestore.blocks[self.block_key_factory(1)].children.remove(self.block_key_factory(3))
+        self.children_map[1].remove(3)
+        self.publish(1)
+        self.assertEquals(self.update_collected(), {'0', '1', '2', '4'})
+
+        block_structure = self.get_collected()
+        for block_id in (3, 6, 7):
+            self.assertNotIn(self.block_key_factory(block_id), block_structure)
+
+    def test_dag_falls_back_to_full_collection(self):
+        self.modulestore.blocks[self.block_key_factory(4)].children.append(self.block_key_factory(5))
+        self.children_map[4].append(5)
+        self.publish(4)
+        self.assertEquals(len(self.update_collected()), len(self.children_map))
+        self.get_collected()
+
+    @ddt.data(
+        (0, 1, [None, None, None, 'new']),
+        (3, 0.5, [None, 'new', None, None]),
+    )
+    @ddt.unpack
+    def test_falls_back_to_full_collection(self, changed_block_id, max_ratio, expected_content):
+        self.set_content(changed_block_id, content='new')
+        self.publish(changed_block_id)
+        self.assertEquals(len(self.update_collected(max_ratio)), len(self.children_map))
+        self.assert_content(self.get_collected(), 7, expected_content)
+
+    def test_collect_failure_falls_back_to_full_collection(self):
+        self.set_content(3, content='new')
+        self.publish(3)
+        with patch('openedx.core.djangoapps.content.block_structure.incremental.create_patched') as mock_patched:
+            mock_patched.side_effect = KeyError
+            self.assertEquals(len(self.update_collected()), len(self.children_map))
+        self.assert_content(self.get_collected(), 6, [None, 'new', None, None])
+
+    def test_unknown_version(self):
+        self.publish(3)
+        self.modulestore.get_changed_blocks = lambda course_key, version: None
+        self.assertEquals(len(self.update_collected()), len(self.children_map))
+
+    def test_outdated_transformer(self):
+        self.publish(3)
+        ContentTransformer.WRITE_VERSION += 1
+        self.addCleanup(setattr, ContentTransformer, 'WRITE_VERSION', ContentTransformer.WRITE_VERSION - 1)
+        self.assertEquals(len(self.update_collected()), len(self.children_map))
+
+    def test_switch_disabled(self):
+        self.publish(3)
+        with waffle().override(INCREMENTAL_COLLECTION, active=False):
+            self.assertEquals(len(self.update_collected()), len(self.children_map))
+
+
+class TestIncrementalCollectionWithRegisteredTransformers(ModuleStoreTestCase):
+    """
+    Tests for collecting block structures incrementally, with the
+    registered transformers.
+    """
+    MODULESTORE = TEST_DATA_SPLIT_MODULESTORE
+    shard = 2
+
+    def setUp(self):
+        super(TestIncrementalCollectionWithRegisteredTransformers, self).setUp()
+        waffle_override = waffle().override(INCREMENTAL_COLLECTION, active=True)
+        waffle_override.__enter__()
+        self.addCleanup(waffle_override.__exit__, None, None, None)
+
+        #   course - chapter - sequential - split_test
+        #                                   /        \
+        #                              group_0      group_1
+        #                                 |            |
+        #                               html         html
+        self.course = CourseFactory.create(
+            user_partitions=[UserPartition(0, 'Partition', 'Partition', [Group(0, 'Group 0'), Group(1, 'Group 1')])],
+        )
+        chapter = ItemFactory.create(parent=self.course, category='chapter')
+        sequential = ItemFactory.create(parent=chapter, category='sequential')
+        group_keys = [self.course.id.make_usage_key('vertical', 'group_{}'.format(group_id)) for group_id in (0, 1)]
+        split_test = ItemFactory.create(
+            parent=sequential,
+            category='split_test',
+            user_partition_id=0,
+            group_id_to_child={'0': group_keys[0], '1': group_keys[1]},
+        )
+        self.html_keys = []
+        for group_key in group_keys:
+            vertical = ItemFactory.create(parent=split_test, category='vertical', location=group_key)
+            self.html_keys.append(ItemFactory.create(parent=vertical, category='html').location)
+
+        self.bs_manager = get_block_structure_manager(self.course.id)
+        self.bs_manager.get_collected()
+
+    def test_changed_block_under_split_test(self):
+        html = self.store.get_item(self.html_keys[0])
+        html.display_name = 'Changed'
+        self.store.update_item(html, self.user.id)
+        self.store.publish(html.location, self.user.id)
+
+        with patch.object(self.bs_manager, '_update_collected', wraps=self.bs_manager._update_collected) as mock_full:
+            with patch.dict(settings.BLOCK_STRUCTURES_SETTINGS, INCREMENTAL_COLLECTION_MAX_RATIO=1):
+                self.bs_manager.update_collected_if_needed()
+        self.assertFalse(mock_full.called)
+
+        block_structure = self.bs_manager.get_collected()
+        course_version = self.store.get_course(self.course.id).course_version
+        for block_key in block_structure:
+            self.assertEquals(block_structure.get_xblock_field(block_key, 'course_version'), course_version)
+        for group_id, html_key in enumerate(self.html_keys):
+            merged_group_access = block_structure.get_transformer_block_field(
+                html_key, 'user_partitions', 'merged_group_access',
+            )
+            self.assertEquals(merged_group_access._access, {0: {group_id}})
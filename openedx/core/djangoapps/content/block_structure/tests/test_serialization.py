@@ -0,0 +1,83 @@
+"""
+Tests for block_structure/serialization.py
+"""
+# pylint: disable=protected-access
+from unittest import TestCase
+
+import ddt
+
+from ..block_structure import BlockStructureModulestoreData
+from ..exceptions import BlockStructureNotFound
+from ..serialization import MAGIC, deserialize, is_compact, serialize
+from .helpers import ChildrenMapTestMixin, MockTransformer, UsageKeyFactoryMixin
+
+
+@ddt.ddt
+class TestCompactSerialization(UsageKeyFactoryMixin, ChildrenMapTestMixin, TestCase):
+    """
+    Tests for the compact serialization format of block structures.
+    """
+    def create_collected_structure(self, children_map):
+        """
+        Returns a block structure for the given children_map, with
+        xBlock fields and transformer data on every block.
+        """
+        block_structure = self.create_block_structure(children_map, BlockStructureModulestoreData)
+        block_structure._add_transformer(MockTransformer)
+        for block_key in block_structure:
+            block_data = block_structure._get_or_create_block(block_key)
+            block_data.display_name = u'Block {}'.format(block_key.block_id)
+            block_structure.set_transformer_block_field(block_key, MockTransformer, 'value', block_key.block_id)
+        return block_structure
+
+    @ddt.data(
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_round_trip(self, children_map):
+        block_structure = self.create_collected_structure(children_map)
+        serialized_data = serialize(block_structure)
+        self.assertTrue(is_compact(serialized_data))
+
+        deserialized = deserialize(serialized_data, block_structure.root_block_usage_key)
+        self.assert_block_structure(deserialized, children_map)
+        for block_key in block_structure:
+            self.assertEqual(deserialized.get_parents(block_key), block_structure.get_parents(block_key))
+            self.assertEqual(deserialized.get_children(block_key), block_structure.get_children(block_key))
+            self.assertEqual(deserialized[block_key].fields, block_structure[block_key].fields)
+            self.assertEqual(
+                deserialized[block_key].transformer_data[MockTransformer].fields,
+                block_structure[block_key].transformer_data[MockTransformer].fields,
+            )
+        self.assertEqual(deserialized._get_transformer_data_version(MockTransformer), MockTransformer.WRITE_VERSION)
+
+    def test_lazy_decoding(self):
+        block_structure = self.create_collected_structure(self.SIMPLE_CHILDREN_MAP)
+        deserialized = deserialize(serialize(block_structure), block_structure.root_block_usage_key)
+        block_key = self.block_key_factory(1)
+
+        self.assertEqual(deserialized.get_xblock_field(block_key, 'display_name'), u'Block 1')
+        self.assertNotIn('display_name', deserialized._lazy_block_data.xblock_columns)
+        self.assertIn(MockTransformer.name(), deserialized._lazy_block_data.transformer_columns)
+
+        self.assertEqual(deserialized.get_transformer_block_field(block_key, MockTransformer, 'value'), u'1')
+        self.assertFalse(deserialized._lazy_block_data)
+
+    def test_copy_keeps_columns_encoded(self):
+        block_structure = self.create_collected_structure(self.SIMPLE_CHILDREN_MAP)
+        deserialized = deserialize(serialize(block_structure), block_structure.root_block_usage_key)
+        block_structure_copy = deserialized.copy()
+
+        block_key = self.block_key_factory(3)
+        deserialized.remove_block(block_key, keep_descendants=False)
+        self.assertIsNone(deserialized.get_xblock_field(block_key, 'display_name'))
+        self.assertEqual(block_structure_copy.get_xblock_field(block_key, 'display_name'), u'Block 3')
+        self.assertEqual(block_structure_copy.get_transformer_block_field(block_key, MockTransformer, 'value'), u'3')
+
+    def test_unknown_version(self):
+        block_structure = self.create_collected_structure(self.SIMPLE_CHILDREN_MAP)
+        serialized_data = serialize(block_structure)
+        serialized_data = MAGIC + chr(255) + serialized_data[len(MAGIC) + 1:]
+        with self.assertRaises(BlockStructureNotFound):
+            deserialize(serialized_data, block_structure.root_block_usage_key)
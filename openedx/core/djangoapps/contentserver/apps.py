@@ -0,0 +1,17 @@
+"""
+Configuration for the contentserver Django app.
+"""
+from django.apps import AppConfig
+
+
+class ContentServerConfig(AppConfig):
+    """
+    Configuration class for the contentserver Django app.
+    """
+    name = 'openedx.core.djangoapps.contentserver'
+
+    def ready(self):
+        """
+        Connect signal handlers.
+        """
+        from . import signals  # pylint: disable=unused-variable
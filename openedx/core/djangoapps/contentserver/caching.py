@@ -1,11 +1,23 @@
 """
 Helper functions for caching course assets.
 """
+import logging
+import threading
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.conf import settings
 from django.core.cache import caches
 from django.core.cache.backends.base import InvalidCacheBackendError
+from dogapi import dog_stats_api
 from opaque_keys import InvalidKeyError
 
-from xmodule.contentstore.content import STATIC_CONTENT_VERSION
+from xmodule.contentstore.content import STATIC_CONTENT_VERSION, CourseAssetIndex
+from xmodule.contentstore.django import contentstore
+
+from .disk_cache import DiskAssetCache, DiskCachedContent, get_content_metadata
+
+log = logging.getLogger(__name__)
 
 # See if there's a "course_assets" cache configured, and if not, fallback to the default cache.
 CONTENT_CACHE = caches['default']
@@ -14,6 +26,64 @@ try:
 except InvalidCacheBackendError:
     pass
 
+# Assets too large for the cache above are cached on the local disk, see CONTENTSERVER_DISK_CACHE.
+# Their metadata is kept in the cache above, so that del_cached_content invalidates them on every server.
+DISK_CACHE_SETTINGS = getattr(settings, 'CONTENTSERVER_DISK_CACHE', {})
+DISK_CACHE = DiskAssetCache(
+    directory=DISK_CACHE_SETTINGS.get('DIRECTORY'),
+    max_bytes=DISK_CACHE_SETTINGS.get('MAX_BYTES', 0),
+    max_asset_bytes=DISK_CACHE_SETTINGS.get('MAX_ASSET_BYTES', 0),
+)
+
+
+class ProcessLRUCache(object):
+    """
+    A bounded, per-process, least-recently-used map, safe to share between threads.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value cached for `key` (marking it as most recently used), or None."""
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._entries[key] = value
+            return value
+
+    def set(self, key, value, max_entries):
+        """Cache `value` under `key`, evicting the least recently used values beyond `max_entries`."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove every cached value."""
+        with self._lock:
+            self._entries.clear()
+
+
+# The locations of the assets being copied to the disk cache by threads of this process.
+DISK_CACHE_FILLS = set()
+DISK_CACHE_FILLS_LOCK = threading.Lock()
+
+# The asset indexes of the courses whose assets this process served or linked to recently,
+# see COURSE_ASSET_INDEX_CACHE_SIZE.
+COURSE_ASSET_INDEXES = ProcessLRUCache()
+
+
+def location_str(loc):
+    """Force the location to a Unicode string."""
+    return unicode(loc).encode("utf-8")
+
+
+def disk_cache_key(loc):
+    """Returns the key of the metadata of a disk cached asset."""
+    return location_str(loc) + ".disk"
+
 
 def set_cached_content(content):
     """
@@ -29,22 +99,177 @@ def get_cached_content(location):
     return CONTENT_CACHE.get(unicode(location).encode("utf-8"), version=STATIC_CONTENT_VERSION)
 
 
+def course_assets_version_key(course_key):
+    """Returns the key of the version of the assets of a course."""
+    return "assets_version." + location_str(course_key)
+
+
+def get_course_assets_version(course_key):
+    """
+    Returns an opaque version of the assets of the given course, which changes
+    whenever one of them is saved or deleted, or the version expires from the cache.
+    """
+    key = course_assets_version_key(course_key)
+    assets_version = CONTENT_CACHE.get(key, version=STATIC_CONTENT_VERSION)
+    if assets_version is None:
+        assets_version = uuid4().hex
+        # Another process may have set it first.
+        if not CONTENT_CACHE.add(key, assets_version, version=STATIC_CONTENT_VERSION):
+            assets_version = CONTENT_CACHE.get(key, assets_version, version=STATIC_CONTENT_VERSION)
+    return assets_version
+
+
+def bump_course_assets_version(course_key):
+    """
+    Changes the version of the assets of the given course (and of the course without a run,
+    like del_cached_content), which refreshes its asset index.
+    """
+    course_keys = [course_key]
+    try:
+        course_keys.append(course_key.replace(run=None))
+    except InvalidKeyError:
+        pass
+    CONTENT_CACHE.delete_many(
+        [course_assets_version_key(key) for key in course_keys], version=STATIC_CONTENT_VERSION
+    )
+
+
+def course_asset_index_key(course_key, assets_version):
+    """Returns the key of the asset index of a course, for the given version of its assets."""
+    return "asset_index.{}.{}".format(location_str(course_key), assets_version)
+
+
+def get_course_asset_index(course_key):
+    """
+    Returns the CourseAssetIndex of the current version of the assets of the given course,
+    from this process, the cache, or built from the contentstore.
+
+    Returns None when the index is disabled (see COURSE_ASSET_INDEX_CACHE_SIZE), or
+    couldn't be built.
+    """
+    cache_size = getattr(settings, 'COURSE_ASSET_INDEX_CACHE_SIZE', 0)
+    if cache_size <= 0:
+        return None
+
+    assets_version = get_course_assets_version(course_key)
+    local_key = (unicode(course_key), assets_version)
+    index = COURSE_ASSET_INDEXES.get(local_key)
+    if index is None:
+        key = course_asset_index_key(course_key, assets_version)
+        index = CONTENT_CACHE.get(key, version=STATIC_CONTENT_VERSION)
+        if index is None:
+            try:
+                index = CourseAssetIndex.from_contentstore(contentstore(), course_key)
+            except Exception:  # pylint: disable=broad-except
+                log.exception(u"Could not build the asset index of course %s", unicode(course_key))
+                return None
+            CONTENT_CACHE.set(key, index, version=STATIC_CONTENT_VERSION)
+        COURSE_ASSET_INDEXES.set(local_key, index, cache_size)
+    return index
+
+
 def del_cached_content(location):
     """
     Delete content for the given location, as well versions of the content without a run.
 
     It's possible that the content could have been cached without knowing the course_key,
     and so without having the run.
-    """
-    def location_str(loc):
-        """Force the location to a Unicode string."""
-        return unicode(loc).encode("utf-8")
 
-    locations = [location_str(location)]
+    This also changes the version of the assets of the course, which refreshes its asset index.
+    """
+    locations = [location]
     try:
-        locations.append(location_str(location.replace(run=None)))
+        locations.append(location.replace(run=None))
     except InvalidKeyError:
         # although deprecated keys allowed run=None, new keys don't if there is no version.
         pass
 
-    CONTENT_CACHE.delete_many(locations, version=STATIC_CONTENT_VERSION)
+    keys = [location_str(loc) for loc in locations] + [disk_cache_key(loc) for loc in locations]
+    keys += [course_assets_version_key(loc.course_key) for loc in locations]
+    CONTENT_CACHE.delete_many(keys, version=STATIC_CONTENT_VERSION)
+    for loc in locations:
+        DISK_CACHE.delete(loc)
+
+
+def is_disk_cacheable(content):
+    """
+    Returns whether the given content can be cached on the local disk.
+    """
+    return DISK_CACHE.accepts(content)
+
+
+def get_disk_cached_content(location):
+    """
+    Retrieves the given piece of content by its location if cached on the local disk.
+    """
+    if not DISK_CACHE.enabled:
+        return None
+
+    content = None
+    metadata = CONTENT_CACHE.get(disk_cache_key(location), version=STATIC_CONTENT_VERSION)
+    if metadata is not None:
+        path = DISK_CACHE.get(location, metadata['content_digest'])
+        if path is not None:
+            try:
+                content = DiskCachedContent(path, metadata)
+            except IOError:
+                # The file was evicted since.
+                pass
+
+    dog_stats_api.increment('contentserver.disk_cache.{}'.format('miss' if content is None else 'hit'))
+    return content
+
+
+def set_disk_cached_content(content):
+    """
+    Copies the given streamed piece of content to the local disk and closes its stream.  Returns
+    the cached copy, or None if it couldn't be copied or another process is copying it.
+    """
+    try:
+        path = DISK_CACHE.set(content.location, content.content_digest, content.stream_data())
+        if path is None:
+            return None
+        metadata = get_content_metadata(content)
+        cached_content = DiskCachedContent(path, metadata)
+    except (IOError, OSError):
+        log.exception(u"Could not cache content on disk: %s", unicode(content.location))
+        return None
+    finally:
+        content.close()
+
+    CONTENT_CACHE.set(disk_cache_key(content.location), metadata, version=STATIC_CONTENT_VERSION)
+    return cached_content
+
+
+def fill_disk_cache_in_background(location):
+    """
+    Starts copying the given asset from the contentstore to the local disk in a background thread,
+    so that the request which missed the cache doesn't wait for the copy.  Returns the thread, or
+    None if a thread of this process is already copying the asset.
+    """
+    with DISK_CACHE_FILLS_LOCK:
+        if location in DISK_CACHE_FILLS:
+            return None
+        DISK_CACHE_FILLS.add(location)
+
+    thread = threading.Thread(target=_fill_disk_cache, args=(location,), name='contentserver-disk-cache-fill')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def _fill_disk_cache(location):
+    """
+    Copies the given asset from the contentstore to the local disk.
+    """
+    try:
+        content = contentstore().find(location, as_stream=True)
+        if DISK_CACHE.accepts(content):
+            set_disk_cached_content(content)
+        else:
+            content.close()
+    except Exception:  # pylint: disable=broad-except
+        log.exception(u"Could not cache content on disk: %s", unicode(location))
+    finally:
+        with DISK_CACHE_FILLS_LOCK:
+            DISK_CACHE_FILLS.discard(location)
@@ -0,0 +1,242 @@
+"""
+A bounded cache of course assets on the local disk of an app server.
+
+Assets that are too large for the "course_assets" cache are copied from
+GridFS to a directory on the local disk after they are first served, and
+served from there afterwards.  The files are named after the location and
+the content digest of the asset, so that a new version of an asset never
+gets the file of an older version.  The directory can be shared by all the
+processes of a server: files are written under a temporary name and renamed
+when complete, only one process writes the file of an asset at a time, and
+the least recently used files are removed whenever the directory holds more
+than `max_bytes`.
+"""
+import errno
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from xmodule.contentstore.content import StaticContentStream
+
+# Size of the reads and writes of cached files.
+DISK_CACHE_CHUNK_SIZE = 64 * 1024
+
+# Prefix of the files being written, which are ignored until they are renamed.
+TEMP_FILE_PREFIX = '.tmp-'
+
+# Prefix of the lock files of the files being written.
+LOCK_FILE_PREFIX = '.lock-'
+
+# Lock files older than this many seconds were left behind by a process that died while writing a file.
+STALE_LOCK_SECONDS = 600
+
+
+class DiskCachedContent(StaticContentStream):
+    """
+    A course asset read from a file of the disk cache.
+    """
+    chunk_size = DISK_CACHE_CHUNK_SIZE
+
+    def __init__(self, path, metadata):
+        self.path = path
+        self.file = open(path, 'rb')
+        super(DiskCachedContent, self).__init__(stream=self.file, **metadata)
+
+
+def get_content_metadata(content):
+    """
+    Returns the attributes of the given content, to rebuild it around a cached file.
+    """
+    return {
+        'loc': content.location,
+        'name': content.name,
+        'content_type': content.content_type,
+        'last_modified_at': content.last_modified_at,
+        'thumbnail_location': content.thumbnail_location,
+        'import_path': content.import_path,
+        'length': content.length,
+        'locked': content.locked,
+        'content_digest': content.content_digest,
+    }
+
+
+class DiskAssetCache(object):
+    """
+    A directory of cached asset files, holding at most `max_bytes` bytes of
+    assets of at most `max_asset_bytes` bytes each.
+    """
+    def __init__(self, directory=None, max_bytes=0, max_asset_bytes=0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_asset_bytes = max_asset_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """
+        Returns whether this cache holds anything at all.
+        """
+        return bool(self.directory) and self.max_bytes > 0 and self.max_asset_bytes > 0
+
+    def accepts(self, content):
+        """
+        Returns whether the given content can be cached.
+        """
+        return (
+            self.enabled and
+            bool(content.content_digest) and
+            content.length is not None and
+            content.length <= min(self.max_asset_bytes, self.max_bytes)
+        )
+
+    def get(self, location, content_digest):
+        """
+        Returns the path of the cached file of the given version of an asset, or None.
+        """
+        path = self._path(location, content_digest)
+        try:
+            # The modification time of a file is the last time it was used.
+            os.utime(path, None)
+        except OSError:
+            return None
+        return path
+
+    def set(self, location, content_digest, chunks):
+        """
+        Writes the given chunks of data to the cached file of the given version of an asset,
+        replacing the files of its other versions, and returns the path of the file.
+
+        Returns None without consuming the chunks if another process is writing the file.
+        """
+        self._make_directory()
+        path = self._path(location, content_digest)
+        lock_path = self._lock_file(path)
+        if lock_path is None:
+            return None
+
+        temp_file = None
+        try:
+            # Another process may have written the file since it was looked up.
+            if self.get(location, content_digest) is not None:
+                return path
+            temp_file = tempfile.NamedTemporaryFile(dir=self.directory, prefix=TEMP_FILE_PREFIX, delete=False)
+            with temp_file:
+                for chunk in chunks:
+                    temp_file.write(chunk)
+            self.delete(location)
+            os.rename(temp_file.name, path)
+        finally:
+            # Nothing is left to remove once the file is renamed.
+            if temp_file is not None:
+                _remove(temp_file.name)
+            _remove(lock_path)
+
+        self._evict()
+        return path
+
+    def delete(self, location):
+        """
+        Removes the cached files of every version of an asset.
+        """
+        prefix = self._location_prefix(location)
+        for filename in self._listdir():
+            if filename.startswith(prefix):
+                _remove(os.path.join(self.directory, filename))
+
+    def clear(self):
+        """
+        Removes every cached file.
+        """
+        for filename in self._listdir():
+            _remove(os.path.join(self.directory, filename))
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the cache is within its limit.
+        """
+        with self._lock:
+            files = []
+            for filename in self._listdir():
+                path = os.path.join(self.directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+            total_bytes = sum(size for __, size, __ in files)
+            for __, size, path in sorted(files):
+                if total_bytes <= self.max_bytes:
+                    break
+                _remove(path)
+                total_bytes -= size
+
+    def _lock_file(self, path):
+        """
+        Creates the lock file of the given cached file, and returns its path, or None if
+        another process holds it.
+        """
+        lock_path = os.path.join(self.directory, LOCK_FILE_PREFIX + os.path.basename(path))
+        for __ in range(2):
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return lock_path
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+            try:
+                if time.time() - os.stat(lock_path).st_mtime < STALE_LOCK_SECONDS:
+                    return None
+            except OSError:
+                # The other process just released it.
+                return None
+            _remove(lock_path)
+        return None
+
+    def _listdir(self):
+        """
+        Returns the names of the complete files of the cache.
+        """
+        if not self.directory:
+            return []
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [
+            filename for filename in filenames if not filename.startswith((TEMP_FILE_PREFIX, LOCK_FILE_PREFIX))
+        ]
+
+    def _make_directory(self):
+        """
+        Creates the directory of the cache, if needed.
+        """
+        try:
+            os.makedirs(self.directory)
+        except OSError:
+            if not os.path.isdir(self.directory):
+                raise
+
+    def _location_prefix(self, location):
+        """
+        Returns the prefix of the names of the cached files of an asset.
+        """
+        return hashlib.sha1(unicode(location).encode('utf-8')).hexdigest() + '-'
+
+    def _path(self, location, content_digest):
+        """
+        Returns the path of the cached file of the given version of an asset.
+        """
+        return os.path.join(self.directory, self._location_prefix(location) + content_digest)
+
+
+def _remove(path):
+    """
+    Removes a file, which another process may have removed already.
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
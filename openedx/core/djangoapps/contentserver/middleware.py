@@ -4,24 +4,30 @@ Middleware to serve assets.
 
 import logging
 import datetime
+from uuid import uuid4
 log = logging.getLogger(__name__)
 try:
     import newrelic.agent
 except ImportError:
     newrelic = None  # pylint: disable=invalid-name
+from dogapi import dog_stats_api
 from django.http import (
-    HttpResponse, HttpResponseNotModified, HttpResponseForbidden,
+    FileResponse, HttpResponse, HttpResponseNotModified, HttpResponseForbidden, StreamingHttpResponse,
     HttpResponseBadRequest, HttpResponseNotFound, HttpResponsePermanentRedirect)
 from six import text_type
 from student.models import CourseEnrollment
 
 from xmodule.assetstore.assetmgr import AssetManager
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.locator import AssetLocator
 from openedx.core.djangoapps.header_control import force_header_for_response
-from .caching import get_cached_content, set_cached_content
+from .caching import (
+    bump_course_assets_version, fill_disk_cache_in_background, get_cached_content, get_course_asset_index,
+    get_disk_cached_content, is_disk_cacheable, set_cached_content
+)
+from .disk_cache import DISK_CACHE_CHUNK_SIZE, DiskCachedContent
 from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.exceptions import NotFoundError
 
@@ -32,6 +38,22 @@ from .models import CourseAssetCacheTtlConfig, CdnUserAgentsConfig
 
 HTTP_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
 
+# Assets smaller than this are cached in memory, in the "course_assets" cache.  We cap this at 1MB
+# because it's the default for memcached and also we don't want to do too much buffering in memory
+# when we're serving an actual request.
+MAX_CACHED_CONTENT_BYTES = 1048576
+
+# Requests for more ranges than this get the full content, rather than a multipart response
+# with a part per range.
+MAX_RANGES = 20
+
+# The delimiter and headers of each part of a multipart/byteranges response.
+MULTIPART_PART_HEADER = (
+    u'\r\n--{boundary}\r\n'
+    u'Content-Type: {content_type}\r\n'
+    u'Content-Range: bytes {first}-{last}/{length}\r\n\r\n'
+)
+
 
 class StaticContentServer(object):
     """
@@ -78,8 +100,12 @@ class StaticContentServer(object):
                 return HttpResponseNotFound()
 
             # If this was a versioned asset, and the digest doesn't match, redirect
-            # them to the actual version.
+            # them to the actual version.  The url may come from an outdated asset index
+            # of the course, which is then refreshed.
             if requested_digest is not None and actual_digest is not None and (actual_digest != requested_digest):
+                indexed_digest = self.get_indexed_digest(loc)
+                if indexed_digest is not None and indexed_digest != actual_digest:
+                    bump_course_assets_version(loc.course_key)
                 actual_asset_path = StaticContent.add_version_to_asset_path(asset_path, actual_digest)
                 return HttpResponsePermanentRedirect(actual_asset_path)
 
@@ -108,25 +134,31 @@ class StaticContentServer(object):
                 return HttpResponseForbidden('Unauthorized')
 
             # Figure out if the client sent us a conditional request, and let them know
-            # if this asset has changed since then.
+            # if this asset has changed since then.  An entity tag takes precedence over
+            # a date: https://tools.ietf.org/html/rfc7232#section-6
+            etag = get_etag(content)
             last_modified_at_str = content.last_modified_at.strftime(HTTP_DATE_FORMAT)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            if etag is not None and 'HTTP_IF_NONE_MATCH' in request.META:
+                if etag_matches(etag, request.META['HTTP_IF_NONE_MATCH']):
+                    response = HttpResponseNotModified()
+                    response['ETag'] = etag
+                    return response
+            elif 'HTTP_IF_MODIFIED_SINCE' in request.META:
                 if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
                 if if_modified_since == last_modified_at_str:
                     return HttpResponseNotModified()
 
-            # *** File streaming within a byte range ***
+            # *** File streaming within byte ranges ***
             # If a Range is provided, parse Range attribute of the request
             # Add Content-Range in the response if Range is structurally correct
-            # Request -> Range attribute structure: "Range: bytes=first-[last]"
+            # Request -> Range attribute structure: "Range: bytes=first-[last][, first-[last]...]"
             # Response -> Content-Range attribute structure: "Content-Range: bytes first-last/totalLength"
             # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.35
+            # The ranges are read from the content that was loaded above: an asset that
+            # isn't cached in memory is read from its GridFS file, one chunk at a time.
             response = None
-            if request.META.get('HTTP_RANGE'):
-                # If we have a StaticContent, get a StaticContentStream.  Can't manipulate the bytes otherwise.
-                if isinstance(content, StaticContent):
-                    content = AssetManager.find(loc, as_stream=True)
-
+            content_type = content.content_type
+            if request.META.get('HTTP_RANGE') and self.is_range_current(request, etag, last_modified_at_str):
                 header_value = request.META['HTTP_RANGE']
                 try:
                     unit, ranges = parse_range_header(header_value, content.length)
@@ -139,46 +171,61 @@ class StaticContentServer(object):
                     if unit != 'bytes':
                         # Only accept ranges in bytes
                         log.warning(u"Unknown unit in Range header: %s for content: %s", header_value, text_type(loc))
-                    elif len(ranges) > 1:
-                        # According to Http/1.1 spec content for multiple ranges should be sent as a multipart message.
-                        # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.16
-                        # But we send back the full content.
+                    elif len(ranges) > MAX_RANGES:
+                        # Sending that many parts costs more than sending the full content.
                         log.warning(
-                            u"More than 1 ranges in Range header: %s for content: %s", header_value, text_type(loc)
+                            u"Too many ranges in Range header: %s for content: %s", header_value, text_type(loc)
                         )
                     else:
-                        first, last = ranges[0]
+                        ranges = [(first, last) for first, last in ranges if 0 <= first <= last < content.length]
+                        if not ranges:
+                            log.warning(
+                                u"Cannot satisfy ranges in Range header: %s for content: %s",
+                                header_value, text_type(loc)
+                            )
+                            response = HttpResponse(status=416)  # Requested Range Not Satisfiable
+                            response['Content-Range'] = 'bytes */{length}'.format(length=content.length)
+                            return response
 
-                        if 0 <= first <= last < content.length:
-                            # If the byte range is satisfiable
-                            response = HttpResponse(content.stream_data_in_range(first, last))
+                        if len(ranges) == 1:
+                            first, last = ranges[0]
+                            response = make_content_response(content, content.stream_data_in_range(first, last))
                             response['Content-Range'] = 'bytes {first}-{last}/{length}'.format(
                                 first=first, last=last, length=content.length
                             )
                             response['Content-Length'] = str(last - first + 1)
-                            response.status_code = 206  # Partial Content
-
-                            if newrelic:
-                                newrelic.agent.add_custom_parameter('contentserver.ranged', True)
                         else:
-                            log.warning(
-                                u"Cannot satisfy ranges in Range header: %s for content: %s",
-                                header_value, text_type(loc)
-                            )
-                            return HttpResponse(status=416)  # Requested Range Not Satisfiable
+                            # According to Http/1.1 spec content for multiple ranges should be sent as a multipart
+                            # message: http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.16
+                            response = make_multipart_byteranges_response(content, ranges)
+                            content_type = response['Content-Type']
+                        response.status_code = 206  # Partial Content
+
+                        if newrelic:
+                            newrelic.agent.add_custom_parameter('contentserver.ranged', True)
+                            newrelic.agent.add_custom_parameter('contentserver.ranges', len(ranges))
 
             # If Range header is absent or syntactically invalid return a full content response.
             if response is None:
-                response = HttpResponse(content.stream_data())
+                if isinstance(content, DiskCachedContent):
+                    # Let the WSGI server send the file itself, with sendfile where it can.
+                    response = FileResponse(content.file)
+                    response.block_size = DISK_CACHE_CHUNK_SIZE
+                else:
+                    response = make_content_response(content, content.stream_data())
                 response['Content-Length'] = content.length
 
+            if isinstance(content, DiskCachedContent):
+                dog_stats_api.increment('contentserver.disk_cache.bytes_served', value=int(response['Content-Length']))
+
             if newrelic:
+                newrelic.agent.add_custom_parameter('contentserver.disk_cached', isinstance(content, DiskCachedContent))
                 newrelic.agent.add_custom_parameter('contentserver.content_len', content.length)
                 newrelic.agent.add_custom_parameter('contentserver.content_type', content.content_type)
 
             # "Accept-Ranges: bytes" tells the user that only "bytes" ranges are allowed
             response['Accept-Ranges'] = 'bytes'
-            response['Content-Type'] = content.content_type
+            response['Content-Type'] = content_type
             response['X-Frame-Options'] = 'ALLOW'
 
             # Set any caching headers, and do any response cleanup needed.  Based on how much
@@ -215,6 +262,9 @@ class StaticContentServer(object):
             response['Cache-Control'] = "private, no-cache, no-store"
 
         response['Last-Modified'] = content.last_modified_at.strftime(HTTP_DATE_FORMAT)
+        etag = get_etag(content)
+        if etag is not None:
+            response['ETag'] = etag
 
         # Force the Vary header to only vary responses on Origin, so that XHR and browser requests get cached
         # separately and don't screw over one another. i.e. a browser request that doesn't send Origin, and
@@ -243,6 +293,21 @@ class StaticContentServer(object):
         expire_dt = now + datetime.timedelta(seconds=cache_ttl)
         return expire_dt.strftime(HTTP_DATE_FORMAT)
 
+    @staticmethod
+    def is_range_current(request, etag, last_modified_at_str):
+        """
+        Determines whether the Range header of the request applies to the current version of the asset:
+        an If-Range header with an entity tag or a date that doesn't match the asset's asks for the full
+        content instead.
+        """
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range:
+            return True
+        if if_range.startswith('"') or if_range.startswith('W/'):
+            # Only a strong comparison is allowed here.
+            return etag is not None and if_range == etag
+        return if_range == last_modified_at_str
+
     def is_content_locked(self, content):
         """
         Determines whether or not the given content is locked.
@@ -268,6 +333,17 @@ class StaticContentServer(object):
 
         return True
 
+    def get_indexed_digest(self, location):
+        """
+        Returns the digest of the asset at the given location according to the asset
+        index of its course, or None if the index is disabled or doesn't know it.
+        """
+        asset_index = get_course_asset_index(location.course_key)
+        if asset_index is None or not asset_index.covers(location):
+            return None
+        __, content_digest = asset_index.get(location, (None, None))
+        return content_digest
+
     def load_asset_from_location(self, location):
         """
         Loads an asset based on its location, either retrieving it from a cache
@@ -276,6 +352,9 @@ class StaticContentServer(object):
 
         # See if we can load this item from cache.
         content = get_cached_content(location)
+        if content is None:
+            # Large assets may be cached on the local disk instead.
+            content = get_disk_cached_content(location)
         if content is None:
             # Not in cache, so just try and load it from the asset manager.
             try:
@@ -283,16 +362,100 @@ class StaticContentServer(object):
             except (ItemNotFoundError, NotFoundError):
                 raise
 
-            # Now that we fetched it, let's go ahead and try to cache it. We cap this at 1MB
-            # because it's the default for memcached and also we don't want to do too much
-            # buffering in memory when we're serving an actual request.
-            if content.length is not None and content.length < 1048576:
+            # Now that we fetched it, let's go ahead and try to cache it.
+            if content.length is not None and content.length < MAX_CACHED_CONTENT_BYTES:
                 content = content.copy_to_in_mem()
                 set_cached_content(content)
+            elif is_disk_cacheable(content):
+                # Serve the stream, while the asset is copied to the local disk for the next requests.
+                fill_disk_cache_in_background(location)
 
         return content
 
 
+def get_etag(content):
+    """
+    Returns the entity tag of the content, based on its digest, or None if it has no digest.
+    """
+    content_digest = getattr(content, 'content_digest', None)
+    if not content_digest:
+        return None
+    return u'"{}"'.format(content_digest)
+
+
+def etag_matches(etag, header_value):
+    """
+    Returns whether the entity tag matches the value of an If-None-Match header, which is "*" or a
+    list of entity tags, using the weak comparison: https://tools.ietf.org/html/rfc7232#section-3.2
+    """
+    if header_value.strip() == '*':
+        return True
+    for tag in header_value.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def make_content_response(content, data):
+    """
+    Returns a response with the given data of the content.  Data read from a stream is streamed
+    to the client, rather than buffered, and the stream is closed once the response is done with it.
+    """
+    if isinstance(content, StaticContentStream):
+        return StreamingHttpResponse(stream_and_close(content, data))
+    return HttpResponse(data)
+
+
+def stream_and_close(content, data):
+    """
+    Yields the given data of the content, then closes the content's stream.  The stream is also
+    closed if the response is closed before all the data was sent.
+    """
+    try:
+        for chunk in data:
+            yield chunk
+    finally:
+        content.close()
+
+
+def make_multipart_byteranges_response(content, ranges):
+    """
+    Returns a multipart/byteranges response with a part for each (first, last) range of the content.
+
+    See spec for details: https://tools.ietf.org/html/rfc7233#appendix-A
+    """
+    boundary = uuid4().hex
+    part_headers = [
+        MULTIPART_PART_HEADER.format(
+            boundary=boundary, content_type=content.content_type, first=first, last=last, length=content.length,
+        ).encode('utf-8')
+        for first, last in ranges
+    ]
+    closing = u'\r\n--{boundary}--\r\n'.format(boundary=boundary).encode('utf-8')
+
+    def parts():
+        """
+        Yields the parts of the response, reading each range when its part is sent.
+        """
+        for part_header, (first, last) in zip(part_headers, ranges):
+            yield part_header
+            for chunk in content.stream_data_in_range(first, last):
+                yield chunk
+        yield closing
+
+    response = make_content_response(content, parts())
+    response['Content-Type'] = 'multipart/byteranges; boundary={boundary}'.format(boundary=boundary)
+    response['Content-Length'] = str(
+        sum(len(part_header) for part_header in part_headers) +
+        sum(last - first + 1 for first, last in ranges) +
+        len(closing)
+    )
+    return response
+
+
 def parse_range_header(header_value, content_length):
     """
     Returns the unit and a list of (start, end) tuples of ranges.
@@ -0,0 +1,17 @@
+"""
+Signal handlers for the contentserver app.
+"""
+from django.dispatch import receiver
+
+from xmodule.contentstore.django import course_assets_changed
+
+from .caching import bump_course_assets_version
+
+
+@receiver(course_assets_changed)
+def refresh_course_asset_index(sender, course_key, **kwargs):  # pylint: disable=unused-argument
+    """
+    Changes the version of the assets of a course when they are saved, changed or deleted in the
+    contentstore (including by course imports), so that its asset index is rebuilt.
+    """
+    bump_course_assets_version(course_key)
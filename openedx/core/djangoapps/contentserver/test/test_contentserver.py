@@ -6,28 +6,42 @@ import copy
 import datetime
 import ddt
 import logging
+import os
+import shutil
+import tempfile
 import unittest
+from io import BytesIO
 from uuid import uuid4
 
 from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import FileResponse
 from django.test import RequestFactory
 from django.test.client import Client
 from django.test.utils import override_settings
 from mock import patch
 
 from xmodule.contentstore.django import contentstore
-from xmodule.contentstore.content import StaticContent, VERSIONED_ASSETS_PREFIX
+from xmodule.contentstore.content import StaticContent, StaticContentStream, VERSIONED_ASSETS_PREFIX
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.xml_importer import import_course_from_xml
 from xmodule.assetstore.assetmgr import AssetManager
 from opaque_keys import InvalidKeyError
+from opaque_keys.edx.locator import CourseLocator
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from student.models import CourseEnrollment
 from student.tests.factories import UserFactory, AdminFactory
 
-from ..middleware import parse_range_header, HTTP_DATE_FORMAT, StaticContentServer
+from ..caching import (
+    COURSE_ASSET_INDEXES, del_cached_content, fill_disk_cache_in_background, get_course_asset_index
+)
+from ..disk_cache import DiskAssetCache
+from ..middleware import (
+    parse_range_header, make_content_response, make_multipart_byteranges_response, HTTP_DATE_FORMAT,
+    StaticContentServer
+)
 
 log = logging.getLogger(__name__)
 
@@ -242,17 +256,93 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
 
     def test_range_request_multiple_ranges(self):
         """
-        Test that multiple ranges in request outputs the full content.
+        Test that multiple ranges in request outputs a multipart response with a part per range.
         """
         first_byte = self.length_unlocked / 4
         last_byte = self.length_unlocked / 2
         resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={first}-{last}, -100'.format(
             first=first_byte, last=last_byte))
 
+        self.assertEqual(resp.status_code, 206)  # HTTP_206_PARTIAL_CONTENT
+        self.assertNotIn('Content-Range', resp)
+        self.assertTrue(resp['Content-Type'].startswith('multipart/byteranges; boundary='))
+        boundary = resp['Content-Type'].split('boundary=')[1]
+
+        full_content = self.client.get(self.url_unlocked).content
+        body = resp.content
+        self.assertEqual(resp['Content-Length'], str(len(body)))
+        self.assertTrue(body.endswith('\r\n--{}--\r\n'.format(boundary)))
+        parts = body.split('\r\n--{}'.format(boundary))[1:-1]
+        self.assertEqual(len(parts), 2)
+        expected_ranges = [
+            (first_byte, last_byte),
+            (self.length_unlocked - 100, self.length_unlocked - 1),
+        ]
+        for part, (first, last) in zip(parts, expected_ranges):
+            headers, data = part.split('\r\n\r\n', 1)
+            self.assertIn('Content-Range: bytes {first}-{last}/{length}'.format(
+                first=first, last=last, length=self.length_unlocked), headers)
+            self.assertEqual(data, full_content[first:last + 1])
+
+    def test_range_request_multiple_ranges_unsatisfiable_range(self):
+        """
+        Test that the unsatisfiable ranges of a request are dropped, and that a single remaining range
+        outputs a plain partial content response.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-9, {first}-'.format(
+            first=self.length_unlocked))
+
+        self.assertEqual(resp.status_code, 206)  # HTTP_206_PARTIAL_CONTENT
+        self.assertEqual(resp['Content-Range'], 'bytes 0-9/{length}'.format(length=self.length_unlocked))
+        self.assertEqual(resp['Content-Length'], '10')
+
+    def test_range_request_too_many_ranges(self):
+        """
+        Test that a request for too many ranges outputs the full content.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=' + ', '.join(['0-1'] * 21))
+
         self.assertEqual(resp.status_code, 200)
         self.assertNotIn('Content-Range', resp)
         self.assertEqual(resp['Content-Length'], str(self.length_unlocked))
 
+    def test_range_request_if_range(self):
+        """
+        Test that a range request is only honored if its If-Range matches the current version of the asset.
+        """
+        etag = self.client.get(self.url_unlocked)['ETag']
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(resp.status_code, 206)
+
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"{}"'.format(FAKE_MD5_HASH))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['Content-Length'], str(self.length_unlocked))
+
+    def test_etag(self):
+        """
+        Test that assets are served with an entity tag based on their digest, and that a request
+        with a matching If-None-Match header outputs 304 Not Modified.
+        """
+        content = AssetManager.find(self.unlocked_asset, as_stream=True)
+        etag = '"{}"'.format(content.content_digest)
+        resp = self.client.get(self.url_unlocked)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['ETag'], etag)
+        last_modified = resp['Last-Modified']
+
+        for if_none_match in (etag, 'W/' + etag, '"{}", {}'.format(FAKE_MD5_HASH, etag), '*'):
+            resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=if_none_match)
+            self.assertEqual(resp.status_code, 304)
+            self.assertEqual(resp['ETag'], etag)
+
+        # An entity tag takes precedence over a date.
+        resp = self.client.get(
+            self.url_unlocked,
+            HTTP_IF_NONE_MATCH='"{}"'.format(FAKE_MD5_HASH),
+            HTTP_IF_MODIFIED_SINCE=last_modified,
+        )
+        self.assertEqual(resp.status_code, 200)
+
     @ddt.data(
         'bytes 0-',
         'bits=0-',
@@ -284,6 +374,111 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
         resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={first}-{last}'.format(
             first=(self.length_unlocked), last=(self.length_unlocked)))
         self.assertEqual(resp.status_code, 416)
+        self.assertEqual(resp['Content-Range'], 'bytes */{length}'.format(length=self.length_unlocked))
+
+    def test_disk_cached_asset(self):
+        """
+        Test that assets too large for the course_assets cache are served from GridFS while they
+        are copied to the disk cache, and served from there as files afterwards.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        def fill_and_wait(location):
+            """ Copies the asset to the disk cache before the first response is served. """
+            fill_disk_cache_in_background(location).join()
+
+        with patch('openedx.core.djangoapps.contentserver.middleware.fill_disk_cache_in_background',
+                   side_effect=fill_and_wait), \
+                patch('openedx.core.djangoapps.contentserver.middleware.MAX_CACHED_CONTENT_BYTES', 0), \
+                patch('openedx.core.djangoapps.contentserver.caching.DISK_CACHE', DiskAssetCache(
+                    directory, max_bytes=1048576, max_asset_bytes=1048576)), \
+                patch('openedx.core.djangoapps.contentserver.caching.CONTENT_CACHE', LocMemCache(
+                    'contentserver-test', {})):
+            with patch('openedx.core.djangoapps.contentserver.middleware.AssetManager.find',
+                       wraps=AssetManager.find) as mock_find:
+                first_resp = self.client.get(self.url_unlocked)
+                second_resp = self.client.get(self.url_unlocked)
+                range_resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-9')
+
+        self.assertEqual(mock_find.call_count, 1)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(first_resp.status_code, 200)
+        self.assertNotIsInstance(first_resp, FileResponse)
+        self.assertEqual(second_resp.status_code, 200)
+        self.assertIsInstance(second_resp, FileResponse)
+        content = b''.join(second_resp.streaming_content)
+        self.assertEqual(content, b''.join(first_resp.streaming_content))
+        self.assertEqual(second_resp['Content-Length'], str(self.length_unlocked))
+        self.assertEqual(range_resp.status_code, 206)
+        self.assertEqual(b''.join(range_resp.streaming_content), content[:10])
+
+    @override_settings(COURSE_ASSET_INDEX_CACHE_SIZE=10)
+    def test_course_asset_index(self):
+        """
+        Test that the asset index of the course knows its assets, and is rebuilt when they change.
+        """
+        COURSE_ASSET_INDEXES.clear()
+        self.addCleanup(COURSE_ASSET_INDEXES.clear)
+        with patch('openedx.core.djangoapps.contentserver.caching.CONTENT_CACHE', LocMemCache(
+                'contentserver-index-test', {})):
+            asset_index = get_course_asset_index(self.course_key)
+            locked_content = AssetManager.find(self.locked_asset)
+            unlocked_content = AssetManager.find(self.unlocked_asset)
+            self.assertEqual(asset_index.get(self.locked_asset), (True, locked_content.content_digest))
+            self.assertEqual(asset_index.get(self.unlocked_asset), (False, unlocked_content.content_digest))
+            self.assertIsNone(asset_index.get(self.course_key.make_asset_key('asset', 'missing.png')))
+            self.assertTrue(asset_index.covers(self.locked_asset))
+            self.assertFalse(asset_index.covers(
+                self.modulestore.make_course_key('edX', 'other', '2012_Fall').make_asset_key('asset', 'a.png')
+            ))
+
+            # The index is shared until an asset of the course changes.
+            self.assertIs(get_course_asset_index(self.course_key), asset_index)
+            del_cached_content(self.unlocked_asset)
+            self.assertIsNot(get_course_asset_index(self.course_key), asset_index)
+
+    @override_settings(COURSE_ASSET_INDEX_CACHE_SIZE=10)
+    def test_contentstore_changes_refresh_course_asset_index(self):
+        """
+        Test that changing an asset in the contentstore, e.g. by an import, rebuilds the asset index of its course.
+        """
+        COURSE_ASSET_INDEXES.clear()
+        self.addCleanup(COURSE_ASSET_INDEXES.clear)
+        with patch('openedx.core.djangoapps.contentserver.caching.CONTENT_CACHE', LocMemCache(
+                'contentserver-index-test', {})):
+            asset_index = get_course_asset_index(self.course_key)
+            contentstore().set_attr(self.unlocked_asset, 'locked', False)
+            self.assertIsNot(get_course_asset_index(self.course_key), asset_index)
+
+            asset_index = get_course_asset_index(self.course_key)
+            contentstore().save(AssetManager.find(self.unlocked_asset))
+            self.assertIsNot(get_course_asset_index(self.course_key), asset_index)
+
+    @override_settings(COURSE_ASSET_INDEX_CACHE_SIZE=10)
+    def test_versioned_asset_with_stale_index(self):
+        """
+        Test that an asset index disagreeing with the assets neither causes redirects by itself, nor outlives
+        a redirect to the actual version of an asset.
+        """
+        COURSE_ASSET_INDEXES.clear()
+        self.addCleanup(COURSE_ASSET_INDEXES.clear)
+        url_unlocked_versioned_old = StaticContent.add_version_to_asset_path(self.url_unlocked, FAKE_MD5_HASH)
+        with patch('openedx.core.djangoapps.contentserver.caching.CONTENT_CACHE', LocMemCache(
+                'contentserver-index-test', {})):
+            asset_index = get_course_asset_index(self.course_key)
+            asset_key = (self.unlocked_asset.block_type, self.unlocked_asset.block_id)
+            asset_index.assets[asset_key] = (False, FAKE_MD5_HASH)
+
+            resp = self.client.get(self.url_unlocked_versioned)
+            self.assertEqual(resp.status_code, 200)
+            self.assertIs(get_course_asset_index(self.course_key), asset_index)
+
+            resp = self.client.get(url_unlocked_versioned_old)
+            self.assertEqual(resp.status_code, 301)
+            self.assertTrue(resp.url.endswith(self.url_unlocked_versioned))
+            self.assertIsNot(get_course_asset_index(self.course_key), asset_index)
+            self.assertNotEqual(get_course_asset_index(self.course_key).get(self.unlocked_asset)[1], FAKE_MD5_HASH)
 
     def test_vary_header_sent(self):
         """
@@ -447,3 +642,34 @@ class ParseRangeHeaderTestCase(unittest.TestCase):
         self.assertRaisesRegexp(
             exception_class, exception_message_regex, parse_range_header, header_value, self.content_length
         )
+
+
+class ContentStreamResponseTestCase(unittest.TestCase):
+    """
+    Tests that the responses streaming the data of a content close its stream.
+    """
+    def setUp(self):
+        super(ContentStreamResponseTestCase, self).setUp()
+        self.stream = BytesIO(b'0123456789' * 10)
+        self.content = StaticContentStream(
+            CourseLocator('edX', 'toy', '2012_Fall').make_asset_key('asset', 'data.txt'), 'data.txt', 'text/plain',
+            self.stream, length=100,
+        )
+
+    def test_stream_closed_when_sent(self):
+        response = make_content_response(self.content, self.content.stream_data_in_range(10, 19))
+        self.assertFalse(self.stream.closed)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertTrue(self.stream.closed)
+
+    def test_multipart_stream_closed_when_sent(self):
+        response = make_multipart_byteranges_response(self.content, [(0, 4), (95, 99)])
+        self.assertFalse(self.stream.closed)
+        self.assertIn(b'56789', b''.join(response.streaming_content))
+        self.assertTrue(self.stream.closed)
+
+    def test_stream_closed_when_response_closed(self):
+        response = make_content_response(self.content, self.content.stream_data_in_range(0, 99))
+        next(iter(response.streaming_content))
+        response.close()
+        self.assertTrue(self.stream.closed)
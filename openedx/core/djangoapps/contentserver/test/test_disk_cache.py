@@ -0,0 +1,200 @@
+"""
+Tests for the disk cache of course assets.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from django.core.cache.backends.locmem import LocMemCache
+from mock import Mock, patch
+from opaque_keys.edx.locator import CourseLocator
+
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+
+from ..caching import (
+    del_cached_content, fill_disk_cache_in_background, get_disk_cached_content, set_disk_cached_content
+)
+from ..disk_cache import LOCK_FILE_PREFIX, DiskAssetCache, DiskCachedContent
+
+
+class DiskAssetCacheTestCase(unittest.TestCase):
+    """
+    Tests for DiskAssetCache.
+    """
+    def setUp(self):
+        super(DiskAssetCacheTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = DiskAssetCache(os.path.join(self.directory, 'assets'), max_bytes=100, max_asset_bytes=50)
+        course_key = CourseLocator('org', 'course', 'run')
+        self.locations = [course_key.make_asset_key('asset', 'asset_{}.pdf'.format(index)) for index in range(4)]
+
+    def test_enabled(self):
+        self.assertTrue(self.cache.enabled)
+        self.assertFalse(DiskAssetCache().enabled)
+        self.assertFalse(DiskAssetCache(self.directory, max_bytes=100).enabled)
+
+    def test_accepts(self):
+        content = StaticContent(
+            self.locations[0], 'asset_0.pdf', 'application/pdf', 'x' * 50, length=50, content_digest='abc'
+        )
+        self.assertTrue(self.cache.accepts(content))
+        content.length = 51
+        self.assertFalse(self.cache.accepts(content))
+        content.length = 50
+        content.content_digest = None
+        self.assertFalse(self.cache.accepts(content))
+
+    def test_set_and_get(self):
+        self.assertIsNone(self.cache.get(self.locations[0], 'abc'))
+        path = self.cache.set(self.locations[0], 'abc', iter(['some ', 'data']))
+        self.assertEqual(self.cache.get(self.locations[0], 'abc'), path)
+        with open(path) as cached_file:
+            self.assertEqual(cached_file.read(), 'some data')
+        self.assertIsNone(self.cache.get(self.locations[0], 'def'))
+        self.assertIsNone(self.cache.get(self.locations[1], 'abc'))
+
+    def test_new_version_replaces_old_one(self):
+        self.cache.set(self.locations[0], 'abc', ['old'])
+        self.cache.set(self.locations[0], 'def', ['new'])
+        self.assertIsNone(self.cache.get(self.locations[0], 'abc'))
+        self.assertIsNotNone(self.cache.get(self.locations[0], 'def'))
+        self.assertEqual(len(os.listdir(self.cache.directory)), 1)
+
+    def test_failed_set(self):
+        def chunks():
+            """ Yields a chunk, then fails. """
+            yield 'some'
+            raise IOError()
+
+        with self.assertRaises(IOError):
+            self.cache.set(self.locations[0], 'abc', chunks())
+        self.assertEqual(os.listdir(self.cache.directory), [])
+
+    def test_set_while_locked(self):
+        path = self.cache.set(self.locations[0], 'abc', ['data'])
+        self.cache.delete(self.locations[0])
+        lock_path = os.path.join(self.cache.directory, LOCK_FILE_PREFIX + os.path.basename(path))
+        open(lock_path, 'w').close()
+
+        # Another process is writing the file, so the chunks are left alone.
+        chunks = iter(['data'])
+        self.assertIsNone(self.cache.set(self.locations[0], 'abc', chunks))
+        self.assertEqual(list(chunks), ['data'])
+        self.assertIsNone(self.cache.get(self.locations[0], 'abc'))
+
+        # Unless the lock was left behind by a process that died.
+        os.utime(lock_path, (1, 1))
+        self.assertEqual(self.cache.set(self.locations[0], 'abc', ['data']), path)
+        self.assertEqual(os.listdir(self.cache.directory), [os.path.basename(path)])
+
+    def test_delete(self):
+        self.cache.set(self.locations[0], 'abc', ['data'])
+        self.cache.set(self.locations[1], 'abc', ['data'])
+        self.cache.delete(self.locations[0])
+        self.assertIsNone(self.cache.get(self.locations[0], 'abc'))
+        self.assertIsNotNone(self.cache.get(self.locations[1], 'abc'))
+
+    def test_lru_eviction(self):
+        paths = [self.cache.set(location, 'abc', ['x' * 40]) for location in self.locations[:2]]
+        # Make the first file older than the second, then use it.
+        os.utime(paths[0], (1, 1))
+        os.utime(paths[1], (2, 2))
+        self.cache.get(self.locations[0], 'abc')
+
+        self.cache.set(self.locations[2], 'abc', ['x' * 40])
+        self.assertIsNotNone(self.cache.get(self.locations[0], 'abc'))
+        self.assertIsNone(self.cache.get(self.locations[1], 'abc'))
+        self.assertIsNotNone(self.cache.get(self.locations[2], 'abc'))
+
+
+class DiskCachedContentTestCase(unittest.TestCase):
+    """
+    Tests for the disk cache helpers of the caching module.
+    """
+    def setUp(self):
+        super(DiskCachedContentTestCase, self).setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for name, value in (
+            ('DISK_CACHE', DiskAssetCache(directory, max_bytes=10000, max_asset_bytes=10000)),
+            ('CONTENT_CACHE', LocMemCache('contentserver-disk-cache-test', {})),
+        ):
+            patcher = patch('openedx.core.djangoapps.contentserver.caching.' + name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.location = CourseLocator('org', 'course', 'run').make_asset_key('asset', 'asset.pdf')
+        self.data = 'some data' * 100
+
+    def make_content(self, data, content_digest):
+        """ Returns a streamed content with the given data. """
+        stream = tempfile.TemporaryFile()
+        self.addCleanup(stream.close)
+        stream.write(data)
+        stream.seek(0)
+        return StaticContentStream(
+            self.location, 'asset.pdf', 'application/pdf', stream, length=len(data), content_digest=content_digest,
+        )
+
+    def test_set_and_get(self):
+        self.assertIsNone(get_disk_cached_content(self.location))
+
+        cached_content = set_disk_cached_content(self.make_content(self.data, 'abc'))
+        self.assertIsInstance(cached_content, DiskCachedContent)
+        self.assertEqual(''.join(cached_content.stream_data()), self.data)
+
+        cached_content = get_disk_cached_content(self.location)
+        self.assertIsInstance(cached_content, DiskCachedContent)
+        self.assertEqual(cached_content.content_digest, 'abc')
+        self.assertEqual(cached_content.content_type, 'application/pdf')
+        self.assertEqual(cached_content.length, len(self.data))
+        self.assertEqual(''.join(cached_content.stream_data_in_range(9, 17)), 'some data')
+
+    def test_set_closes_stream(self):
+        content = self.make_content(self.data, 'abc')
+        set_disk_cached_content(content)
+        self.assertTrue(content._stream.closed)  # pylint: disable=protected-access
+
+    def test_fill_in_background(self):
+        content = self.make_content(self.data, 'abc')
+        found = threading.Event()
+        released = threading.Event()
+
+        def find(location, as_stream=False):  # pylint: disable=unused-argument
+            """ Returns the content once the test is done starting fills. """
+            found.set()
+            released.wait()
+            return content
+
+        with patch('openedx.core.djangoapps.contentserver.caching.contentstore') as mock_contentstore:
+            mock_contentstore.return_value = Mock(find=Mock(side_effect=find))
+            thread = fill_disk_cache_in_background(self.location)
+            found.wait()
+            # The asset is already being copied by this process.
+            self.assertIsNone(fill_disk_cache_in_background(self.location))
+            released.set()
+            thread.join()
+
+        self.assertEqual(mock_contentstore.return_value.find.call_count, 1)
+        self.assertTrue(content._stream.closed)  # pylint: disable=protected-access
+        cached_content = get_disk_cached_content(self.location)
+        self.assertIsInstance(cached_content, DiskCachedContent)
+        self.assertEqual(''.join(cached_content.stream_data()), self.data)
+
+    def test_del_cached_content(self):
+        set_disk_cached_content(self.make_content(self.data, 'abc'))
+        del_cached_content(self.location)
+        self.assertIsNone(get_disk_cached_content(self.location))
+
+    @patch('openedx.core.djangoapps.contentserver.caching.dog_stats_api')
+    def test_metrics(self, mock_dog_stats_api):
+        get_disk_cached_content(self.location)
+        set_disk_cached_content(self.make_content(self.data, 'abc'))
+        get_disk_cached_content(self.location)
+        self.assertEqual(
+            [call[0][0] for call in mock_dog_stats_api.increment.call_args_list],
+            ['contentserver.disk_cache.miss', 'contentserver.disk_cache.hit'],
+        )
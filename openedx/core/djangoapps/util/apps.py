@@ -15,6 +15,8 @@ class UtilConfig(AppConfig):
 
     def ready(self):
         """
-        Registers signal handlers at startup.
+        Registers signal handlers and configures the sandbox worker pool at startup.
         """
         import openedx.core.djangoapps.util.signals  # pylint: disable=unused-variable
+        from xmodule.util.sandboxing import configure_sandbox_worker_pool
+        configure_sandbox_worker_pool()
@@ -1,6 +1,10 @@
 """
 Django storage backends for Open edX.
 """
+import os
+import tempfile
+from gzip import GzipFile
+
 from django.contrib.staticfiles.storage import StaticFilesStorage
 from django.core.files.storage import get_storage_class
 from django.utils.lru_cache import lru_cache
@@ -58,7 +62,16 @@ class DevelopmentStorage(
 class S3ReportStorage(S3BotoStorage):  # pylint: disable=abstract-method
     """
     Storage for reports.
+
+    Reports can be large, so they are compressed to a temporary file rather than
+    in memory, and uploaded in parts of `multipart_chunk_size` bytes when they
+    are larger than that.
     """
+    # S3 requires the parts of a multipart upload, but the last, to be at least 5MB.
+    multipart_chunk_size = 50 * 1024 * 1024
+    # Compressed reports are kept in memory up to this size.
+    spool_max_memory_size = 5 * 1024 * 1024
+
     def __init__(self, acl=None, bucket=None, custom_domain=None, **settings):
         """
         init method for S3ReportStorage, Note that we have added an extra key-word
@@ -77,6 +90,46 @@ class S3ReportStorage(S3BotoStorage):  # pylint: disable=abstract-method
             self.custom_domain = custom_domain
         super(S3ReportStorage, self).__init__(acl=acl, bucket=bucket, **settings)
 
+    def _compress_content(self, content):
+        """
+        Gzip the content to a temporary file, a chunk at a time.
+        """
+        compressed_file = tempfile.SpooledTemporaryFile(max_size=self.spool_max_memory_size)
+        # A fixed modification time keeps the MD5 of the compressed content stable.
+        with GzipFile(mode='wb', compresslevel=6, fileobj=compressed_file, mtime=0.0) as gzip_file:
+            for chunk in content.chunks():
+                gzip_file.write(chunk)
+        content.file = compressed_file
+        content.seek(0)
+        return content
+
+    def _save_content(self, key, content, headers):
+        """
+        Upload the content to the given key, with a multipart upload if it's larger than a part.
+        """
+        content.seek(0, os.SEEK_END)
+        size = content.tell()
+        content.seek(0)
+        if size <= self.multipart_chunk_size:
+            return super(S3ReportStorage, self)._save_content(key, content, headers)
+
+        multipart_upload = self.bucket.initiate_multipart_upload(
+            key.name,
+            headers=headers,
+            reduced_redundancy=self.reduced_redundancy,
+            encrypt_key=self.encryption,
+            policy=self.default_acl,
+        )
+        try:
+            for part_number, offset in enumerate(xrange(0, size, self.multipart_chunk_size), start=1):
+                multipart_upload.upload_part_from_file(
+                    content, part_number, size=min(self.multipart_chunk_size, size - offset),
+                )
+            multipart_upload.complete_upload()
+        except Exception:
+            multipart_upload.cancel_upload()
+            raise
+
 
 @lru_cache()
 def get_storage(storage_class=None, **kwargs):